@@ -19,13 +19,21 @@ Manage the `hcache_simple` function cache from the command line.
 - Run a self-contained smoke test:
 > manage_cache.py --clear_actions --action test
 
+- Measure the overhead of a cache hit with the different key encoders:
+> manage_cache.py --clear_actions --action benchmark
+
 Import as:
 
 import dev_scripts_helpers.coding_tools.manage_cache as dsccomaca
 """
 
 import argparse
+import functools
 import logging
+import timeit
+from typing import Any, List, Tuple
+
+import pandas as pd
 
 import helpers.hcache_simple as hcacsimp
 import helpers.hdbg as hdbg
@@ -49,6 +57,8 @@ _VALID_ACTIONS = [
     "print_info",
     # Run a smoke test of the cache round-trip.
     "test",
+    # Measure the overhead of a cache hit.
+    "benchmark",
 ]
 _DEFAULT_ACTIONS = ["print_info"]
 
@@ -101,6 +111,82 @@ def _run_smoke_test() -> None:
     _LOG.info("Smoke test complete.")
 
 
+# #############################################################################
+# Benchmark.
+# #############################################################################
+
+
+@hcacsimp.simple_cache(cache_type="pickle", write_through=False)
+def manage_cache_benchmark_func(obj: Any) -> int:
+    """
+    Return a constant to measure only the overhead of the cache.
+
+    :param obj: the argument used to compute the cache key
+    :return: 1
+    """
+    _ = obj
+    return 1
+
+
+@hcacsimp.simple_cache(
+    cache_type="pickle",
+    write_through=False,
+    key_encoder=hcacsimp.hash_cache_key,
+)
+def manage_cache_benchmark_hash_func(obj: Any) -> int:
+    """
+    Same as `manage_cache_benchmark_func()` but using hashed cache keys.
+
+    :param obj: the argument used to compute the cache key
+    :return: 1
+    """
+    _ = obj
+    return 1
+
+
+def _run_benchmark(num_calls: int = 1000) -> None:
+    """
+    Measure the time of a cache hit for different arguments and key encoders.
+
+    :param num_calls: number of cache hits to average the time over
+    """
+    cache_dir = "/tmp/manage_cache.benchmark"
+    _LOG.info("Benchmark: using cache_dir='%s'", cache_dir)
+    funcs = [
+        ("json", manage_cache_benchmark_func),
+        ("hash", manage_cache_benchmark_hash_func),
+    ]
+    for _, func in funcs:
+        hcacsimp.set_cache_property(func.__name__, "cache_dir", cache_dir)
+        hcacsimp.reset_mem_cache(func.__name__)
+    objs: List[Tuple[str, Any]] = [
+        ("small", 1),
+        ("prompt_100KB", "word " * 20000),
+        (
+            "df_100Krows",
+            pd.DataFrame({"a": range(100000), "b": [1.5] * 100000}),
+        ),
+    ]
+    # Baseline: a lookup in a dict.
+    baseline = {"key": 1}
+    time_in_secs = timeit.timeit(lambda: baseline["key"], number=num_calls)
+    _LOG.info("dict lookup: %.2f us/call", time_in_secs / num_calls * 1e6)
+    for encoder_name, func in funcs:
+        for obj_name, obj in objs:
+            # Populate the cache, so that the timed calls are all hits.
+            func(obj)
+            call = functools.partial(func, obj)
+            time_in_secs = timeit.timeit(call, number=num_calls)
+            _LOG.info(
+                "key_encoder=%s arg=%s: %.2f us/hit",
+                encoder_name,
+                obj_name,
+                time_in_secs / num_calls * 1e6,
+            )
+    for _, func in funcs:
+        hcacsimp.reset_mem_cache(func.__name__)
+
+
 # #############################################################################
 # Argument parsing and main.
 # #############################################################################
@@ -144,6 +230,8 @@ def _main(parser: argparse.ArgumentParser) -> None:
                 _LOG.info("No cached functions found.")
         elif action == "test":
             _run_smoke_test()
+        elif action == "benchmark":
+            _run_benchmark()
         else:
             raise ValueError(f"Invalid action='{action}'")
     hdbg.dassert_eq(
@@ -18,6 +18,10 @@ parallel.
 - Run the failure workload with 3 parallel threads:
 > clear; parallel_script_template.py --workload failure --num_threads 3
 
+- Compare starting a process per task with a pool of warm worker processes,
+  executing 1000 small tasks with 4 threads:
+> clear; parallel_script_template.py --workload benchmark --num_threads 4
+
 Add a description of what the script does and examples of command lines.
 Check dev_scripts/linter.py to see an example of a script using this
 template.
@@ -30,12 +34,14 @@ import dev_scripts_helpers.parallel_script_template as dspascsk
 # TODO(gp): We should test this, although the library is already tested.
 
 import argparse
+import concurrent.futures
 import logging
 import os
 
 import helpers.hdbg as hdbg
 import helpers.hjoblib as hjoblib
 import helpers.hparser as hparser
+import helpers.htimer as htimer
 
 # This module contains example workloads.
 import helpers.test.test_joblib_helpers
@@ -56,7 +62,7 @@ def _parse() -> argparse.ArgumentParser:
         "--workload",
         action="store",
         type=str,
-        choices=["success", "failure"],
+        choices=["success", "failure", "benchmark"],
         help="Worklod to execute",
     )
     parser.add_argument(
@@ -75,9 +81,43 @@ def _parse() -> argparse.ArgumentParser:
     return parser  # type: ignore
 
 
+def _run_benchmark(num_threads: int, num_tasks: int = 1000) -> None:
+    """
+    Measure the time to execute small tasks in separate processes.
+
+    :param num_threads: number of threads submitting the tasks
+    :param num_tasks: number of tasks to execute
+    """
+    func = helpers.test.test_joblib_helpers.get_pid
+    worker_pool = hjoblib.get_worker_pool(num_threads)
+    # Start the workers before measuring.
+    list(worker_pool.map(func, range(num_threads)))
+    funcs = [
+        ("new process per task", hjoblib.processify(func)),
+        (
+            "worker pool",
+            hjoblib.processify(func, worker_pool=worker_pool),
+        ),
+    ]
+    for tag, processified_func in funcs:
+        with htimer.TimedScope(logging.DEBUG, tag) as ts:
+            with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+                list(executor.map(processified_func, range(num_tasks)))
+        _LOG.info(
+            "%s: %.2f secs for %s tasks (%.2f ms/task)",
+            tag,
+            ts.elapsed_time,
+            num_tasks,
+            ts.elapsed_time / num_tasks * 1e3,
+        )
+
+
 def _main(parser: argparse.ArgumentParser) -> None:
     args = parser.parse_args()
     hdbg.init_logger(verbosity=args.log_level, use_exec_path=True)
+    if args.workload == "benchmark":
+        _run_benchmark(hjoblib.get_num_executing_threads(args.num_threads))
+        return
     # Prepare the workload.
     randomize = args.randomize
     # randomize = False
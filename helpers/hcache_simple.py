@@ -10,16 +10,38 @@ import helpers.hcache_simple as hcacsimp
 """
 
 import argparse
+import asyncio
+import atexit
+import contextlib
+import fcntl
 import functools
 import glob
 import hashlib
 import inspect
+import itertools
 import json
 import logging
+import multiprocessing.util
 import os
 import pickle
 import re
-from typing import Any, Callable, Dict, List, Optional, Union, cast
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
 import helpers.hdbg as hdbg
 import helpers.hgit as hgit
@@ -80,6 +102,31 @@ if "_CACHE" not in globals():
     _LOG.trace("Creating _CACHE")
     _CACHE: _CacheType = {}
 
+# Create global variable for the lock protecting the memory cache (and the
+# other in-memory state, e.g., properties and SQLite connections) from
+# concurrent threads.
+# - The lock is not held while a cached function is being computed
+# - Concurrent processes are synchronized on disk (see `_lock_file()`)
+if "_CACHE_LOCK" not in globals():
+    _LOG.trace("Creating _CACHE_LOCK")
+    _CACHE_LOCK = threading.RLock()
+
+
+def _reset_cache_lock_after_fork() -> None:
+    """
+    Recreate the lock in a forked child process.
+
+    Another thread of the parent process could hold the lock while
+    forking, leaving it locked forever in the child.
+    """
+    global _CACHE_LOCK
+    _CACHE_LOCK = threading.RLock()
+
+
+if "_CACHE_LOCK_FORK_HOOK" not in globals():
+    _CACHE_LOCK_FORK_HOOK = True
+    os.register_at_fork(after_in_child=_reset_cache_lock_after_fork)
+
 # Process-wide default `cache_mode` applied to every `@simple_cache` function
 # when no explicit `cache_mode` is passed at the call site. Used by CLI scripts
 # to flip all cached functions into refresh/disable/hit-or-abort mode from a
@@ -268,11 +315,12 @@ def cache_data_to_str(cache_data: _CacheType) -> str:
 #       on a cache miss
 #     - `force_refresh`: Whether to bypass the cache and refresh the value
 #   - `System Properties`:
-#     - cache type (e.g., "json" or "pickle")
+#     - cache type (e.g., "json", "pickle", or "sqlite")
 #     - write through (e.g., True or False)
 #     - exclude keys (e.g., ["password", "api_key"])
 #     - per-function cache location (cache_dir, cache_prefix)
 #     - per-function S3 configuration (s3_bucket, s3_prefix, aws_profile, auto_sync_s3)
+#     - memory cache bounds (max_entries, max_bytes, eviction_policy, ttl)
 
 _SYSTEM_PROPERTIES = [
     "type",
@@ -288,6 +336,13 @@ _SYSTEM_PROPERTIES = [
     # Used to warn when the function body changes while stale cached values
     # are still being served.
     "func_hash",
+    "max_entries",
+    "max_bytes",
+    "eviction_policy",
+    "ttl",
+    "write_back",
+    "write_back_max_misses",
+    "write_back_max_secs",
 ]
 
 
@@ -494,46 +549,63 @@ if "_CACHE_PROPERTY" not in globals():
     _CACHE_PROPERTY: _CachePropertyType = _get_initial_cache_property()
 
 
+# Names of the valid cache properties.
+_VALID_CACHE_PROPERTIES = [
+    # Abort if there is a cache miss. This is used to make sure everything
+    # is cached.
+    "abort_on_cache_miss",
+    # Report if there is a cache miss and return `_cache_miss_` instead of
+    # accessing the real value.
+    "report_on_cache_miss",
+    # Force to refresh the value.
+    "force_refresh",
+    # TODO(gp): "force_refresh_once"
+    # json, pickle, or sqlite cache type.
+    "type",
+    # Write-through mode: flush cache to disk after each update.
+    "write_through",
+    # List of keys to exclude from cache key generation.
+    "exclude_keys",
+    # Per-function cache directory.
+    "cache_dir",
+    # Per-function cache file prefix.
+    "cache_prefix",
+    # Per-function S3 bucket.
+    "s3_bucket",
+    # Per-function S3 prefix.
+    "s3_prefix",
+    # Per-function AWS profile.
+    "aws_profile",
+    # Auto-sync to S3 after cache updates.
+    "auto_sync_s3",
+    # MD5 hex digest of the function source recorded at decoration time.
+    "func_hash",
+    # Max number of entries kept in the memory cache.
+    "max_entries",
+    # Max size in bytes of the entries kept in the memory cache.
+    "max_bytes",
+    # Policy to evict entries from memory ("lru" or "lfu").
+    "eviction_policy",
+    # Seconds after which an entry not accessed is evicted from memory.
+    "ttl",
+    # Write-back mode: flush the new entries to disk in batches.
+    "write_back",
+    # Max number of new entries before flushing them in write-back mode.
+    "write_back_max_misses",
+    # Max seconds before flushing the new entries in write-back mode.
+    "write_back_max_secs",
+]
+
+
 def _check_valid_cache_property(property_name: str) -> None:
     """
     Verify that a cache property name is valid for the given type.
 
     :param property_name: The property name to validate.
     """
-    _LOG.trace(hprint.func_signature_to_str())
+    _LOG.trace("property_name=%s", property_name)
     hdbg.dassert_isinstance(property_name, str)
-    valid_properties = [
-        # Abort if there is a cache miss. This is used to make sure everything
-        # is cached.
-        "abort_on_cache_miss",
-        # Report if there is a cache miss and return `_cache_miss_` instead of
-        # accessing the real value.
-        "report_on_cache_miss",
-        # Force to refresh the value.
-        "force_refresh",
-        # TODO(gp): "force_refresh_once"
-        # json or pickle cache type.
-        "type",
-        # Write-through mode: flush cache to disk after each update.
-        "write_through",
-        # List of keys to exclude from cache key generation.
-        "exclude_keys",
-        # Per-function cache directory.
-        "cache_dir",
-        # Per-function cache file prefix.
-        "cache_prefix",
-        # Per-function S3 bucket.
-        "s3_bucket",
-        # Per-function S3 prefix.
-        "s3_prefix",
-        # Per-function AWS profile.
-        "aws_profile",
-        # Auto-sync to S3 after cache updates.
-        "auto_sync_s3",
-        # MD5 hex digest of the function source recorded at decoration time.
-        "func_hash",
-    ]
-    hdbg.dassert_in(property_name, valid_properties)
+    hdbg.dassert_in(property_name, _VALID_CACHE_PROPERTIES)
 
 
 def _infer_cache_type_from_path(file_path: str) -> str:
@@ -541,10 +613,12 @@ def _infer_cache_type_from_path(file_path: str) -> str:
     Infer cache type from file path extension.
 
     :param file_path: path to cache file (local or S3)
-    :return: inferred type ("pickle" or "json")
+    :return: inferred type ("pickle", "json", or "sqlite")
     """
     if file_path.endswith(".pkl"):
         out = "pickle"
+    elif file_path.endswith(".db"):
+        out = "sqlite"
     elif file_path.endswith(".json"):
         out = "json"
     else:
@@ -561,8 +635,12 @@ def _save_func_cache_data_to_file(
     """
     Save the function cache data to a file.
 
+    For "json" and "pickle" the file is rewritten with `func_cache_data`,
+    while for "sqlite" the entries are upserted into the existing database.
+
     :param file_name: The name of the file.
-    :param cache_type: The cache type ("json", "pickle", or "" to infer).
+    :param cache_type: The cache type ("json", "pickle", "sqlite", or "" to
+        infer).
     :param func_cache_data: The function cache data to save.
     """
     # Infer cache type from file extension if not set.
@@ -570,21 +648,59 @@ def _save_func_cache_data_to_file(
         cache_type = _infer_cache_type_from_path(file_name)
     hio.create_enclosing_dir(file_name, incremental=True)
     _LOG.trace("Saving to '%s'", file_name)
-    # Save data.
-    if cache_type == "pickle":
-        with open(file_name, "wb") as file:
-            pickle.dump(func_cache_data, file)
-    elif cache_type == "json":
-        with open(file_name, "w", encoding="utf-8") as file:
-            json.dump(
-                func_cache_data,
-                file,
-                indent=4,
-                sort_keys=True,
-                ensure_ascii=False,
-            )
-    else:
+    if cache_type == "sqlite":
+        _save_sqlite_entries(file_name, func_cache_data)
+        return
+    if cache_type not in ("json", "pickle"):
         raise ValueError(f"Invalid cache type '{cache_type}'")
+    # Save data to a temporary file in the same dir and then rename it, so that
+    # concurrent readers never see a partially written file.
+    fd, tmp_file_name = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(file_name)),
+        prefix=os.path.basename(file_name) + ".",
+        suffix=".tmp",
+    )
+    try:
+        if cache_type == "pickle":
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(func_cache_data, file)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(
+                    func_cache_data,
+                    file,
+                    indent=4,
+                    sort_keys=True,
+                    ensure_ascii=False,
+                )
+        # `mkstemp()` creates files readable only by the owner.
+        os.chmod(tmp_file_name, 0o644)
+        os.replace(tmp_file_name, file_name)
+    except BaseException:
+        if os.path.exists(tmp_file_name):
+            os.remove(tmp_file_name)
+        raise
+
+
+@contextlib.contextmanager
+def _lock_file(file_name: str) -> Iterator[None]:
+    """
+    Hold an exclusive inter-process lock on a file.
+
+    The lock is taken on the companion file `<file_name>.lock`, so that
+    `file_name` can be atomically replaced while the lock is held.
+
+    :param file_name: the file to lock
+    """
+    lock_file_name = file_name + ".lock"
+    hio.create_enclosing_dir(lock_file_name, incremental=True)
+    with open(lock_file_name, "a", encoding="utf-8") as lock_file:
+        _LOG.trace("Locking '%s'", lock_file_name)
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
 
 
 def set_cache_property(func_name: str, property_name: str, val: Any) -> None:
@@ -600,25 +716,54 @@ def set_cache_property(func_name: str, property_name: str, val: Any) -> None:
     hdbg.dassert_isinstance(func_name, str)
     hdbg.dassert_isinstance(property_name, str)
     _check_valid_cache_property(property_name)
-    # Assign value.
-    cache_property = _CACHE_PROPERTY
-    if func_name not in cache_property:
-        cache_property[func_name] = {}
-    dict_ = cache_property[func_name]
-    dict_[property_name] = val
-    # Update values on the disk.
+    with _CACHE_LOCK:
+        # Assign value.
+        cache_property = _CACHE_PROPERTY
+        if func_name not in cache_property:
+            cache_property[func_name] = {}
+        dict_ = cache_property[func_name]
+        dict_[property_name] = val
+        # Make sure the dict is well-formed.
+        for func_name_tmp in cache_property:
+            hdbg.dassert_isinstance(func_name_tmp, str)
+            _LOG.trace(
+                "func_name_tmp='%s' -> %s",
+                func_name_tmp,
+                cache_property[func_name_tmp],
+            )
+        # Update values on the disk.
+        _save_cache_property()
+
+
+def _save_cache_property(*, reset_user_properties: bool = False) -> None:
+    """
+    Save the cache properties to disk.
+
+    The in-memory properties are merged into the ones on disk (in-memory
+    ones take precedence) holding an inter-process lock, so that processes
+    sharing the property file don't drop each other's properties.
+
+    :param reset_user_properties: if True, remove the user properties
+        from the properties on disk before merging
+    """
     file_name = get_cache_property_file()
     _LOG.trace("Updating %s", file_name)
-    # Make sure the dict is well-formed.
-    for func_name_tmp in cache_property:
-        hdbg.dassert_isinstance(func_name_tmp, str)
-        _LOG.trace(
-            "func_name_tmp='%s' -> %s",
-            func_name_tmp,
-            cache_property[func_name_tmp],
-        )
-    hio.create_enclosing_dir(file_name, incremental=True)
-    _save_func_cache_data_to_file(file_name, "pickle", cache_property)
+    with _lock_file(file_name):
+        if os.path.exists(file_name):
+            disk_property = cast(
+                _CachePropertyType,
+                _load_func_cache_data_from_file(file_name, "pickle"),
+            )
+        else:
+            disk_property = {}
+        for func_name_tmp, func_prop in _CACHE_PROPERTY.items():
+            disk_func_prop = disk_property.setdefault(func_name_tmp, {})
+            if reset_user_properties:
+                for property_name_tmp in list(disk_func_prop.keys()):
+                    if property_name_tmp not in _SYSTEM_PROPERTIES:
+                        del disk_func_prop[property_name_tmp]
+            disk_func_prop.update(func_prop)
+        _save_func_cache_data_to_file(file_name, "pickle", disk_property)
 
 
 def get_cache_property(
@@ -631,7 +776,10 @@ def get_cache_property(
         the property. Returns None if the property is not set (for
         system properties), or False (for user properties).
     """
-    _LOG.trace(hprint.func_signature_to_str())
+    # This is called several times for each cached call, so we don't use
+    # `hprint.func_signature_to_str()`, which inspects the stack even when
+    # tracing is disabled.
+    _LOG.trace("func_name=%s property_name=%s", func_name, property_name)
     _check_valid_cache_property(property_name)
     # Read from in-memory property storage.
     cache_property = _CACHE_PROPERTY
@@ -650,24 +798,24 @@ def reset_cache_property() -> None:
     """
     file_name = get_cache_property_file()
     _LOG.warning("Resetting %s", file_name)
-    # Empty the values.
-    global _CACHE_PROPERTY
-    cache_property = _CACHE_PROPERTY
-    # Empty the values excluding the system properties like `type` and
-    # `write_through`.
-    _LOG.trace("before cache_property=%s", cache_property)
-    # Iterate over a list of keys to avoid modifying the dictionary during iteration.
-    for func_name_tmp in list(cache_property.keys()):
-        # Only remove non-system properties from the function's property dict.
-        func_prop = cache_property[func_name_tmp]
-        for property_name_tmp in list(func_prop.keys()):
-            if property_name_tmp not in _SYSTEM_PROPERTIES:
-                del func_prop[property_name_tmp]
-    _LOG.trace("after cache_property=%s", cache_property)
-    # Update values on the disk.
-    _LOG.trace("Updating %s", file_name)
-    hio.create_enclosing_dir(file_name, incremental=True)
-    _save_func_cache_data_to_file(file_name, "pickle", cache_property)
+    with _CACHE_LOCK:
+        # Empty the values.
+        cache_property = _CACHE_PROPERTY
+        # Empty the values excluding the system properties like `type` and
+        # `write_through`.
+        _LOG.trace("before cache_property=%s", cache_property)
+        # Iterate over a list of keys to avoid modifying the dictionary during
+        # iteration.
+        for func_name_tmp in list(cache_property.keys()):
+            # Only remove non-system properties from the function's property
+            # dict.
+            func_prop = cache_property[func_name_tmp]
+            for property_name_tmp in list(func_prop.keys()):
+                if property_name_tmp not in _SYSTEM_PROPERTIES:
+                    del func_prop[property_name_tmp]
+        _LOG.trace("after cache_property=%s", cache_property)
+        # Update values on the disk.
+        _save_cache_property(reset_user_properties=True)
 
 
 # #############################################################################
@@ -704,7 +852,7 @@ def _extract_func_names_from_cache_files(
     :return: set of function names
     """
     func_names = set()
-    pattern = r"^(.+)\.([^\.]+)\.(?:json|pkl)$"
+    pattern = r"^(.+)\.([^\.]+)\.(?:json|pkl|db)$"
     for file_path in file_paths:
         base_name = os.path.basename(file_path)
         match = re.match(pattern, base_name)
@@ -767,10 +915,14 @@ def _get_cache_file_name(func_name: str) -> str:
         file_name += ".pkl"
     elif cache_type == "json":
         file_name += ".json"
+    elif cache_type == "sqlite":
+        file_name += ".db"
     elif cache_type is None:
         # Try to infer cache type from existing files.
         if os.path.exists(file_name + ".pkl"):
             file_name += ".pkl"
+        elif os.path.exists(file_name + ".db"):
+            file_name += ".db"
         elif os.path.exists(file_name + ".json"):
             file_name += ".json"
         else:
@@ -864,6 +1016,7 @@ def get_cached_func_names(type_: str) -> List[str]:
         # Search global cache directory.
         disk_files = glob.glob(os.path.join(cache_dir, "*.json"))
         disk_files += glob.glob(os.path.join(cache_dir, "*.pkl"))
+        disk_files += glob.glob(os.path.join(cache_dir, "*.db"))
         property_file_name = os.path.basename(get_cache_property_file())
         # Filter out property file.
         disk_files = [
@@ -1064,7 +1217,8 @@ def _load_func_cache_data_from_file(
     Load the function cache data from a file.
 
     :param file_name: the name of the file
-    :param cache_type: the type of the cache ("json", "pickle", or "" to infer)
+    :param cache_type: the type of the cache ("json", "pickle", "sqlite", or
+        "" to infer)
     :return: the function cache data
     """
     # Infer cache type from file extension if not set.
@@ -1079,6 +1233,8 @@ def _load_func_cache_data_from_file(
     elif cache_type == "json":
         with open(file_name, "r", encoding="utf-8") as file:
             func_cache_data = json.load(file)
+    elif cache_type == "sqlite":
+        func_cache_data = _load_sqlite_entries(file_name)
     else:
         raise ValueError(f"Invalid cache type '{cache_type}'")
     return func_cache_data
@@ -1110,6 +1266,282 @@ def get_disk_cache(func_name: str) -> _FunctionCacheType:
     return func_cache_data
 
 
+# Create global variable for the parsed JSON / pickle disk caches, so that
+# looking up an entry on a memory miss doesn't parse the cache file each time.
+if "_DISK_CACHE_SNAPSHOTS" not in globals():
+    _LOG.trace("Creating _DISK_CACHE_SNAPSHOTS")
+    # file_name -> (version of the file, parsed disk cache)
+    _DISK_CACHE_SNAPSHOTS: Dict[
+        str, Tuple[Tuple[int, int, int, int], _FunctionCacheType]
+    ] = {}
+
+
+def _get_cache_file_version(stat: os.stat_result) -> Tuple[int, int, int, int]:
+    """
+    Return the version of a cache file to detect when it's rewritten.
+
+    The cache files are replaced atomically, so a rewrite usually changes the
+    inode even within the granularity of the timestamps. A rewrite is missed
+    only if it reuses the inode and keeps the size and the timestamps (e.g.,
+    an external in-place rewrite with the same size within the same tick of
+    the filesystem clock).
+    """
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size)
+    return version
+
+
+def _get_disk_cache_snapshot(func_name: str) -> _FunctionCacheType:
+    """
+    Return the JSON / pickle disk cache of a function, parsing it only if the
+    cache file changed since the last call.
+
+    :param func_name: the name of the function
+    :return: the disk cache, which must not be modified
+    """
+    file_name = _get_cache_file_name(func_name)
+    try:
+        stat = os.stat(file_name)
+    except FileNotFoundError:
+        with _CACHE_LOCK:
+            _DISK_CACHE_SNAPSHOTS.pop(file_name, None)
+        return {}
+    version = _get_cache_file_version(stat)
+    with _CACHE_LOCK:
+        snapshot = _DISK_CACHE_SNAPSHOTS.get(file_name)
+    if snapshot is not None and snapshot[0] == version:
+        return snapshot[1]
+    disk_cache = get_disk_cache(func_name)
+    with _CACHE_LOCK:
+        _DISK_CACHE_SNAPSHOTS[file_name] = (version, disk_cache)
+    return disk_cache
+
+
+def _set_disk_cache_snapshot(
+    file_name: str, disk_cache: _FunctionCacheType
+) -> None:
+    """
+    Record the content of a cache file that was just saved, so that it's not
+    parsed again.
+
+    :param file_name: path to the cache file
+    :param disk_cache: the content saved to the cache file
+    """
+    try:
+        stat = os.stat(file_name)
+    except FileNotFoundError:
+        return
+    version = _get_cache_file_version(stat)
+    with _CACHE_LOCK:
+        _DISK_CACHE_SNAPSHOTS[file_name] = (version, disk_cache)
+
+
+def _merge_into_disk_cache(
+    func_name: str, func_cache_data: _FunctionCacheType
+) -> _FunctionCacheType:
+    """
+    Merge entries into the JSON / pickle disk cache of a function.
+
+    The disk cache is read, merged (`func_cache_data` takes precedence),
+    and saved holding an inter-process lock on the cache file, so that
+    concurrent writers don't lose each other's entries.
+
+    :param func_name: the name of the function
+    :param func_cache_data: the entries to merge
+    :return: the merged disk cache
+    """
+    hdbg.dassert_ne(get_cache_property(func_name, "type"), "sqlite")
+    file_name = _get_cache_file_name(func_name)
+    with _lock_file(file_name):
+        disk_cache = _get_disk_cache_snapshot(func_name)
+        # Skip the write if the entries are already on disk, e.g., when
+        # evicting entries that were read back from the disk cache.
+        if all(
+            cache_key in disk_cache and disk_cache[cache_key] is value
+            for cache_key, value in func_cache_data.items()
+        ):
+            return disk_cache
+        disk_cache = {**disk_cache, **func_cache_data}
+        # Do not create empty cache files.
+        if len(disk_cache) > 0:
+            _save_cache_dict_to_disk(func_name, disk_cache)
+            _set_disk_cache_snapshot(file_name, disk_cache)
+    return disk_cache
+
+
+# #############################################################################
+# SQLite disk cache.
+# #############################################################################
+
+# With `cache_type="sqlite"` the disk cache of a function is an SQLite database
+# in WAL mode storing one row per cache key, instead of a single JSON / pickle
+# document that is rewritten on every update. This makes a miss a single-row
+# upsert and a lookup a point read, independently of the number of entries.
+# - Values are pickled, so any picklable object can be cached
+# - Connections are kept open per file and reopened in a forked child process
+# - Concurrent processes are synchronized by SQLite, while the threads of a
+#   process share a connection and are serialized by `_CACHE_LOCK`
+
+# Create global variable for the open SQLite connections.
+if "_SQLITE_CONNECTIONS" not in globals():
+    _LOG.trace("Creating _SQLITE_CONNECTIONS")
+    # file_name -> (pid of the process that opened it, connection).
+    _SQLITE_CONNECTIONS: Dict[str, Tuple[int, sqlite3.Connection]] = {}
+
+
+def _get_sqlite_connection(file_name: str) -> sqlite3.Connection:
+    """
+    Get an open connection to an SQLite cache file, creating it if needed.
+
+    :param file_name: path to the SQLite cache file
+    :return: connection to the database
+    """
+    with _CACHE_LOCK:
+        file_name = os.path.abspath(file_name)
+        pid = os.getpid()
+        if file_name in _SQLITE_CONNECTIONS:
+            conn_pid, conn = _SQLITE_CONNECTIONS[file_name]
+            if conn_pid == pid:
+                return conn
+            # A connection inherited through `fork()` can't be shared with the
+            # parent process, so open a new one.
+            _LOG.trace("Reopening '%s' in process %s", file_name, pid)
+        hio.create_enclosing_dir(file_name, incremental=True)
+        _LOG.trace("Opening '%s'", file_name)
+        conn = sqlite3.connect(file_name, timeout=60, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache"
+            " (key TEXT PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID"
+        )
+        conn.commit()
+        _SQLITE_CONNECTIONS[file_name] = (pid, conn)
+        return conn
+
+
+def _close_sqlite_connection(file_name: str = "") -> None:
+    """
+    Close the connection to an SQLite cache file, if open.
+
+    :param file_name: path to the SQLite cache file. If empty, close all
+        the open connections
+    """
+    with _CACHE_LOCK:
+        if file_name == "":
+            for file_name_tmp in list(_SQLITE_CONNECTIONS.keys()):
+                _close_sqlite_connection(file_name_tmp)
+            return
+        file_name = os.path.abspath(file_name)
+        if file_name not in _SQLITE_CONNECTIONS:
+            return
+        conn_pid, conn = _SQLITE_CONNECTIONS.pop(file_name)
+        # Only the process that opened the connection can close it.
+        if conn_pid == os.getpid():
+            _LOG.trace("Closing '%s'", file_name)
+            conn.close()
+
+
+def _checkpoint_sqlite_file(file_name: str) -> None:
+    """
+    Move all the content of the write-ahead log into the database file.
+
+    This is needed before copying the database file (e.g., to S3), since
+    the most recent entries may still be only in the `-wal` file.
+
+    :param file_name: path to the SQLite cache file
+    """
+    with _CACHE_LOCK:
+        conn = _get_sqlite_connection(file_name)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def _save_sqlite_entries(
+    file_name: str, func_cache_data: _FunctionCacheType
+) -> None:
+    """
+    Upsert cache entries into an SQLite cache file in a single transaction.
+
+    :param file_name: path to the SQLite cache file
+    :param func_cache_data: cache key -> value entries to store
+    """
+    rows = [
+        (cache_key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        for cache_key, value in func_cache_data.items()
+    ]
+    # The connection is shared by all the threads, so transactions must not
+    # interleave.
+    with _CACHE_LOCK:
+        conn = _get_sqlite_connection(file_name)
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", rows
+            )
+
+
+def _load_sqlite_entries(file_name: str) -> _FunctionCacheType:
+    """
+    Load all the entries of an SQLite cache file.
+
+    :param file_name: path to the SQLite cache file
+    :return: cache key -> value entries
+    """
+    with _CACHE_LOCK:
+        conn = _get_sqlite_connection(file_name)
+        rows = conn.execute("SELECT key, value FROM cache").fetchall()
+    func_cache_data = {key: pickle.loads(value) for key, value in rows}
+    return func_cache_data
+
+
+def _load_sqlite_entry(file_name: str, cache_key: str) -> Tuple[bool, Any]:
+    """
+    Look up a single entry of an SQLite cache file.
+
+    :param file_name: path to the SQLite cache file
+    :param cache_key: the cache key to look up
+    :return: whether the key was found and the corresponding value (or
+        `None`, if not found)
+    """
+    if not os.path.exists(file_name):
+        # Do not create a database just to find out that it's empty.
+        return False, None
+    with _CACHE_LOCK:
+        conn = _get_sqlite_connection(file_name)
+        row = conn.execute(
+            "SELECT value FROM cache WHERE key = ?", (cache_key,)
+        ).fetchone()
+    if row is None:
+        return False, None
+    value = pickle.loads(row[0])
+    return True, value
+
+
+def _remove_cache_file(file_name: str) -> None:
+    """
+    Remove a disk cache file.
+
+    For SQLite cache files the connection is closed and the `-wal` / `-shm`
+    companion files are also removed. The `.lock` companion file created by
+    `_lock_file()` is never removed: a process holding the lock on the
+    removed file and a process locking a newly created one would both enter
+    the critical section.
+
+    :param file_name: path to the cache file
+    """
+    if _infer_cache_type_from_path(file_name) == "sqlite":
+        _close_sqlite_connection(file_name)
+        for suffix in ("-wal", "-shm", ""):
+            if os.path.exists(file_name + suffix):
+                os.remove(file_name + suffix)
+        return
+    with _CACHE_LOCK:
+        _DISK_CACHE_SNAPSHOTS.pop(file_name, None)
+    if os.path.exists(file_name):
+        # Don't remove the file while another process is updating it.
+        with _lock_file(file_name):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+
 # #############################################################################
 # S3 cache.
 # #############################################################################
@@ -1122,7 +1554,7 @@ def _build_s3_cache_path_for_type(func_name: str, cache_type: str) -> str:
     Build S3 cache path for a specific cache type.
 
     :param func_name: the name of the function
-    :param cache_type: the cache type ("json" or "pickle")
+    :param cache_type: the cache type ("json", "pickle", or "sqlite")
     :return: the S3 path with appropriate extension
     """
     # Check for per-function S3 bucket, otherwise use global.
@@ -1149,6 +1581,8 @@ def _build_s3_cache_path_for_type(func_name: str, cache_type: str) -> str:
         base_name = f"{prefix}.{func_name}.pkl"
     elif cache_type == "json":
         base_name = f"{prefix}.{func_name}.json"
+    elif cache_type == "sqlite":
+        base_name = f"{prefix}.{func_name}.db"
     else:
         raise ValueError(f"Invalid cache type '{cache_type}'")
     # Construct S3 path.
@@ -1191,13 +1625,13 @@ def _extract_func_name_from_cache_file(cache_file_name: str) -> str:
     """
     Extract function name from cache file name.
 
-    Cache file names follow the format: <prefix>.<func_name>.<json|pkl>
+    Cache file names follow the format: <prefix>.<func_name>.<json|pkl|db>
 
     :param cache_file_name: the cache file name (e.g.,
         "cache.my_func.json")
     :return: the function name, or "" if pattern does not match
     """
-    pattern = r"^(.+)\.([^\.]+)\.(?:json|pkl)$"
+    pattern = r"^(.+)\.([^\.]+)\.(?:json|pkl|db)$"
     match = re.match(pattern, cache_file_name)
     if match:
         return match.group(2)
@@ -1231,8 +1665,11 @@ def _upload_cache_to_s3(func_name: str) -> None:
     # Infer cache type from file extension if not set.
     if cache_type is None:
         cache_type = _infer_cache_type_from_path(local_file)
-    if cache_type == "pickle":
-        # Read pickle files as bytes and write.
+    if cache_type == "sqlite":
+        # Make sure the database file is self-contained before copying it.
+        _checkpoint_sqlite_file(local_file)
+    if cache_type in ("pickle", "sqlite"):
+        # Read pickle and SQLite files as bytes and write.
         with open(local_file, "rb") as f:
             data = f.read()
         s3fs_ = hs3.get_s3fs(aws_profile)
@@ -1267,8 +1704,8 @@ def _download_cache_from_s3(func_name: str) -> bool:
     cache_type = get_cache_property(func_name, "type")
     # If type is unknown, try both extensions in S3.
     if cache_type is None:
-        # Try both .json and .pkl extensions.
-        for ext_type in ["json", "pickle"]:
+        # Try all the extensions.
+        for ext_type in ["json", "pickle", "sqlite"]:
             # Build S3 path for this type.
             s3_path_candidate = _build_s3_cache_path_for_type(
                 func_name, ext_type
@@ -1299,8 +1736,12 @@ def _download_cache_from_s3(func_name: str) -> bool:
     if cache_type is None:
         cache_type = _infer_cache_type_from_path(s3_path)
     hio.create_enclosing_dir(local_file, incremental=True)
-    if cache_type == "pickle":
-        # Read pickle files as bytes and write.
+    if cache_type == "sqlite":
+        # Drop the local database, including its write-ahead log, so that it
+        # is fully replaced by the downloaded one.
+        _remove_cache_file(local_file)
+    if cache_type in ("pickle", "sqlite"):
+        # Read pickle and SQLite files as bytes and write.
         with s3fs_.open(s3_path, "rb") as f:
             data = f.read()
         with open(local_file, "wb") as f:
@@ -1326,6 +1767,9 @@ def cache_stats_to_str(
     If `func_name` is empty or None, returns stats for all functions with local cache
     (mem + disk).
 
+    For functions with a bounded memory cache, the bounds, the size of
+    the memory cache, and the number of evicted entries are also reported.
+
     E.g.,
     ```
     find_email:
@@ -1366,6 +1810,14 @@ def cache_stats_to_str(
         result["disk"] = len(disk_cache)
     else:
         result["disk"] = "-"
+    # Memory cache bounds.
+    if _is_cache_bounded(func_name):
+        bound_properties = ("max_entries", "max_bytes", "eviction_policy", "ttl")
+        for property_name in bound_properties:
+            result[property_name] = get_cache_property(func_name, property_name)
+        state = _get_cache_bounds_state(func_name)
+        result["memory_bytes"] = state["bytes"]
+        result["evictions"] = state["evictions"]
     result = pd.Series(result).to_frame().T
     result.index = [func_name]
     return result
@@ -1387,7 +1839,11 @@ def flush_cache_to_disk(func_name: str = "") -> None:
     Flush the memory cache to disk and update the memory cache.
 
     This merges memory cache with disk cache (memory takes precedence)
-    and saves to disk, then updates memory with the merged result.
+    and saves to disk, then updates memory with the merged result. For
+    SQLite caches the memory entries are upserted into the database
+    without loading the disk cache into memory. In write-back mode, this
+    flushes the dirty entries and uploads the cache to S3 if
+    `auto_sync_s3` is set.
 
     :param func_name: the name of the function. If empty or None, apply
         to all functions with memory cache
@@ -1402,21 +1858,33 @@ def flush_cache_to_disk(func_name: str = "") -> None:
         _LOG.info("After:\n%s", cache_stats_to_str())
         return
     _LOG.trace("func_name='%s'", func_name)
-    # Get memory cache.
-    mem_cache = get_mem_cache(func_name)
+    # Get a snapshot of the memory cache, since other threads can update it.
+    with _CACHE_LOCK:
+        # All the memory entries are saved below, including the dirty ones.
+        dirty_keys = _pop_dirty_cache_keys(func_name)
+        mem_cache = dict(get_mem_cache(func_name))
     _LOG.trace("mem_cache=%s", len(mem_cache))
-    # Get disk cache.
-    disk_cache = get_disk_cache(func_name)
-    _LOG.trace("disk_cache=%s", len(disk_cache))
-    # Merge disk cache with memory cache.
-    disk_cache.update(mem_cache)
-    # Save merged cache to disk only if non-empty.
-    # Do not create empty cache files.
-    if len(disk_cache) > 0:
-        _save_cache_dict_to_disk(func_name, disk_cache)
-        # Update the memory cache.
-        global _CACHE
-        _CACHE[func_name] = disk_cache
+    if get_cache_property(func_name, "type") == "sqlite":
+        # The keyed store merges on write, so there is no need to read it.
+        if len(mem_cache) > 0:
+            _save_cache_dict_to_disk(func_name, mem_cache)
+    else:
+        # Merge the memory cache into the disk cache.
+        disk_cache = _merge_into_disk_cache(func_name, mem_cache)
+        _LOG.trace("disk_cache=%s", len(disk_cache))
+        # Update the memory cache with the entries saved by other processes,
+        # unless it's bounded, since the disk cache can be larger than the
+        # bounds.
+        if len(disk_cache) > 0 and not _is_cache_bounded(func_name):
+            with _CACHE_LOCK:
+                cache = _CACHE.setdefault(func_name, {})
+                for cache_key, value in disk_cache.items():
+                    # Memory takes precedence.
+                    if cache_key not in cache:
+                        cache[cache_key] = value
+    if dirty_keys and get_cache_property(func_name, "auto_sync_s3"):
+        _LOG.debug("Auto-syncing cache to S3 for '%s'", func_name)
+        _upload_cache_to_s3(func_name)
 
 
 def push_cache_to_s3(func_name: str = "") -> None:
@@ -1452,14 +1920,17 @@ def force_cache_from_disk(func_name: str = "") -> None:
         _LOG.info("After:\n%s", cache_stats_to_str())
         return
     _LOG.trace("func_name='%s'", func_name)
+    # Save the entries not flushed yet in write-back mode.
+    _flush_write_back_cache(func_name)
     # Get disk cache.
     disk_cache = get_disk_cache(func_name)
     _LOG.trace("disk_cache=%s", len(disk_cache))
     # Update the memory cache only if non-empty.
     # Do not store empty dicts to avoid phantom cached functions.
     if len(disk_cache) > 0:
-        global _CACHE
-        _CACHE[func_name] = disk_cache
+        with _CACHE_LOCK:
+            _CACHE[func_name] = disk_cache
+            _CACHE_BOUNDS.pop(func_name, None)
 
 
 def pull_cache_from_s3(func_name: str = "") -> None:
@@ -1532,13 +2003,61 @@ def sync_cache_with_s3(func_name: str = "") -> None:
             # Upload back to S3.
             _upload_cache_to_s3(func_name)
             # Update memory cache.
-            global _CACHE
-            _CACHE[func_name] = s3_cache
+            with _CACHE_LOCK:
+                _CACHE[func_name] = s3_cache
+                _CACHE_BOUNDS.pop(func_name, None)
     else:
         # Upload local cache to S3.
         push_cache_to_s3(func_name)
 
 
+def _auto_pull_cache_from_s3(func_name: str) -> bool:
+    """
+    Download the cache of a function from S3, if configured.
+
+    The download is attempted only once per function per session.
+
+    :param func_name: the name of the function
+    :return: True if the cache was downloaded, False otherwise
+    """
+    if func_name in _S3_AUTO_PULL_ATTEMPTED:
+        return False
+    _S3_AUTO_PULL_ATTEMPTED.add(func_name)
+    if not _check_s3_configured(func_name):
+        return False
+    _LOG.trace(
+        "Cache not in memory/disk for '%s', attempting S3 pull", func_name
+    )
+    success = _download_cache_from_s3(func_name)
+    if success:
+        _LOG.trace("S3 pull succeeded for '%s'", func_name)
+    return success
+
+
+def _get_mem_cache_or_pull_from_s3(func_name: str) -> _FunctionCacheType:
+    """
+    Retrieve the memory cache for a function loading disk entries on demand.
+
+    Unlike `get_cache()`, the disk cache is not loaded into memory, since
+    the entries are read one at a time with `_load_disk_cache_entry()` on
+    a memory miss (e.g., for SQLite or bounded memory caches). The disk
+    cache is pulled from S3, if it's missing locally.
+
+    :param func_name: the name of the function
+    :return: memory cache data
+    """
+    if func_name not in _S3_AUTO_PULL_ATTEMPTED:
+        with _CACHE_LOCK:
+            file_name = _get_cache_file_name(func_name)
+            if os.path.exists(file_name):
+                # There is a local disk cache, so S3 is not needed.
+                _S3_AUTO_PULL_ATTEMPTED.add(func_name)
+            else:
+                _auto_pull_cache_from_s3(func_name)
+    mem_cache = get_mem_cache(func_name)
+    return mem_cache
+
+
 def get_cache(func_name: str) -> _FunctionCacheType:
     """
     Retrieve the cache for a given function name.
@@ -1555,43 +2074,478 @@ def get_cache(func_name: str) -> _FunctionCacheType:
         retrieved
     :return: cache data
     """
-    global _CACHE
-    global _S3_AUTO_PULL_ATTEMPTED
     if func_name in _CACHE:
         _LOG.trace("Loading mem cache for '%s'", func_name)
         cache = get_mem_cache(func_name)
         # Return cache from memory.
         if cache:
             return cache
-    # Try loading cache from local disk.
-    _LOG.trace("Loading disk cache for '%s'", func_name)
-    func_cache_data = get_disk_cache(func_name)
-    if func_cache_data:
-        _CACHE[func_name] = func_cache_data
-        return func_cache_data
-    # Try S3 auto-pull if configured.
-    if func_name not in _S3_AUTO_PULL_ATTEMPTED:
-        _S3_AUTO_PULL_ATTEMPTED.add(func_name)
-        if _check_s3_configured(func_name):
-            _LOG.trace(
-                "Cache not in memory/disk for '%s', attempting S3 pull",
-                func_name,
-            )
-            success = _download_cache_from_s3(func_name)
-            if success:
-                _LOG.trace("S3 pull succeeded for '%s'", func_name)
-                # Reload from disk after S3 pull.
-                func_cache_data = get_disk_cache(func_name)
-                # Store in memory only if non-empty.
-                if len(func_cache_data) > 0:
-                    _CACHE[func_name] = func_cache_data
-                return func_cache_data
+    with _CACHE_LOCK:
+        # Check again, since another thread could have loaded the cache while
+        # waiting for the lock.
+        cache = get_mem_cache(func_name)
+        if cache:
+            return cache
+        # Try loading cache from local disk.
+        _LOG.trace("Loading disk cache for '%s'", func_name)
+        func_cache_data = get_disk_cache(func_name)
+        if func_cache_data:
+            _CACHE[func_name] = func_cache_data
+            return func_cache_data
+        # Try S3 auto-pull if configured.
+        if _auto_pull_cache_from_s3(func_name):
+            # Reload from disk after S3 pull.
+            func_cache_data = get_disk_cache(func_name)
+            # Store in memory only if non-empty.
+            if len(func_cache_data) > 0:
+                _CACHE[func_name] = func_cache_data
+            return func_cache_data
     # Return empty dict without storing it in _CACHE.
     # Only store when we have actual cached data.
     empty_cache: _FunctionCacheType = {}
     return empty_cache
 
 
+# #############################################################################
+# Memory cache bounds.
+# #############################################################################
+
+# The memory cache of a function is unbounded by default. It can be bounded by
+# setting the properties (e.g., `set_cache_property(func_name, "max_entries",
+# 1000)`):
+# - `max_entries`: max number of entries kept in memory
+# - `max_bytes`: max size of the entries kept in memory, estimated from the
+#   size of the pickled keys and values
+# - `eviction_policy`: entries to evict first when a bound is exceeded
+#   - "lru" (default): the least recently used
+#   - "lfu": the least frequently used
+# - `ttl`: number of seconds after which an entry that has not been accessed is
+#   evicted from memory
+# Evicted entries are only dropped from memory: they are saved to disk first,
+# if write-through is disabled, and are read back from the disk (or S3) cache
+# on the next access.
+# The bounds of a function are enforced at each of its calls, so the expired
+# entries of a function that is not called anymore stay in memory until
+# `reset_mem_cache()`.
+
+_VALID_EVICTION_POLICIES = ("lru", "lfu")
+
+# Create global variable for the state of the bounded memory caches.
+if "_CACHE_BOUNDS" not in globals():
+    _LOG.trace("Creating _CACHE_BOUNDS")
+    # func_name -> state of the bounded memory cache:
+    # - "entries": cache_key -> entry stats ("access_time", "hits", "bytes"),
+    #   ordered from the least to the most recently used
+    # - "buckets": number of hits -> cache keys with that number of hits
+    #   (stored as dict keys), ordered from the least to the most recently
+    #   used, so that LFU eviction doesn't sort all the entries
+    # - "bytes": total size of the entries
+    # - "evictions": number of entries evicted so far
+    _CACHE_BOUNDS: Dict[str, Dict[str, Any]] = {}
+
+
+def _is_cache_bounded(func_name: str) -> bool:
+    """
+    Return whether the memory cache of a function is bounded.
+
+    :param func_name: the name of the function
+    :return: True if any of `max_entries`, `max_bytes`, `ttl` is set
+    """
+    is_bounded = bool(
+        get_cache_property(func_name, "max_entries")
+        or get_cache_property(func_name, "max_bytes")
+        or get_cache_property(func_name, "ttl")
+    )
+    return is_bounded
+
+
+def _get_cache_entry_size(cache_key: str, value: Any) -> int:
+    """
+    Estimate the memory used by a cache entry.
+
+    :param cache_key: the cache key
+    :param value: the cached value
+    :return: estimated size in bytes
+    """
+    try:
+        value_size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:  # pylint: disable=broad-except
+        # Fall back to a shallow estimate for values that can't be pickled.
+        value_size = sys.getsizeof(value)
+    size = len(cache_key) + value_size
+    return size
+
+
+def _get_cache_bounds_state(func_name: str) -> Dict[str, Any]:
+    """
+    Get the state of the bounded memory cache of a function.
+
+    The state is reconciled with the memory cache, since entries can be
+    added or removed without going through the decorator (e.g., by
+    `force_cache_from_disk()` or `mock_cache()`). Untracked entries are
+    considered the least recently used.
+
+    :param func_name: the name of the function
+    :return: the state of the bounded memory cache
+    """
+    if func_name not in _CACHE_BOUNDS:
+        _CACHE_BOUNDS[func_name] = {
+            "entries": {},
+            "buckets": {},
+            "bytes": 0,
+            "evictions": 0,
+        }
+    state = _CACHE_BOUNDS[func_name]
+    cache = get_mem_cache(func_name)
+    entries = state["entries"]
+    # Compare only the sizes to keep the check cheap, since outside the
+    # decorator the memory cache only grows (e.g., `mock_cache()`) or is
+    # replaced resetting the state (e.g., `force_cache_from_disk()`).
+    if len(entries) != len(cache):
+        _LOG.trace("Reconciling cache bounds for '%s'", func_name)
+        untracked_entries = {
+            cache_key: {
+                "access_time": 0.0,
+                "hits": 0,
+                "bytes": _get_cache_entry_size(cache_key, value),
+            }
+            for cache_key, value in cache.items()
+            if cache_key not in entries
+        }
+        tracked_entries = {k: v for k, v in entries.items() if k in cache}
+        entries = {**untracked_entries, **tracked_entries}
+        state["entries"] = entries
+        state["bytes"] = sum(v["bytes"] for v in entries.values())
+        buckets: Dict[int, Dict[str, None]] = {}
+        for cache_key, entry in entries.items():
+            buckets.setdefault(entry["hits"], {})[cache_key] = None
+        state["buckets"] = buckets
+    return state
+
+
+def _remove_from_cache_bucket(
+    state: Dict[str, Any], cache_key: str, hits: int
+) -> None:
+    """
+    Remove an entry from the bucket of the entries with its number of hits.
+    """
+    bucket = state["buckets"][hits]
+    del bucket[cache_key]
+    if not bucket:
+        del state["buckets"][hits]
+
+
+def _track_cache_entry_access(
+    func_name: str, cache_key: str, value: Any, *, is_hit: bool
+) -> None:
+    """
+    Update the stats of an entry of a bounded memory cache after an access.
+
+    :param func_name: the name of the function
+    :param cache_key: the cache key that was accessed
+    :param value: the cached value
+    :param is_hit: whether the access was a cache hit
+    """
+    state = _get_cache_bounds_state(func_name)
+    entries = state["entries"]
+    entry = entries.pop(cache_key, None)
+    if entry is None:
+        entry = {
+            "access_time": 0.0,
+            "hits": 0,
+            "bytes": _get_cache_entry_size(cache_key, value),
+        }
+        state["bytes"] += entry["bytes"]
+    else:
+        _remove_from_cache_bucket(state, cache_key, entry["hits"])
+    entry["access_time"] = time.time()
+    if is_hit:
+        entry["hits"] += 1
+    # Move the entry to the end, since it's the most recently used.
+    entries[cache_key] = entry
+    state["buckets"].setdefault(entry["hits"], {})[cache_key] = None
+
+
+def _evict_cache_entries(func_name: str, cache_keys: List[str]) -> None:
+    """
+    Evict entries from the memory cache of a function.
+
+    The entries are saved to disk before being evicted, unless
+    write-through is enabled (and write-back is not), so that they can
+    be read back later.
+
+    :param func_name: the name of the function
+    :param cache_keys: the cache keys to evict
+    """
+    if not cache_keys:
+        return
+    _LOG.debug("Evicting %s entries for '%s'", len(cache_keys), func_name)
+    cache = get_mem_cache(func_name)
+    is_write_back = _is_write_back_enabled(func_name)
+    if is_write_back or not get_cache_property(func_name, "write_through"):
+        evicted_data = {k: cache[k] for k in cache_keys}
+        if get_cache_property(func_name, "type") == "sqlite":
+            _save_cache_dict_to_disk(func_name, evicted_data)
+        else:
+            _merge_into_disk_cache(func_name, evicted_data)
+    if is_write_back:
+        # The evicted entries have been saved.
+        write_back_state = _WRITE_BACK_STATE.get(func_name)
+        if write_back_state is not None:
+            write_back_state["dirty_keys"].difference_update(cache_keys)
+    state = _get_cache_bounds_state(func_name)
+    for cache_key in cache_keys:
+        del cache[cache_key]
+        entry = state["entries"].pop(cache_key)
+        _remove_from_cache_bucket(state, cache_key, entry["hits"])
+        state["bytes"] -= entry["bytes"]
+    state["evictions"] += len(cache_keys)
+
+
+def _enforce_cache_bounds(func_name: str) -> None:
+    """
+    Evict entries from the memory cache of a function to meet its bounds.
+
+    :param func_name: the name of the function
+    """
+    with _CACHE_LOCK:
+        max_entries = get_cache_property(func_name, "max_entries")
+        max_bytes = get_cache_property(func_name, "max_bytes")
+        ttl = get_cache_property(func_name, "ttl")
+        eviction_policy = get_cache_property(func_name, "eviction_policy")
+        if not eviction_policy:
+            eviction_policy = "lru"
+        hdbg.dassert_in(eviction_policy, _VALID_EVICTION_POLICIES)
+        state = _get_cache_bounds_state(func_name)
+        entries = state["entries"]
+        cache_keys: List[str] = []
+        # Evict the expired entries. The entries are ordered by access time,
+        # so the scan can stop at the first entry that is not expired.
+        if ttl:
+            min_access_time = time.time() - ttl
+            for cache_key, entry in entries.items():
+                if entry["access_time"] >= min_access_time:
+                    break
+                cache_keys.append(cache_key)
+            _evict_cache_entries(func_name, cache_keys)
+            entries = state["entries"]
+        # Evict the entries exceeding the bounds in order of eviction.
+        num_entries_to_evict = 0
+        if max_entries:
+            num_entries_to_evict = max(len(entries) - max_entries, 0)
+        num_bytes_to_evict = 0
+        if max_bytes:
+            num_bytes_to_evict = max(state["bytes"] - max_bytes, 0)
+        if num_entries_to_evict == 0 and num_bytes_to_evict == 0:
+            return
+        if eviction_policy == "lru":
+            ordered_keys = iter(entries)
+        else:
+            # Scan the entries by frequency of use, breaking ties with the
+            # recency of use. Only the distinct numbers of hits are sorted.
+            buckets = state["buckets"]
+            ordered_keys = itertools.chain.from_iterable(
+                buckets[hits] for hits in sorted(buckets)
+            )
+        cache_keys = []
+        for cache_key in ordered_keys:
+            if num_entries_to_evict <= 0 and num_bytes_to_evict <= 0:
+                break
+            cache_keys.append(cache_key)
+            num_entries_to_evict -= 1
+            num_bytes_to_evict -= entries[cache_key]["bytes"]
+        _evict_cache_entries(func_name, cache_keys)
+
+
+def _load_disk_cache_entry(func_name: str, cache_key: str) -> Tuple[bool, Any]:
+    """
+    Look up a single entry of the disk cache of a function.
+
+    SQLite caches are queried for the entry, while JSON and pickle caches
+    are parsed once and reused until the cache file changes.
+
+    :param func_name: the name of the function
+    :param cache_key: the cache key to look up
+    :return: whether the key was found and the corresponding value (or
+        `None`, if not found)
+    """
+    file_name = _get_cache_file_name(func_name)
+    if get_cache_property(func_name, "type") == "sqlite":
+        found, value = _load_sqlite_entry(file_name, cache_key)
+    else:
+        disk_cache = _get_disk_cache_snapshot(func_name)
+        found = cache_key in disk_cache
+        value = disk_cache.get(cache_key)
+    return found, value
+
+
+# #############################################################################
+# Write-back cache.
+# #############################################################################
+
+# With the `write_back` property, the entries added to the memory cache are
+# marked as dirty and saved to disk (and uploaded to S3 with `auto_sync_s3`) in
+# batches, instead of on every miss like with `write_through`. The dirty entries
+# of a function are flushed when:
+# - there are `write_back_max_misses` of them
+# - `write_back_max_secs` seconds have elapsed since the oldest one was added
+# - the process exits, including `multiprocessing` / `joblib` worker processes
+#   that don't run the `atexit` handlers
+# - `flush_cache_to_disk()` or `flush_write_back_caches()` is called
+# so that a crash loses at most one batch of entries.
+
+# Create global variable for the state of the write-back caches.
+if "_WRITE_BACK_STATE" not in globals():
+    # func_name -> {
+    #   "dirty_keys": cache keys not saved to disk yet,
+    #   "timer": timer flushing the dirty entries, if started
+    # }
+    _WRITE_BACK_STATE: Dict[str, Dict[str, Any]] = {}
+
+
+def _is_write_back_enabled(func_name: str) -> bool:
+    """
+    Return whether the cache of a function is in write-back mode.
+
+    :param func_name: the name of the function
+    """
+    return bool(get_cache_property(func_name, "write_back"))
+
+
+def _pop_dirty_cache_keys(func_name: str) -> List[str]:
+    """
+    Remove the write-back state of a function, canceling its timer.
+
+    :param func_name: the name of the function
+    :return: the keys of the dirty entries
+    """
+    with _CACHE_LOCK:
+        state = _WRITE_BACK_STATE.pop(func_name, None)
+    if state is None:
+        return []
+    if state["timer"] is not None:
+        state["timer"].cancel()
+    return list(state["dirty_keys"])
+
+
+def _flush_write_back_cache(func_name: str) -> None:
+    """
+    Save the dirty entries of a write-back cache to disk in a single batch.
+
+    The cache is uploaded to S3 once per batch, if `auto_sync_s3` is set.
+
+    :param func_name: the name of the function
+    """
+    # Hold the lock while saving, so that the batches are saved in order.
+    with _CACHE_LOCK:
+        dirty_keys = _pop_dirty_cache_keys(func_name)
+        cache = get_mem_cache(func_name)
+        dirty_data = {k: cache[k] for k in dirty_keys if k in cache}
+        if not dirty_data:
+            return
+        _LOG.debug(
+            "Flushing %s dirty entries for '%s'", len(dirty_data), func_name
+        )
+        if get_cache_property(func_name, "type") == "sqlite":
+            _save_cache_dict_to_disk(func_name, dirty_data)
+        else:
+            _merge_into_disk_cache(func_name, dirty_data)
+    if get_cache_property(func_name, "auto_sync_s3"):
+        _LOG.debug("Auto-syncing cache to S3 for '%s'", func_name)
+        _upload_cache_to_s3(func_name)
+
+
+def _mark_cache_entry_dirty(func_name: str, cache_key: str) -> None:
+    """
+    Mark an entry of a write-back cache as dirty.
+
+    The dirty entries are flushed if there are `write_back_max_misses` of
+    them, otherwise a timer flushing them after `write_back_max_secs` is
+    started, if not running.
+
+    :param func_name: the name of the function
+    :param cache_key: the key of the entry added to the memory cache
+    """
+    with _CACHE_LOCK:
+        _register_write_back_finalizer()
+        state = _WRITE_BACK_STATE.setdefault(
+            func_name, {"dirty_keys": set(), "timer": None}
+        )
+        state["dirty_keys"].add(cache_key)
+        max_misses = get_cache_property(func_name, "write_back_max_misses")
+        is_batch_full = bool(max_misses) and (
+            len(state["dirty_keys"]) >= max_misses
+        )
+        max_secs = get_cache_property(func_name, "write_back_max_secs")
+        if not is_batch_full and max_secs and state["timer"] is None:
+            timer = threading.Timer(
+                max_secs, _flush_write_back_cache, args=(func_name,)
+            )
+            # Don't keep the process alive, since the dirty entries are also
+            # flushed at exit.
+            timer.daemon = True
+            timer.start()
+            state["timer"] = timer
+    if is_batch_full:
+        _flush_write_back_cache(func_name)
+
+
+def flush_write_back_caches() -> None:
+    """
+    Flush the dirty entries of all the write-back caches.
+
+    This is called automatically when the process exits, but it can be
+    called explicitly, e.g., at the end of a task running in a worker
+    process that can be killed.
+    """
+    for func_name in list(_WRITE_BACK_STATE.keys()):
+        try:
+            _flush_write_back_cache(func_name)
+        except Exception as e:  # pylint: disable=broad-except
+            _LOG.error("Can't flush the cache of '%s': %s", func_name, e)
+
+
+def _register_write_back_finalizer() -> None:
+    """
+    Flush the write-back caches when the current process exits.
+
+    Worker processes of `multiprocessing` and `joblib` exit with
+    `os._exit()` without running the `atexit` handlers, but they run the
+    `multiprocessing` finalizers. The finalizers registered by the parent
+    are dropped in a child process, so the finalizer is registered once in
+    each process.
+    """
+    global _WRITE_BACK_FINALIZER_PID
+    pid = os.getpid()
+    if _WRITE_BACK_FINALIZER_PID == pid:
+        return
+    multiprocessing.util.Finalize(
+        None, flush_write_back_caches, exitpriority=10
+    )
+    _WRITE_BACK_FINALIZER_PID = pid
+
+
+def _reset_write_back_state_after_fork() -> None:
+    """
+    Drop the write-back state in a forked child process.
+
+    The parent process flushes its dirty entries, and its timers don't
+    run in the child.
+    """
+    _WRITE_BACK_STATE.clear()
+
+
+# Create global variable for the process that registered the finalizer
+# flushing the write-back caches.
+if "_WRITE_BACK_FINALIZER_PID" not in globals():
+    _WRITE_BACK_FINALIZER_PID: Optional[int] = None
+
+if "_WRITE_BACK_HOOKS" not in globals():
+    _WRITE_BACK_HOOKS = True
+    atexit.register(flush_write_back_caches)
+    os.register_at_fork(after_in_child=_reset_write_back_state_after_fork)
+
+
 # #############################################################################
 # Reset cache.
 # #############################################################################
@@ -1603,6 +2557,9 @@ def reset_mem_cache(func_name: str = "") -> None:
     """
     Reset the memory cache for a given function.
 
+    The entries not flushed yet in write-back mode are saved to disk
+    first, so that they are not lost.
+
     :param func_name: The name of the function. If empty or None, reset
         all memory caches (for functions currently in memory).
     """
@@ -1622,9 +2579,12 @@ def reset_mem_cache(func_name: str = "") -> None:
             reset_mem_cache(func_name=func_name_tmp)
         _LOG.trace("After:\n%s", cache_stats_to_str())
         return
+    # Save the entries not flushed yet in write-back mode.
+    _flush_write_back_cache(func_name)
     # Delete if present.
-    if func_name in _CACHE:
-        del _CACHE[func_name]
+    with _CACHE_LOCK:
+        _CACHE.pop(func_name, None)
+        _CACHE_BOUNDS.pop(func_name, None)
 
 
 def reset_disk_cache(func_name: str = "", interactive: bool = True) -> None:
@@ -1662,6 +2622,8 @@ def reset_disk_cache(func_name: str = "", interactive: bool = True) -> None:
     if func_name == "":
         _LOG.trace("Before resetting disk cache:\n%s", cache_stats_to_str())
         _LOG.warning("Resetting disk cache")
+        # Release the SQLite databases before deleting them.
+        _close_sqlite_connection()
         # Reset files in global cache directory.
         prefix = get_cache_file_prefix()
         cache_files = glob.glob(os.path.join(get_cache_dir(), f"{prefix}.*"))
@@ -1680,14 +2642,14 @@ def reset_disk_cache(func_name: str = "", interactive: bool = True) -> None:
                     _LOG.debug(
                         "Removing per-function cache file '%s'", func_cache_file
                     )
-                    os.remove(func_cache_file)
+                    _remove_cache_file(func_cache_file)
         _LOG.trace("After:\n%s", cache_stats_to_str())
         return
     #
     file_name = _get_cache_file_name(func_name)
     if os.path.exists(file_name):
         _LOG.warning("Removing cache file '%s'", file_name)
-        os.remove(file_name)
+        _remove_cache_file(file_name)
 
 
 def reset_cache(func_name: str = "", interactive: bool = True) -> None:
@@ -1724,9 +2686,12 @@ def reset_cache(func_name: str = "", interactive: bool = True) -> None:
 
 
 # #############################################################################
-# Mock / unit test cache.
+# Cache keys.
 # #############################################################################
 
+# A key encoder maps the args and the kwargs of a call to the cache key.
+_KeyEncoderType = Callable[[Tuple[Any, ...], Dict[str, Any]], str]
+
 
 def _get_cache_key(args: Any, kwargs: Any) -> str:
     cache_key = json.dumps(
@@ -1738,6 +2703,110 @@ def _get_cache_key(args: Any, kwargs: Any) -> str:
     return cache_key
 
 
+def _update_hash(hasher: Any, data: bytes) -> None:
+    """
+    Feed length-prefixed data into a hasher.
+
+    The length prefix makes the encoding unambiguous, e.g., `("ab", "c")`
+    and `("a", "bc")` have different hashes.
+    """
+    hasher.update(b"%d:" % len(data))
+    hasher.update(data)
+
+
+def _update_hash_with_obj(hasher: Any, obj: Any) -> None:
+    """
+    Feed a canonical encoding of an object into a hasher.
+
+    :param hasher: a `hashlib` hash object
+    :param obj: the object to encode
+    """
+    # Tag each value with its type, so that, e.g., `1` and `"1"` differ.
+    _update_hash(hasher, type(obj).__qualname__.encode())
+    pd = sys.modules.get("pandas")
+    np = sys.modules.get("numpy")
+    if obj is None or isinstance(obj, (bool, int, float)):
+        _update_hash(hasher, repr(obj).encode())
+    elif isinstance(obj, str):
+        _update_hash(hasher, obj.encode("utf-8", "surrogatepass"))
+    elif isinstance(obj, (bytes, bytearray)):
+        _update_hash(hasher, bytes(obj))
+    elif isinstance(obj, (list, tuple)):
+        _update_hash(hasher, str(len(obj)).encode())
+        for item in obj:
+            _update_hash_with_obj(hasher, item)
+    elif isinstance(obj, dict):
+        _update_hash(hasher, str(len(obj)).encode())
+        # Sort the items, so that the key doesn't depend on their order.
+        for key, value in sorted(obj.items(), key=lambda item: repr(item[0])):
+            _update_hash_with_obj(hasher, key)
+            _update_hash_with_obj(hasher, value)
+    elif isinstance(obj, (set, frozenset)):
+        _update_hash(hasher, str(len(obj)).encode())
+        for item in sorted(obj, key=repr):
+            _update_hash_with_obj(hasher, item)
+    elif pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        # Hash the metadata and the data of each column, without converting
+        # it to a string, which is slow and truncated for large data.
+        frame = obj.to_frame() if isinstance(obj, pd.Series) else obj
+        metadata = (list(frame.columns), [str(dtype) for dtype in frame.dtypes])
+        _update_hash(hasher, repr(metadata).encode())
+        if isinstance(frame.index, pd.RangeIndex):
+            # Avoid materializing the index.
+            _update_hash(hasher, repr(frame.index).encode())
+        else:
+            _update_hash_with_obj(hasher, frame.index.to_numpy())
+        for idx in range(frame.shape[1]):
+            _update_hash_with_obj(hasher, frame.iloc[:, idx].to_numpy())
+    elif np is not None and isinstance(obj, np.ndarray):
+        _update_hash(hasher, repr((obj.shape, str(obj.dtype))).encode())
+        if obj.dtype.hasobject:
+            # Hash the values, since the pickled bytes depend also on the
+            # identity of the objects, e.g., equal strings that are or aren't
+            # the same object.
+            values = obj.ravel()
+            if pd is not None and pd.api.types.infer_dtype(
+                values, skipna=True
+            ) in ("string", "empty"):
+                # Hash the strings in C, which is much faster than one by one.
+                hashes = pd.util.hash_array(values, categorize=False)
+                _update_hash(hasher, hashes.tobytes())
+            else:
+                for value in values:
+                    _update_hash_with_obj(hasher, value)
+        else:
+            _update_hash(hasher, np.ascontiguousarray(obj).tobytes())
+    else:
+        # Fall back to the string representation, like `_get_cache_key()`.
+        _update_hash(hasher, str(obj).encode("utf-8", "surrogatepass"))
+
+
+def hash_cache_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """
+    Compute a cache key as a hash of the canonicalized args and kwargs.
+
+    This is a key encoder for `@simple_cache(key_encoder=...)` that is
+    faster than the default JSON one for large arguments (e.g., long
+    prompts, dataframes, numpy arrays) and generates short keys. Unlike
+    the default encoder, dataframes and arrays are keyed by their full
+    data, instead of by their (truncated) string representation.
+
+    :param args: positional arguments of the call
+    :param kwargs: keyword arguments of the call
+    :return: hex digest of the arguments
+    """
+    hasher = hashlib.sha256()
+    _update_hash_with_obj(hasher, (args, kwargs))
+    cache_key = hasher.hexdigest()
+    _LOG.trace("cache_key=%s", cache_key)
+    return cache_key
+
+
+# #############################################################################
+# Mock / unit test cache.
+# #############################################################################
+
+
 def mock_cache(func_name: str, cache_key: str, value: Any) -> None:
     """
     Mock the function cache for a given function and cache key.
@@ -1766,7 +2835,12 @@ def mock_cache(func_name: str, cache_key: str, value: Any) -> None:
 
 
 def mock_cache_from_args_kwargs(
-    func_name: str, args: Any, kwargs: Any, value: Any
+    func_name: str,
+    args: Any,
+    kwargs: Any,
+    value: Any,
+    *,
+    key_encoder: Optional[_KeyEncoderType] = None,
 ) -> None:
     """
     Mock the function cache for a given function and args/kwargs.
@@ -1779,11 +2853,15 @@ def mock_cache_from_args_kwargs(
     :param args: The arguments for the function.
     :param kwargs: The keyword arguments for the function.
     :param value: The value to store in the cache.
+    :param key_encoder: The key encoder used by the function, if it is
+        not the default one.
     """
     hdbg.dassert_isinstance(args, tuple, "args is not a tuple: %s", args)
     hdbg.dassert_isinstance(kwargs, dict, "kwargs is not a dict: %s", kwargs)
     # Get the cache key.
-    cache_key = _get_cache_key(args, kwargs)
+    if key_encoder is None:
+        key_encoder = _get_cache_key
+    cache_key = key_encoder(args, kwargs)
     # Mock the cache.
     mock_cache(func_name, cache_key, value)
 
@@ -1824,6 +2902,61 @@ def _compute_func_hash(func: Callable) -> str:
     return func_hash
 
 
+# #############################################################################
+# In-flight computations.
+# #############################################################################
+
+# Concurrent calls of an async cached function with the same key are coalesced
+# ("single-flight"): the first caller starts the computation of the value in
+# its own task, while all the callers await its result.
+# - The task is shielded from the cancellation of the callers, including the
+#   one that started it, so that the other callers still get the value
+# - The task completes even if all the callers are cancelled, caching the
+#   value for the following calls
+
+# Create global variable for the in-flight computations.
+if "_IN_FLIGHT" not in globals():
+    # (event loop, func_name, cache_key) -> task computing the value.
+    _IN_FLIGHT: Dict[
+        Tuple[asyncio.AbstractEventLoop, str, str], "asyncio.Task[Any]"
+    ] = {}
+
+
+async def _run_single_flight(
+    func_name: str,
+    cache_key: str,
+    compute: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Compute the value for a key, unless it is already being computed.
+
+    :param func_name: name of the cached function
+    :param cache_key: key of the call
+    :param compute: coroutine function computing and caching the value
+    :return: value computed by this call or by the in-flight one
+    """
+    loop = asyncio.get_running_loop()
+    in_flight_key = (loop, func_name, cache_key)
+    task = _IN_FLIGHT.get(in_flight_key)
+    if task is not None:
+        _LOG.trace("Awaiting in-flight computation for key='%s'", cache_key)
+    else:
+        task = loop.create_task(compute())
+        _IN_FLIGHT[in_flight_key] = task
+
+        def _on_done(task_: "asyncio.Task[Any]") -> None:
+            del _IN_FLIGHT[in_flight_key]
+            if not task_.cancelled():
+                # Mark the exception as retrieved, since all the callers might
+                # have been cancelled.
+                task_.exception()
+
+        task.add_done_callback(_on_done)
+    # Shield the shared computation from the cancellation of this caller.
+    value = await asyncio.shield(task)
+    return value
+
+
 # #############################################################################
 # Decorator
 # #############################################################################
@@ -1853,6 +2986,10 @@ def simple_cache(
     s3_prefix: str = "",
     aws_profile: str = "ck",
     auto_sync_s3: bool = False,
+    key_encoder: Optional[_KeyEncoderType] = None,
+    write_back: bool = False,
+    write_back_max_misses: int = 100,
+    write_back_max_secs: float = 60.0,
 ) -> Callable[..., Any]:
     """
     Decorate a function to cache its results.
@@ -1869,7 +3006,10 @@ def simple_cache(
     function, first clear the property via reset_cache_property() or
     manually set it via set_cache_property().
 
-    :param cache_type: type of cache to use ('json' or 'pickle')
+    :param cache_type: type of cache to use ('json', 'pickle', or
+        'sqlite'). With 'sqlite' each entry is stored as a row of an
+        embedded database, so updates and lookups don't require to
+        rewrite or load the whole disk cache
     :param write_through: if True, the cache is written to disk after
         each access
     :param exclude_keys: keys to exclude from the cache key
@@ -1884,6 +3024,19 @@ def simple_cache(
     :param aws_profile: AWS profile for S3 access
     :param auto_sync_s3: if True, automatically sync to S3 after each
         cache update
+    :param key_encoder: function computing the cache key from the args
+        and the kwargs of a call (e.g., `hash_cache_key()` for large
+        arguments). If None, the JSON representation of the arguments
+        is used. Unlike the other parameters, it's not stored as a
+        property, since it's not serializable
+    :param write_back: if True, the new entries are saved to disk (and
+        uploaded to S3 with `auto_sync_s3`) in batches, instead of after
+        each miss. It takes precedence over `write_through`
+    :param write_back_max_misses: number of new entries triggering a
+        flush in write-back mode
+    :param write_back_max_secs: max seconds a new entry is kept only in
+        memory in write-back mode. The entries are also flushed at exit
+        and by `flush_cache_to_disk()`
     :return: a decorator that can be applied to a function
     """
 
@@ -1891,7 +3044,7 @@ def simple_cache(
         """
         Decorate a function to cache its results.
         """
-        hdbg.dassert_in(cache_type, ("json", "pickle"))
+        hdbg.dassert_in(cache_type, ("json", "pickle", "sqlite"))
         func_name = getattr(func, "__name__", "unknown_function")
         if func_name.endswith("_intrinsic"):
             func_name = func_name[: -len("_intrinsic")]
@@ -1908,11 +3061,19 @@ def simple_cache(
         # so cross-session change detection is preserved. Without this, a warm
         # cache (e.g., populated before `func_hash` was introduced) would have
         # no hash stored and hits would skip the comparison indefinitely.
+        # The hash of the current source is computed once, since the source of
+        # the decorated function can't change without decorating it again.
+        func_hash = _compute_func_hash(func)
         existing_hash = get_cache_property(func_name, "func_hash")
         if not existing_hash:
-            set_cache_property(func_name, "func_hash", _compute_func_hash(func))
+            set_cache_property(func_name, "func_hash", func_hash)
         # Store caching behavior settings.
         set_cache_property(func_name, "write_through", write_through)
+        set_cache_property(func_name, "write_back", write_back)
+        set_cache_property(
+            func_name, "write_back_max_misses", write_back_max_misses
+        )
+        set_cache_property(func_name, "write_back_max_secs", write_back_max_secs)
         # Store exclude_keys as empty list if None for consistency.
         exclude_keys_list: List[str] = (
             exclude_keys if exclude_keys is not None else []
@@ -1932,28 +3093,26 @@ def simple_cache(
             set_cache_property(func_name, "aws_profile", aws_profile)
         set_cache_property(func_name, "auto_sync_s3", auto_sync_s3)
 
-        @functools.wraps(func)
-        def wrapper(
-            *args: Any,
-            force_refresh: bool = False,
-            abort_on_cache_miss: bool = False,
-            report_on_cache_miss: bool = False,
-            **kwargs: Any,
-        ) -> Any:
+        def _look_up_cache(
+            args: Tuple[Any, ...],
+            kwargs: Dict[str, Any],
+            force_refresh: bool,
+            abort_on_cache_miss: bool,
+            report_on_cache_miss: bool,
+        ) -> Tuple[bool, Any, Dict[str, Any]]:
             """
-            Cache the results of the decorated function.
-
-            :param args: Positional arguments for the function.
-            :param force_refresh: If True, the cache is refreshed
-                  regardless of whether the key exists in the cache.
-            :param abort_on_cache_miss: If True, an exception is raised
-                  if the key is not found in the cache.
-            :param report_on_cache_miss: If True, a message is logged if
-                  the key is not found in the cache, and the function
-                  returns "_cache_miss_" instead of accessing the real
-                  value.
-            :param kwargs: Keyword arguments for the function.
-            :return: The cached value or the result of the function.
+            Look up the result of a call of the decorated function.
+
+            This is shared by the sync and the async wrapper, which differ
+            only in how the function is called.
+
+            :return: tuple `(is_done, value, call_info)` where:
+                - `is_done`: whether `value` is the result of the call (e.g.,
+                  on a cache hit), so that the function must not be called
+                - `call_info`: how to call the function and store its result
+                  when `is_done` is False, i.e., `kwargs` for the function,
+                  `store` (whether to store the result in the cache) and the
+                  state needed by `_store_in_cache()`
             """
             # Get the function name.
             func_name = getattr(func, "__name__", "unknown_function")
@@ -1966,9 +3125,18 @@ def simple_cache(
                 _LOG.warning(
                     "All caching is disabled: executing '%s' directly", func_name
                 )
-                return func(*args, **kwargs)
+                return False, None, {"kwargs": kwargs, "store": False}
             # Get the cache.
-            cache = get_cache(func_name)
+            is_sqlite = get_cache_property(func_name, "type") == "sqlite"
+            is_bounded = _is_cache_bounded(func_name)
+            # Entries missing in memory are read one at a time from disk
+            # below for SQLite caches, and for bounded memory caches, since
+            # entries could have been evicted.
+            load_on_demand = is_sqlite or is_bounded
+            if load_on_demand:
+                cache = _get_mem_cache_or_pull_from_s3(func_name)
+            else:
+                cache = get_cache(func_name)
             # Remove keys that should not be part of the cache key.
             # Read from properties first, fall back to closure.
             exclude_keys_prop = get_cache_property(func_name, "exclude_keys")
@@ -2013,10 +3181,13 @@ def simple_cache(
                             "cache[%s]: COMPUTE (cache disabled by cache_mode=DISABLE_CACHE)",
                             func_name,
                         )
-                    value = func(*args, **kwargs_for_func)
-                    return value
+                    call_info = {"kwargs": kwargs_for_func, "store": False}
+                    return False, None, call_info
             # Get the key.
-            cache_key = _get_cache_key(args, kwargs_for_cache_key)
+            if key_encoder is None:
+                cache_key = _get_cache_key(args, kwargs_for_cache_key)
+            else:
+                cache_key = key_encoder(args, kwargs_for_cache_key)
             # Update the performance stats.
             cache_perf = get_cache_perf(func_name)
             _LOG.trace("cache_perf is None=%s", cache_perf is None)
@@ -2028,15 +3199,31 @@ def simple_cache(
                 func_name, "force_refresh"
             )
             _LOG.trace("force_refresh=%s", force_refresh)
-            if cache_key in cache and not force_refresh:
+            value = None
+            with _CACHE_LOCK:
+                is_miss = cache_key not in cache
+                if load_on_demand and is_miss and not force_refresh:
+                    # Look up the key on disk and promote it to memory.
+                    found, value = _load_disk_cache_entry(func_name, cache_key)
+                    if found:
+                        cache = _CACHE.setdefault(func_name, cache)
+                        cache[cache_key] = value
+                is_hit = cache_key in cache and not force_refresh
+                if is_hit:
+                    # Retrieve the value from the cache while holding the
+                    # lock, since other threads can evict it.
+                    value = cache[cache_key]
+                    if is_bounded:
+                        _track_cache_entry_access(
+                            func_name, cache_key, value, is_hit=True
+                        )
+            if is_hit:
                 _LOG.trace("Cache hit for key='%s'", cache_key)
                 if _CACHE_DEBUG:
                     _LOG.warning("cache[%s]: HIT", func_name)
                 # Update the performance stats.
                 if cache_perf:
                     cache_perf["hits"] += 1
-                # Retrieve the value from the cache.
-                value = cache[cache_key]
                 # Warn if the function source has changed since the hash
                 # was last recorded (at decoration time).
                 # TODO(krishna): Cross-machine staleness is not detected. To
@@ -2048,7 +3235,7 @@ def simple_cache(
                 # TODO(gp): This warning should print only once.
                 stored_hash = get_cache_property(func_name, "func_hash")
                 if stored_hash:
-                    current_hash = _compute_func_hash(func)
+                    current_hash = func_hash
                     if current_hash != stored_hash:
                         _LOG.warning(
                             "Function '%s' source code has changed since "
@@ -2059,75 +3246,190 @@ def simple_cache(
                             stored_hash,
                             current_hash,
                         )
-            else:
+                if is_bounded:
+                    _enforce_cache_bounds(func_name)
+                return True, value, {}
+            _LOG.trace("Cache miss for key='%s'", cache_key)
+            # Update the performance stats.
+            if cache_perf:
+                cache_perf["misses"] += 1
+            # Abort on cache miss.
+            abort_on_cache_miss = abort_on_cache_miss or get_cache_property(
+                func_name, "abort_on_cache_miss"
+            )
+            _LOG.trace("abort_on_cache_miss=%s", abort_on_cache_miss)
+            if abort_on_cache_miss:
+                raise ValueError(f"Cache miss for key='{cache_key}'")
+            # Report on cache miss.
+            report_on_cache_miss = report_on_cache_miss or get_cache_property(
+                func_name, "report_on_cache_miss"
+            )
+            _LOG.trace("report_on_cache_miss=%s", report_on_cache_miss)
+            if report_on_cache_miss:
                 _LOG.trace("Cache miss for key='%s'", cache_key)
-                # Update the performance stats.
-                if cache_perf:
-                    cache_perf["misses"] += 1
-                # Abort on cache miss.
-                abort_on_cache_miss = abort_on_cache_miss or get_cache_property(
-                    func_name, "abort_on_cache_miss"
-                )
-                _LOG.trace("abort_on_cache_miss=%s", abort_on_cache_miss)
-                if abort_on_cache_miss:
-                    raise ValueError(f"Cache miss for key='{cache_key}'")
-                # Report on cache miss.
-                report_on_cache_miss = (
-                    report_on_cache_miss
-                    or get_cache_property(func_name, "report_on_cache_miss")
-                )
-                _LOG.trace("report_on_cache_miss=%s", report_on_cache_miss)
-                if report_on_cache_miss:
-                    _LOG.trace("Cache miss for key='%s'", cache_key)
-                    return "_cache_miss_"
-                if _CACHE_DEBUG:
-                    if force_refresh:
-                        _LOG.warning(
-                            "cache[%s]: RECOMPUTE (cache_mode=REFRESH_CACHE)",
-                            func_name,
-                        )
-                    else:
-                        _LOG.warning("cache[%s]: COMPUTE (miss)", func_name)
-                # Access the intrinsic function.
-                value = func(*args, **kwargs_for_func)
-                # Update cache.
+                return True, "_cache_miss_", {}
+            if _CACHE_DEBUG:
+                if force_refresh:
+                    _LOG.warning(
+                        "cache[%s]: RECOMPUTE (cache_mode=REFRESH_CACHE)",
+                        func_name,
+                    )
+                else:
+                    _LOG.warning("cache[%s]: COMPUTE (miss)", func_name)
+            call_info = {
+                "kwargs": kwargs_for_func,
+                "store": True,
+                "func_name": func_name,
+                "cache_key": cache_key,
+                "cache": cache,
+                "is_sqlite": is_sqlite,
+                "is_bounded": is_bounded,
+            }
+            return False, None, call_info
+
+        def _store_in_cache(call_info: Dict[str, Any], value: Any) -> None:
+            """
+            Store the result of a call of the decorated function in the cache.
+
+            :param call_info: information about the call returned by
+                `_look_up_cache()`
+            :param value: result of the call
+            """
+            func_name = call_info["func_name"]
+            cache_key = call_info["cache_key"]
+            is_bounded = call_info["is_bounded"]
+            # Update cache.
+            with _CACHE_LOCK:
+                # Ensure the cache dict is stored in memory, using the
+                # current one, since another thread could have replaced
+                # it while the value was being computed.
+                cache = _CACHE.setdefault(func_name, call_info["cache"])
                 cache[cache_key] = value
-                # Ensure the cache dict is stored in memory.
-                global _CACHE
-                _CACHE[func_name] = cache
-                _LOG.trace(
-                    "Updating cache with key='%s' value='%s'", cache_key, value
-                )
-                # Check if write-through is enabled.
-                write_through_prop = get_cache_property(
-                    func_name, "write_through"
-                )
-                write_through_enabled = (
-                    write_through_prop
-                    if write_through_prop is not None
-                    else write_through
-                )
-                if write_through_enabled:
-                    _LOG.trace("Writing through to disk")
+                if is_bounded:
+                    _track_cache_entry_access(
+                        func_name, cache_key, value, is_hit=False
+                    )
+            _LOG.trace(
+                "Updating cache with key='%s' value='%s'", cache_key, value
+            )
+            # Check if write-through is enabled.
+            write_through_prop = get_cache_property(func_name, "write_through")
+            write_through_enabled = (
+                write_through_prop
+                if write_through_prop is not None
+                else write_through
+            )
+            if _is_write_back_enabled(func_name):
+                # Defer saving to disk and S3 to the next batch.
+                _LOG.trace("Marking the entry as dirty")
+                _mark_cache_entry_dirty(func_name, cache_key)
+            elif write_through_enabled:
+                _LOG.trace("Writing through to disk")
+                if call_info["is_sqlite"]:
+                    # Upsert only the new entry.
+                    _save_cache_dict_to_disk(func_name, {cache_key: value})
+                else:
                     flush_cache_to_disk(func_name)
-                    # Check if auto-sync to S3 is enabled.
-                    auto_sync = get_cache_property(func_name, "auto_sync_s3")
-                    if auto_sync:
-                        _LOG.debug(
-                            "Auto-syncing cache to S3 for '%s'", func_name
-                        )
-                        _upload_cache_to_s3(func_name)
-                # Print info about the cache.
-                cache_file = _get_cache_file_name(func_name)
-                cache_type = get_cache_property(func_name, "type")
-                _LOG.debug(
-                    "Allocating cache for '%s': file='%s' type='%s'",
-                    func_name,
-                    cache_file,
-                    cache_type,
-                )
+                # Check if auto-sync to S3 is enabled.
+                auto_sync = get_cache_property(func_name, "auto_sync_s3")
+                if auto_sync:
+                    _LOG.debug("Auto-syncing cache to S3 for '%s'", func_name)
+                    _upload_cache_to_s3(func_name)
+            # Print info about the cache.
+            cache_file = _get_cache_file_name(func_name)
+            cache_type = get_cache_property(func_name, "type")
+            _LOG.debug(
+                "Allocating cache for '%s': file='%s' type='%s'",
+                func_name,
+                cache_file,
+                cache_type,
+            )
+            if is_bounded:
+                _enforce_cache_bounds(func_name)
+
+        @functools.wraps(func)
+        def wrapper(
+            *args: Any,
+            force_refresh: bool = False,
+            abort_on_cache_miss: bool = False,
+            report_on_cache_miss: bool = False,
+            **kwargs: Any,
+        ) -> Any:
+            """
+            Cache the results of the decorated function.
+
+            :param args: Positional arguments for the function.
+            :param force_refresh: If True, the cache is refreshed
+                  regardless of whether the key exists in the cache.
+            :param abort_on_cache_miss: If True, an exception is raised
+                  if the key is not found in the cache.
+            :param report_on_cache_miss: If True, a message is logged if
+                  the key is not found in the cache, and the function
+                  returns "_cache_miss_" instead of accessing the real
+                  value.
+            :param kwargs: Keyword arguments for the function.
+            :return: The cached value or the result of the function.
+            """
+            is_done, value, call_info = _look_up_cache(
+                args,
+                kwargs,
+                force_refresh,
+                abort_on_cache_miss,
+                report_on_cache_miss,
+            )
+            if is_done:
+                return value
+            # Access the intrinsic function.
+            value = func(*args, **call_info["kwargs"])
+            if call_info["store"]:
+                _store_in_cache(call_info, value)
+            return value
+
+        @functools.wraps(func)
+        async def async_wrapper(
+            *args: Any,
+            force_refresh: bool = False,
+            abort_on_cache_miss: bool = False,
+            report_on_cache_miss: bool = False,
+            **kwargs: Any,
+        ) -> Any:
+            """
+            Cache the awaited results of the decorated coroutine function.
+
+            Concurrent calls with the same cache key await a single
+            computation (see `_run_single_flight()`).
+
+            The params are the same as `wrapper()`.
+            """
+            is_done, value, call_info = _look_up_cache(
+                args,
+                kwargs,
+                force_refresh,
+                abort_on_cache_miss,
+                report_on_cache_miss,
+            )
+            if is_done:
+                return value
+            if not call_info["store"]:
+                # Access the intrinsic function, without caching.
+                value = await func(*args, **call_info["kwargs"])
+                return value
+
+            async def _compute() -> Any:
+                # Access the intrinsic function.
+                value = await func(*args, **call_info["kwargs"])
+                # Lock and write the cache file in a worker thread, to avoid
+                # blocking the event loop.
+                await asyncio.to_thread(_store_in_cache, call_info, value)
+                return value
+
+            value = await _run_single_flight(
+                call_info["func_name"], call_info["cache_key"], _compute
+            )
             return value
 
+        if inspect.iscoroutinefunction(func):
+            return async_wrapper
         return wrapper
 
     return decorator
@@ -5,31 +5,207 @@ import helpers.hcsv as hcsv
 """
 
 import ast
+import collections
+import concurrent.futures
+import glob
+import io
+import itertools
 import logging
 import os
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm.autonotebook import tqdm
 
 import helpers.hdbg as hdbg
 import helpers.hio as hio
+import helpers.hjoblib as hjoblib
 import helpers.hs3 as hs3
 
 _LOG = logging.getLogger(__name__)
 
 
-def _append_csv(
-    df: pd.DataFrame, path: str, *, index: bool = False, **kwargs: Any
-) -> None:
+# #############################################################################
+# CSV row index
+# #############################################################################
+
+# Version of the format of the row index sidecar file.
+_CSV_ROW_INDEX_VERSION = 1
+# Size of the buffers used to scan a CSV file for line breaks.
+_SCAN_BUFFER_SIZE = 64 * 1024 * 1024
+
+
+def get_csv_row_index_file_name(csv_path: str) -> str:
+    """
+    Return the name of the row index sidecar file of a CSV file.
+
+    E.g., `foobar.csv` -> `foobar.csv.row_index.json`.
+    """
+    return csv_path + ".row_index.json"
+
+
+def _get_row_offsets(csv_path: str, block_size: int) -> Tuple[List[int], int]:
+    """
+    Scan a CSV file and return the byte offsets of every `block_size`-th row.
+
+    :return:
+        - byte offsets of rows 1, 1 + block_size, 1 + 2 * block_size, ...
+        - number of data rows, i.e., excluding the header
+    """
+    offsets = []
+    # Number of line breaks seen so far. Row `i` starts after the `i`-th line
+    # break.
+    num_line_breaks = 0
+    file_size = os.path.getsize(csv_path)
+    last_byte = b""
+    with open(csv_path, "rb") as f:
+        buffer_offset = 0
+        while True:
+            buffer = f.read(_SCAN_BUFFER_SIZE)
+            if not buffer:
+                break
+            line_break_positions = np.flatnonzero(
+                np.frombuffer(buffer, dtype=np.uint8) == ord("\n")
+            )
+            # Line breaks (1-based) that start a block, i.e., ending rows
+            # 0, block_size, 2 * block_size, ...
+            first = num_line_breaks + 1
+            # Smallest `k * block_size + 1 >= first`.
+            next_block_line_break = (
+                (first - 1 + block_size - 1) // block_size
+            ) * block_size + 1
+            idxs = np.arange(
+                next_block_line_break - first,
+                len(line_break_positions),
+                block_size,
+            )
+            offsets.extend(
+                (buffer_offset + line_break_positions[idxs] + 1).tolist()
+            )
+            num_line_breaks += len(line_break_positions)
+            buffer_offset += len(buffer)
+            last_byte = buffer[-1:]
+    # Count a last row without the trailing line break.
+    num_lines = num_line_breaks + int(last_byte not in (b"", b"\n"))
+    num_rows = max(num_lines - 1, 0)
+    # Remove the offset pointing at the end of the file.
+    offsets = [offset for offset in offsets if offset < file_size]
+    return offsets, num_rows
+
+
+def build_csv_row_index(
+    csv_path: str,
+    *,
+    block_size: int = 100000,
+    key_col: Optional[str] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Build and save a sidecar index to access the rows of a CSV file directly.
+
+    The index stores the byte offset of every `block_size`-th row and,
+    optionally, the min / max values of `key_col` in each block of rows. It
+    is saved next to the CSV file (see `get_csv_row_index_file_name()`) and
+    it is used by `_read_csv_range()`, `build_chunk()` and
+    `find_first_matching_row()` as long as the CSV file doesn't change.
+
+    The CSV file is assumed to have a header and no line breaks inside
+    values.
+
+    :param csv_path: location of CSV file
+    :param block_size: number of rows between offsets
+    :param key_col: column to compute min / max values of for each block
+    :param kwargs: params passed to `pd.read_csv()` to read `key_col`
+    :return: the index
     """
-    Append a df to the CSV file `path` without header.
+    hdbg.dassert_file_exists(csv_path)
+    hdbg.dassert_lte(1, block_size)
+    offsets, num_rows = _get_row_offsets(csv_path, block_size)
+    key_mins: List[Any] = []
+    key_maxs: List[Any] = []
+    if key_col is not None:
+        # The chunks are aligned with the blocks of the index.
+        chunks = pd.read_csv(
+            csv_path, usecols=[key_col], chunksize=block_size, **kwargs
+        )
+        for chunk in chunks:
+            for vals, func in ((key_mins, "min"), (key_maxs, "max")):
+                val = getattr(chunk[key_col], func)()
+                val = None if pd.isna(val) else val
+                # Convert numpy scalars to JSON-serializable values.
+                vals.append(val.item() if hasattr(val, "item") else val)
+        hdbg.dassert_eq(len(key_mins), len(offsets))
+    stat = os.stat(csv_path)
+    row_index = {
+        "version": _CSV_ROW_INDEX_VERSION,
+        "file_size": stat.st_size,
+        "file_mtime": stat.st_mtime,
+        "block_size": block_size,
+        "num_rows": num_rows,
+        "offsets": offsets,
+        "key_col": key_col,
+        "key_mins": key_mins,
+        "key_maxs": key_maxs,
+    }
+    hio.to_json(get_csv_row_index_file_name(csv_path), row_index)
+    _LOG.debug(
+        "Indexed %s rows of '%s' in %s blocks", num_rows, csv_path, len(offsets)
+    )
+    return row_index
+
+
+def load_csv_row_index(csv_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the row index of a CSV file.
+
+    :return: the index or `None` if it doesn't exist or if the CSV file
+        changed after building the index
+    """
+    file_name = get_csv_row_index_file_name(csv_path)
+    if not os.path.exists(file_name):
+        return None
+    row_index = hio.from_json(file_name)
+    stat = os.stat(csv_path)
+    if (
+        row_index.get("version") != _CSV_ROW_INDEX_VERSION
+        or row_index["file_size"] != stat.st_size
+        or row_index["file_mtime"] != stat.st_mtime
+    ):
+        _LOG.warning("Ignoring stale row index '%s'", file_name)
+        return None
+    return row_index
+
+
+def _read_csv_lines_from_offset(
+    csv_path: str, offset: int, skip: int, nrows: int, **kwargs: Any
+) -> pd.DataFrame:
+    """
+    Read `nrows` rows starting `skip` rows after the byte offset `offset`.
+
+    The header is read from the start of the file.
     """
-    with open(path, "a") as f:
-        df.to_csv(f, header=False, index=index, **kwargs)
+    with open(csv_path, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        # Read only the requested rows, instead of letting the parser read
+        # the rest of the file.
+        lines = [header] + list(itertools.islice(f, skip + nrows))
+    # Skip the rows before the requested ones, keeping the header.
+    del lines[1 : skip + 1]
+    df = pd.read_csv(io.BytesIO(b"".join(lines)), **kwargs)
+    return df
 
 
 def _read_csv_range(
-    csv_path: str, from_: int, to: int, **kwargs: Any
+    csv_path: str,
+    from_: int,
+    to: int,
+    *,
+    row_index: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
 ) -> pd.DataFrame:
     """
     Read a specified row range of a CSV file and convert to a DataFrame.
@@ -41,15 +217,30 @@ def _read_csv_range(
     :param csv_path: location of CSV file
     :param from_: first line to read (header is row 0 and is always read)
     :param to: last line to read, not inclusive
+    :param row_index: index of the CSV file (see `build_csv_row_index()`) to
+        seek to `from_` directly, instead of parsing all the previous rows
     :return: DataFrame with columns from CSV line 0 (header)
     """
     hdbg.dassert_lt(0, from_, msg="Row 0 assumed to be header row")
     hdbg.dassert_lt(from_, to, msg="Empty range requested!")
-    skiprows = list(range(1, from_))
     nrows = to - from_
-    df = pd.read_csv(csv_path, skiprows=skiprows, nrows=nrows, **kwargs)
-    if df.shape[0] < to:
-        _LOG.warning("Number of df rows = %i vs requested = %i", df.shape[0], to)
+    if row_index is not None:
+        block_idx, skip = divmod(from_ - 1, row_index["block_size"])
+        if block_idx < len(row_index["offsets"]):
+            offset = row_index["offsets"][block_idx]
+            df = _read_csv_lines_from_offset(
+                csv_path, offset, skip, nrows, **kwargs
+            )
+        else:
+            # The range is past the end of the file.
+            df = pd.read_csv(csv_path, nrows=0, **kwargs)
+    else:
+        skiprows = range(1, from_)
+        df = pd.read_csv(csv_path, skiprows=skiprows, nrows=nrows, **kwargs)
+    if df.shape[0] < nrows:
+        _LOG.warning(
+            "Number of df rows = %i vs requested = %i", df.shape[0], nrows
+        )
     return df
 
 
@@ -60,6 +251,7 @@ def build_chunk(
     start: int,
     *,
     nrows_at_a_time: int = 1000,
+    use_row_index: bool = True,
     **kwargs: Any,
 ) -> pd.DataFrame:
     """
@@ -77,12 +269,17 @@ def build_chunk(
     :param col_name: name of column whose values define chunks
     :param start: first row to process
     :param nrows_at_a_time: size of chunks to process
+    :param use_row_index: whether to use the row index of the CSV file, if
+        present, to seek to the chunks (see `build_csv_row_index()`)
     :return: DataFrame with columns from CSV line 0
     """
     hdbg.dassert_lt(0, start)
+    row_index = load_csv_row_index(csv_path) if use_row_index else None
     stop = False
     dfs: List[pd.DataFrame] = []
-    init_df = _read_csv_range(csv_path, start, start + 1, **kwargs)
+    init_df = _read_csv_range(
+        csv_path, start, start + 1, row_index=row_index, **kwargs
+    )
     if init_df.shape[0] < 1:
         return init_df
     val = init_df[col_name].iloc[0]
@@ -90,7 +287,9 @@ def build_chunk(
     counter = 0
     while not stop:
         from_ = start + counter * nrows_at_a_time
-        df = _read_csv_range(csv_path, from_, from_ + nrows_at_a_time)
+        df = _read_csv_range(
+            csv_path, from_, from_ + nrows_at_a_time, row_index=row_index
+        )
         # Break if there are no matches.
         if df.shape[0] == 0:
             break
@@ -118,18 +317,30 @@ def find_first_matching_row(
     *,
     start: int = 1,
     nrows_at_a_time: int = 1000000,
+    use_row_index: bool = True,
     **kwargs: Any,
 ) -> Optional[int]:
     """
     Find first row in CSV where value in column `col_name` equals `val`.
 
+    If the CSV file has a row index with the min / max values of `col_name`
+    (see `build_csv_row_index()`), only the blocks of rows that can contain
+    `val` are read.
+
     :param csv_path: location of CSV file
     :param col_name: name of column whose values define chunks
     :param val: value to match on
     :param start: first row (inclusive) to start search on
     :param nrows_at_a_time: size of chunks to process
+    :param use_row_index: whether to use the row index of the CSV file, if
+        present
     :return: line in CSV of first matching row at or past start
     """
+    row_index = load_csv_row_index(csv_path) if use_row_index else None
+    if row_index is not None and row_index["key_col"] == col_name:
+        return _find_first_matching_row_with_index(
+            csv_path, col_name, val, start, row_index, **kwargs
+        )
     curr = start
     while True:
         _LOG.debug("Start of current chunk = line %i", curr)
@@ -145,11 +356,299 @@ def find_first_matching_row(
     return None
 
 
+def _may_contain(key_min: Any, key_max: Any, val: Any) -> bool:
+    """
+    Check if a block of rows with keys in [key_min, key_max] can contain
+    `val`.
+    """
+    if key_min is None or key_max is None:
+        # All the keys are missing.
+        return False
+    try:
+        ret = bool(key_min <= val <= key_max)
+    except TypeError:
+        # The values can't be compared, so the block needs to be read.
+        ret = True
+    return ret
+
+
+def _find_first_matching_row_with_index(
+    csv_path: str,
+    col_name: str,
+    val: Any,
+    start: int,
+    row_index: Dict[str, Any],
+    **kwargs: Any,
+) -> Optional[int]:
+    """
+    Same as `find_first_matching_row()` but reading only the blocks of rows
+    whose min / max values of `col_name` can contain `val`.
+    """
+    block_size = row_index["block_size"]
+    num_rows = row_index["num_rows"]
+    first_block_idx = (start - 1) // block_size
+    for block_idx in range(first_block_idx, len(row_index["offsets"])):
+        if not _may_contain(
+            row_index["key_mins"][block_idx],
+            row_index["key_maxs"][block_idx],
+            val,
+        ):
+            continue
+        from_ = max(start, block_idx * block_size + 1)
+        to = min((block_idx + 1) * block_size, num_rows) + 1
+        _LOG.debug(
+            "Reading block %s, i.e., lines [%s, %s)", block_idx, from_, to
+        )
+        df = _read_csv_range(csv_path, from_, to, row_index=row_index, **kwargs)
+        matches = df[col_name] == val
+        if matches.any():
+            idx_max = matches.idxmax()
+            return int(from_ + idx_max)
+    _LOG.info("Value %s not found", val)
+    return None
+
+
 # #############################################################################
 # CSV to PQ conversion
 # #############################################################################
 
 
+# #############################################################################
+# _GroupWriter
+# #############################################################################
+
+
+class _GroupWriter:
+    """
+    Fan out rows to one output file per group, buffering the writes.
+
+    Rows are buffered in memory per group and written in large blocks when
+    the buffered rows exceed `max_buffered_rows`. At most `max_open_files`
+    files are kept open, closing the least recently used one when needed.
+
+    The output is:
+    - "csv": `out_dir/{key}.csv` without header, appending to an existing
+      file
+    - "parquet": `out_dir/{key}/part-{idx}.parquet`, where a new part is
+      started each time the file of a group is reopened, appending to the
+      parts already in the directory
+      - Without an explicit `schema`, the schema of a group is inferred from
+        its first rows (or read from its last existing part). When the
+        inferred types change (e.g., a column that was empty in the previous
+        rows), the schema is promoted with `unify_csv_schemas()` and a new
+        part is started. When the writer is closed, the previous parts are
+        rewritten with the final schema, so that all the parts of a group
+        can be read as one dataset
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        *,
+        output_format: str = "csv",
+        max_open_files: int = 128,
+        max_buffered_rows: int = 1000000,
+        schema: Optional[pa.Schema] = None,
+    ) -> None:
+        """
+        Constructor.
+
+        :param out_dir: output dir
+        :param output_format: "csv" or "parquet"
+        :param max_open_files: maximum number of output files open at the
+            same time
+        :param max_buffered_rows: maximum number of rows buffered across all
+            the groups before writing them
+        :param schema: schema of the Parquet files, which the rows are cast
+            to, `None` to infer it
+        """
+        hdbg.dassert_in(output_format, ("csv", "parquet"))
+        hdbg.dassert_lte(1, max_open_files)
+        hdbg.dassert_lte(1, max_buffered_rows)
+        self._out_dir = out_dir
+        self._output_format = output_format
+        self._max_open_files = max_open_files
+        self._max_buffered_rows = max_buffered_rows
+        self._schema = schema
+        self._buffers: Dict[str, List[pd.DataFrame]] = (
+            collections.defaultdict(list)
+        )
+        self._num_buffered_rows = 0
+        # Open files (or Parquet writers) from the least to the most recently
+        # used.
+        self._open_files: collections.OrderedDict = collections.OrderedDict()
+        # File name and schema of the Parquet parts of each group.
+        self._parts: Dict[str, List[Tuple[str, pa.Schema]]] = {}
+
+    def __enter__(self) -> "_GroupWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def append(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Buffer the rows of a group.
+        """
+        if df.empty:
+            return
+        self._buffers[key].append(df)
+        self._num_buffered_rows += len(df)
+        if self._num_buffered_rows >= self._max_buffered_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all the buffered rows.
+        """
+        for key in list(self._buffers):
+            df = pd.concat(self._buffers.pop(key))
+            self._write(key, df)
+        self._num_buffered_rows = 0
+
+    def close(self) -> None:
+        """
+        Write all the buffered rows and close the files.
+        """
+        self.flush()
+        while self._open_files:
+            _, file = self._open_files.popitem(last=False)
+            file.close()
+        self._unify_parts()
+
+    def _write(self, key: str, df: pd.DataFrame) -> None:
+        if self._output_format == "csv":
+            f = self._get_file(key)
+            df.to_csv(f, header=False, index=False)
+            return
+        if key in self._open_files:
+            schema = self._open_files[key].schema
+        else:
+            schema = self._get_schema(key, df)
+        try:
+            table = _convert_df_to_table(df, schema)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if self._schema is not None:
+                raise
+            # The inferred types changed, so start a new part with a schema
+            # compatible with the previous and the new rows.
+            schema = unify_csv_schemas(
+                [schema, pa.Schema.from_pandas(df, preserve_index=False)]
+            )
+            _LOG.debug("Starting a new part for '%s' with\n%s", key, schema)
+            table = _convert_df_to_table(df, schema)
+            if key in self._open_files:
+                self._open_files.pop(key).close()
+        writer = self._get_file(key, schema=schema)
+        writer.write_table(table)
+
+    def _get_parts(self, key: str) -> List[Tuple[str, pa.Schema]]:
+        """
+        Return the Parquet parts of a group, including the existing ones.
+        """
+        if key not in self._parts:
+            file_names = sorted(
+                glob.glob(os.path.join(self._out_dir, key, "part-*.parquet"))
+            )
+            self._parts[key] = [
+                (file_name, pq.read_schema(file_name))
+                for file_name in file_names
+            ]
+        return self._parts[key]
+
+    def _get_schema(self, key: str, df: pd.DataFrame) -> pa.Schema:
+        """
+        Return the schema of a new Parquet part of a group.
+        """
+        if self._schema is not None:
+            return self._schema
+        parts = self._get_parts(key)
+        if parts:
+            # Continue with the schema of the last part.
+            return parts[-1][1]
+        return pa.Schema.from_pandas(df, preserve_index=False)
+
+    def _unify_parts(self) -> None:
+        """
+        Rewrite the Parquet parts of each group with the schema of its last
+        part.
+        """
+        for key, parts in self._parts.items():
+            schema = parts[-1][1]
+            for idx, (file_name, part_schema) in enumerate(parts[:-1]):
+                if part_schema.equals(schema):
+                    continue
+                _LOG.debug("Rewriting '%s' with\n%s", file_name, schema)
+                tmp_file_name = file_name + ".tmp"
+                with pq.ParquetWriter(tmp_file_name, schema) as writer:
+                    for batch in pq.ParquetFile(file_name).iter_batches():
+                        table = _convert_df_to_table(batch.to_pandas(), schema)
+                        writer.write_table(table)
+                os.replace(tmp_file_name, file_name)
+                parts[idx] = (file_name, schema)
+
+    def _get_file(self, key: str, *, schema: Optional[pa.Schema] = None) -> Any:
+        """
+        Return the open file of a group, opening it if needed.
+
+        :param schema: schema of the Parquet part to open
+        """
+        if key in self._open_files:
+            self._open_files.move_to_end(key)
+            return self._open_files[key]
+        if len(self._open_files) >= self._max_open_files:
+            # Close the least recently used file.
+            _, file = self._open_files.popitem(last=False)
+            file.close()
+        if self._output_format == "csv":
+            file_name = os.path.join(self._out_dir, key + ".csv")
+            file = open(file_name, "a", buffering=1024 * 1024)
+        else:
+            hdbg.dassert_is_not(schema, None)
+            parts = self._get_parts(key)
+            file_name = os.path.join(
+                self._out_dir, key, f"part-{len(parts):05d}.parquet"
+            )
+            hio.create_enclosing_dir(file_name, incremental=True)
+            file = pq.ParquetWriter(file_name, schema)
+            parts.append((file_name, schema))
+        self._open_files[key] = file
+        return file
+
+
+def _convert_df_to_table(
+    df: pd.DataFrame,
+    schema: pa.Schema,
+    *,
+    preserve_index: Optional[bool] = False,
+) -> pa.Table:
+    """
+    Convert a dataframe to an Arrow table with the given schema.
+
+    :param preserve_index: whether to store the index, see
+        `pa.Table.from_pandas()`
+        - `None` stores the index as in `df.to_parquet()`, i.e., a
+          `RangeIndex` only as metadata and any other index as columns,
+          which need to be in `schema`
+    """
+    # Arrow doesn't cast numbers and booleans to strings, so convert the
+    # values of the string columns (e.g., the columns promoted to strings by
+    # `unify_csv_schemas()`).
+    for field in schema:
+        if not pa.types.is_string(field.type) or field.name not in df:
+            continue
+        col = df[field.name]
+        if pd.api.types.infer_dtype(col, skipna=True) not in (
+            "string",
+            "empty",
+        ):
+            df[field.name] = col.where(col.isna(), col.astype(str))
+    table = pa.Table.from_pandas(
+        df, schema=schema, preserve_index=preserve_index
+    )
+    return table
+
+
 def _csv_mapreduce(
     csv_path: str,
     out_dir: str,
@@ -157,6 +656,10 @@ def _csv_mapreduce(
     chunk_preprocessor: Optional[Callable],
     *,
     chunk_size: int = 1000000,
+    output_format: str = "csv",
+    max_open_files: int = 128,
+    max_buffered_rows: int = 1000000,
+    schema: Optional[pa.Schema] = None,
 ) -> None:
     """
     Map-reduce-type processing of CSV.
@@ -164,15 +667,23 @@ def _csv_mapreduce(
     The phases are:
       - Read the CSV in chunks as DataFrame
       - Key each row of the DataFrame using a `groupby`
-      - "Reduce" keyed groups by writing and appending to a CSV
+      - "Reduce" keyed groups by writing and appending to a file per key
+
+    The CSV is read only once and the writes are buffered across chunks (see
+    `_GroupWriter`), instead of opening and closing a file per key for each
+    chunk.
 
     :param csv_path: input CSV path
-    :param out_dir: output dir for CSV with filenames corresponding to keys
+    :param out_dir: output dir for files with filenames corresponding to keys
     :param key_func: function to apply to each chunk DataFrame to key rows
         Should return an iterable with elements like (key, df)
     :param chunk_preprocessor: function to apply to each chunk DataFrame before
         applying key_func
     :param chunk_size: chunk_size of input to process
+    :param output_format: format of the output files, see `_GroupWriter`
+    :param max_open_files: see `_GroupWriter`
+    :param max_buffered_rows: see `_GroupWriter`
+    :param schema: see `_GroupWriter`
     """
     # Read CSV data in chunks.
     chunks = pd.read_csv(csv_path, chunksize=chunk_size)
@@ -182,10 +693,16 @@ def _csv_mapreduce(
     # Apply key_func to each chunk.
     keyed_group_blocks = map(key_func, chunks)
     # Append results.
-    for block in keyed_group_blocks:
-        for idx, df in block:
-            file_name = os.path.join(out_dir, idx + ".csv")
-            _append_csv(df, file_name)
+    with _GroupWriter(
+        out_dir,
+        output_format=output_format,
+        max_open_files=max_open_files,
+        max_buffered_rows=max_buffered_rows,
+        schema=schema,
+    ) as writer:
+        for block in keyed_group_blocks:
+            for idx, df in block:
+                writer.append(idx, df)
 
 
 def convert_csv_to_pq(
@@ -195,6 +712,8 @@ def convert_csv_to_pq(
     normalizer: Optional[Callable] = None,
     header: Optional[int] = 0,
     compression: Optional[str] = "gzip",
+    dtype: Optional[Dict[str, str]] = None,
+    schema: Optional[pa.Schema] = None,
 ) -> None:
     """
     Convert CSV file to Parquet file.
@@ -208,12 +727,132 @@ def convert_csv_to_pq(
     :param pq_path: full path of parquet
     :param header: header specification of CSV
     :param normalizer: function to apply to df before writing to PQ
+    :param compression: compression of the Parquet file
+    :param dtype: types of the columns to use when reading the CSV, instead of
+        letting Pandas infer them
+    :param schema: Arrow schema to cast the data to before writing it, so that
+        different files have the same schema
+        - The index set by `normalizer` is stored like `df.to_parquet()`
+          does, so it must be in the schema unless it's a `RangeIndex` (see
+          `infer_csv_schema()`)
     """
-    df = pd.read_csv(csv_path, header=header)
+    df = pd.read_csv(csv_path, header=header, dtype=dtype)
     # TODO(Paul): Ensure that one of header, normalizer is not None.
     if normalizer is not None:
         df = normalizer(df)
-    df.to_parquet(pq_path, compression=compression)
+    if schema is None:
+        df.to_parquet(pq_path, compression=compression)
+    else:
+        table = _convert_df_to_table(df, schema, preserve_index=None)
+        pq.write_table(table, pq_path, compression=compression)
+
+
+def infer_csv_schema(
+    csv_path: str,
+    *,
+    normalizer: Optional[Callable] = None,
+    header: Optional[int] = 0,
+    dtype: Optional[Dict[str, str]] = None,
+    num_rows: int = 100000,
+) -> pa.Schema:
+    """
+    Infer the Arrow schema of the Parquet data converted from a CSV file.
+
+    The types are inferred from the first `num_rows` rows of the file.
+
+    :param csv_path: full path of CSV
+    :param normalizer: function to apply to df before converting it, as in
+        `convert_csv_to_pq()`
+    :param header: header specification of CSV
+    :param dtype: types of the columns to use when reading the CSV
+    :param num_rows: number of rows to use to infer the types
+    :return: schema without Pandas metadata, including the index set by
+        `normalizer` unless it's a `RangeIndex`, which is stored only in the
+        Pandas metadata regenerated when writing the data
+    """
+    hdbg.dassert_lte(1, num_rows)
+    df = pd.read_csv(csv_path, header=header, dtype=dtype, nrows=num_rows)
+    if normalizer is not None:
+        df = normalizer(df)
+    schema = pa.Schema.from_pandas(df)
+    schema = schema.remove_metadata()
+    return schema
+
+
+def unify_csv_schemas(schemas: List[pa.Schema]) -> pa.Schema:
+    """
+    Unify the Arrow schemas inferred from different CSV files.
+
+    The type of a column is:
+    - the type inferred from the files where the column is not empty (i.e.,
+      it doesn't have the `null` type)
+    - `float64`, if the types are numeric but different (e.g., a column with
+      missing values in some files and without in others)
+    - `string`, if the types are not compatible (e.g., numbers in some files
+      and strings in others)
+
+    :param schemas: schemas inferred by `infer_csv_schema()`
+    :return: schema with the columns of all the schemas, in order of
+        appearance
+    """
+    hdbg.dassert_lte(1, len(schemas))
+    # Collect the types of each column.
+    col_types: Dict[str, List[pa.DataType]] = {}
+    for schema in schemas:
+        for field in schema:
+            types = col_types.setdefault(field.name, [])
+            if not pa.types.is_null(field.type) and field.type not in types:
+                types.append(field.type)
+    fields = []
+    for col_name, types in col_types.items():
+        if not types:
+            # The column is empty in all the files.
+            type_ = pa.null()
+        elif len(types) == 1:
+            type_ = types[0]
+        elif all(
+            pa.types.is_integer(type_) or pa.types.is_floating(type_)
+            for type_ in types
+        ):
+            type_ = pa.float64()
+        else:
+            type_ = pa.string()
+        if len(types) > 1:
+            _LOG.debug(
+                "Promoting column '%s' with types %s to %s",
+                col_name,
+                types,
+                type_,
+            )
+        fields.append(pa.field(col_name, type_))
+    return pa.schema(fields)
+
+
+def _convert_csv_to_pq_file(csv_path: str, pq_path: str, **kwargs: Any) -> None:
+    """
+    Apply `convert_csv_to_pq()` writing to a temporary file first.
+
+    This guarantees that an interrupted conversion doesn't leave a partial
+    output file that looks up to date.
+    """
+    tmp_pq_path = pq_path + ".tmp"
+    convert_csv_to_pq(csv_path, tmp_pq_path, **kwargs)
+    os.replace(tmp_pq_path, pq_path)
+
+
+def _get_csv_stem(file_name: str) -> Optional[str]:
+    """
+    Return the name of a CSV file without the `.csv` / `.csv.gz` extension.
+
+    :return: the stem or `None` if the file is not a CSV file
+    """
+    for extension in (".csv", ".csv.gz"):
+        csv_stem = hio.remove_extension(
+            file_name, extension, check_has_extension=False
+        )
+        if csv_stem is not None:
+            return csv_stem
+    return None
 
 
 def convert_csv_dir_to_pq_dir(
@@ -222,55 +861,167 @@ def convert_csv_dir_to_pq_dir(
     *,
     normalizer: Optional[Callable] = None,
     header: Optional[int] = None,
+    schema: Optional[pa.Schema] = None,
+    num_sample_rows: int = 100000,
+    incremental: bool = False,
+    num_threads: Union[str, int] = "serial",
 ) -> None:
     """
     Apply `convert_csv_to_pq()` to all files in `csv_dir`.
 
+    All the files are converted with the same schema, so that the output
+    files can be read together as a dataset. Unless it is passed explicitly,
+    the schema is inferred from each CSV file and the schemas are unified
+    (see `unify_csv_schemas()`). If a file `{csv_file}.types` (see
+    `to_typed_csv()`) is stored next to the first CSV file, its column types
+    are used to read all the files.
+
     :param csv_dir: directory storing CSV files on S3 or local
     :param pq_dir: target directory to save PQ files (only local
         filesystem)
     :param header: header specification of CSV
     :param normalizer: function to apply to df before writing to PQ
+        - It needs to be picklable (e.g., not a lambda) when using more than
+          one process
+    :param schema: Arrow schema of the output files
+        - `None` to infer it from all the CSV files
+    :param num_sample_rows: number of rows of each file used to infer the
+        schema
+        - If a later row has a value of a different type (e.g., a string in a
+          column with only numbers in the first rows), the conversion of the
+          file fails: in this case pass `schema` or increase this value
+    :param incremental: if True, skip the CSV files with an output file more
+        recent than the CSV file
+        - Without an explicit `schema`, the schema of the files already
+          converted is reused, promoting it to fit the new files if needed.
+          In this case all the files are converted again
+    :param num_threads: number of processes converting the files in parallel
+        (see `hjoblib.get_num_executing_threads()`)
     """
-    # Get the filenames in `csv_dir`.
+    # Get the filenames in `csv_dir` and their modification times.
+    s3fs = None
     if hs3.is_s3_path(csv_dir):
         # TODO(gp): Pass aws_profile.
         s3fs = hs3.get_s3fs("am")
-        filenames = s3fs.ls(csv_dir)
+        file_mtimes = {
+            os.path.basename(info["name"]): info["LastModified"].timestamp()
+            for info in s3fs.ls(csv_dir, detail=True)
+            if info["type"] == "file"
+        }
     else:
         # Local filesystem.
         hdbg.dassert_dir_exists(csv_dir)
-        # TODO(Paul): check .endswith(".csv") or do glob(csv_dir + "/*.csv")
-        filenames = os.listdir(csv_dir)
-    hdbg.dassert(filenames, "No files in the directory '%s'", csv_dir)
-    # Process all the filenames.
-    # TODO(gp): Add tqdm.
-    # TODO(gp): Consider parallelizing.
-    for filename in filenames:
+        file_mtimes = {
+            entry.name: entry.stat().st_mtime
+            for entry in os.scandir(csv_dir)
+            if entry.is_file()
+        }
+    hdbg.dassert(file_mtimes, "No files in the directory '%s'", csv_dir)
+    hio.create_dir(pq_dir, incremental=True)
+    # Find the files to convert.
+    csv_file_names = []
+    pq_file_names = []
+    for filename in sorted(file_mtimes):
+        if filename.endswith(".types"):
+            # Skip the files with the types of the CSV files.
+            continue
         # Remove .csv/.csv.gz.
-        csv_stem = hio.remove_extension(
-            filename, ".csv", check_file_exists=True, check_has_extension=False
-        )
-        if csv_stem is None:
-            csv_stem = hio.remove_extension(
-                filename,
-                ".csv.gz",
-                check_file_exists=True,
-                check_has_extension=False,
-            )
+        csv_stem = _get_csv_stem(filename)
         if csv_stem is None:
             _LOG.warning(
-                "Skipping filename=%s since it has invalid extension", csv_stem
+                "Skipping filename=%s since it has invalid extension", filename
             )
             continue
-        # Convert file to PQ.
-        pq_filename = csv_stem + ".pq"
-        convert_csv_to_pq(
-            os.path.join(csv_dir, filename),
-            os.path.join(pq_dir, pq_filename),
-            normalizer=normalizer,
-            header=header,
+        csv_file_names.append(filename)
+        pq_file_names.append(csv_stem + ".pq")
+    hdbg.dassert(csv_file_names, "No CSV files in the directory '%s'", csv_dir)
+    # Load the types of the columns, if available.
+    dtype = None
+    dtypes_filename = csv_file_names[0] + ".types"
+    if dtypes_filename in file_mtimes:
+        dtype = _read_dtypes(os.path.join(csv_dir, dtypes_filename), s3fs=s3fs)
+    num_workers = hjoblib.get_num_executing_threads(num_threads)
+    # Prepare the conversions, skipping the ones already done.
+    all_tasks = []
+    tasks = []
+    converted_pq_paths = []
+    for csv_file_name, pq_file_name in zip(csv_file_names, pq_file_names):
+        task = (
+            os.path.join(csv_dir, csv_file_name),
+            os.path.join(pq_dir, pq_file_name),
         )
+        all_tasks.append(task)
+        pq_path = task[1]
+        if (
+            incremental
+            and os.path.exists(pq_path)
+            and os.path.getmtime(pq_path) >= file_mtimes[csv_file_name]
+        ):
+            _LOG.debug("Skipping up to date file '%s'", pq_path)
+            converted_pq_paths.append(pq_path)
+            continue
+        tasks.append(task)
+    # Infer the schema from all the files to convert, since the types
+    # inferred from a single file can differ from the ones of the other files
+    # (e.g., for a column that is empty in the first file).
+    if schema is None:
+        schema_kwargs = {
+            "normalizer": normalizer,
+            "header": header,
+            "dtype": dtype,
+            "num_rows": num_sample_rows,
+        }
+        csv_paths = [csv_path for csv_path, _ in tasks]
+        if num_workers == 1 or len(csv_paths) <= 1:
+            schemas = [
+                infer_csv_schema(csv_path, **schema_kwargs)
+                for csv_path in csv_paths
+            ]
+        else:
+            pool = hjoblib.get_worker_pool(num_workers)
+            futures = [
+                pool.submit(infer_csv_schema, csv_path, **schema_kwargs)
+                for csv_path in csv_paths
+            ]
+            schemas = [future.result() for future in futures]
+        if converted_pq_paths:
+            # Reuse the schema of the files already converted, which all have
+            # the same schema.
+            converted_schema = pq.read_schema(converted_pq_paths[0])
+            converted_schema = converted_schema.remove_metadata()
+            schema = unify_csv_schemas([converted_schema] + schemas)
+            if not schema.equals(converted_schema):
+                _LOG.warning(
+                    "The schema of the files already converted doesn't fit "
+                    "the new files: converting all the files with\n%s",
+                    schema,
+                )
+                tasks = all_tasks
+        else:
+            schema = unify_csv_schemas(schemas)
+    _LOG.debug("schema=\n%s", schema)
+    _LOG.info("Converting %s files out of %s", len(tasks), len(csv_file_names))
+    kwargs = {
+        "normalizer": normalizer,
+        "header": header,
+        "dtype": dtype,
+        "schema": schema,
+    }
+    # Convert the files to PQ.
+    if num_workers == 1 or len(tasks) <= 1:
+        for csv_path, pq_path in tqdm(tasks):
+            _convert_csv_to_pq_file(csv_path, pq_path, **kwargs)
+    else:
+        pool = hjoblib.get_worker_pool(num_workers)
+        futures = [
+            pool.submit(_convert_csv_to_pq_file, csv_path, pq_path, **kwargs)
+            for csv_path, pq_path in tasks
+        ]
+        for future in tqdm(
+            concurrent.futures.as_completed(futures), total=len(futures)
+        ):
+            # Propagate the exceptions of the workers.
+            future.result()
 
 
 # #############################################################################
@@ -348,6 +1099,22 @@ def to_typed_csv(df: pd.DataFrame, file_name: str) -> str:
     return dtypes_filename
 
 
+def _read_dtypes(
+    dtypes_filename: str, *, s3fs: Optional[Any] = None
+) -> Dict[str, str]:
+    """
+    Read a file with the types of the columns written by `to_typed_csv()`.
+
+    :param dtypes_filename: path to the file with the types
+    :param s3fs: filesystem to read the file from S3, if not None
+    :return: types of the columns
+    """
+    open_func = open if s3fs is None else s3fs.open
+    with open_func(dtypes_filename, "r") as dtypes_file:
+        dtypes_dict = ast.literal_eval(list(dtypes_file)[0])
+    return dtypes_dict
+
+
 def from_typed_csv(file_name: str) -> pd.DataFrame:
     """
     Load CSV file as df applying the original types of columns.
@@ -358,8 +1125,7 @@ def from_typed_csv(file_name: str) -> pd.DataFrame:
     # Load the types.
     dtypes_filename = file_name + ".types"
     hdbg.dassert_path_exists(dtypes_filename)
-    with open(dtypes_filename) as dtypes_file:
-        dtypes_dict = ast.literal_eval(list(dtypes_file)[0])
+    dtypes_dict = _read_dtypes(dtypes_filename)
     # Load the data, applying the types.
     df = pd.read_csv(file_name, dtype=dtypes_dict)
     return df
@@ -0,0 +1,680 @@
+"""
+Index of the files in a dir tree that can be refreshed incrementally.
+
+Import as:
+
+import helpers.hfile_index as hfilinde
+"""
+
+import collections
+import dataclasses
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import re
+import stat
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import helpers.hdbg as hdbg
+import helpers.hio as hio
+import helpers.hsystem as hsystem
+
+_LOG = logging.getLogger(__name__)
+
+
+# #############################################################################
+# FileIndex
+# #############################################################################
+
+
+@dataclasses.dataclass
+class FileInfo:
+    """
+    Metadata of a file stored in a `FileIndex`.
+    """
+
+    size: int
+    mtime_ns: int
+    # SHA-256 of the content of the file, when the index computes hashes.
+    hash: Optional[str] = None
+
+
+@dataclasses.dataclass
+class _DirInfo:
+    """
+    Content of a dir stored in a `FileIndex`.
+    """
+
+    mtime_ns: int
+    # Basenames of the files (including symlinks) directly under the dir.
+    file_names: List[str]
+    # Basenames of the dirs directly under the dir.
+    dir_names: List[str]
+
+
+# Version of the format of the files saved by `FileIndex.save()`.
+_FILE_INDEX_VERSION = 1
+
+
+def _compute_hash(file_name: str) -> str:
+    """
+    Compute the SHA-256 of the content of a file.
+    """
+    hasher = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _has_glob_chars(pattern: str) -> bool:
+    return any(char in pattern for char in "*?[")
+
+
+def _join(dir_name: str, name: str) -> str:
+    """
+    Join a path relative to the root of the index with a basename.
+
+    This is a faster version of `os.path.join()` for the hot loops.
+    """
+    return f"{dir_name}/{name}" if dir_name else name
+
+
+class FileIndex:
+    """
+    Map the paths of a dir tree to their size, mtime and, optionally, hash.
+
+    The tree is walked once when the index is built. Then `refresh()` lists
+    again only the dirs whose mtime changed, since adding, removing or
+    renaming an entry updates the mtime of the enclosing dir, so that
+    repeated lookups don't walk the filesystem or run `find` each time.
+
+    The index can be saved to a JSON file and loaded back, so that the
+    state can be reused across processes (e.g., invoke tasks, see
+    `get_file_index()`).
+
+    E.g.,
+    ```
+    file_index = FileIndex("/app")
+    file_index.find_by_basename("hio.py")
+    ['/app/helpers/hio.py']
+    ```
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        *,
+        pruned_dir_names: Iterable[str] = hio.DEFAULT_PRUNED_DIR_NAMES,
+        compute_hashes: bool = False,
+        cache_file: Optional[str] = None,
+        check_files: bool = True,
+    ) -> None:
+        """
+        Build the index of the files under `root_dir`.
+
+        :param root_dir: dir to index
+        :param pruned_dir_names: glob patterns of the basenames of the dirs
+            that are indexed but not traversed
+        :param compute_hashes: compute the SHA-256 of the content of each file
+        :param cache_file: JSON file to load the state of the index from, if
+            it exists, and to save it to with `save()`
+            - If the file can't be loaded, the index is built from scratch
+        :param check_files: refresh also the metadata of the files loaded
+            from `cache_file` (see `refresh()`)
+        """
+        hdbg.dassert_dir_exists(root_dir)
+        self.root_dir = os.path.abspath(root_dir)
+        self._pruned_dir_names = list(pruned_dir_names)
+        # Match all the patterns at once.
+        self._pruned_dir_names_regex = re.compile(
+            "|".join(map(fnmatch.translate, self._pruned_dir_names)) or "(?!)"
+        )
+        self._compute_hashes = compute_hashes
+        self.cache_file = cache_file
+        # Map the path of each dir, relative to `root_dir`, to its content.
+        # The root dir is stored as "".
+        self._dirs: Dict[str, _DirInfo] = {}
+        # Map the relative path of each file to its metadata.
+        self._files: Dict[str, FileInfo] = {}
+        # Map the basename of each file and dir to their relative paths.
+        self._basename_to_paths: Dict[str, Set[str]] = collections.defaultdict(
+            set
+        )
+        # Paths reported by `git status` and `HEAD` at the last call of
+        # `refresh_from_git_status()`.
+        self._git_status_paths: Set[str] = set()
+        self._git_head: Optional[str] = None
+        # Whether the index changed since it was loaded or saved.
+        self.is_modified = False
+        self._lock = threading.RLock()
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                self._load(cache_file)
+            except (OSError, ValueError, TypeError, KeyError) as e:
+                _LOG.warning(
+                    "Ignoring index in '%s' that can't be loaded: %s",
+                    cache_file,
+                    e,
+                )
+                self._dirs = {}
+                self._files = {}
+                self._basename_to_paths.clear()
+        self.refresh(check_files=check_files)
+
+    def refresh(self, *, check_files: bool = True) -> None:
+        """
+        Bring the index up to date with the filesystem.
+
+        :param check_files: stat also the files in the dirs that didn't
+            change, to update their size, mtime and hash
+            - `False` refreshes only the structure of the tree, which is
+              enough to look up paths and costs one `stat()` per dir
+        """
+        with self._lock:
+            self._refresh_dir("", check_files=check_files, recursive=True)
+        _LOG.debug(
+            "Indexed %s files in %s dirs under '%s'",
+            len(self._files),
+            len(self._dirs),
+            self.root_dir,
+        )
+
+    def refresh_from_git_status(self) -> None:
+        """
+        Refresh only the dirs containing the paths reported by `git status`.
+
+        This is faster than `refresh()` on large trees, but it detects only
+        the changes to files tracked by Git and to untracked files that are
+        not ignored. If `HEAD` moved (e.g., after a checkout), the entire tree
+        is refreshed.
+        """
+        # Run `git` directly without a shell, since this is on a hot path.
+        cmd = ["git", "-C", self.root_dir, "rev-parse", "--show-toplevel"]
+        cmd.append("HEAD")
+        _, txt = hsystem.system_to_string(cmd)
+        git_root, git_head = txt.split()
+        cmd = ["git", "-C", self.root_dir, "status", "--porcelain", "-z"]
+        cmd.extend(["--untracked-files=all", "."])
+        _, txt = hsystem.system_to_string(cmd)
+        git_status_paths: Set[str] = set()
+        tokens = txt.split("\0")
+        idx = 0
+        while idx < len(tokens):
+            token = tokens[idx]
+            idx += 1
+            if len(token) < 4:
+                continue
+            # E.g., ` M helpers/hio.py` or `R  new.py` followed by `old.py`.
+            status, path = token[:2], token[3:]
+            paths = [path]
+            if "R" in status or "C" in status:
+                paths.append(tokens[idx])
+                idx += 1
+            for path in paths:
+                # Convert the path from relative to the Git root to relative
+                # to the index root.
+                path = os.path.relpath(
+                    os.path.join(git_root, path), self.root_dir
+                )
+                if not path.startswith(".."):
+                    git_status_paths.add(path)
+        with self._lock:
+            if git_head != self._git_head:
+                _LOG.debug("HEAD moved to %s: refreshing all", git_head)
+                self.refresh()
+            else:
+                # Refresh also the paths reported at the previous call, since
+                # their changes might have been reverted in the meantime.
+                changed_paths = git_status_paths | self._git_status_paths
+                dir_names = {
+                    self._get_indexed_enclosing_dir(os.path.dirname(path))
+                    for path in changed_paths
+                }
+                for dir_name in sorted(dir_names):
+                    self._refresh_dir(
+                        dir_name, check_files=True, recursive=False
+                    )
+            self._git_head = git_head
+            self._git_status_paths = git_status_paths
+
+    def find_by_basename(
+        self, pattern: str, *, use_relative_paths: bool = False
+    ) -> List[str]:
+        """
+        Find the files and dirs whose basename matches `pattern`.
+
+        :param pattern: basename (e.g., `hio.py`) or glob pattern on the
+            basename (e.g., `test_*.py`), like `find -name`
+        :param use_relative_paths: return paths relative to `root_dir`
+            instead of absolute paths
+        :return: sorted list of paths
+        """
+        with self._lock:
+            if _has_glob_chars(pattern):
+                paths = [
+                    path
+                    for base_name, paths_tmp in self._basename_to_paths.items()
+                    if fnmatch.fnmatchcase(base_name, pattern)
+                    for path in paths_tmp
+                ]
+            else:
+                # Look up the basename directly.
+                paths = list(self._basename_to_paths.get(pattern, ()))
+        paths = self._to_output_paths(paths, use_relative_paths)
+        return paths
+
+    def get_paths(
+        self,
+        *,
+        patterns: Optional[List[str]] = None,
+        only_files: bool = False,
+        use_relative_paths: bool = False,
+    ) -> List[str]:
+        """
+        Get the files and dirs in the index.
+
+        :param patterns: glob patterns to match against the basename of the
+            paths (e.g., `["*.py", "*.ipynb"]`)
+            - `None` to return all the paths
+        :param only_files: return only files instead of both files and dirs
+        :param use_relative_paths: return paths relative to `root_dir`
+            instead of absolute paths
+        :return: sorted list of paths
+        """
+        with self._lock:
+            paths = list(self._files.keys())
+            if not only_files:
+                paths.extend(
+                    _join(dir_name, name)
+                    for dir_name, dir_info in self._dirs.items()
+                    for name in dir_info.dir_names
+                )
+        if patterns is not None:
+            paths = [
+                path
+                for path in paths
+                if any(
+                    fnmatch.fnmatchcase(os.path.basename(path), pattern)
+                    for pattern in patterns
+                )
+            ]
+        paths = self._to_output_paths(paths, use_relative_paths)
+        return paths
+
+    def get_file_info(self, file_name: str) -> Optional[FileInfo]:
+        """
+        Get the metadata of a file.
+
+        :param file_name: absolute path or path relative to `root_dir`
+        :return: metadata of the file or `None` if it's not in the index
+        """
+        path = os.path.relpath(
+            os.path.join(self.root_dir, file_name), self.root_dir
+        )
+        with self._lock:
+            file_info = self._files.get(path)
+        return file_info
+
+    def save(self, cache_file: Optional[str] = None) -> None:
+        """
+        Save the state of the index to a JSON file.
+
+        :param cache_file: file to save the index to
+            - `None` to use the `cache_file` passed to the constructor
+        """
+        if cache_file is None:
+            cache_file = self.cache_file
+        hdbg.dassert_is_not(cache_file, None)
+        with self._lock:
+            obj = {
+                "version": _FILE_INDEX_VERSION,
+                "root_dir": self.root_dir,
+                "pruned_dir_names": self._pruned_dir_names,
+                "compute_hashes": self._compute_hashes,
+                "dirs": {
+                    path: dataclasses.astuple(dir_info)
+                    for path, dir_info in self._dirs.items()
+                },
+                "files": {
+                    path: dataclasses.astuple(file_info)
+                    for path, file_info in self._files.items()
+                },
+            }
+            self.is_modified = False
+        # Write to a temporary file first, so that other processes never load
+        # a partially written index. Use `json` directly instead of
+        # `hio.to_json()`, since the index is large and on a hot path.
+        hio.create_enclosing_dir(cache_file, incremental=True)
+        tmp_cache_file = f"{cache_file}.tmp.{os.getpid()}"
+        with open(tmp_cache_file, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp_cache_file, cache_file)
+        _LOG.debug("Saved index of '%s' to '%s'", self.root_dir, cache_file)
+
+    # /////////////////////////////////////////////////////////////////////////
+
+    def _load(self, cache_file: str) -> None:
+        """
+        Load the state of the index saved by `save()`.
+
+        The state is discarded if it was saved with a different format or
+        configuration.
+        """
+        with open(cache_file) as f:
+            obj: Dict[str, Any] = json.load(f)
+        is_compatible = (
+            obj.get("version") == _FILE_INDEX_VERSION
+            and obj.get("root_dir") == self.root_dir
+            and obj.get("pruned_dir_names") == self._pruned_dir_names
+            and obj.get("compute_hashes") == self._compute_hashes
+        )
+        if not is_compatible:
+            _LOG.warning(
+                "Ignoring index in '%s' built with a different format or "
+                "configuration",
+                cache_file,
+            )
+            return
+        self._dirs = {
+            path: _DirInfo(*values) for path, values in obj["dirs"].items()
+        }
+        self._files = {
+            path: FileInfo(*values) for path, values in obj["files"].items()
+        }
+        for path in self._files:
+            self._basename_to_paths[os.path.basename(path)].add(path)
+        for dir_name, dir_info in self._dirs.items():
+            for name in dir_info.dir_names:
+                self._basename_to_paths[name].add(_join(dir_name, name))
+
+    def _to_output_paths(
+        self, paths: List[str], use_relative_paths: bool
+    ) -> List[str]:
+        if not use_relative_paths:
+            paths = [os.path.join(self.root_dir, path) for path in paths]
+        return sorted(paths)
+
+    def _is_pruned(self, dir_name: str) -> bool:
+        return self._pruned_dir_names_regex.match(dir_name) is not None
+
+    def _get_indexed_enclosing_dir(self, dir_name: str) -> str:
+        """
+        Return the closest dir enclosing `dir_name` that is in the index.
+        """
+        while dir_name not in self._dirs or not os.path.isdir(
+            os.path.join(self.root_dir, dir_name)
+        ):
+            hdbg.dassert_ne(dir_name, "")
+            dir_name = os.path.dirname(dir_name)
+        return dir_name
+
+    def _refresh_dir(
+        self, dir_name: str, *, check_files: bool, recursive: bool
+    ) -> None:
+        """
+        Refresh a dir, listing it again only if its mtime changed.
+
+        :param dir_name: path of the dir relative to `root_dir`
+        :param check_files: stat the files, even if the dir didn't change
+        :param recursive: refresh also the subdirs; the subdirs that are not
+            in the index yet are always scanned
+        """
+        abs_dir_name = f"{self.root_dir}/{dir_name}"
+        try:
+            # Stat the dir before listing it, so that a change happening
+            # while listing is detected at the next refresh.
+            mtime_ns = os.stat(abs_dir_name).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            self._remove_dir(dir_name)
+            return
+        dir_info = self._dirs.get(dir_name)
+        if dir_info is None or dir_info.mtime_ns != mtime_ns:
+            dir_info = self._scan_dir(dir_name, mtime_ns)
+        elif check_files:
+            for name in dir_info.file_names:
+                self._update_file(_join(dir_name, name))
+        for name in dir_info.dir_names:
+            if self._is_pruned(name):
+                continue
+            path = _join(dir_name, name)
+            if recursive or path not in self._dirs:
+                self._refresh_dir(
+                    path, check_files=check_files, recursive=recursive
+                )
+
+    def _scan_dir(self, dir_name: str, mtime_ns: int) -> _DirInfo:
+        """
+        List a dir, updating the index with its files and subdirs.
+        """
+        abs_dir_name = os.path.join(self.root_dir, dir_name)
+        file_names = []
+        dir_names = []
+        try:
+            with os.scandir(abs_dir_name) as it:
+                for entry in it:
+                    # Don't follow symlinks, like `find`.
+                    if entry.is_dir(follow_symlinks=False):
+                        dir_names.append(entry.name)
+                    else:
+                        file_names.append(entry.name)
+        except PermissionError as e:
+            _LOG.debug("Skipping dir '%s': %s", abs_dir_name, e)
+        file_names.sort()
+        dir_names.sort()
+        # Remove the entries that disappeared.
+        old_dir_info = self._dirs.get(dir_name)
+        old_dir_names: Set[str] = set()
+        if old_dir_info is not None:
+            for name in set(old_dir_info.file_names) - set(file_names):
+                self._remove_file(_join(dir_name, name))
+            old_dir_names = set(old_dir_info.dir_names)
+            for name in old_dir_names - set(dir_names):
+                self._remove_dir(_join(dir_name, name))
+        # Add the new entries.
+        for name in set(dir_names) - old_dir_names:
+            self._basename_to_paths[name].add(_join(dir_name, name))
+        for name in file_names:
+            self._update_file(_join(dir_name, name))
+        dir_info = _DirInfo(mtime_ns, file_names, dir_names)
+        self._dirs[dir_name] = dir_info
+        self.is_modified = True
+        return dir_info
+
+    def _update_file(self, file_name: str) -> None:
+        """
+        Update the metadata of a file, if its size or mtime changed.
+        """
+        abs_file_name = f"{self.root_dir}/{file_name}"
+        try:
+            stat_result = os.stat(abs_file_name, follow_symlinks=False)
+        except FileNotFoundError:
+            self._remove_file(file_name)
+            return
+        file_info = self._files.get(file_name)
+        if (
+            file_info is not None
+            and file_info.size == stat_result.st_size
+            and file_info.mtime_ns == stat_result.st_mtime_ns
+        ):
+            return
+        hash_ = None
+        if self._compute_hashes and stat.S_ISREG(stat_result.st_mode):
+            hash_ = _compute_hash(abs_file_name)
+        if file_info is None:
+            self._basename_to_paths[os.path.basename(file_name)].add(file_name)
+        self._files[file_name] = FileInfo(
+            stat_result.st_size, stat_result.st_mtime_ns, hash_
+        )
+        self.is_modified = True
+
+    def _remove_file(self, file_name: str) -> None:
+        if self._files.pop(file_name, None) is not None:
+            self._basename_to_paths[os.path.basename(file_name)].discard(
+                file_name
+            )
+            self.is_modified = True
+
+    def _remove_dir(self, dir_name: str) -> None:
+        """
+        Remove a dir and all its content from the index.
+        """
+        self._basename_to_paths[os.path.basename(dir_name)].discard(dir_name)
+        dir_info = self._dirs.pop(dir_name, None)
+        if dir_info is None:
+            return
+        self.is_modified = True
+        for name in dir_info.file_names:
+            self._remove_file(_join(dir_name, name))
+        for name in dir_info.dir_names:
+            self._remove_dir(_join(dir_name, name))
+
+
+# #############################################################################
+
+
+# Maximum number of indexes kept in memory by `get_file_index()`.
+_MAX_NUM_FILE_INDEXES = 8
+# Maximum number of index files kept on disk by `get_file_index()` for each
+# Git repo.
+_MAX_NUM_CACHE_FILES = 16
+
+
+def _find_git_dir(dir_name: str) -> Optional[str]:
+    """
+    Find the `.git` dir of the Git repo enclosing a dir.
+
+    This doesn't run `git`, since it's on the hot path of `get_file_index()`.
+
+    :return: path of the `.git` dir or `None` if the dir is not in a repo
+    """
+    while True:
+        git_path = os.path.join(dir_name, ".git")
+        if os.path.isdir(git_path):
+            return git_path
+        if os.path.isfile(git_path):
+            # In submodules and worktrees `.git` is a file pointing to the
+            # actual dir, e.g., `gitdir: ../.git/modules/helpers_root`.
+            txt = hio.from_file(git_path).strip()
+            prefix = "gitdir:"
+            if not txt.startswith(prefix):
+                return None
+            git_dir = txt[len(prefix) :].strip()
+            return os.path.normpath(os.path.join(dir_name, git_dir))
+        parent_dir_name = os.path.dirname(dir_name)
+        if parent_dir_name == dir_name:
+            return None
+        dir_name = parent_dir_name
+
+
+def _get_cache_file(root_dir: str) -> Optional[str]:
+    """
+    Get the file storing the index of `root_dir` across processes.
+
+    The files are stored under the `.git` dir of the enclosing repo, which is
+    not indexed and is not reported by `git status`. Only the
+    `_MAX_NUM_CACHE_FILES` most recently saved files are kept.
+
+    :return: path of the file or `None` if `root_dir` is not in a repo
+    """
+    git_dir = _find_git_dir(root_dir)
+    if git_dir is None:
+        return None
+    cache_dir = os.path.join(git_dir, "tmp.file_index")
+    digest = hashlib.sha256(root_dir.encode()).hexdigest()[:16]
+    cache_file = os.path.join(cache_dir, f"{digest}.json")
+    if not os.path.exists(cache_file) and os.path.isdir(cache_dir):
+        # Remove the least recently saved files to make room for a new one.
+        cache_files = []
+        for entry in os.scandir(cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                cache_files.append((entry.stat().st_mtime_ns, entry.path))
+            except FileNotFoundError:
+                # Removed by another process.
+                continue
+        cache_files.sort()
+        num_files_to_remove = len(cache_files) - _MAX_NUM_CACHE_FILES + 1
+        for _, file_name in cache_files[: max(num_files_to_remove, 0)]:
+            _LOG.debug("Removing index file '%s'", file_name)
+            hio.delete_file(file_name)
+    return cache_file
+
+
+# Map the root dir of each index to the index shared in this process, from the
+# least to the most recently used.
+_FILE_INDEXES: collections.OrderedDict = collections.OrderedDict()
+_FILE_INDEXES_LOCK = threading.Lock()
+
+
+def get_file_index(root_dir: str, *, use_disk_cache: bool = True) -> FileIndex:
+    """
+    Get the index of `root_dir` shared by all the callers in this process.
+
+    The index is built at the first call. At each following call only the
+    structure of the tree is refreshed, which costs one `stat()` per dir.
+    Only the `_MAX_NUM_FILE_INDEXES` most recently used indexes are kept in
+    memory.
+
+    Like the `find` commands that the index replaces, only the content of
+    the `.git` dirs is not indexed, so that the lookups also return the files
+    in `node_modules`, `__pycache__`, etc.
+
+    :param root_dir: dir to index
+    :param use_disk_cache: load the index built by a previous process and
+        save it when it changes, so that a new process (e.g., an invoke task)
+        only needs to refresh it
+        - The index is stored in the Git repo enclosing `root_dir` (see
+          `_get_cache_file()`), if any
+        - The disk cache is best-effort: if it can't be written (e.g., the
+          `.git` file of a worktree points to a dir of the host not mounted
+          in the container), the index is kept only in memory
+    """
+    root_dir = os.path.abspath(root_dir)
+    with _FILE_INDEXES_LOCK:
+        file_index = _FILE_INDEXES.get(root_dir)
+        if file_index is None:
+            cache_file = None
+            if use_disk_cache:
+                try:
+                    cache_file = _get_cache_file(root_dir)
+                except OSError as e:
+                    _LOG.warning(
+                        "Can't use the disk cache of the index of '%s': %s",
+                        root_dir,
+                        e,
+                    )
+            # Refresh only the structure of the tree loaded from disk, like
+            # for the indexes in memory.
+            file_index = FileIndex(
+                root_dir,
+                pruned_dir_names=[".git"],
+                cache_file=cache_file,
+                check_files=False,
+            )
+            _FILE_INDEXES[root_dir] = file_index
+            if len(_FILE_INDEXES) > _MAX_NUM_FILE_INDEXES:
+                _FILE_INDEXES.popitem(last=False)
+            is_new = True
+        else:
+            _FILE_INDEXES.move_to_end(root_dir)
+            is_new = False
+    if not is_new:
+        file_index.refresh(check_files=False)
+    if file_index.cache_file is not None and file_index.is_modified:
+        try:
+            file_index.save()
+        except OSError as e:
+            _LOG.warning(
+                "Can't save the index of '%s' to '%s': %s",
+                root_dir,
+                file_index.cache_file,
+                e,
+            )
+            # Don't try again at each call.
+            file_index.cache_file = None
+    return file_index
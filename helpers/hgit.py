@@ -16,6 +16,7 @@ import string
 from typing import cast, List, Optional, Tuple, Union
 
 import helpers.hdbg as hdbg
+import helpers.hfile_index as hfilinde
 import helpers.hio as hio
 import helpers.hprint as hprint
 import helpers.hserver as hserver
@@ -1198,18 +1199,23 @@ def find_file_in_git_tree(
     We get the Git root and then search for the file from there.
     """
     root_dir = get_client_root(super_module=super_module)
-    cmd = rf"find {root_dir} -name '{file_name}' -not -path '*/.git/*'"
-    if remove_tmp_base:
-        cmd += r" -not -path '*/tmp\.base/*'"
-    _, file_name_out = hsystem.system_to_one_line(cmd)
-    _LOG.debug(hprint.to_str("file_name_out"))
+    file_index = hfilinde.get_file_index(root_dir)
+    file_names = file_index.find_by_basename(file_name)
+    # Remove the annoying spurious matches under `tmp.base`. This was done
+    # also by `hsystem.get_first_line()`, independently of `remove_tmp_base`.
+    file_names = [
+        file_name_ for file_name_ in file_names if "/tmp.base/" not in file_name_
+    ]
     hdbg.dassert_ne(
-        file_name_out,
-        "",
+        len(file_names),
+        0,
         "Can't find file '%s' in dir '%s'",
         file_name,
         root_dir,
     )
+    hdbg.dassert_eq(len(file_names), 1, "Found multiple files: %s", file_names)
+    file_name_out = file_names[0]
+    _LOG.debug(hprint.to_str("file_name_out"))
     file_name_out: str = os.path.abspath(file_name_out)
     hdbg.dassert_path_exists(file_name_out)
     return file_name_out
@@ -6,17 +6,18 @@ Import as:
 import helpers.hio as hio
 """
 
+import concurrent.futures
 import datetime
+import fnmatch
 import gzip
 import json
 import logging
 import os
 import re
-import shlex
 import shutil
 import time
 import uuid
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import helpers.hdbg as hdbg
 import helpers.hprint as hprint
@@ -51,6 +52,171 @@ def purify_file_name(file_name: str) -> str:
     return file_name_out
 
 
+# Names of the dirs that are typically not worth traversing when looking for
+# source files.
+DEFAULT_PRUNED_DIR_NAMES = (
+    ".git",
+    "node_modules",
+    "__pycache__",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ipynb_checkpoints",
+)
+
+
+def _matches_any(name: str, patterns: Optional[Iterable[str]]) -> bool:
+    """
+    Return whether `name` matches any of the glob `patterns`.
+    """
+    if not patterns:
+        return False
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def _scan_dir(
+    dir_name: str,
+    depth: int,
+    patterns: Optional[List[str]],
+    exclude_patterns: Optional[List[str]],
+    pruned_dir_names: Optional[List[str]],
+    only_files: bool,
+    maxdepth: Optional[int],
+) -> List[Tuple[str, bool, bool]]:
+    """
+    Scan the entries of a dir.
+
+    :param depth: depth of the entries of `dir_name` with respect to the root
+        of the traversal
+    :return: list of `(path, is_match, traverse)` in the order returned by
+        the OS, where `is_match` is True if the path should be reported and
+        `traverse` is True if the path is a dir to descend into
+    """
+    entries = []
+    try:
+        with os.scandir(dir_name) as it:
+            for entry in it:
+                if _matches_any(entry.name, exclude_patterns):
+                    continue
+                # Like `find`, don't follow symlinks.
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_match = patterns is None or _matches_any(
+                    entry.name, patterns
+                )
+                if only_files:
+                    is_match = is_match and entry.is_file(follow_symlinks=False)
+                traverse = (
+                    is_dir
+                    and (maxdepth is None or depth < maxdepth)
+                    and not _matches_any(entry.name, pruned_dir_names)
+                )
+                entries.append((entry.path, is_match, traverse))
+    except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+        # The dir can disappear or be unreadable while we are walking the tree.
+        _LOG.debug("Skipping dir '%s': %s", dir_name, e)
+    return entries
+
+
+def find_paths(
+    dir_name: str,
+    *,
+    patterns: Optional[List[str]] = None,
+    exclude_patterns: Optional[List[str]] = None,
+    pruned_dir_names: Optional[List[str]] = None,
+    only_files: bool = False,
+    maxdepth: Optional[int] = None,
+    num_threads: int = 1,
+) -> List[str]:
+    """
+    Find the files and dirs under `dir_name`, like `find`, without spawning a
+    subprocess.
+
+    The semantics follow `find {dir_name} -name {pattern}`:
+    - `dir_name` itself is reported, if it matches
+    - the returned paths start with `dir_name`
+    - symlinks are reported but not followed
+
+    E.g., `find_paths(".", patterns=["*.py"], pruned_dir_names=[".git"])` is
+    equivalent to `find . -name "*.py" -not -path "*/.git/*"`.
+
+    :param dir_name: dir to traverse
+    :param patterns: glob patterns to match against the basename of the paths
+        (e.g., `["*.py", "*.ipynb"]`)
+        - `None` to report all the paths
+    :param exclude_patterns: glob patterns of the basenames to skip; a matching
+        dir is neither reported nor traversed (e.g., `["tmp.*"]`)
+    :param pruned_dir_names: glob patterns of the basenames of the dirs that
+        are reported, if they match, but not traversed (e.g.,
+        `DEFAULT_PRUNED_DIR_NAMES`)
+    :param only_files: report only files instead of both files and dirs
+    :param maxdepth: limit the depth of the traversal, like `find -maxdepth`
+        (e.g., `1` to report only the entries of `dir_name`)
+    :param num_threads: number of threads to walk the tree with
+        - `1` to walk serially, returning the paths in the same order as
+          `find`
+        - `> 1` to scan dirs in parallel, which is faster on network
+          filesystems and large trees; in this case the order of the
+          returned paths is not deterministic
+    :return: list of paths found
+    """
+    hdbg.dassert_dir_exists(dir_name)
+    hdbg.dassert_lte(1, num_threads)
+    if maxdepth is not None:
+        hdbg.dassert_lte(0, maxdepth)
+    if patterns is not None:
+        hdbg.dassert_isinstance(patterns, list)
+    paths = []
+    # Check the root dir, which is never excluded nor pruned.
+    root_name = os.path.basename(os.path.normpath(dir_name))
+    is_match = patterns is None or _matches_any(root_name, patterns)
+    if is_match and not only_files:
+        paths.append(dir_name)
+    if maxdepth == 0:
+        return paths
+    scan_kwargs = {
+        "patterns": patterns,
+        "exclude_patterns": exclude_patterns,
+        "pruned_dir_names": pruned_dir_names,
+        "only_files": only_files,
+        "maxdepth": maxdepth,
+    }
+    if num_threads == 1:
+        # Walk the tree depth-first, visiting each dir right after reporting
+        # it, like `find` does.
+        def _walk(dir_name_: str, depth: int) -> None:
+            for path, is_match, traverse in _scan_dir(
+                dir_name_, depth, **scan_kwargs
+            ):
+                if is_match:
+                    paths.append(path)
+                if traverse:
+                    _walk(path, depth + 1)
+
+        _walk(dir_name, 1)
+    else:
+        # Scan each dir in a different task, as soon as it is found.
+        with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+            future_to_depth = {
+                executor.submit(_scan_dir, dir_name, 1, **scan_kwargs): 1
+            }
+            while future_to_depth:
+                done, _ = concurrent.futures.wait(
+                    future_to_depth,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    depth = future_to_depth.pop(future)
+                    for path, is_match, traverse in future.result():
+                        if is_match:
+                            paths.append(path)
+                        if traverse:
+                            subdir_future = executor.submit(
+                                _scan_dir, path, depth + 1, **scan_kwargs
+                            )
+                            future_to_depth[subdir_future] = depth + 1
+    _LOG.debug("Found %s paths in %s", len(paths), dir_name)
+    return paths
+
+
 def listdir(
     dir_name: str,
     pattern: str,
@@ -70,21 +236,14 @@ def listdir(
     :param exclude_git_dirs: skip `.git` dirs
     :param maxdepth: limit the depth of directory traversal
     """
-    hdbg.dassert_dir_exists(dir_name)
-    # Escape the directory path.
-    dir_name = shlex.quote(dir_name)
-    cmd = [f"find {dir_name}", f'-name "{pattern}"']
-    if maxdepth is not None:
-        cmd.append(f'-maxdepth "{maxdepth}"')
-    if only_files:
-        cmd.append("-type f")
-    if exclude_git_dirs:
-        cmd.append(r'-not -path "*/\.git/*"')
-    cmd = " ".join(cmd)
-    _, output = hsystem.system_to_string(cmd)
-    # TODO(gp): -> system_to_files
-    paths = [path for path in output.split("\n") if path != ""]
-    _LOG.debug("Found %s paths in %s", len(paths), dir_name)
+    pruned_dir_names = [".git"] if exclude_git_dirs else None
+    paths = find_paths(
+        dir_name,
+        patterns=[pattern],
+        pruned_dir_names=pruned_dir_names,
+        only_files=only_files,
+        maxdepth=maxdepth,
+    )
     _LOG.debug("\n".join(paths))
     if use_relative_paths:
         paths = [os.path.relpath(path, start=dir_name) for path in paths]
@@ -1030,16 +1189,24 @@ def find_file_with_dir(
     _LOG.trace(hprint.func_signature_to_str())
     # Find all the files in the dir with the same basename.
     if candidate_files is None:
+        # Import here to avoid a circular dependency, since `hfile_index`
+        # depends on this module.
+        import helpers.hfile_index as hfilinde
+
         base_name = os.path.basename(file_name)
-        cmd = rf"find . -name '{base_name}' -not -path '*/\.git/*'"
-        # > find . -name "utils.py"
+        # Look up the files in the index of `root_dir`, which is refreshed
+        # instead of being rebuilt at each call. This is equivalent to:
+        # > find . -name "utils.py" -not -path '*/.git/*'
         # ./amp/core/dataflow/utils.py
         # ./amp/core/dataflow_model/utils.py
         # ./amp/im/common/test/utils.py
-        mode_ = "return_all_results"
-        candidate_files = hsystem.system_to_files(
-            cmd, dir_name=root_dir, mode=mode_
-        )
+        file_index = hfilinde.get_file_index(root_dir)
+        candidate_files = [
+            os.path.normpath(os.path.join(root_dir, path))
+            for path in file_index.find_by_basename(
+                base_name, use_relative_paths=True
+            )
+        ]
     _LOG.trace("candidate files=\n%s", "\n".join(candidate_files))
     #
     if dir_depth == -1:
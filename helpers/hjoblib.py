@@ -5,26 +5,50 @@ import helpers.hjoblib as hjoblib
 """
 
 import argparse
+import atexit
+import collections
 import concurrent.futures
+import contextlib
+import dataclasses
+import fcntl
+import heapq
 import logging
 import math
+import multiprocessing
 import os
+import pickle
 import pprint
 import random
+import signal
 import sys
+import threading
+import time
 import traceback
 from functools import wraps
 from multiprocessing import Process, Queue
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 import joblib
+import pandas as pd
 from joblib._store_backends import StoreBackendBase, StoreBackendMixin
+from joblib.externals.loky import get_reusable_executor
 from tqdm.autonotebook import tqdm
 
 import helpers.hdatetime as hdateti
 import helpers.hdbg as hdbg
 import helpers.hio as hio
 import helpers.hprint as hprint
+import helpers.hretry as hretry
 import helpers.htimer as htimer
 import helpers.htqdm as htqdm
 
@@ -431,16 +455,30 @@ def _run_in_process(func: Callable, q: Queue, *args: Any, **kwargs: Any) -> None
 # Note that this is not going to work with joblib.parallel with
 # backend="multiprocessing" returning an error
 # AssertionError: daemonic processes are not allowed to have children
-def processify(func):
+def processify(func, *, worker_pool=None):
     """
     Decorator to run a function as a process.
 
     Be sure that every argument and the return value is *pickable*. The
     created process is joined, so the code does not run in parallel.
+
+    :param worker_pool: if not None, run the function in a warm worker of
+        this pool (see `get_worker_pool()`) instead of starting a new process
+        for each call
+        - In this case the function needs to be importable, e.g., it can't be
+          a lambda or a nested function
+        - If the pool breaks (e.g., a worker is killed), `BrokenProcessPool`
+          is raised and `get_worker_pool()` returns a new pool
     """
 
     @wraps(func)
     def wrapper(*args, **kwargs):
+        if worker_pool is not None:
+            try:
+                return worker_pool.submit(func, *args, **kwargs).result()
+            except concurrent.futures.process.BrokenProcessPool:
+                _discard_worker_pool(worker_pool)
+                raise
         q = Queue()
         p = Process(
             target=_run_in_process, args=[func] + [q] + list(args), kwargs=kwargs
@@ -457,105 +495,600 @@ def processify(func):
     return wrapper
 
 
-def _parallel_execute_decorator(
+# #############################################################################
+# Worker pool.
+# #############################################################################
+
+# A worker pool executes functions in warm worker processes, isolated from the
+# calling process.
+# - Compared to `processify()`, the cost of starting a process and importing
+#   the modules is paid once per worker and not once per call
+# - A worker is replaced with a new one after executing `max_tasks_per_worker`
+#   tasks, to release the memory accumulated by the tasks (see
+#   CmampTask5854: Resolve backtest memory leakage)
+# - The workers are started with `forkserver`, since `fork` can't be used when
+#   recycling the workers and `spawn` would import all the modules again for
+#   each new worker
+#   - Thus the functions need to be importable and the scripts need to use the
+#     `if __name__ == "__main__":` idiom (see `_can_run_in_worker_pool()`)
+# - The pools are kept alive across calls and are shut down when the process
+#   exits
+
+# Default number of tasks executed by a worker before it is replaced.
+_MAX_TASKS_PER_WORKER = 100
+
+# Modules imported once by the fork server, so that the new workers don't
+# import them again.
+_FORKSERVER_PRELOAD_MODULES = ["helpers.hjoblib"]
+
+# (num_workers, max_tasks_per_worker)
+_WorkerPoolKey = Tuple[int, Optional[int]]
+
+# Key -> pool.
+_WORKER_POOLS: Dict[_WorkerPoolKey, concurrent.futures.ProcessPoolExecutor] = {}
+_WORKER_POOLS_LOCK = threading.Lock()
+
+
+def get_worker_pool(
+    num_workers: int,
+    *,
+    max_tasks_per_worker: Optional[int] = _MAX_TASKS_PER_WORKER,
+) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Return a persistent pool of worker processes, creating it if needed.
+
+    A pool that broke (e.g., because a worker was killed) is replaced with a
+    new one, once `BrokenProcessPool` was raised by one of its tasks.
+
+    :param num_workers: number of worker processes
+    :param max_tasks_per_worker: number of tasks executed by a worker before
+        it is replaced with a new one
+        - `None` to never replace the workers
+    :return: the pool
+    """
+    hdbg.dassert_lte(1, num_workers)
+    if max_tasks_per_worker is not None:
+        hdbg.dassert_lte(1, max_tasks_per_worker)
+    key = (num_workers, max_tasks_per_worker)
+    with _WORKER_POOLS_LOCK:
+        pool = _WORKER_POOLS.get(key)
+        if pool is None:
+            _LOG.debug(
+                "Creating worker pool with num_workers=%s "
+                "max_tasks_per_worker=%s",
+                num_workers,
+                max_tasks_per_worker,
+            )
+            mp_context = multiprocessing.get_context("forkserver")
+            mp_context.set_forkserver_preload(_FORKSERVER_PRELOAD_MODULES)
+            pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=mp_context,
+                max_tasks_per_child=max_tasks_per_worker,
+            )
+            _WORKER_POOLS[key] = pool
+    return pool
+
+
+def _discard_worker_pool(
+    pool: concurrent.futures.ProcessPoolExecutor,
+) -> None:
+    """
+    Shut down a broken pool, so that `get_worker_pool()` creates a new one.
+
+    :param pool: pool that raised `BrokenProcessPool`
+    """
+    with _WORKER_POOLS_LOCK:
+        for key, pool_tmp in list(_WORKER_POOLS.items()):
+            if pool_tmp is pool:
+                _LOG.warning("Replacing broken worker pool %s", key)
+                del _WORKER_POOLS[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _can_run_in_worker_pool(func: Callable) -> bool:
+    """
+    Return whether a function can be executed by the workers of a pool.
+
+    The function is sent to the workers by reference, so it needs to be
+    picklable (e.g., not a lambda or a closure) and importable without
+    executing the main script again.
+
+    :param func: the function to execute
+    :return: whether the function can be executed by a worker pool
+    """
+    if getattr(func, "__module__", None) == "__main__":
+        return False
+    try:
+        pickle.dumps(func)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def shutdown_worker_pools() -> None:
+    """
+    Shut down all the worker pools, waiting for their tasks to complete.
+    """
+    with _WORKER_POOLS_LOCK:
+        pools = list(_WORKER_POOLS.values())
+        _WORKER_POOLS.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+atexit.register(shutdown_worker_pools)
+
+
+# #############################################################################
+# Checkpoint journal.
+# #############################################################################
+
+# A checkpoint journal records the results of the tasks completed successfully,
+# so that an aborted or crashed run can be resumed without executing them
+# again.
+# - The journal is a sequence of pickled `(task_key, result)` records
+# - Each task appends its record as soon as it completes, so that the journal
+#   is up to date even if the process running `parallel_execute()` crashes
+# - A task is identified by the content of its `args` and `kwargs`, which are
+#   hashed with `joblib.hash()` and thus need to be picklable
+#   - Their string representation can't be used, since it's truncated (e.g.,
+#     for large dataframes) and can vary across runs (e.g., memory addresses)
+
+
+def _get_task_key(task: Task) -> str:
+    """
+    Return the key identifying a task in a checkpoint journal.
+    """
+    args, kwargs = task
+    # Ignore the params added by `_execute_task_attempt()`.
+    kwargs = {
+        k: v
+        for k, v in kwargs.items()
+        if k not in ("incremental", "num_attempts")
+    }
+    try:
+        task_key = joblib.hash((args, kwargs), hash_name="md5")
+    except (pickle.PicklingError, TypeError) as e:
+        raise ValueError(
+            "The args and kwargs of a task need to be picklable to be "
+            f"checkpointed: {e}"
+        ) from e
+    return task_key
+
+
+def _append_to_checkpoint(checkpoint_file: str, task_key: str, res: Any) -> None:
+    """
+    Append the result of a completed task to a checkpoint journal.
+    """
+    data = pickle.dumps((task_key, res))
+    with open(checkpoint_file, "ab") as f:
+        # Serialize the appends of tasks running in different processes.
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_checkpoint(checkpoint_file: str) -> Dict[str, Any]:
+    """
+    Load the results of the completed tasks from a checkpoint journal.
+
+    A record truncated by a crash is removed from the journal, so that
+    new records can be appended.
+
+    :return: task key -> result
+    """
+    completed: Dict[str, Any] = {}
+    if not os.path.exists(checkpoint_file):
+        return completed
+    with open(checkpoint_file, "rb+") as f:
+        offset = 0
+        while True:
+            try:
+                task_key, res = pickle.load(f)
+            except EOFError:
+                break
+            except pickle.UnpicklingError:
+                break
+            completed[task_key] = res
+            offset = f.tell()
+        if offset < os.path.getsize(checkpoint_file):
+            _LOG.warning(
+                "Removing a truncated record at offset %s from '%s'",
+                offset,
+                checkpoint_file,
+            )
+            f.truncate(offset)
+    return completed
+
+
+# #############################################################################
+# Task retry policy.
+# #############################################################################
+
+# The retries of the tasks are scheduled by the process running
+# `parallel_execute()`, instead of inside the workers:
+# - each worker executes a single attempt of a task and returns its outcome
+# - a task that failed with a retriable exception is submitted again only after
+#   its backoff delay, so that in the meantime the workers keep executing the
+#   other tasks
+# - an attempt running longer than the timeout of the task fails with a
+#   `TimeoutError`
+# Note that `num_attempts` is different since it is passed through to the
+# workload function, which can implement its own retry logic.
+
+
+# #############################################################################
+# TaskRetryPolicy
+# #############################################################################
+
+
+@dataclasses.dataclass(frozen=True)
+class TaskRetryPolicy:
+    """
+    Control how a task of a workload is retried when it fails.
+
+    The backoff delays are computed with `hretry.get_backoff_delay_in_sec()`.
+    """
+
+    # Maximum number of times a task is executed before declaring an error.
+    num_attempts: int = 1
+    # Exceptions that trigger a retry. The other exceptions fail the task at
+    # the first attempt.
+    retry_exceptions: Tuple[Type[BaseException], ...] = (Exception,)
+    # Delay after the first failed attempt, which is multiplied by
+    # `backoff_factor` after each failed attempt.
+    retry_delay_in_sec: float = 1.0
+    backoff_factor: float = 2.0
+    max_retry_delay_in_sec: float = 60.0
+    # Fraction of the delay to randomize.
+    jitter: float = 0.1
+    # Maximum wall-clock time of an attempt, or None for no timeout.
+    # A task that times out is retried only if `TimeoutError` is in
+    # `retry_exceptions`.
+    task_timeout_in_sec: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        hdbg.dassert_lte(1, self.num_attempts)
+        hdbg.dassert_isinstance(self.retry_exceptions, tuple)
+        if self.task_timeout_in_sec is not None:
+            hdbg.dassert_lt(0, self.task_timeout_in_sec)
+
+    def is_default(self) -> bool:
+        """
+        Return whether the policy neither retries nor times out the tasks.
+        """
+        ret = self.num_attempts == 1 and self.task_timeout_in_sec is None
+        return ret
+
+    def should_retry(self, attempt: int, exception: BaseException) -> bool:
+        """
+        Return whether to retry a task after its `attempt` failed.
+        """
+        ret = attempt < self.num_attempts and isinstance(
+            exception, self.retry_exceptions
+        )
+        return ret
+
+    def get_retry_delay_in_sec(self, attempt: int) -> float:
+        """
+        Return the time to wait before retrying a task after its `attempt`
+        failed.
+        """
+        delay = hretry.get_backoff_delay_in_sec(
+            attempt,
+            retry_delay_in_sec=self.retry_delay_in_sec,
+            backoff_factor=self.backoff_factor,
+            max_retry_delay_in_sec=self.max_retry_delay_in_sec,
+            jitter=self.jitter,
+        )
+        return delay
+
+
+# Statistics about the execution of an attempt of a task, e.g.,
+# ```
+# {
+#     "worker_id": "1234/MainThread",
+#     "queue_wait_in_secs": 0.01,
+#     "elapsed_time_in_secs": 1.52,
+#     "run_time_in_secs": 1.5,
+#     "cpu_time_in_secs": 1.2,
+#     "peak_rss_in_GB": 0.35,
+# }
+# ```
+# where:
+# - `queue_wait_in_secs` is the time between submitting the attempt and the
+#   start of its execution by a worker
+# - `elapsed_time_in_secs` is the wall-clock time of the attempt, as observed
+#   by the process executing it, including any dispatch to a worker pool
+# - `run_time_in_secs` and `cpu_time_in_secs` are the wall-clock and CPU time
+#   of the workload function
+# - `peak_rss_in_GB` is the peak memory of the worker process while executing
+#   the workload function, only when profiling the tasks
+# Note that when the workers are threads of the same process (e.g., with the
+# `asyncio_threading` backend) the CPU time is the one of the thread and the
+# memory is the one of the process, which is shared with the other tasks.
+_AttemptStats = Dict[str, Any]
+
+# Outcome of the execution of a task, i.e.,
+# `(task_idx, res, exception, start_ts, attempt_stats)` where:
+# - `res` is the return value of the workload function and `exception` the
+#   exception of the last attempt, if any
+# - `start_ts` is the timestamp of the first attempt
+# - `attempt_stats` contains the statistics of each attempt
+_TaskOutcome = Tuple[
+    int, Any, Optional[BaseException], str, List[_AttemptStats]
+]
+
+
+@contextlib.contextmanager
+def _task_timeout(
+    task_idx: int, timeout_in_sec: Optional[float]
+) -> Iterator[None]:
+    """
+    Raise `TimeoutError` if the code in the scope runs longer than the timeout.
+
+    The timeout is implemented with `SIGALRM`, so it can be enforced only in
+    the main thread of a process, e.g., in serial mode or in the workers of a
+    process pool. In any other thread the timeout is skipped with a warning.
+
+    :param timeout_in_sec: timeout, or None to disable it
+    """
+    if timeout_in_sec is None:
+        yield
+        return
+    if threading.current_thread() is not threading.main_thread():
+        _LOG.warning(
+            "Can't enforce the timeout of task %s outside the main thread",
+            task_idx + 1,
+        )
+        yield
+        return
+
+    def _handler(signum: int, frame: Any) -> None:
+        _ = signum, frame
+        raise TimeoutError(
+            f"Task {task_idx + 1} timed out after {timeout_in_sec} secs"
+        )
+
+    old_handler = signal.signal(signal.SIGALRM, _handler)
+    signal.setitimer(signal.ITIMER_REAL, timeout_in_sec)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+class _PeakRssSampler:
+    """
+    Sample the memory of the current process in a background thread to track
+    its peak.
+    """
+
+    def __init__(self, interval_in_secs: float = 0.05) -> None:
+        import psutil
+
+        self._process = psutil.Process()
+        self._interval_in_secs = interval_in_secs
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self.peak_rss = self._process.memory_info().rss
+
+    def __enter__(self) -> "_PeakRssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._update()
+
+    def _update(self) -> None:
+        self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self._interval_in_secs):
+            self._update()
+
+
+def _run_workload_func(
+    task_idx: int,
+    timeout_in_sec: Optional[float],
+    profile_tasks: bool,
+    submit_time: Optional[float],
+    func: Callable,
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+) -> Tuple[Any, Optional[BaseException], _AttemptStats]:
+    """
+    Run the workload function measuring its execution.
+
+    :param timeout_in_sec: see `_task_timeout()`
+    :param profile_tasks: if True, measure also the peak memory
+    :param submit_time: time when the attempt was submitted, if known
+    :return: the return value of the function, its exception, if any, and
+        the statistics of the execution
+    """
+    start_time = time.time()
+    stats: _AttemptStats = {
+        "worker_id": f"{os.getpid()}/{threading.current_thread().name}",
+        "queue_wait_in_secs": (
+            None if submit_time is None else max(start_time - submit_time, 0.0)
+        ),
+    }
+    # A worker process executes one task at the time in its main thread, so
+    # it can use the CPU time of the entire process, including the threads
+    # started by the task.
+    if threading.current_thread() is threading.main_thread():
+        get_cpu_time = time.process_time
+    else:
+        get_cpu_time = time.thread_time
+    start_cpu_time = get_cpu_time()
+    rss_sampler = _PeakRssSampler() if profile_tasks else None
+    exception: Optional[BaseException] = None
+    res = None
+    try:
+        with contextlib.ExitStack() as stack:
+            if rss_sampler is not None:
+                stack.enter_context(rss_sampler)
+            with _task_timeout(task_idx, timeout_in_sec):
+                res = func(*args, **kwargs)
+    except Exception as e:  # pylint: disable=broad-except
+        exception = e
+    stats["run_time_in_secs"] = time.time() - start_time
+    stats["cpu_time_in_secs"] = get_cpu_time() - start_cpu_time
+    if rss_sampler is not None:
+        stats["peak_rss_in_GB"] = rss_sampler.peak_rss / (1024**3)
+    return res, exception, stats
+
+
+def _execute_task_attempt(
     task_idx: int,
     task_len: int,
     incremental: bool,
-    abort_on_error: bool,
     num_attempts: int,
-    log_file: str,
     # TODO(gp): Pass these parameters first.
     workload_func: Callable,
     func_name: str,
     processify_func: bool,
+    worker_pool_key: Optional[_WorkerPoolKey],
+    profile_tasks: bool,
     task: Task,
-    enable_file_logging: bool,
-    verbose_log: bool,
-) -> Any:
+    timeout_in_sec: Optional[float] = None,
+    submit_time: Optional[float] = None,
+) -> _TaskOutcome:
     """
+    Execute a single attempt of a task.
+
+    This function is executed by the workers, so that the exception of a
+    failing task is returned instead of being raised.
+
     Parameters have the same meaning as in `parallel_execute()`.
 
-    :param abort_on_error: control whether to abort on `workload_func` function
-        that is failing and asserting
-        - If `workload_func` fails:
-            - if `abort_on_error=True` the exception from `workload_func` is
-              propagated and the return value is `None`
-            - if `abort_on_error=False` the exception is not propagated, but the
-              return value is the string representation of the exception
-    :param processify_func: switch to enable wrapping a function into a process
-    :param enable_file_logging: see same parameter in `parallel_execute()`
-    :param verbose_log: see same parameter in `parallel_execute()`
-    :return: the return value of the workload function or the exception string
+    :param processify_func: if True, execute the workload function in a new
+        process, instead of the current process
+    :param worker_pool_key: if not None, execute the workload function in a
+        worker of the pool with these params (see `get_worker_pool()`),
+        instead of starting a new process
+    :param timeout_in_sec: if not None, fail the attempt with `TimeoutError`
+        after this time (see `_task_timeout()`)
+    :param submit_time: time when the attempt was submitted, used to compute
+        the time it waited in the queue of the executor
+    :return: the outcome of the attempt
     """
     # Validate very carefully all the parameters.
     hdbg.dassert_lte(0, task_idx)
     hdbg.dassert_lt(task_idx, task_len)
     hdbg.dassert_isinstance(incremental, bool)
-    hdbg.dassert_isinstance(abort_on_error, bool)
     hdbg.dassert_lte(1, num_attempts)
-    hdbg.dassert_isinstance(log_file, str)
     hdbg.dassert_callable(workload_func)
     hdbg.dassert_isinstance(func_name, str)
     hdbg.dassert(validate_task(task))
-    # Redirect the logging output of each task to a different file.
-    # TODO(gp): This file should go in the `task_dst_dir`.
-    # log_to_file = True
-    log_to_file = False
-    if log_to_file:
-        dst_dir = os.path.dirname(os.path.abspath(log_file))
-        print(dst_dir)
-        hio.create_dir(dst_dir, incremental=True)
-        file_name = os.path.join(
-            dst_dir, f"{func_name}.{task_idx + 1}_{task_len}.log"
-        )
-        _LOG.warning("Logging to %s", file_name)
-        file_handler = logging.FileHandler(file_name)
-        root_logger = logging.getLogger()
-        root_logger.addHandler(file_handler)
-    # Save information about the function to be executed.
-    txt = []
     # `start_ts` needs to be before running the function.
     start_ts = hdateti.get_current_timestamp_as_string("naive_ET")
-    tag = f"{task_idx + 1}/{task_len} ({start_ts})"
-    txt.append("\n" + hprint.frame(tag) + "\n")
-    txt.append(f"tag={tag}")
-    workload_func_str = getattr(workload_func, "__name__", "unknown_function")
-    txt.append(f"workload_func={workload_func_str}")
-    txt.append(f"func_name={func_name}")
-    txt.append(task_to_string(task))
-    # Run the workload.
+    # Run the workload on a copy of the task, since the task can be executed
+    # multiple times.
     args, kwargs = task
-    kwargs.update({"incremental": incremental, "num_attempts": num_attempts})
+    kwargs = {**kwargs, "incremental": incremental, "num_attempts": num_attempts}
+    workload_func_str = getattr(workload_func, "__name__", "unknown_function")
     with htimer.TimedScope(
         logging.DEBUG, f"Execute '{workload_func_str}'"
     ) as ts:
-        # Initialize `exception` before the try block to satisfy the type checker.
-        exception: Optional[BaseException] = None
+        call_args = (
+            task_idx,
+            timeout_in_sec,
+            profile_tasks,
+            submit_time,
+            workload_func,
+            args,
+            kwargs,
+        )
         try:
-            if processify_func:
+            # Run the function in a separate process to enforce de-allocating
+            # memory (see CmampTask5854: Resolve backtest memory leakage). The
+            # timeout is enforced by the process running the function.
+            if worker_pool_key is not None:
+                _LOG.debug("Using worker pool")
+                num_workers, max_tasks_per_worker = worker_pool_key
+                worker_pool = get_worker_pool(
+                    num_workers, max_tasks_per_worker=max_tasks_per_worker
+                )
+                func = processify(_run_workload_func, worker_pool=worker_pool)
+                res, exception, stats = func(*call_args)
+            elif processify_func:
                 _LOG.debug("Using processify")
-                # Wrap the function into a process to enforce de-allocating
-                # memory at the end of the execution (see
-                # CmampTask5854: Resolve backtest memory leakage).
-                _LOG.debug("pid before processify=%s", os.getpid())
-                workload_func = processify(workload_func)
-            res = workload_func(*args, **kwargs)
-            error = False
+                func = processify(_run_workload_func)
+                res, exception, stats = func(*call_args)
+            else:
+                res, exception, stats = _run_workload_func(*call_args)
         except Exception as e:  # pylint: disable=broad-except
-            exception = e
-            txt.append(f"exception='{str(e)}'")
-            res = None
-            error = True
-            _LOG.error("Execution failed")
+            # E.g., a worker of the pool died.
+            res, exception, stats = None, e, {}
+    if exception is not None:
+        _LOG.error("Execution failed")
+    stats["elapsed_time_in_secs"] = ts.elapsed_time
+    return task_idx, res, exception, start_ts, [stats]
+
+
+def _finalize_task(
+    outcome: _TaskOutcome,
+    task_len: int,
+    abort_on_error: bool,
+    log_file: str,
+    workload_func: Callable,
+    func_name: str,
+    task: Task,
+    enable_file_logging: bool,
+    verbose_log: bool,
+    checkpoint_file: str,
+) -> Tuple[int, Any]:
+    """
+    Log the outcome of a task and compute its result.
+
+    Parameters have the same meaning as in `parallel_execute()`.
+
+    :param outcome: the outcome of the last attempt of the task, including
+        the statistics of all its attempts
+    :param abort_on_error: control whether to abort on `workload_func` function
+        that is failing and asserting
+        - If `workload_func` fails:
+            - if `abort_on_error=True` the exception from `workload_func` is
+              propagated and the return value is `None`
+            - if `abort_on_error=False` the exception is not propagated, but the
+              return value is the string representation of the exception
+    :return: the index of the task and the return value of the workload
+        function or the exception string
+    """
+    task_idx, res, exception, start_ts, attempt_stats = outcome
+    elapsed_times = [stats["elapsed_time_in_secs"] for stats in attempt_stats]
+    error = exception is not None
+    # Save information about the function executed.
+    txt = []
+    tag = f"{task_idx + 1}/{task_len} ({start_ts})"
+    txt.append("\n" + hprint.frame(tag) + "\n")
+    txt.append(f"tag={tag}")
+    workload_func_str = getattr(workload_func, "__name__", "unknown_function")
+    txt.append(f"workload_func={workload_func_str}")
+    txt.append(f"func_name={func_name}")
+    txt.append(task_to_string(task))
+    if error:
+        txt.append(f"exception='{str(exception)}'")
     # Save information about the execution of the function.
-    elapsed_time = ts.elapsed_time
     end_ts = hdateti.get_current_timestamp_as_string("naive_ET")
     # TODO(gp): -> func_result
     if verbose_log:
         txt.append(f"func_res=\n{hprint.indent(str(res))}")
     else:
         txt.append("func_res=<omitted>")
-    txt.append(f"elapsed_time_in_secs={elapsed_time}")
+    txt.append(f"elapsed_time_in_secs={sum(elapsed_times)}")
+    txt.append(f"num_task_attempts={len(elapsed_times)}")
+    txt.append(f"attempt_elapsed_times_in_secs={elapsed_times}")
+    txt.append(f"worker_id={attempt_stats[-1].get('worker_id')}")
     txt.append(f"start_ts={start_ts}")
     txt.append(f"end_ts={end_ts}")
     txt.append(f"error={error}")
@@ -564,6 +1097,15 @@ def _parallel_execute_decorator(
     _LOG.debug("txt=\n%s", hprint.indent(txt))
     if enable_file_logging:
         hio.to_file(log_file, txt, mode="a")
+    if len(elapsed_times) > 1:
+        _LOG.info(
+            "Task %s / %s executed %s times in %.2f secs: error=%s",
+            task_idx + 1,
+            task_len,
+            len(elapsed_times),
+            sum(elapsed_times),
+            error,
+        )
     if error:
         # The execution wasn't successful.
         _LOG.error(txt)
@@ -576,8 +1118,595 @@ def _parallel_execute_decorator(
         res = str(exception)
     else:
         # The execution was successful.
-        pass
-    return res
+        if checkpoint_file:
+            _append_to_checkpoint(checkpoint_file, _get_task_key(task), res)
+    return task_idx, res
+
+
+def _get_executor(
+    backend: str, num_threads: int
+) -> concurrent.futures.Executor:
+    """
+    Return the executor running the tasks for a backend.
+    """
+    if backend in ("threading", "asyncio_threading"):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_threads)
+    elif backend in ("multiprocessing", "asyncio_multiprocessing"):
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=num_threads
+        )
+    elif backend == "loky":
+        # Use the same pool of workers as `joblib.Parallel`.
+        executor = get_reusable_executor(max_workers=num_threads)
+    else:
+        raise ValueError(f"Invalid backend='{backend}'")
+    return executor
+
+
+def _schedule_tasks(
+    task_idxs: List[int],
+    num_threads: int,
+    backend: str,
+    retry_policy: TaskRetryPolicy,
+    get_attempt_args: Callable[[int], Tuple[Any, ...]],
+) -> Iterator[_TaskOutcome]:
+    """
+    Execute tasks on an executor, retrying the failed ones.
+
+    At most `num_threads` attempts are executed at the same time. The
+    attempts of the tasks that failed are scheduled after their backoff
+    delay, without blocking the execution of the other tasks.
+
+    The timeout of the tasks is enforced:
+    - by the workers of a process pool, including the worker pool of the
+      threading backend, which are then free to execute other tasks
+    - by this function for a thread pool, since a thread can't be
+      interrupted: the attempt is declared failed without waiting for it, but
+      its thread keeps running until the attempt completes
+
+    :param get_attempt_args: return the params of `_execute_task_attempt()`
+        for a task index
+    :return: iterator over the outcome of the last attempt of each task, in
+        order of completion
+    """
+    # Tasks ready to be executed.
+    ready = collections.deque(task_idxs)
+    # Heap of the tasks waiting for their backoff delay, as
+    # `(retry_time, task_idx)`.
+    delayed: List[Tuple[float, int]] = []
+    # Attempts being executed: future -> task_idx.
+    running: Dict[concurrent.futures.Future, int] = {}
+    # Time when the running attempts of a thread pool were observed starting:
+    # future -> (monotonic time, timestamp).
+    start_times: Dict[concurrent.futures.Future, Tuple[float, str]] = {}
+    # Outcome of the attempts of each task: task_idx -> (attempt, start_ts,
+    # statistics of the previous attempts).
+    attempts: Dict[int, Tuple[int, str, List[_AttemptStats]]] = {}
+    executor = _get_executor(backend, num_threads)
+    # The threading backend executes the tasks in a worker pool, which
+    # enforces the timeout.
+    if backend != "threading" and isinstance(
+        executor, concurrent.futures.ThreadPoolExecutor
+    ):
+        timeout = retry_policy.task_timeout_in_sec
+        worker_timeout = None
+    else:
+        timeout = None
+        worker_timeout = retry_policy.task_timeout_in_sec
+    # How often to check if the attempts started, to enforce the timeout.
+    poll_interval_in_secs = 0.1
+    has_timed_out = False
+    try:
+        while ready or delayed or running:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                _, task_idx = heapq.heappop(delayed)
+                ready.append(task_idx)
+            # Keep the workers busy.
+            while ready and len(running) < num_threads:
+                task_idx = ready.popleft()
+                future = executor.submit(
+                    _execute_task_attempt,
+                    *get_attempt_args(task_idx),
+                    worker_timeout,
+                    time.time(),
+                )
+                running[future] = task_idx
+            # Wait until an attempt completes, a delayed task is ready or an
+            # attempt times out.
+            wait_times = []
+            if delayed:
+                wait_times.append(delayed[0][0] - now)
+            if timeout is not None:
+                for future in running:
+                    if future in start_times:
+                        wait_times.append(start_times[future][0] + timeout - now)
+                    else:
+                        wait_times.append(poll_interval_in_secs)
+            wait_time = max(min(wait_times), 0.0) if wait_times else None
+            done, _ = concurrent.futures.wait(
+                running,
+                timeout=wait_time,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            outcomes = []
+            for future in done:
+                task_idx = running.pop(future)
+                start_times.pop(future, None)
+                outcomes.append(future.result())
+            if timeout is not None:
+                now = time.monotonic()
+                for future in list(running):
+                    if future not in start_times:
+                        if future.running():
+                            start_ts = hdateti.get_current_timestamp_as_string(
+                                "naive_ET"
+                            )
+                            start_times[future] = (now, start_ts)
+                        continue
+                    elapsed_time = now - start_times[future][0]
+                    if elapsed_time < timeout:
+                        continue
+                    # Stop waiting for the attempt.
+                    task_idx = running.pop(future)
+                    _, start_ts = start_times.pop(future)
+                    has_timed_out = True
+                    exception = TimeoutError(
+                        f"Task {task_idx + 1} timed out after {timeout} secs"
+                    )
+                    _LOG.error("%s", exception)
+                    stats = {"elapsed_time_in_secs": elapsed_time}
+                    outcomes.append(
+                        (task_idx, None, exception, start_ts, [stats])
+                    )
+            for task_idx, res, exception, start_ts, attempt_stats in outcomes:
+                attempt, first_start_ts, prev_attempt_stats = attempts.get(
+                    task_idx, (0, start_ts, [])
+                )
+                attempt += 1
+                attempt_stats = prev_attempt_stats + attempt_stats
+                if exception is not None and retry_policy.should_retry(
+                    attempt, exception
+                ):
+                    delay = retry_policy.get_retry_delay_in_sec(attempt)
+                    _LOG.warning(
+                        "Retrying task %s in %.2f secs after attempt %s / %s "
+                        "failed with '%s'",
+                        task_idx + 1,
+                        delay,
+                        attempt,
+                        retry_policy.num_attempts,
+                        exception,
+                    )
+                    attempts[task_idx] = (attempt, first_start_ts, attempt_stats)
+                    heapq.heappush(delayed, (time.monotonic() + delay, task_idx))
+                    continue
+                attempts.pop(task_idx, None)
+                yield task_idx, res, exception, first_start_ts, attempt_stats
+    finally:
+        # Don't wait for the threads running the attempts that timed out.
+        wait = not has_timed_out
+        if backend == "loky":
+            # The loky executor doesn't support `cancel_futures`.
+            executor.shutdown(wait=wait)
+        else:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# #############################################################################
+# Run report.
+# #############################################################################
+
+# A run report collects the statistics of each task of a run (see
+# `_AttemptStats`), to understand why a run was slow, e.g., because of tasks
+# of different size, memory pressure or overhead of the backend.
+
+# A task is a straggler if its run time is larger than this multiple of the
+# median run time of the tasks.
+_STRAGGLER_FACTOR = 2.0
+
+# Percentiles of the statistics of the tasks reported in the summary.
+_REPORT_PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def get_run_report_file_name(log_file: str) -> str:
+    """
+    Return the name of the run report saved next to the log file.
+    """
+    file_name = os.path.splitext(log_file)[0] + ".run_report.json"
+    return file_name
+
+
+# #############################################################################
+# _RunReport
+# #############################################################################
+
+
+class _RunReport:
+    """
+    Collect the statistics of the tasks of a run and save them as JSON.
+    """
+
+    def __init__(self, num_threads: Union[str, int], backend: str) -> None:
+        self._num_threads = get_num_executing_threads(num_threads)
+        self._backend = backend
+        self._start_time = time.time()
+        self._tasks: List[Dict[str, Any]] = []
+
+    def add_task(self, outcome: _TaskOutcome) -> None:
+        """
+        Add the statistics of a completed task, aggregating its attempts.
+        """
+        task_idx, _, exception, start_ts, attempt_stats = outcome
+
+        def _get_values(key: str) -> List[float]:
+            values = [stats.get(key) for stats in attempt_stats]
+            values = [value for value in values if value is not None]
+            return values
+
+        peak_rss = _get_values("peak_rss_in_GB")
+        task = {
+            "task_idx": task_idx,
+            "start_ts": start_ts,
+            "worker_id": attempt_stats[-1].get("worker_id"),
+            "num_task_attempts": len(attempt_stats),
+            "error": exception is not None,
+            "queue_wait_in_secs": sum(_get_values("queue_wait_in_secs")),
+            "elapsed_time_in_secs": sum(_get_values("elapsed_time_in_secs")),
+            "run_time_in_secs": sum(_get_values("run_time_in_secs")),
+            "cpu_time_in_secs": sum(_get_values("cpu_time_in_secs")),
+            "peak_rss_in_GB": max(peak_rss) if peak_rss else None,
+            "attempts": attempt_stats,
+        }
+        self._tasks.append(task)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return the report with the statistics of the tasks, their summary and
+        the stragglers.
+        """
+        wall_time = time.time() - self._start_time
+        report: Dict[str, Any] = {
+            "backend": self._backend,
+            "num_threads": self._num_threads,
+            "num_tasks": len(self._tasks),
+            "wall_time_in_secs": wall_time,
+        }
+        if self._tasks:
+            df = pd.DataFrame(self._tasks).set_index("task_idx").sort_index()
+            cols = [
+                "queue_wait_in_secs",
+                "elapsed_time_in_secs",
+                "run_time_in_secs",
+                "cpu_time_in_secs",
+                "peak_rss_in_GB",
+                "num_task_attempts",
+            ]
+            summary = (
+                df[cols].astype(float).describe(percentiles=_REPORT_PERCENTILES)
+            )
+            # Fraction of the time the workers were executing tasks.
+            report["utilization"] = df["run_time_in_secs"].sum() / (
+                wall_time * self._num_threads
+            )
+            report["summary"] = _nan_to_none(summary.to_dict())
+            median = df["run_time_in_secs"].median()
+            stragglers = df[df["run_time_in_secs"] > _STRAGGLER_FACTOR * median]
+            stragglers = stragglers.sort_values(
+                "run_time_in_secs", ascending=False
+            )
+            report["stragglers"] = [
+                {
+                    "task_idx": task_idx,
+                    "worker_id": row["worker_id"],
+                    "run_time_in_secs": row["run_time_in_secs"],
+                    "ratio_to_median": (
+                        row["run_time_in_secs"] / median if median > 0 else None
+                    ),
+                }
+                for task_idx, row in stragglers.iterrows()
+            ]
+        report["tasks"] = self._tasks
+        return report
+
+    def save(self, file_name: str) -> None:
+        """
+        Save the report to a JSON file.
+        """
+        hio.to_json(file_name, self.to_dict())
+        _LOG.info("Saved run report in '%s'", file_name)
+
+
+def _nan_to_none(obj: Any) -> Any:
+    """
+    Replace the NaNs in a nested dict with None, to save it as valid JSON.
+    """
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, float) and math.isnan(obj):
+        return None
+    return obj
+
+
+def _execute_tasks(
+    task_idxs: List[int],
+    workload: Workload,
+    num_threads: Union[str, int],
+    incremental: bool,
+    abort_on_error: bool,
+    num_attempts: int,
+    log_file: str,
+    backend: str,
+    enable_file_logging: bool,
+    verbose_log: bool,
+    keep_order: bool,
+    checkpoint_file: str,
+    retry_policy: TaskRetryPolicy,
+    use_worker_pool: bool,
+    max_tasks_per_worker: Optional[int],
+    run_report: Optional[_RunReport],
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Execute a subset of the tasks of a workload with the requested backend.
+
+    The params are the same as `parallel_execute_iter()`.
+
+    :param task_idxs: indices of the tasks to execute
+    :param run_report: if not None, collect the statistics of the tasks and
+        measure their peak memory
+    :return: iterator over the index and the result of each task
+    """
+    workload_func, func_name, tasks = workload
+    task_len = len(tasks)
+    if backend == "threading":
+        # Execute the function in a separate process for threading backend
+        # to force memory de-allocation.
+        # TODO(Grisha): unclear if there are cases when we want to use
+        #  `False` with `threading` backends, consider exposing to the
+        #  interface.
+        # TODO(Grisha): should we enable the switch for `num_threads="serial"`? will it work?
+        processify_func = True
+        if use_worker_pool and not _can_run_in_worker_pool(workload_func):
+            _LOG.warning(
+                "Can't execute '%s' in a worker pool: starting a new process "
+                "for each task",
+                func_name,
+            )
+            use_worker_pool = False
+    else:
+        processify_func = False
+        use_worker_pool = False
+    worker_pool_key: Optional[_WorkerPoolKey] = None
+    if use_worker_pool:
+        worker_pool_key = (
+            get_num_executing_threads(num_threads),
+            max_tasks_per_worker,
+        )
+
+    def _get_attempt_args(task_idx: int) -> Tuple[Any, ...]:
+        """
+        Return the params of `_execute_task_attempt()` for a task.
+        """
+        return (
+            task_idx,
+            task_len,
+            incremental,
+            num_attempts,
+            workload_func,
+            func_name,
+            processify_func,
+            worker_pool_key,
+            run_report is not None,
+            tasks[task_idx],
+        )
+
+    def _finalize(outcome: _TaskOutcome) -> Tuple[int, Any]:
+        task_idx = outcome[0]
+        if run_report is not None:
+            run_report.add_task(outcome)
+        return _finalize_task(
+            outcome,
+            task_len,
+            abort_on_error,
+            log_file,
+            workload_func,
+            func_name,
+            tasks[task_idx],
+            enable_file_logging,
+            verbose_log,
+            checkpoint_file,
+        )
+
+    if num_threads == "serial":
+        # Execute the tasks serially.
+        for task_idx in task_idxs:
+            _LOG.debug("\n%s", hprint.frame(f"Task {task_idx + 1} / {task_len}"))
+            # Execute.
+            first_start_ts = ""
+            attempt_stats: List[_AttemptStats] = []
+            for attempt in range(1, retry_policy.num_attempts + 1):
+                outcome = _execute_task_attempt(
+                    *_get_attempt_args(task_idx),
+                    retry_policy.task_timeout_in_sec,
+                    time.time(),
+                )
+                _, res, exception, start_ts, stats = outcome
+                first_start_ts = first_start_ts or start_ts
+                attempt_stats.extend(stats)
+                if exception is None or not retry_policy.should_retry(
+                    attempt, exception
+                ):
+                    break
+                delay = retry_policy.get_retry_delay_in_sec(attempt)
+                _LOG.warning(
+                    "Retrying task %s in %.2f secs after attempt %s / %s "
+                    "failed with '%s'",
+                    task_idx + 1,
+                    delay,
+                    attempt,
+                    retry_policy.num_attempts,
+                    exception,
+                )
+                time.sleep(delay)
+            yield _finalize(
+                (task_idx, res, exception, first_start_ts, attempt_stats)
+            )
+        return
+    # Execute the tasks in parallel.
+    num_threads = int(num_threads)
+    # -1 is interpreted by joblib like for all cores.
+    _LOG.info("Using %d threads, backend='%s'", num_threads, backend)
+    if backend in ("loky", "threading", "multiprocessing") and (
+        retry_policy.is_default()
+    ):
+        # from joblib.externals.loky import set_loky_pickler
+        # set_loky_pickler('cloudpickle')
+        # Removed `verbose` param which causes issues in HelpersTask715.
+        return_as = "generator" if keep_order else "generator_unordered"
+        outcomes_iter = joblib.Parallel(
+            n_jobs=num_threads, backend=backend, return_as=return_as
+        )(
+            joblib.delayed(_execute_task_attempt)(
+                *_get_attempt_args(task_idx), None, time.time()
+            )
+            for task_idx in task_idxs
+        )
+        for outcome in outcomes_iter:
+            yield _finalize(outcome)
+    elif backend in (
+        "loky",
+        "threading",
+        "multiprocessing",
+        "asyncio_threading",
+        "asyncio_multiprocessing",
+    ):
+        if num_threads == -1:
+            num_threads = joblib.cpu_count()
+        outcomes_iter = _schedule_tasks(
+            task_idxs, num_threads, backend, retry_policy, _get_attempt_args
+        )
+        if not keep_order:
+            for outcome in outcomes_iter:
+                yield _finalize(outcome)
+            return
+        # Buffer the outcomes completed out of order.
+        outcomes: Dict[int, _TaskOutcome] = {}
+        next_idx = 0
+        for outcome in outcomes_iter:
+            outcomes[outcome[0]] = outcome
+            while next_idx < len(task_idxs) and task_idxs[next_idx] in outcomes:
+                yield _finalize(outcomes.pop(task_idxs[next_idx]))
+                next_idx += 1
+    else:
+        raise ValueError(f"Invalid backend='{backend}'")
+
+
+def parallel_execute_iter(
+    workload: Workload,
+    num_threads: Union[str, int],
+    incremental: bool,
+    abort_on_error: bool,
+    num_attempts: int,
+    log_file: str,
+    *,
+    backend: str = "loky",
+    enable_file_logging: bool = True,
+    verbose_log: bool = False,
+    keep_order: bool = True,
+    checkpoint_file: str = "",
+    retry_policy: Optional[TaskRetryPolicy] = None,
+    use_worker_pool: bool = False,
+    max_tasks_per_worker: Optional[int] = _MAX_TASKS_PER_WORKER,
+    profile_tasks: bool = False,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Run a workload in parallel yielding the results as the tasks complete.
+
+    Unlike `parallel_execute()`, the results are not accumulated, so the
+    memory doesn't grow with the number of tasks.
+
+    The params are the same as `parallel_execute()`.
+
+    :param keep_order: if True, yield the results in the order of the tasks
+        in the workload, otherwise in order of completion
+    :return: iterator over the index of each task in the workload and its
+        result
+    """
+    validate_workload(workload)
+    _, _, tasks = workload
+    task_len = len(tasks)
+    if retry_policy is None:
+        retry_policy = TaskRetryPolicy()
+    # Load the tasks completed by a previous run.
+    task_keys: List[str] = []
+    completed: Dict[str, Any] = {}
+    if checkpoint_file:
+        hio.create_enclosing_dir(checkpoint_file, incremental=True)
+        task_keys = [_get_task_key(task) for task in tasks]
+        completed = _load_checkpoint(checkpoint_file)
+    is_completed = [
+        bool(task_keys) and task_keys[task_idx] in completed
+        for task_idx in range(task_len)
+    ]
+    task_idxs = [i for i in range(task_len) if not is_completed[i]]
+    if checkpoint_file:
+        _LOG.info(
+            "Resuming from '%s': %s / %s tasks already completed",
+            checkpoint_file,
+            task_len - len(task_idxs),
+            task_len,
+        )
+    run_report = _RunReport(num_threads, backend) if profile_tasks else None
+    results_iter = _execute_tasks(
+        task_idxs,
+        workload,
+        num_threads,
+        incremental,
+        abort_on_error,
+        num_attempts,
+        log_file,
+        backend,
+        enable_file_logging,
+        verbose_log,
+        keep_order,
+        checkpoint_file,
+        retry_policy,
+        use_worker_pool,
+        max_tasks_per_worker,
+        run_report,
+    )
+
+    def _merge_results() -> Iterator[Tuple[int, Any]]:
+        """
+        Merge the results of the completed tasks with the executed ones.
+        """
+        if keep_order:
+            for task_idx in range(task_len):
+                if is_completed[task_idx]:
+                    yield task_idx, completed[task_keys[task_idx]]
+                else:
+                    res_idx, res = next(results_iter)
+                    hdbg.dassert_eq(res_idx, task_idx)
+                    yield res_idx, res
+        else:
+            for task_idx in range(task_len):
+                if is_completed[task_idx]:
+                    yield task_idx, completed[task_keys[task_idx]]
+            yield from results_iter
+
+    # Report the progress as the tasks complete.
+    tqdm_out = htqdm.TqdmToLogger(_LOG, level=logging.INFO)
+    try:
+        yield from tqdm(
+            _merge_results(),
+            total=task_len,
+            file=tqdm_out,
+            desc=f"num_threads={num_threads} backend={backend}",
+        )
+    finally:
+        # Save the report also when the run is aborted.
+        if run_report is not None:
+            run_report.save(get_run_report_file_name(log_file))
 
 
 # TODO(gp): Pass a `task_dst_dir` to each task so it can write there.
@@ -596,6 +1725,11 @@ def parallel_execute(
     backend: str = "loky",
     enable_file_logging: bool = True,
     verbose_log: bool = False,
+    checkpoint_file: str = "",
+    retry_policy: Optional[TaskRetryPolicy] = None,
+    use_worker_pool: bool = False,
+    max_tasks_per_worker: Optional[int] = _MAX_TASKS_PER_WORKER,
+    profile_tasks: bool = False,
 ) -> Optional[List[Any]]:
     """
     Run a workload in parallel using joblib or asyncio.
@@ -604,6 +1738,8 @@ def parallel_execute(
         - if `abort_on_error=True` and a task fails early, `joblib` does not return partial results
         - use `enable_logging=False` to disable logging entirely (useful for large results)
         - use `verbose_log=False` to keep logging enabled but skip verbose output per task
+        - use `parallel_execute_iter()` to process the results as the tasks
+          complete
 
     :param workload: the workload to execute
     :param dry_run: if True, print the workload and exit without executing it
@@ -615,12 +1751,36 @@ def parallel_execute(
         - If False, the execution continues
     :param num_attempts: number of times to attempt running a function before
         declaring an error
+        - This param is passed to the workload function, which is responsible
+          for the retries
     :param log_file: file used to log information about the execution
     :param backend: specify the backend type (e.g., joblib `loky` or `asyncio_process_executor`)
     :param enable_file_logging: if False, skip writing any log file
     :param verbose_log: if True, write detailed task results to the log file
         - If False, large outputs will be omitted from the log to reduce file size
-    :return: results from executing `func` or the exception of the failing function
+    :param checkpoint_file: if not empty, journal where the result of each task
+        completed successfully is saved, so that running the same workload
+        again (e.g., after an abort or a crash) executes only the tasks not
+        completed yet
+    :param retry_policy: how to retry and time out the tasks, which are
+        retried by the scheduler without blocking the other tasks
+        - `None` executes each task once without a timeout
+    :param use_worker_pool: if True, the threading backend executes the
+        tasks in a pool of warm worker processes (see `get_worker_pool()`),
+        instead of starting a new process for each task
+        - The workers are started with `forkserver`, so `workload_func` needs
+          to be importable and the script needs to use the
+          `if __name__ == "__main__":` idiom
+        - A new process for each task is used if `workload_func` can't be
+          executed by the workers (e.g., a lambda or a closure)
+    :param max_tasks_per_worker: number of tasks executed by a worker process
+        of the pool before it is replaced with a new one
+    :param profile_tasks: if True, measure the peak memory of each task and
+        save a report with the statistics of the tasks (e.g., queue wait, run
+        and CPU time, worker, number of attempts), their percentiles and the
+        stragglers in `get_run_report_file_name(log_file)`
+    :return: results from executing `func` (in the order of the tasks) or the
+        exception of the failing function
     """
     # Print the parameters.
     _LOG.info(hprint.frame("Workload"))
@@ -633,7 +1793,7 @@ def parallel_execute(
     )
     # Parse the workload.
     validate_workload(workload)
-    workload_func, func_name, tasks = workload
+    _, _, tasks = workload
     _LOG.info("Saving log info in '%s'", log_file)
     _LOG.info(
         "Number of executing threads=%s (%s)",
@@ -650,118 +1810,26 @@ def parallel_execute(
         _LOG.warning("Exiting without executing workload, as per user request")
         return None
     # Run.
-    task_len = len(tasks)
-    tqdm_out = htqdm.TqdmToLogger(_LOG, level=logging.INFO)
-    tqdm_iter = tqdm(
-        enumerate(tasks),
-        total=task_len,
-        file=tqdm_out,
-        desc=f"num_threads={num_threads} backend={backend}",
-    )
-    if backend == "threading":
-        # Enable wrapping a function into a process for threading backend
-        # to force memory de-allocation.
-        # TODO(Grisha): unclear if there are cases when we want to use
-        #  `False` with `threading` backends, consider exposing to the
-        #  interface.
-        # TODO(Grisha): should we enable the switch for `num_threads="serial"`? will it work?
-        processify_func = True
-    else:
-        processify_func = False
-    if num_threads == "serial":
-        # Execute the tasks serially.
-        res = []
-        for task_idx, task in tqdm_iter:
-            _LOG.debug("\n%s", hprint.frame(f"Task {task_idx + 1} / {task_len}"))
-            # Execute.
-            res_tmp = _parallel_execute_decorator(
-                task_idx,
-                task_len,
-                incremental,
-                abort_on_error,
-                num_attempts,
-                log_file,
-                #
-                workload_func,
-                func_name,
-                processify_func,
-                task,
-                enable_file_logging,
-                verbose_log,
-            )
-            res.append(res_tmp)
-    else:
-        # Execute the tasks in parallel.
-        num_threads = int(num_threads)
-        # -1 is interpreted by joblib like for all cores.
-        _LOG.info("Using %d threads, backend='%s'", num_threads, backend)
-        if backend in ("loky", "threading", "multiprocessing"):
-            # from joblib.externals.loky import set_loky_pickler
-            # set_loky_pickler('cloudpickle')
-            # Removed `verbose` param which causes issues in HelpersTask715.
-            res = joblib.Parallel(n_jobs=num_threads, backend=backend)(
-                joblib.delayed(_parallel_execute_decorator)(
-                    task_idx,
-                    task_len,
-                    incremental,
-                    abort_on_error,
-                    num_attempts,
-                    log_file,
-                    #
-                    workload_func,
-                    func_name,
-                    processify_func,
-                    task,
-                    enable_file_logging,
-                    verbose_log,
-                )
-                # We can't use `tqdm_iter` since this only shows the submission of
-                # the jobs but not their completion.
-                for task_idx, task in enumerate(tasks)
-            )
-        elif backend in ("asyncio_threading", "asyncio_multiprocessing"):
-            if backend == "asyncio_threading":
-                executor = concurrent.futures.ThreadPoolExecutor
-            elif backend == "asyncio_multiprocessing":
-                executor = concurrent.futures.ProcessPoolExecutor
-            else:
-                raise ValueError(f"Invalid backend='{backend}'")
-            func = lambda args_: _parallel_execute_decorator(
-                args_[0],
-                task_len,
-                incremental,
-                abort_on_error,
-                num_attempts,
-                log_file,
-                #
-                workload_func,
-                func_name,
-                processify_func,
-                args_[1],
-                enable_file_logging,
-                verbose_log,
-            )
-            args = list(enumerate(tasks))
-            use_progress_bar = True
-            if not use_progress_bar:
-                # Implementation without progress bar.
-                with executor(max_workers=num_threads) as executor_:
-                    res = list(executor_.map(func, args))
-            else:
-                # Implementation with progress bar.
-                res = []
-                with tqdm_iter as pbar:
-                    with executor(max_workers=num_threads) as executor_:
-                        futures = {
-                            executor_.submit(func, arg): arg for arg in args
-                        }
-                        _LOG.debug("done submitting")
-                        for future in concurrent.futures.as_completed(futures):
-                            res_tmp = future.result()
-                            res.append(res_tmp)
-                            pbar.update(1)
-        else:
-            raise ValueError(f"Invalid backend='{backend}'")
+    res = [
+        res_tmp
+        for _, res_tmp in parallel_execute_iter(
+            workload,
+            num_threads,
+            incremental,
+            abort_on_error,
+            num_attempts,
+            log_file,
+            backend=backend,
+            enable_file_logging=enable_file_logging,
+            verbose_log=verbose_log,
+            keep_order=True,
+            checkpoint_file=checkpoint_file,
+            retry_policy=retry_policy,
+            use_worker_pool=use_worker_pool,
+            max_tasks_per_worker=max_tasks_per_worker,
+            profile_tasks=profile_tasks,
+        )
+    ]
     _LOG.info("Saved log info in '%s'", log_file)
     return res
 
@@ -5,7 +5,7 @@ import helpers.hmoto as hmoto
 """
 
 import unittest.mock as umock
-from typing import Generator, Union
+from typing import Any, Generator, Union
 
 import pytest  # isort:skip # noqa: E402 # pylint: disable=wrong-import-position
 
@@ -70,6 +70,14 @@ class S3Mock_TestCase(hunitest.TestCase):
         aws_profile = S3FileSystem(anon=False)
         return aws_profile
 
+    def _mock_get_s3_client(self, aws_profile: str) -> Any:
+        """
+        Mock implementation of `get_s3_client` to use the mocked environment
+        variables from `moto`.
+        """
+        hdbg.dassert_isinstance(aws_profile, str)
+        return boto3.client("s3")
+
     def set_up_test(self) -> None:
         # Getting necessary secret before boto3 is mocked.
         if self.binance_secret is None:
@@ -99,6 +107,11 @@ class S3Mock_TestCase(hunitest.TestCase):
             hs3, "get_s3fs", side_effect=self._mock_get_s3fs
         )
         self.mock_get_s3fs.start()
+        # Patch `get_s3_client` that uses the mocked environment variables.
+        self.mock_get_s3_client = umock.patch.object(
+            hs3, "get_s3_client", side_effect=self._mock_get_s3_client
+        )
+        self.mock_get_s3_client.start()
 
     def tear_down_test(self) -> None:
         # Empty the bucket otherwise deletion will fail.
@@ -111,6 +124,8 @@ class S3Mock_TestCase(hunitest.TestCase):
         # Stop mocked `get_s3fs`.
         if hasattr(self, "mock_get_s3fs"):
             self.mock_get_s3fs.stop()
+        if hasattr(self, "mock_get_s3_client"):
+            self.mock_get_s3_client.stop()
         # Stop moto.
         self.mock_aws_credentials_patch.stop()
         self.mock_s3.stop()
@@ -5,15 +5,33 @@ import helpers.hparquet as hparque
 """
 
 import collections
+import concurrent.futures
+import contextlib
+import dataclasses
 import datetime
 import glob
+import json
 import logging
 import os
-from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+import queue
+import threading
+import urllib.parse
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.dataset as ds
 import pyarrow.fs as pafs
 import pyarrow.parquet as pq
@@ -35,7 +53,6 @@ else:
 
 from tqdm.autonotebook import tqdm
 
-import helpers.hdataframe as hdatafr
 import helpers.hdatetime as hdateti
 import helpers.hdbg as hdbg
 import helpers.hintrospection as hintros
@@ -301,15 +318,26 @@ def to_partitioned_parquet(
     *,
     aws_profile: hs3.AwsProfile = None,
     basename_template: str = None,
+    create_index: bool = False,
 ) -> None:
     """
     Save the given dataframe as Parquet file partitioned along the given
     columns.
 
+    If the dataset has an index (see `build_parquet_dataset_index()`), the
+    entries of the written files are refreshed using the footers returned by
+    the writer, without reading the files back. Concurrent writers to the same
+    dataset can lose index updates, in which case the readers using the index
+    don't see the files of the lost updates until the index is rebuilt with
+    `build_parquet_dataset_index()`.
+
     :param df: dataframe
     :param partition_columns: partitioning columns
     :param dst_dir: location of partitioned dataset
     :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :param basename_template: template for the names of the written files
+    :param create_index: whether to create the index of the dataset if it
+        doesn't exist, indexing also the files already in the dataset
 
     E.g., in case of partition using `date`, the file layout looks like:
     ```
@@ -361,13 +389,269 @@ def to_partitioned_parquet(
         #  how to do it. Either setting permissions to read-only before writing.
         #  Or having a list of files that will be written and ensure that none of
         #  those files already existing.
+        file_metadatas = {}
+
+        def _collect_file_metadata(written_file: Any) -> None:
+            file_metadatas[written_file.path] = (
+                written_file.metadata,
+                written_file.size,
+            )
+
         pq.write_to_dataset(
             table,
             dst_dir,
             partition_cols=partition_columns,
             filesystem=filesystem,
             basename_template=basename_template,
+            file_visitor=_collect_file_metadata,
+        )
+    with htimer.TimedScope(logging.DEBUG, "# update_dataset_index"):
+        _update_parquet_dataset_index(
+            dst_dir,
+            file_metadatas,
+            [],
+            _get_pyarrow_filesystem(filesystem),
+            create_index=create_index,
+        )
+
+
+# #############################################################################
+# ParquetDatasetWriter
+# #############################################################################
+
+
+class ParquetDatasetWriter:
+    """
+    Append dataframes to a Parquet dataset partitioned by date.
+
+    Rows are buffered per partition and written in files of about
+    `target_rows_per_file` rows, instead of one file per partition for each
+    call to `to_partitioned_parquet()`.
+
+    Each flush is committed by saving the index of the dataset (see
+    `build_parquet_dataset_index()`), which is the manifest read by
+    `from_parquet()`:
+    - the files are written with hidden temporary names and renamed only
+      when complete, so readers listing the dataset never see partial files
+    - the index is saved atomically only after all the files of a flush are
+      in place, so readers using the index see either all or none of them,
+      while readers listing the dataset (e.g., with `use_index=False`) can
+      see part of a flush being committed
+    - if the dataset has no index, the first flush creates it indexing also
+      the files already in the dataset
+    - if a flush fails, its files are removed
+
+    Exiting the context because of an exception discards the rows that are
+    still buffered, so that the dataset contains only the data committed
+    before the error.
+
+    Only one writer per dataset is supported.
+
+    E.g.,
+    ```
+    with hparque.ParquetDatasetWriter(dst_dir, "by_year_month") as writer:
+        for df in dfs:
+            writer.append(df)
+    ```
+    """
+
+    def __init__(
+        self,
+        dst_dir: str,
+        partition_mode: str,
+        *,
+        additional_partition_columns: Optional[List[str]] = None,
+        target_rows_per_file: int = 1_000_000,
+        max_buffered_rows: int = 10_000_000,
+        row_group_size: Optional[int] = None,
+        aws_profile: hs3.AwsProfile = None,
+    ) -> None:
+        """
+        Constructor.
+
+        :param dst_dir: location of partitioned dataset
+        :param partition_mode: how to partition the data by date, see
+            `add_date_partition_columns()`
+        :param additional_partition_columns: columns to partition by before
+            the date columns, e.g., `["asset"]`
+        :param target_rows_per_file: number of rows of the written files. A
+            partition is flushed as soon as it buffers this many rows
+        :param max_buffered_rows: maximum number of rows buffered across all
+            the partitions before flushing all of them
+        :param row_group_size: maximum number of rows in each row group,
+            `None` to use the `pyarrow` default
+        :param aws_profile: the name of an AWS profile or a s3fs filesystem
+        """
+        hdbg.dassert_lte(1, target_rows_per_file)
+        hdbg.dassert_lte(target_rows_per_file, max_buffered_rows)
+        self._dst_dir = _strip_s3_prefix(dst_dir).rstrip("/")
+        self._partition_mode = partition_mode
+        self._additional_partition_columns = additional_partition_columns or []
+        self._target_rows_per_file = target_rows_per_file
+        self._max_buffered_rows = max_buffered_rows
+        self._row_group_size = row_group_size
+        filesystem = None
+        if aws_profile is not None:
+            filesystem = hs3.get_s3fs(aws_profile)
+        self._filesystem = _get_pyarrow_filesystem(filesystem)
+        # Map from partition path (e.g., `asset=A/year=2022/month=1`) to the
+        # buffered tables.
+        self._buffers: Dict[str, List[pa.Table]] = collections.defaultdict(
+            list
         )
+        self._num_buffered_rows: Dict[str, int] = collections.defaultdict(int)
+
+    def __enter__(self) -> "ParquetDatasetWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        # Commit the buffered data only if no error happened.
+        if exc_type is None:
+            self.close()
+            return
+        num_rows = sum(self._num_buffered_rows.values())
+        if num_rows > 0:
+            _LOG.warning(
+                "Discarding %s buffered rows of '%s' because of an error",
+                num_rows,
+                self._dst_dir,
+            )
+        self._buffers.clear()
+        self._num_buffered_rows.clear()
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Buffer the rows of a dataframe with a `DatetimeIndex`.
+
+        The partitions that reach `target_rows_per_file` rows are flushed.
+        """
+        hdbg.dassert_isinstance(df, pd.DataFrame)
+        hdbg.dassert_isinstance(df.index, pd.DatetimeIndex)
+        if df.empty:
+            return
+        df, partition_columns = add_date_partition_columns(
+            df.copy(), self._partition_mode
+        )
+        partition_columns = (
+            self._additional_partition_columns + partition_columns
+        )
+        hdbg.dassert_is_subset(partition_columns, df.columns)
+        for key, partition_df in df.groupby(partition_columns, sort=False):
+            partition_path = "/".join(
+                f"{col}={urllib.parse.quote(str(val), safe='')}"
+                for col, val in zip(partition_columns, key)
+            )
+            table = pa.Table.from_pandas(
+                partition_df.drop(columns=partition_columns)
+            )
+            self._buffers[partition_path].append(table)
+            self._num_buffered_rows[partition_path] += table.num_rows
+        # Flush the partitions that are large enough.
+        partition_paths = [
+            partition_path
+            for partition_path, num_rows in self._num_buffered_rows.items()
+            if num_rows >= self._target_rows_per_file
+        ]
+        if sum(self._num_buffered_rows.values()) >= self._max_buffered_rows:
+            partition_paths = list(self._num_buffered_rows)
+        if partition_paths:
+            self._flush(partition_paths)
+
+    def flush(self) -> None:
+        """
+        Write and commit all the buffered rows.
+        """
+        self._flush(list(self._buffers))
+
+    def close(self) -> None:
+        self.flush()
+
+    def _flush(self, partition_paths: List[str]) -> None:
+        """
+        Write the buffered rows of the given partitions and commit them.
+        """
+        if not partition_paths:
+            return
+        with htimer.TimedScope(logging.DEBUG, "# flush_partitions"):
+            # Files of the flush to remove if it fails.
+            written_file_paths: List[str] = []
+            try:
+                file_metadatas = self._write_files(
+                    partition_paths, written_file_paths
+                )
+                # Make the files visible.
+                for file_path in file_metadatas:
+                    tmp_file_path = self._get_tmp_file_path(file_path)
+                    self._filesystem.move(tmp_file_path, file_path)
+                    written_file_paths.remove(tmp_file_path)
+                    written_file_paths.append(file_path)
+                # Commit the flush in the index.
+                file_metadatas = {
+                    file_path: (
+                        file_metadata,
+                        self._filesystem.get_file_info(file_path).size,
+                    )
+                    for file_path, file_metadata in file_metadatas.items()
+                }
+                _update_parquet_dataset_index(
+                    self._dst_dir,
+                    file_metadatas,
+                    [],
+                    self._filesystem,
+                    create_index=True,
+                )
+            except BaseException:
+                for file_path in written_file_paths:
+                    with contextlib.suppress(OSError):
+                        self._filesystem.delete_file(file_path)
+                raise
+        _LOG.debug(
+            "Flushed %s partitions into %s files",
+            len(partition_paths),
+            len(file_metadatas),
+        )
+
+    @staticmethod
+    def _get_tmp_file_path(file_path: str) -> str:
+        """
+        Return the temporary name of a file while it's written.
+        """
+        dir_path, basename = file_path.rsplit("/", 1)
+        # The leading `.` hides the file from `pyarrow` until it is complete.
+        return f"{dir_path}/.tmp.{basename}"
+
+    def _write_files(
+        self, partition_paths: List[str], written_file_paths: List[str]
+    ) -> Dict[str, pq.FileMetaData]:
+        """
+        Write the buffered rows of the given partitions in temporary files.
+
+        :param written_file_paths: list to which the paths of the temporary
+            files are appended as soon as they are created
+        :return: map from the final path of each file to its footer
+        """
+        file_metadatas = {}
+        for partition_path in partition_paths:
+            table = pa.concat_tables(self._buffers.pop(partition_path))
+            del self._num_buffered_rows[partition_path]
+            # Split the partition into files of the target size.
+            for offset in range(0, table.num_rows, self._target_rows_per_file):
+                file_table = table.slice(offset, self._target_rows_per_file)
+                dir_path = f"{self._dst_dir}/{partition_path}"
+                self._filesystem.create_dir(dir_path)
+                file_path = f"{dir_path}/{uuid.uuid4().hex}.parquet"
+                tmp_file_path = self._get_tmp_file_path(file_path)
+                written_file_paths.append(tmp_file_path)
+                metadata_collector: List[pq.FileMetaData] = []
+                pq.write_table(
+                    file_table,
+                    tmp_file_path,
+                    filesystem=self._filesystem,
+                    row_group_size=self._row_group_size,
+                    metadata_collector=metadata_collector,
+                )
+                file_metadatas[file_path] = metadata_collector[0]
+        return file_metadatas
 
 
 def generate_parquet_files(
@@ -428,35 +712,66 @@ def generate_parquet_files(
     to_partitioned_parquet(df, partition_cols, dst_dir)
 
 
-def get_pyarrow_s3fs(*args: Any, **kwargs: Any) -> PyArrowS3FileSystem:
-    """
-    Return an Pyarrow S3Fs object from a given AWS profile.
+# Age after which a pooled Pyarrow S3 filesystem is created again, since it
+# stores the credentials read at creation, which can be temporary.
+_PYARROW_S3FS_MAX_AGE_IN_SECS = 15 * 60
 
-    Same as `hs3.get_s3fs`, used specifically for accessing Parquet
-    datasets.
+
+def _create_pyarrow_s3fs(
+    aws_profile: str, endpoint_url: Optional[str]
+) -> PyArrowS3FileSystem:
     """
-    # Check if S3FileSystem is available
-    hdbg.dassert(
-        S3FileSystemAvailable,
-        "S3FileSystem is not available in this version of pyarrow.fs",
-    )
+    Create a Pyarrow S3Fs object from a given AWS profile.
+    """
+    kwargs: Dict[str, Any] = {}
+    if endpoint_url is not None:
+        kwargs["endpoint_override"] = endpoint_url
     # When deploying jobs via ECS the container obtains credentials based on passed
     #  task role specified in the ECS task-definition, refer to:
     #  https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-iam-roles.html
     if hserver.is_inside_ecs_container():
         _LOG.info("Fetching credentials from task IAM role")
-        s3fs_ = PyArrowS3FileSystem()
+        s3fs_ = PyArrowS3FileSystem(**kwargs)
     else:
-        aws_credentials = hs3.get_aws_credentials(*args, **kwargs)
+        aws_credentials = hs3.get_aws_credentials(aws_profile)
         s3fs_ = PyArrowS3FileSystem(
             access_key=aws_credentials["aws_access_key_id"],
             secret_key=aws_credentials["aws_secret_access_key"],
             session_token=aws_credentials["aws_session_token"],
             region=aws_credentials["aws_region"],
+            **kwargs,
         )
     return s3fs_
 
 
+def get_pyarrow_s3fs(
+    aws_profile: str, *, endpoint_url: Optional[str] = None
+) -> PyArrowS3FileSystem:
+    """
+    Return an Pyarrow S3Fs object from a given AWS profile.
+
+    Same as `hs3.get_s3fs`, used specifically for accessing Parquet
+    datasets. The object is shared by the callers in the process (see
+    `hs3.get_filesystem_from_pool()`).
+
+    :param aws_profile: the name of an AWS profile
+    :param endpoint_url: S3 endpoint to use, if not the default one
+    """
+    # Check if S3FileSystem is available
+    hdbg.dassert(
+        S3FileSystemAvailable,
+        "S3FileSystem is not available in this version of pyarrow.fs",
+    )
+    s3fs_ = hs3.get_filesystem_from_pool(
+        "pyarrow",
+        aws_profile,
+        lambda: _create_pyarrow_s3fs(aws_profile, endpoint_url),
+        endpoint_url=endpoint_url,
+        max_age_in_secs=_PYARROW_S3FS_MAX_AGE_IN_SECS,
+    )
+    return s3fs_
+
+
 def _get_parquet_tiles_from_file_path(file_path: str) -> List[Tuple[str, Any]]:
     """
     Hacky function to help get tile values from parquet file path.
@@ -478,6 +793,89 @@ def _get_parquet_tiles_from_file_path(file_path: str) -> List[Tuple[str, Any]]:
     return tiles
 
 
+def _get_parquet_path_and_filesystem(
+    file_name: str, aws_profile: hs3.AwsProfile
+) -> Tuple[str, Any]:
+    """
+    Check that a Parquet path exists and return the filesystem to read it.
+
+    :return: path without the `s3://` prefix and filesystem to pass to
+        `pyarrow` (`None` for the local filesystem)
+    """
+    hdbg.dassert_isinstance(file_name, str)
+    hs3.dassert_is_valid_aws_profile(file_name, aws_profile)
+    if hs3.is_s3_path(file_name):
+        if isinstance(aws_profile, str):
+            filesystem = get_pyarrow_s3fs(aws_profile)
+        else:
+            # Note: `s3fs` filesystem is only to be used on exact file path
+            # as `pq.ParquetDataset` is not properly handling directory path.
+            filesystem = aws_profile
+        # Pyarrow S3FileSystem does not have `exists` method.
+        s3_filesystem = hs3.get_s3fs(aws_profile)
+        hs3.dassert_path_exists(file_name, s3_filesystem)
+        file_name = _strip_s3_prefix(file_name)
+    else:
+        filesystem = None
+        hdbg.dassert_path_exists(file_name)
+    return file_name, filesystem
+
+
+def _table_to_df(table: Union[pa.Table, pa.RecordBatch]) -> pd.DataFrame:
+    """
+    Convert data read from Parquet into a dataframe.
+    """
+    # Convert the Pandas Dataframe timestamp columns and index to `ns`
+    # resolution. The general approach is to preserve the time unit
+    # information after reading data back from Parquet files.
+    # Currently, it's challenging to resolve this issue since Parquet
+    # data is mixed with data from CSV files, which convert the time
+    # unit to `ns` by default. Refer to CmampTask7331 for details.
+    # https://github.com/cryptokaizen/cmamp/issues/7331
+    df = table.to_pandas(coerce_temporal_nanoseconds=True)
+    if isinstance(df.index, pd.DatetimeIndex):
+        df.index = df.index.as_unit("ns")
+    return df
+
+
+def _get_filter_expression(
+    filters: Optional[List[Any]],
+) -> Optional[ds.Expression]:
+    return pq.filters_to_expression(filters) if filters else None
+
+
+def _get_pandas_index_columns(schema: pa.Schema) -> List[str]:
+    """
+    Return the columns storing the pandas index of the data.
+
+    A `RangeIndex` is not stored as a column, so it is not returned.
+    """
+    pandas_metadata = schema.pandas_metadata or {}
+    index_columns = [
+        col
+        for col in pandas_metadata.get("index_columns", [])
+        if isinstance(col, str)
+    ]
+    return index_columns
+
+
+def _get_columns_with_pandas_index(
+    schema: pa.Schema, columns: Optional[List[str]]
+) -> Optional[List[str]]:
+    """
+    Add the columns storing the pandas index to the columns to read, like
+    `ParquetDataset.read_pandas()` does.
+    """
+    if not columns:
+        return columns
+    # Note: `schema.names` also includes and index.
+    hdbg.dassert_is_subset(columns, schema.names)
+    index_columns = [
+        col for col in _get_pandas_index_columns(schema) if col not in columns
+    ]
+    return columns + index_columns
+
+
 # TODO(Dan): Add mode to allow querying even when some non-existing columns are passed.
 def from_parquet(
     file_name: str,
@@ -489,6 +887,7 @@ def from_parquet(
     log_level: int = logging.DEBUG,
     report_stats: bool = False,
     aws_profile: hs3.AwsProfile = None,
+    use_index: bool = True,
 ) -> pd.DataFrame:
     """
     Load a dataframe from a Parquet file.
@@ -496,6 +895,11 @@ def from_parquet(
     The difference with `pd.read_pq` is that here we use Parquet
     Dataset.
 
+    If the dataset has an index (see `build_parquet_dataset_index()`), the
+    files and the row groups that can't match `filters` are pruned using the
+    index, without listing the dataset and reading their footers. The index is
+    the manifest of the dataset, so the files not in the index are ignored.
+
     :param file_name: path to a Parquet dataset
     :param columns: columns to return, skipping reading columns that are not requested
        - `None` means return all available columns
@@ -507,25 +911,14 @@ def from_parquet(
     :param report_stats: whether to report Parquet file size or not
     :param aws_profile: AWS profile to use if and only if using an S3 path,
         otherwise `None` for local path
+    :param use_index: whether to use the index of the dataset, if present,
+        instead of listing the dataset
     :return: data from Parquet dataset
     """
     _LOG.debug(hprint.to_str("file_name columns filters schema"))
-    hdbg.dassert_isinstance(file_name, str)
-    hs3.dassert_is_valid_aws_profile(file_name, aws_profile)
-    if hs3.is_s3_path(file_name):
-        if isinstance(aws_profile, str):
-            filesystem = get_pyarrow_s3fs(aws_profile)
-        else:
-            # Note: `s3fs` filesystem is only to be used on exact file path
-            # as `pq.ParquetDataset` is not properly handling directory path.
-            filesystem = aws_profile
-        # Pyarrow S3FileSystem does not have `exists` method.
-        s3_filesystem = hs3.get_s3fs(aws_profile)
-        hs3.dassert_path_exists(file_name, s3_filesystem)
-        file_name = file_name.lstrip("s3://")
-    else:
-        filesystem = None
-        hdbg.dassert_path_exists(file_name)
+    file_name, filesystem = _get_parquet_path_and_filesystem(
+        file_name, aws_profile
+    )
     # Load data.
     with htimer.TimedScope(
         logging.DEBUG, f"# Reading Parquet file '{file_name}'"
@@ -538,7 +931,8 @@ def from_parquet(
                 "aws_profile must be a string for S3 operations",
             )
             last_pq_file = hs3.get_latest_pq_in_s3_dir(file_name, aws_profile)
-            file = s3_filesystem.open(last_pq_file, "rb")  # type: ignore[possibly-unbound]
+            s3_filesystem = hs3.get_s3fs(aws_profile)
+            file = s3_filesystem.open(last_pq_file, "rb")
             # Load the data.
             parquet_file = pq.ParquetFile(file)
             # Get the head of the data.
@@ -560,30 +954,37 @@ def from_parquet(
                 # Pass partition columns types explicitly.
                 schema = pa.schema(schema)
             partitioning = ds.partitioning(schema, flavor="hive")
-            dataset = pq.ParquetDataset(
-                # Replace URI with path.
-                file_name,
-                filesystem=filesystem,
-                filters=filters,
-                partitioning=partitioning,
-            )
-            if columns:
-                # Note: `schema.names` also includes and index.
-                hdbg.dassert_is_subset(columns, dataset.schema.names)
-            # To read also the index we need to use `read_pandas()`, instead of
-            # `read_table()`.
-            # See https://arrow.apache.org/docs/python/parquet.html#reading-and-writing-single-files.
-            table = dataset.read_pandas(columns=columns)
-            # Convert the Pandas Dataframe timestamp columns and index to `ns`
-            # resolution. The general approach is to preserve the time unit
-            # information after reading data back from Parquet files.
-            # Currently, it's challenging to resolve this issue since Parquet
-            # data is mixed with data from CSV files, which convert the time
-            # unit to `ns` by default. Refer to CmampTask7331 for details.
-            # https://github.com/cryptokaizen/cmamp/issues/7331
-            df = table.to_pandas(coerce_temporal_nanoseconds=True)
-            if isinstance(df.index, pd.DatetimeIndex):
-                df.index = df.index.as_unit("ns")
+            index = None
+            if use_index:
+                index = _load_parquet_dataset_index(
+                    file_name, _get_pyarrow_filesystem(filesystem)
+                )
+            if index is not None and index["files"]:
+                dataset = _get_parquet_dataset_with_index(
+                    file_name, index, filters, partitioning, filesystem
+                )
+                table = dataset.to_table(
+                    columns=_get_columns_with_pandas_index(
+                        dataset.schema, columns
+                    ),
+                    filter=_get_filter_expression(filters),
+                )
+            else:
+                dataset = pq.ParquetDataset(
+                    # Replace URI with path.
+                    file_name,
+                    filesystem=filesystem,
+                    filters=filters,
+                    partitioning=partitioning,
+                )
+                if columns:
+                    # Note: `schema.names` also includes and index.
+                    hdbg.dassert_is_subset(columns, dataset.schema.names)
+                # To read also the index we need to use `read_pandas()`,
+                # instead of `read_table()`.
+                # See https://arrow.apache.org/docs/python/parquet.html#reading-and-writing-single-files.
+                table = dataset.read_pandas(columns=columns)
+            df = _table_to_df(table)
     # Report stats about the df.
     _LOG.debug("df.shape=%s", str(df.shape))
     mem = df.memory_usage().sum()
@@ -601,6 +1002,144 @@ def from_parquet(
     return df
 
 
+# Default maximum number of rows of the batches yielded by
+# `yield_parquet_batches()`.
+_BATCH_SIZE = 1_000_000
+
+
+def _prefetch(iterator: Iterator[Any], num_prefetched: int) -> Iterator[Any]:
+    """
+    Consume an iterator on a background thread, keeping items ready.
+
+    At most `num_prefetched` items are queued, plus the one being produced,
+    so that memory stays bounded. Exceptions raised by `iterator` are
+    re-raised in the consumer thread.
+
+    :param iterator: iterator to consume
+    :param num_prefetched: number of items to prefetch
+      - `0` means no prefetching, i.e., consuming `iterator` in the caller
+        thread
+    """
+    hdbg.dassert_lte(0, num_prefetched)
+    if num_prefetched == 0:
+        yield from iterator
+        return
+    queue_: queue.Queue = queue.Queue(maxsize=num_prefetched)
+    is_stopped = threading.Event()
+    end_marker = object()
+
+    def _put(item: Any, exception: Optional[BaseException]) -> None:
+        # Wait for space in the queue, unless the consumer went away.
+        while not is_stopped.is_set():
+            try:
+                queue_.put((item, exception), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _produce() -> None:
+        try:
+            for item in iterator:
+                if is_stopped.is_set():
+                    return
+                _put(item, None)
+        except BaseException as e:  # pylint: disable=broad-except
+            _put(end_marker, e)
+            return
+        _put(end_marker, None)
+
+    thread = threading.Thread(target=_produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exception = queue_.get()
+            if item is end_marker:
+                if exception is not None:
+                    raise exception
+                return
+            yield item
+    finally:
+        # Stop the producer also when the consumer stops early.
+        is_stopped.set()
+        thread.join()
+
+
+def yield_parquet_batches(
+    file_name: str,
+    *,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[Any]] = None,
+    schema: Optional[List[Tuple[str, pa.DataType]]] = None,
+    batch_size: int = _BATCH_SIZE,
+    output_type: str = "pandas",
+    num_prefetched_batches: int = 1,
+    aws_profile: hs3.AwsProfile = None,
+    use_index: bool = True,
+) -> Iterator[Union[pd.DataFrame, pa.RecordBatch]]:
+    """
+    Yield data from a Parquet dataset in batches of bounded size.
+
+    This is the streaming version of `from_parquet()`: the memory used is
+    proportional to `batch_size` and not to the size of the result.
+
+    :param file_name: see `from_parquet()`
+    :param columns: see `from_parquet()`
+    :param filters: see `from_parquet()`
+    :param schema: see `from_parquet()`
+    :param batch_size: maximum number of rows of each batch. Batches can be
+        smaller, e.g., they don't span multiple row groups
+    :param output_type: type of the yielded batches
+        - "pandas": dataframes, like the ones returned by `from_parquet()`
+        - "arrow": `pyarrow.RecordBatch`
+    :param num_prefetched_batches: number of batches to read and convert on a
+        background thread while the caller processes the current one
+        - `0` means no prefetching
+    :param aws_profile: see `from_parquet()`
+    :param use_index: see `from_parquet()`
+    :return: a generator of batches
+    """
+    _LOG.debug(hprint.to_str("file_name columns filters schema batch_size"))
+    hdbg.dassert_in(output_type, ("pandas", "arrow"))
+    hdbg.dassert_lte(1, batch_size)
+    file_name, filesystem = _get_parquet_path_and_filesystem(
+        file_name, aws_profile
+    )
+    if schema is not None:
+        # Pass partition columns types explicitly.
+        schema = pa.schema(schema)
+    partitioning = ds.partitioning(schema, flavor="hive")
+    index = None
+    if use_index:
+        index = _load_parquet_dataset_index(
+            file_name, _get_pyarrow_filesystem(filesystem)
+        )
+    if index is not None and index["files"]:
+        dataset = _get_parquet_dataset_with_index(
+            file_name, index, filters, partitioning, filesystem
+        )
+    else:
+        dataset = ds.dataset(
+            file_name,
+            filesystem=filesystem,
+            format="parquet",
+            partitioning=partitioning,
+        )
+    batches = dataset.to_batches(
+        columns=_get_columns_with_pandas_index(dataset.schema, columns),
+        filter=_get_filter_expression(filters),
+        batch_size=batch_size,
+        # Limit the read-ahead of `pyarrow` to keep the memory bounded, since
+        # prefetching is controlled by `num_prefetched_batches`.
+        batch_readahead=num_prefetched_batches,
+        fragment_readahead=1,
+    )
+    # Skip the empty batches, e.g., of fragments with no matching rows.
+    batches = (batch for batch in batches if batch.num_rows > 0)
+    if output_type == "pandas":
+        batches = (_table_to_df(batch) for batch in batches)
+    yield from _prefetch(batches, num_prefetched_batches)
+
+
 # Copied from `hio.create_enclosing_dir()` to avoid circular dependencies.
 def _create_enclosing_dir(file_name: str) -> Optional[str]:
     dir_name = os.path.dirname(file_name)
@@ -1021,6 +1560,551 @@ def collate_parquet_tile_metadata(
     return df
 
 
+# #############################################################################
+# Dataset index.
+# #############################################################################
+
+# Name of the file storing the index of a partitioned Parquet dataset. The
+# leading `_` makes `pyarrow` ignore the file when discovering the dataset.
+PARQUET_DATASET_INDEX_FILE_NAME = "_dataset_index.json"
+_PARQUET_DATASET_INDEX_VERSION = 1
+# Statistics about a column of a row group, e.g.,
+# `{"min": "2022-01-01T00:00:00+00:00", "max": "2022-01-31T18:00:00+00:00",
+#   "type": "timestamp"}`.
+_ColumnStats = Dict[str, Any]
+# Index of a partitioned Parquet dataset, e.g.,
+# ```
+# {
+#     "version": 1,
+#     "files": {
+#         "asset=A/year=2022/month=1/data.parquet": {
+#             "partition": {"asset": "A", "year": 2022, "month": 1},
+#             "num_rows": 62,
+#             "size_in_bytes": 5243,
+#             "row_groups": [
+#                 {
+#                     "num_rows": 62,
+#                     "size_in_bytes": 1745,
+#                     "stats": {"x": {"min": 0, "max": 122}, ...},
+#                 }
+#             ],
+#         },
+#         ...
+#     },
+# }
+# ```
+ParquetDatasetIndex = Dict[str, Any]
+
+
+def _get_pyarrow_filesystem(filesystem: Any) -> pafs.FileSystem:
+    """
+    Wrap a filesystem so that it can be used through the `pyarrow` API.
+
+    :param filesystem: `None` for the local filesystem, a `pyarrow`
+        filesystem or a `fsspec` filesystem (e.g., `s3fs`)
+    """
+    if filesystem is None:
+        filesystem = pafs.LocalFileSystem()
+    elif not isinstance(filesystem, pafs.FileSystem):
+        filesystem = pafs.PyFileSystem(pafs.FSSpecHandler(filesystem))
+    return filesystem
+
+
+def _strip_s3_prefix(path: str) -> str:
+    """
+    Remove the `s3://` prefix from a path, since `pyarrow` doesn't accept it.
+    """
+    prefix = "s3://"
+    if path.startswith(prefix):
+        path = path[len(prefix) :]
+    return path
+
+
+def _get_parquet_dataset_index_path(root_dir: str) -> str:
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/")
+    return f"{root_dir}/{PARQUET_DATASET_INDEX_FILE_NAME}"
+
+
+def _get_path_relative_to_root(root_dir: str, path: str) -> str:
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/") + "/"
+    path = _strip_s3_prefix(path)
+    hdbg.dassert(
+        path.startswith(root_dir),
+        "File '%s' is not inside dir '%s'",
+        path,
+        root_dir,
+    )
+    return path[len(root_dir) :]
+
+
+def _encode_column_stats(stats: Any) -> Optional[_ColumnStats]:
+    """
+    Convert Parquet column statistics into a JSON-serializable dict.
+
+    :param stats: `pyarrow.parquet.Statistics` of a row group column
+    :return: min / max values of the column or `None` if the statistics
+        can't be used for pruning (e.g., they are missing or the type is not
+        supported)
+    """
+    if stats is None or not stats.has_min_max:
+        return None
+    min_val = stats.min
+    max_val = stats.max
+    type_ = None
+    if isinstance(min_val, (datetime.datetime, pd.Timestamp)):
+        type_ = "timestamp"
+        min_val = pd.Timestamp(min_val).isoformat()
+        max_val = pd.Timestamp(max_val).isoformat()
+    elif isinstance(min_val, datetime.date):
+        type_ = "date"
+        min_val = min_val.isoformat()
+        max_val = max_val.isoformat()
+    elif isinstance(min_val, float):
+        if not (np.isfinite(min_val) and np.isfinite(max_val)):
+            return None
+    elif not isinstance(min_val, (bool, int, str)):
+        # E.g., `bytes` or `Decimal`.
+        return None
+    column_stats = {"min": min_val, "max": max_val}
+    if type_ is not None:
+        column_stats["type"] = type_
+    return column_stats
+
+
+def _decode_column_stats(column_stats: _ColumnStats) -> Tuple[Any, Any]:
+    """
+    Inverse of `_encode_column_stats()`.
+
+    :return: min and max values of a column
+    """
+    min_val = column_stats["min"]
+    max_val = column_stats["max"]
+    type_ = column_stats.get("type")
+    if type_ == "timestamp":
+        min_val = pd.Timestamp(min_val)
+        max_val = pd.Timestamp(max_val)
+    elif type_ == "date":
+        min_val = datetime.date.fromisoformat(min_val)
+        max_val = datetime.date.fromisoformat(max_val)
+    return min_val, max_val
+
+
+def _get_parquet_file_index_entry(
+    rel_path: str, file_metadata: pq.FileMetaData, size_in_bytes: int
+) -> Dict[str, Any]:
+    """
+    Build the index entry of a Parquet file from its footer.
+
+    :param rel_path: path of the file relative to the root of the dataset
+    :param file_metadata: footer of the file
+    :param size_in_bytes: size of the file
+    """
+    # Partition values are URI-encoded by `pyarrow` in the paths.
+    partition = {
+        col: urllib.parse.unquote(val) if isinstance(val, str) else val
+        for col, val in _get_parquet_tiles_from_file_path(rel_path)
+    }
+    row_groups = []
+    for rg_idx in range(file_metadata.num_row_groups):
+        rg_metadata = file_metadata.row_group(rg_idx)
+        stats = {}
+        for col_idx in range(rg_metadata.num_columns):
+            col_metadata = rg_metadata.column(col_idx)
+            column_stats = _encode_column_stats(col_metadata.statistics)
+            if column_stats is not None:
+                stats[col_metadata.path_in_schema] = column_stats
+        row_group = {
+            "num_rows": rg_metadata.num_rows,
+            "size_in_bytes": rg_metadata.total_byte_size,
+            "stats": stats,
+        }
+        row_groups.append(row_group)
+    entry = {
+        "partition": partition,
+        "num_rows": file_metadata.num_rows,
+        "size_in_bytes": size_in_bytes,
+        "row_groups": row_groups,
+    }
+    return entry
+
+
+def _save_parquet_dataset_index(
+    index: ParquetDatasetIndex, root_dir: str, filesystem: pafs.FileSystem
+) -> None:
+    """
+    Save the index atomically, so that readers never see a partial file.
+    """
+    index_path = _get_parquet_dataset_index_path(root_dir)
+    tmp_index_path = f"{index_path}.tmp"
+    with filesystem.open_output_stream(tmp_index_path) as f:
+        f.write(json.dumps(index, sort_keys=True).encode("utf-8"))
+    filesystem.move(tmp_index_path, index_path)
+
+
+def _load_parquet_dataset_index(
+    root_dir: str, filesystem: pafs.FileSystem
+) -> Optional[ParquetDatasetIndex]:
+    index_path = _get_parquet_dataset_index_path(root_dir)
+    file_info = filesystem.get_file_info(index_path)
+    if file_info.type != pafs.FileType.File:
+        return None
+    with filesystem.open_input_stream(index_path) as f:
+        index = json.loads(f.read().decode("utf-8"))
+    hdbg.dassert_eq(index["version"], _PARQUET_DATASET_INDEX_VERSION)
+    return index
+
+
+def _list_parquet_dataset_files(
+    root_dir: str,
+    filesystem: pafs.FileSystem,
+    *,
+    partition_paths: Optional[List[str]] = None,
+) -> Dict[str, pafs.FileInfo]:
+    """
+    List the data files of a dataset, like `pyarrow` does.
+
+    :param partition_paths: paths of the partitions to list, relative to
+        the root of the dataset (e.g., `["asset=A/year=2022"]`), `None` to
+        list the entire dataset
+    :return: map from the path of each file relative to the root of the
+        dataset to its info
+    """
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/")
+    if partition_paths is None:
+        dir_paths = [root_dir]
+    else:
+        dir_paths = [f"{root_dir}/{path}" for path in partition_paths]
+    file_infos = {}
+    for dir_path in dir_paths:
+        selector = pafs.FileSelector(
+            dir_path, recursive=True, allow_not_found=True
+        )
+        for file_info in filesystem.get_file_info(selector):
+            if file_info.type != pafs.FileType.File:
+                continue
+            rel_path = _get_path_relative_to_root(root_dir, file_info.path)
+            # Skip the files that `pyarrow` ignores, e.g., the index itself.
+            if any(part.startswith(("_", ".")) for part in rel_path.split("/")):
+                continue
+            file_infos[rel_path] = file_info
+    return file_infos
+
+
+def _build_parquet_dataset_index(
+    root_dir: str, filesystem: pafs.FileSystem
+) -> ParquetDatasetIndex:
+    """
+    Build the index of a dataset reading the footers of all its files.
+    """
+    files = {}
+    for rel_path, file_info in _list_parquet_dataset_files(
+        root_dir, filesystem
+    ).items():
+        file_metadata = pq.read_metadata(file_info.path, filesystem=filesystem)
+        files[rel_path] = _get_parquet_file_index_entry(
+            rel_path, file_metadata, file_info.size
+        )
+    index = {"version": _PARQUET_DATASET_INDEX_VERSION, "files": files}
+    _save_parquet_dataset_index(index, root_dir, filesystem)
+    _LOG.debug("Indexed %s files of '%s'", len(files), root_dir)
+    return index
+
+
+def _update_parquet_dataset_index(
+    root_dir: str,
+    file_metadatas: Dict[str, Tuple[pq.FileMetaData, int]],
+    removed_file_paths: List[str],
+    filesystem: pafs.FileSystem,
+    *,
+    create_index: bool = False,
+) -> None:
+    """
+    Add / replace and remove the entries of the given files in the index.
+
+    :param file_metadatas: map from the path of each file to add to its
+        footer and size in bytes
+    :param removed_file_paths: paths of the files to remove from the index
+    :param create_index: whether to create the index if it doesn't exist,
+        otherwise the update is skipped
+        - The index is created from all the files of the dataset, including
+          the ones that were already present
+    """
+    index = _load_parquet_dataset_index(root_dir, filesystem)
+    if index is None:
+        if create_index:
+            # The given files are already in the dataset, so they are indexed
+            # with the others.
+            _build_parquet_dataset_index(root_dir, filesystem)
+        return
+    for path in removed_file_paths:
+        rel_path = _get_path_relative_to_root(root_dir, path)
+        index["files"].pop(rel_path, None)
+    for path, (file_metadata, size_in_bytes) in file_metadatas.items():
+        rel_path = _get_path_relative_to_root(root_dir, path)
+        index["files"][rel_path] = _get_parquet_file_index_entry(
+            rel_path, file_metadata, size_in_bytes
+        )
+    _save_parquet_dataset_index(index, root_dir, filesystem)
+    _LOG.debug(
+        "Updated index of '%s': added=%s removed=%s",
+        root_dir,
+        len(file_metadatas),
+        len(removed_file_paths),
+    )
+
+
+def build_parquet_dataset_index(
+    root_dir: str,
+    *,
+    aws_profile: hs3.AwsProfile = None,
+) -> ParquetDatasetIndex:
+    """
+    Build from scratch and save the index of a partitioned Parquet dataset.
+
+    The index stores for each file and each of its row groups the number of
+    rows, the size, the partition values and the min / max statistics of the
+    columns, so that `from_parquet()` can prune files and row groups without
+    reading all the footers.
+
+    The index is the manifest of the dataset: the readers using it read only
+    the indexed files, without listing the dataset. It is refreshed
+    incrementally by `to_partitioned_parquet()`, `ParquetDatasetWriter` and
+    `list_and_merge_pq_files()`. If the dataset is modified in a different
+    way, the index must be rebuilt with this function.
+
+    :param root_dir: root directory of a Parquet dataset
+    :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :return: the index
+    """
+    filesystem = None
+    if aws_profile is not None:
+        filesystem = hs3.get_s3fs(aws_profile)
+    filesystem = _get_pyarrow_filesystem(filesystem)
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/")
+    index = _build_parquet_dataset_index(root_dir, filesystem)
+    return index
+
+
+def load_parquet_dataset_index(
+    root_dir: str,
+    *,
+    aws_profile: hs3.AwsProfile = None,
+) -> Optional[ParquetDatasetIndex]:
+    """
+    Load the index of a partitioned Parquet dataset.
+
+    :param root_dir: root directory of a Parquet dataset
+    :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :return: the index or `None` if the dataset has no index
+    """
+    filesystem = None
+    if aws_profile is not None:
+        filesystem = hs3.get_s3fs(aws_profile)
+    filesystem = _get_pyarrow_filesystem(filesystem)
+    return _load_parquet_dataset_index(root_dir, filesystem)
+
+
+def _get_value_kind(value: Any) -> Optional[str]:
+    """
+    Return the kind of a value to decide if two values can be compared.
+    """
+    if isinstance(value, (datetime.datetime, pd.Timestamp, np.datetime64)):
+        kind = "timestamp"
+    elif isinstance(value, datetime.date):
+        kind = "date"
+    elif isinstance(value, (bool, int, float, np.number)):
+        kind = "number"
+    elif isinstance(value, str):
+        kind = "str"
+    else:
+        kind = None
+    return kind
+
+
+def _may_satisfy_predicate(
+    min_val: Any, max_val: Any, op: str, value: Any
+) -> bool:
+    """
+    Check if any value in [min_val, max_val] can satisfy a predicate.
+
+    The check is conservative, i.e., when the values can't be compared it
+    returns `True`.
+
+    :param min_val: min value of a column
+    :param max_val: max value of a column
+    :param op: Parquet filter operator, e.g., `==`, `<`, `in`
+    :param value: right-hand side of the predicate
+    """
+    if op in ("in", "not in"):
+        values = list(value)
+    else:
+        values = [value]
+    min_kind = _get_value_kind(min_val)
+    if min_kind is None or any(
+        _get_value_kind(val) != min_kind for val in values
+    ):
+        return True
+    if min_kind == "timestamp":
+        values = [pd.Timestamp(val) for val in values]
+    try:
+        if op in ("=", "=="):
+            ret = min_val <= values[0] <= max_val
+        elif op == "!=":
+            ret = not min_val == max_val == values[0]
+        elif op == "<":
+            ret = min_val < values[0]
+        elif op == "<=":
+            ret = min_val <= values[0]
+        elif op == ">":
+            ret = max_val > values[0]
+        elif op == ">=":
+            ret = max_val >= values[0]
+        elif op == "in":
+            ret = any(min_val <= val <= max_val for val in values)
+        elif op == "not in":
+            ret = not (min_val == max_val and min_val in values)
+        else:
+            raise ValueError(f"Invalid op='{op}'")
+    except TypeError:
+        # E.g., comparing tz-aware and tz-naive timestamps.
+        ret = True
+    return bool(ret)
+
+
+def _may_satisfy_and_filter(
+    partition: Dict[str, Any],
+    stats: Dict[str, _ColumnStats],
+    and_filter: List[Tuple[str, str, Any]],
+) -> bool:
+    """
+    Check if a row group can contain rows satisfying an AND filter.
+    """
+    for col, op, value in and_filter:
+        if col in partition:
+            min_val = max_val = partition[col]
+        elif col in stats:
+            min_val, max_val = _decode_column_stats(stats[col])
+        else:
+            # Without information we need to read the row group.
+            continue
+        if not _may_satisfy_predicate(min_val, max_val, op, value):
+            return False
+    return True
+
+
+def prune_parquet_dataset_index(
+    index: ParquetDatasetIndex,
+    filters: Optional[List[Any]],
+) -> List[Tuple[str, List[int]]]:
+    """
+    Select the files and the row groups that can contain rows matching
+    `filters`.
+
+    The pruning is conservative: the selected row groups still need to be
+    filtered, but the discarded ones are guaranteed not to contain matching
+    rows.
+
+    :param index: index of the dataset
+    :param filters: Parquet query in the same format as `from_parquet()`,
+        i.e., a list of AND predicates or a list of lists of OR-ed AND
+        predicates
+    :return: list of paths relative to the root of the dataset and the
+        indices of the row groups to read, e.g.,
+        `[("asset=A/year=2022/month=1/data.parquet", [0, 2])]`
+    """
+    if not filters:
+        or_and_filter = [[]]
+    elif isinstance(filters[0], list):
+        or_and_filter = filters
+    else:
+        or_and_filter = [filters]
+    selected = []
+    for rel_path in sorted(index["files"]):
+        entry = index["files"][rel_path]
+        rg_idxs = [
+            rg_idx
+            for rg_idx, row_group in enumerate(entry["row_groups"])
+            if any(
+                _may_satisfy_and_filter(
+                    entry["partition"], row_group["stats"], and_filter
+                )
+                for and_filter in or_and_filter
+            )
+        ]
+        if rg_idxs:
+            selected.append((rel_path, rg_idxs))
+    return selected
+
+
+def _get_parquet_dataset_with_index(
+    root_dir: str,
+    index: ParquetDatasetIndex,
+    filters: Optional[List[Any]],
+    partitioning: ds.Partitioning,
+    filesystem: Any,
+) -> ds.Dataset:
+    """
+    Build a dataset with the row groups selected through the index.
+
+    Compared to `pq.ParquetDataset(root_dir)`, it doesn't list the dataset
+    and it doesn't read the footers of the files that are pruned. The
+    `filters` still need to be applied when reading the dataset.
+    """
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/")
+    selected = prune_parquet_dataset_index(index, filters)
+    _LOG.debug(
+        "Selected %s / %s files using the index",
+        len(selected),
+        len(index["files"]),
+    )
+    if not selected:
+        # Read no row group of one file to get the schema of the dataset.
+        selected = [(sorted(index["files"])[0], [])]
+    dataset = _get_parquet_dataset_from_files(
+        root_dir, selected, partitioning, filesystem
+    )
+    return dataset
+
+
+def _get_parquet_dataset_from_files(
+    root_dir: str,
+    selected: List[Tuple[str, Optional[List[int]]]],
+    partitioning: ds.Partitioning,
+    filesystem: Any,
+) -> ds.Dataset:
+    """
+    Build a dataset from a list of files of a partitioned dataset.
+
+    :param root_dir: root directory of the dataset, used to parse the
+        partition values from the paths
+    :param selected: paths relative to `root_dir` and indices of the row
+        groups to read (`None` to read all the row groups)
+    """
+    hdbg.dassert_lte(1, len(selected))
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/")
+    paths = [f"{root_dir}/{rel_path}" for rel_path, _ in selected]
+    dataset = ds.dataset(
+        paths,
+        filesystem=_get_pyarrow_filesystem(filesystem),
+        format="parquet",
+        partitioning=partitioning,
+        partition_base_dir=root_dir,
+    )
+    rg_idxs_by_path = dict(zip(paths, [rg_idxs for _, rg_idxs in selected]))
+    fragments = [
+        (
+            fragment
+            if rg_idxs_by_path[fragment.path] is None
+            else fragment.subset(row_group_ids=rg_idxs_by_path[fragment.path])
+        )
+        for fragment in dataset.get_fragments()
+    ]
+    dataset = ds.FileSystemDataset(
+        fragments, dataset.schema, dataset.format, dataset.filesystem
+    )
+    return dataset
+
+
 # #############################################################################
 
 # A Parquet filtering condition. e.g., `("year", "=", year)`
@@ -1180,12 +2264,372 @@ def get_parquet_filters_from_timestamp_interval(
     return or_and_filter
 
 
+# #############################################################################
+# ParquetQueryPlan
+# #############################################################################
+
+
+@dataclasses.dataclass
+class ParquetQueryPlan:
+    """
+    Files, row groups and filters to read to answer a query on a Parquet
+    dataset.
+
+    Built by `plan_parquet_query()` and executed by `read_parquet_query_plan()`.
+    """
+
+    # Root directory of the dataset.
+    root_dir: str
+    # Partition directories that can contain data for the query, relative
+    # to `root_dir`, e.g., `["asset_id=1/year=2022/month=1"]`.
+    partition_paths: List[str]
+    # Files to read, relative to `root_dir`, and indices of the row groups
+    # to read (`None` for all the row groups).
+    files: List[Tuple[str, Optional[List[int]]]]
+    # Row-level filters in the `from_parquet()` format.
+    filters: Optional[ParquetAndFilter]
+    # Columns to read, `None` for all.
+    columns: Optional[List[str]]
+
+    @property
+    def filter_expression(self) -> Optional[ds.Expression]:
+        """
+        Return the filters as a `pyarrow` expression.
+        """
+        return _get_filter_expression(self.filters)
+
+
+def get_partition_paths_from_timestamp_interval(
+    partition_mode: str,
+    start_timestamp: pd.Timestamp,
+    end_timestamp: pd.Timestamp,
+    *,
+    asset_ids: Optional[List[Any]] = None,
+    asset_id_col: str = "asset_id",
+) -> List[str]:
+    """
+    Compute the partition directories storing the data of a timestamp interval.
+
+    The directories are computed directly from the interval, without listing
+    the dataset, using the same logic as `add_date_partition_columns()`. Some
+    of them might not exist, e.g., if there is no data for a day.
+
+    :param partition_mode: partition mode used to write the data, see
+        `add_date_partition_columns()`
+    :param start_timestamp: start of the interval, in the same timezone as
+        the data
+    :param end_timestamp: end of the interval, in the same timezone as the
+        data
+    :param asset_ids: assets to select, assuming that the dataset is
+        partitioned by `asset_id_col` before the date. `None` means that the
+        dataset is not partitioned by asset
+    :param asset_id_col: name of the asset partition column
+    :return: paths relative to the root of the dataset, e.g.,
+        `["asset_id=1/year=2022/month=1", "asset_id=1/year=2022/month=2"]`
+    """
+    hdateti.dassert_is_valid_interval(
+        start_timestamp, end_timestamp, left_close=True, right_close=True
+    )
+    hdbg.dassert_is_not(start_timestamp, None)
+    hdbg.dassert_is_not(end_timestamp, None)
+    # Compute the partition values of each day of the interval.
+    days = pd.date_range(
+        start_timestamp.floor("D"), end_timestamp.floor("D"), freq="D"
+    )
+    df, partition_columns = add_date_partition_columns(
+        pd.DataFrame(index=days), partition_mode
+    )
+    date_partitions = [
+        "/".join(f"{col}={val}" for col, val in zip(partition_columns, row))
+        for row in df[partition_columns].drop_duplicates().itertuples(
+            index=False
+        )
+    ]
+    if asset_ids is None:
+        partition_paths = date_partitions
+    else:
+        partition_paths = [
+            f"{asset_id_col}={urllib.parse.quote(str(asset_id), safe='')}/"
+            + date_partition
+            for asset_id in asset_ids
+            for date_partition in date_partitions
+        ]
+    return partition_paths
+
+
+def plan_parquet_query(
+    root_dir: str,
+    partition_mode: str,
+    start_timestamp: pd.Timestamp,
+    end_timestamp: pd.Timestamp,
+    *,
+    asset_ids: Optional[List[Any]] = None,
+    asset_id_col: str = "asset_id",
+    timestamp_col: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    aws_profile: hs3.AwsProfile = None,
+) -> ParquetQueryPlan:
+    """
+    Plan a query on a timestamp interval and a set of assets.
+
+    Compared to passing `get_parquet_filters_from_timestamp_interval()` to
+    `from_parquet()`, the partitions are computed directly from the interval
+    instead of listing the entire dataset and evaluating the filters on each
+    partition:
+    - if the dataset has an index, the files of the partitions are selected
+      from the index, which also prunes the row groups that can't match the
+      interval, without listing the dataset
+    - otherwise only the partition directories of the interval are listed
+
+    :param root_dir: root directory of the dataset
+    :param partition_mode: see `get_partition_paths_from_timestamp_interval()`
+    :param start_timestamp: see `get_partition_paths_from_timestamp_interval()`
+    :param end_timestamp: see `get_partition_paths_from_timestamp_interval()`
+    :param asset_ids: see `get_partition_paths_from_timestamp_interval()`
+    :param asset_id_col: see `get_partition_paths_from_timestamp_interval()`
+    :param timestamp_col: column to filter on the interval at row level,
+        e.g., the column storing the index of the data. `None` to filter only
+        at partition level
+    :param columns: columns to read, `None` for all
+    :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :return: query plan
+    """
+    partition_paths = get_partition_paths_from_timestamp_interval(
+        partition_mode,
+        start_timestamp,
+        end_timestamp,
+        asset_ids=asset_ids,
+        asset_id_col=asset_id_col,
+    )
+    filters = None
+    if timestamp_col is not None:
+        filters = [
+            (timestamp_col, ">=", start_timestamp),
+            (timestamp_col, "<=", end_timestamp),
+        ]
+    filesystem = None
+    if aws_profile is not None:
+        filesystem = hs3.get_s3fs(aws_profile)
+    filesystem = _get_pyarrow_filesystem(filesystem)
+    root_dir = _strip_s3_prefix(root_dir).rstrip("/")
+    index = _load_parquet_dataset_index(root_dir, filesystem)
+    files: List[Tuple[str, Optional[List[int]]]]
+    if index is not None:
+        # Select the files of the partitions and prune their row groups.
+        prefixes = tuple(f"{path}/" for path in partition_paths)
+        index = {
+            "version": index["version"],
+            "files": {
+                rel_path: entry
+                for rel_path, entry in index["files"].items()
+                if rel_path.startswith(prefixes)
+            },
+        }
+        files = list(prune_parquet_dataset_index(index, filters))
+    else:
+        # List only the partitions of the interval.
+        file_infos = _list_parquet_dataset_files(
+            root_dir, filesystem, partition_paths=partition_paths
+        )
+        files = [(rel_path, None) for rel_path in sorted(file_infos)]
+    _LOG.debug(
+        "Planned %s files in %s partitions", len(files), len(partition_paths)
+    )
+    plan = ParquetQueryPlan(
+        root_dir=root_dir,
+        partition_paths=partition_paths,
+        files=files,
+        filters=filters,
+        columns=columns,
+    )
+    return plan
+
+
+def read_parquet_query_plan(
+    plan: ParquetQueryPlan,
+    *,
+    schema: Optional[List[Tuple[str, pa.DataType]]] = None,
+    aws_profile: hs3.AwsProfile = None,
+) -> pd.DataFrame:
+    """
+    Read the data selected by a query plan.
+
+    :param plan: plan built by `plan_parquet_query()`
+    :param schema: see `from_parquet()`
+    :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :return: data like `from_parquet()`, or an empty dataframe if no file
+        can match the query
+    """
+    if not plan.files:
+        return pd.DataFrame(columns=plan.columns)
+    filesystem = None
+    if aws_profile is not None:
+        filesystem = hs3.get_s3fs(aws_profile)
+    if schema is not None:
+        # Pass partition columns types explicitly.
+        schema = pa.schema(schema)
+    partitioning = ds.partitioning(schema, flavor="hive")
+    dataset = _get_parquet_dataset_from_files(
+        plan.root_dir, plan.files, partitioning, filesystem
+    )
+    table = dataset.to_table(
+        columns=_get_columns_with_pandas_index(dataset.schema, plan.columns),
+        filter=plan.filter_expression,
+    )
+    df = _table_to_df(table)
+    return df
+
+
+# Columns that are ignored when dropping duplicates in
+# `list_and_merge_pq_files()`, since they are metadata about the download.
+_DUPLICATE_METADATA_COLUMNS = ["knowledge_timestamp", "end_download_timestamp"]
+# Name of the temporary column used to track the original order of the rows.
+_ROW_IDX_COLUMN = "__row_idx__"
+
+
+def _get_duplicate_columns(
+    schema: pa.Schema, drop_duplicates_mode: Optional[str]
+) -> Tuple[List[str], Optional[str]]:
+    """
+    Get the columns used to detect duplicates for `list_and_merge_pq_files()`.
+
+    :return: columns that identify duplicated rows and the column whose max
+        value determines the kept row, if any
+    """
+    if drop_duplicates_mode is None:
+        # Drop duplicates on all non-metadata columns.
+        # TODO(gp): hparquet is general and we should pass the columns to
+        #  remove or perform the transform after.
+        index_columns = _get_pandas_index_columns(schema)
+        duplicate_columns = [
+            col
+            for col in schema.names
+            if col not in index_columns
+            and col not in _DUPLICATE_METADATA_COLUMNS
+        ]
+        control_column = None
+    elif drop_duplicates_mode == "bid_ask":
+        # Drop duplicates on timestamp index.
+        duplicate_columns = ["timestamp", "exchange_id"]
+        control_column = None
+    elif drop_duplicates_mode == "ohlcv":
+        # Drop duplicates on timestamp and keep one with largest volume.
+        duplicate_columns = ["timestamp", "exchange_id"]
+        control_column = "volume"
+    else:
+        raise ValueError(
+            f"Invalid drop_duplicates_mode='{drop_duplicates_mode}': "
+            "supported modes are None, ohlcv, bid_ask"
+        )
+    return duplicate_columns, control_column
+
+
+def _drop_duplicates_in_table(
+    table: pa.Table,
+    duplicate_columns: List[str],
+    control_column: Optional[str],
+) -> pa.Table:
+    """
+    Remove duplicated rows from a table, preserving the order of the rows.
+
+    This is the Arrow equivalent of `hdatafr.remove_duplicates()`, without
+    sorting the data.
+
+    :param table: table to process
+    :param duplicate_columns: columns identifying duplicated rows
+    :param control_column: column whose max value determines the kept row.
+        If `None`, the first row is kept
+    :return: table without duplicates
+    """
+    hdbg.dassert_is_subset(duplicate_columns, table.column_names)
+    row_idxs = pa.array(np.arange(table.num_rows, dtype=np.int64))
+    ordered_table = table.append_column(_ROW_IDX_COLUMN, row_idxs)
+    if control_column is not None:
+        # Put the row with the largest value of the control column first in
+        # each group of duplicates.
+        ordered_table = ordered_table.sort_by(
+            [(control_column, "descending"), (_ROW_IDX_COLUMN, "ascending")]
+        )
+    # Grouping without threads preserves the order of the rows, so that
+    # "first" selects the first row of each group.
+    kept_row_idxs = ordered_table.group_by(
+        duplicate_columns, use_threads=False
+    ).aggregate([(_ROW_IDX_COLUMN, "first")])[f"{_ROW_IDX_COLUMN}_first"]
+    mask = pc.is_in(row_idxs, value_set=kept_row_idxs.combine_chunks())
+    table = table.filter(mask)
+    return table
+
+
+def _merge_pq_folder(
+    folder: str,
+    folder_files: List[str],
+    file_name: str,
+    filesystem: Any,
+    drop_duplicates_mode: Optional[str],
+    row_group_size: Optional[int],
+) -> str:
+    """
+    Merge the Parquet files in a folder into a single file.
+
+    The merged file is written to a temporary file and then moved in place
+    so that it appears atomically. The original files are removed only
+    after that, so a concurrent reader can see duplicated data but never
+    miss data.
+
+    :return: path of the merged file
+    """
+    # Read all files in target folder.
+    # `partitioning=None` is required to read the dataset without
+    # partitioning columns. See CmTask7324 for details.
+    # https://github.com/cryptokaizen/cmamp/issues/7324
+    table = pq.ParquetDataset(
+        folder_files, filesystem=filesystem, partitioning=None
+    ).read()
+    duplicate_columns, control_column = _get_duplicate_columns(
+        table.schema, drop_duplicates_mode
+    )
+    if not duplicate_columns:
+        duplicate_columns = table.column_names
+    table = _drop_duplicates_in_table(table, duplicate_columns, control_column)
+    # Sort by index to return to original view.
+    index_columns = _get_pandas_index_columns(table.schema)
+    if index_columns:
+        table = table.sort_by([(col, "ascending") for col in index_columns])
+    # Write the merged file and replace the old files.
+    pa_filesystem = _get_pyarrow_filesystem(filesystem)
+    folder = _strip_s3_prefix(folder)
+    merged_file_path = f"{folder}/{file_name}"
+    # The leading `.` hides the file from `pyarrow` until it is complete.
+    tmp_file_path = f"{folder}/.tmp.{file_name}"
+    pq.write_table(
+        table,
+        tmp_file_path,
+        filesystem=pa_filesystem,
+        row_group_size=row_group_size,
+    )
+    pa_filesystem.move(tmp_file_path, merged_file_path)
+    for file_path in folder_files:
+        file_path = _strip_s3_prefix(file_path)
+        if file_path != merged_file_path:
+            pa_filesystem.delete_file(file_path)
+    return merged_file_path
+
+
+def _is_hidden_file(path: str) -> bool:
+    """
+    Return whether a file is ignored by `pyarrow` when reading a dataset.
+    """
+    return os.path.basename(path).startswith((".", "_"))
+
+
 def list_and_merge_pq_files(
     root_dir: str,
     *,
     file_name: str = "data.parquet",
     aws_profile: hs3.AwsProfile = None,
     drop_duplicates_mode: Optional[str] = None,
+    num_threads: Optional[int] = None,
+    row_group_size: Optional[int] = None,
 ) -> None:
     """
     Merge all files of the Parquet dataset.
@@ -1213,10 +2657,25 @@ def list_and_merge_pq_files(
                     data.parquet
     ```
 
+    The folders are merged in parallel, deduplicating and sorting the data in
+    Arrow, so that the memory used is proportional to the size of the
+    `num_threads` folders being merged.
+
     :param root_dir: root directory of Parquet dataset
     :param file_name: name of the single resulting file
     :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :param drop_duplicates_mode: columns used to detect duplicated rows
+        - `None`: all the columns, except the index and download metadata
+        - "bid_ask": timestamp and exchange
+        - "ohlcv": timestamp and exchange, keeping the row with the largest
+          volume
+    :param num_threads: number of folders to merge in parallel, `None` to
+        use the default of `concurrent.futures.ThreadPoolExecutor`
+    :param row_group_size: maximum number of rows in each row group of the
+        merged files, `None` to use the `pyarrow` default
     """
+    # Check the mode before modifying any folder.
+    _get_duplicate_columns(pa.schema([]), drop_duplicates_mode)
     if aws_profile is not None:
         filesystem = hs3.get_s3fs(aws_profile)
     else:
@@ -1230,9 +2689,14 @@ def list_and_merge_pq_files(
     else:
         # For local filesystem, use glob.glob
         parquet_files = glob.glob(f"{root_dir}/**/*.parquet", recursive=True)
+    # Skip the files that `pyarrow` ignores, e.g., the temporary files of
+    # `ParquetDatasetWriter`.
+    parquet_files = [f for f in parquet_files if not _is_hidden_file(f)]
     _LOG.debug("Parquet files: '%s'", parquet_files)
     # Get paths only to the lowest level of dataset folders.
-    dataset_folders = {f.rsplit("/", 1)[0] for f in parquet_files}
+    dataset_folders = sorted({f.rsplit("/", 1)[0] for f in parquet_files})
+    # Find the folders to merge.
+    folder_files_to_merge = {}
     for folder in dataset_folders:
         # Get files per folder and merge if there are multiple ones.
         if filesystem:
@@ -1241,53 +2705,49 @@ def list_and_merge_pq_files(
         else:
             # For local filesystem, use os.listdir
             folder_files = [os.path.join(folder, f) for f in os.listdir(folder)]
+        folder_files = [f for f in folder_files if not _is_hidden_file(f)]
         hdbg.dassert_ne(
             len(folder_files), 0, msg=f"Empty folder `{folder}` detected!"
         )
         if len(folder_files) == 1 and folder_files[0].endswith("/data.parquet"):
             # If there is already single `data.parquet` file, no action is required.
             continue
-        # Read all files in target folder.
-        # `partitioning=None` is required to read the dataset without
-        # partitioning columns. See CmTask7324 for details.
-        # https://github.com/cryptokaizen/cmamp/issues/7324
-        data = pq.ParquetDataset(
-            folder_files, filesystem=filesystem, partitioning=None
-        ).read()
-        data = data.to_pandas()
-        # Drop duplicates on all non-metadata columns.
-        # TODO(gp): hparquet is general and we should pass the columns to remove
-        #  or perform the transform after.
-        if drop_duplicates_mode is None:
-            duplicate_columns = data.columns.to_list()
-            for col_name in ["knowledge_timestamp", "end_download_timestamp"]:
-                if col_name in duplicate_columns:
-                    duplicate_columns.remove(col_name)
-            control_column = None
-        elif drop_duplicates_mode == "bid_ask":
-            # Drop duplicates on timestamp index.
-            duplicate_columns = ["timestamp", "exchange_id"]
-            control_column = None
-        elif drop_duplicates_mode == "ohlcv":
-            # Drop duplicates on timestamp and keep one with largest volume.
-            duplicate_columns = ["timestamp", "exchange_id"]
-            control_column = "volume"
-        else:
-            hdbg.dfatal("Supported drop duplicates modes: ohlcv, bid_ask")
-        data = hdatafr.remove_duplicates(data, duplicate_columns, control_column)  # type: ignore[possibly-unbound]
-        # Remove all old files and write the new, merged one.
-        if filesystem:
-            filesystem.rm(folder, recursive=True)
-            pq.write_table(
-                pa.Table.from_pandas(data),
-                folder + "/" + file_name,
-                filesystem=filesystem,
+        folder_files_to_merge[folder] = folder_files
+    # Merge the folders.
+    with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+        futures = [
+            executor.submit(
+                _merge_pq_folder,
+                folder,
+                folder_files,
+                file_name,
+                filesystem,
+                drop_duplicates_mode,
+                row_group_size,
             )
-        else:
-            # Use os.remove for local filesystem to remove files.
-            for file_path in folder_files:
-                os.remove(file_path)
-            data.to_parquet(os.path.join(folder, file_name))
+            for folder, folder_files in folder_files_to_merge.items()
+        ]
+        merged_file_paths = [future.result() for future in futures]
+    # Refresh the index of the dataset, if any.
+    pa_filesystem = _get_pyarrow_filesystem(filesystem)
+    if (
+        merged_file_paths
+        and _load_parquet_dataset_index(root_dir, pa_filesystem) is not None
+    ):
+        file_metadatas = {}
+        for file_path in merged_file_paths:
+            file_metadatas[file_path] = (
+                pq.read_metadata(file_path, filesystem=pa_filesystem),
+                pa_filesystem.get_file_info(file_path).size,
+            )
+        removed_file_paths = [
+            file_path
+            for folder_files in folder_files_to_merge.values()
+            for file_path in folder_files
+        ]
+        _update_parquet_dataset_index(
+            root_dir, file_metadatas, removed_file_paths, pa_filesystem
+        )
 
 
 def maybe_cast_to_int(string: str) -> Union[str, int]:
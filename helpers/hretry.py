@@ -7,6 +7,7 @@ import helpers.hretry as hretry
 import asyncio
 import functools
 import logging
+import random
 import time
 from typing import Any, Callable, Optional, Tuple, cast
 
@@ -23,11 +24,53 @@ _MAX_RETRIES = 3
 _RETRY_DELAY_SEC = 5
 
 
+def get_backoff_delay_in_sec(
+    attempt: int,
+    *,
+    retry_delay_in_sec: float = _RETRY_DELAY_SEC,
+    backoff_factor: float = 1.0,
+    max_retry_delay_in_sec: Optional[float] = None,
+    jitter: float = 0.0,
+) -> float:
+    """
+    Return the time to wait before the attempt following the failed `attempt`.
+
+    The delay grows exponentially with the number of failed attempts, i.e.,
+    `retry_delay_in_sec * backoff_factor ** (attempt - 1)`, it is capped to
+    `max_retry_delay_in_sec` and then randomized by `jitter`, so that tasks
+    failing together don't retry in lockstep.
+
+    :param attempt: index of the attempt that failed, starting from 1
+    :param retry_delay_in_sec: delay after the first failed attempt
+    :param backoff_factor: multiplier of the delay after each failed attempt
+        - `1.0` corresponds to a constant delay
+    :param max_retry_delay_in_sec: upper bound of the delay before applying
+        the jitter, if not None
+    :param jitter: fraction of the delay to randomize, e.g., `0.1` returns a
+        delay uniformly distributed in [0.9 * delay, 1.1 * delay]
+    :return: delay in seconds
+    """
+    hdbg.dassert_lte(1, attempt)
+    hdbg.dassert_lte(0, retry_delay_in_sec)
+    hdbg.dassert_lte(1.0, backoff_factor)
+    hdbg.dassert_lte(0.0, jitter)
+    hdbg.dassert_lte(jitter, 1.0)
+    delay = retry_delay_in_sec * backoff_factor ** (attempt - 1)
+    if max_retry_delay_in_sec is not None:
+        delay = min(delay, max_retry_delay_in_sec)
+    if jitter > 0:
+        delay *= random.uniform(1.0 - jitter, 1.0 + jitter)
+    return delay
+
+
 def sync_retry(
     exceptions: Tuple[Any, ...],
     *,
     num_attempts: int = _MAX_RETRIES,
     retry_delay_in_sec: int = _RETRY_DELAY_SEC,
+    backoff_factor: float = 1.0,
+    max_retry_delay_in_sec: Optional[float] = None,
+    jitter: float = 0.0,
 ) -> Callable[[_RetriedFunc], _RetriedFunc]:
     """
     Decorator retrying the wrapped function/method num_attempts times if the
@@ -39,6 +82,9 @@ def sync_retry(
       - The function will be called `num_attempts` times.
     :param retry_delay_in_sec: the number of seconds to wait between retry
         attempts
+    :param backoff_factor: see `get_backoff_delay_in_sec()`
+    :param max_retry_delay_in_sec: see `get_backoff_delay_in_sec()`
+    :param jitter: see `get_backoff_delay_in_sec()`
     :return: the result of the wrapped function/method
     """
 
@@ -60,8 +106,15 @@ def sync_retry(
                         attempts_count,
                         num_attempts,
                     )
+                    delay = get_backoff_delay_in_sec(
+                        attempts_count,
+                        retry_delay_in_sec=retry_delay_in_sec,
+                        backoff_factor=backoff_factor,
+                        max_retry_delay_in_sec=max_retry_delay_in_sec,
+                        jitter=jitter,
+                    )
                     attempts_count += 1
-                    time.sleep(retry_delay_in_sec)
+                    time.sleep(delay)
             _LOG.error(
                 "Function %s failed after %d attempts", func, num_attempts
             )
@@ -82,6 +135,9 @@ def async_retry(
     *,
     num_attempts: int = _MAX_RETRIES,
     retry_delay_in_sec: int = _RETRY_DELAY_SEC,
+    backoff_factor: float = 1.0,
+    max_retry_delay_in_sec: Optional[float] = None,
+    jitter: float = 0.0,
 ) -> Callable[[_RetriedFunc], _RetriedFunc]:
     """
     Same as `sync_retry` decorator but for `async` functions.
@@ -105,8 +161,15 @@ def async_retry(
                         attempts_count,
                         num_attempts,
                     )
+                    delay = get_backoff_delay_in_sec(
+                        attempts_count,
+                        retry_delay_in_sec=retry_delay_in_sec,
+                        backoff_factor=backoff_factor,
+                        max_retry_delay_in_sec=max_retry_delay_in_sec,
+                        jitter=jitter,
+                    )
                     attempts_count += 1
-                    await asyncio.sleep(retry_delay_in_sec)
+                    await asyncio.sleep(delay)
             _LOG.error(
                 "Function %s failed after %d attempts", func, num_attempts
             )
@@ -6,14 +6,29 @@ import helpers.hs3 as hs3
 
 import argparse
 import configparser
-import copy
+import contextlib
 import functools
 import gzip
+import io
 import logging
 import os
 import pathlib
 import re
-from typing import Any, Dict, List, Optional, Tuple, Union
+import tarfile
+import threading
+import time
+from typing import (
+    IO,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 _WARNING = "\033[33mWARNING\033[0m"
 
@@ -133,53 +148,238 @@ def dassert_is_valid_aws_profile(path: str, aws_profile: AwsProfile) -> None:
 # ///////////////////////////////////////////////////////////////////////////////
 
 
-def get_s3fs(aws_profile: AwsProfile) -> S3FileSystem:
+# #############################################################################
+# Filesystem pool.
+# #############################################################################
+
+# Filesystems shared by all the callers in a process, so that the resolution of
+# the credentials and the setup of the connections are done once per process
+# instead of once per call.
+# - The key is `(kind, aws_profile, endpoint_url, pid)`, where `pid` prevents
+#   a forked process from reusing the connections of its parent
+# - The value is `(filesystem, creation time)`
+_FILESYSTEM_POOL: Dict[Tuple[Any, ...], Tuple[Any, float]] = {}
+_FILESYSTEM_POOL_LOCK = threading.Lock()
+
+
+def get_filesystem_from_pool(
+    kind: str,
+    aws_profile: str,
+    factory: Callable[[], Any],
+    *,
+    endpoint_url: Optional[str] = None,
+    max_age_in_secs: Optional[float] = None,
+) -> Any:
     """
-    Return a `s3fs` object from a given AWS profile.
+    Return a filesystem from the process-wide pool, creating it if needed.
+
+    :param kind: type of filesystem, e.g., "s3fs" or "pyarrow"
+    :param aws_profile: name of the AWS profile of the filesystem
+    :param factory: function creating the filesystem
+    :param endpoint_url: S3 endpoint of the filesystem, if not the default one
+    :param max_age_in_secs: age after which the filesystem is created again,
+        e.g., when it stores temporary credentials
+        - `None` to reuse the filesystem for the life of the process
+    :return: the filesystem
+    """
+    key = (kind, aws_profile, endpoint_url, os.getpid())
+    with _FILESYSTEM_POOL_LOCK:
+        entry = _FILESYSTEM_POOL.get(key)
+        now = time.monotonic()
+        if entry is None or (
+            max_age_in_secs is not None and now - entry[1] > max_age_in_secs
+        ):
+            _LOG.debug("Creating filesystem for key=%s", str(key))
+            entry = (factory(), now)
+            _FILESYSTEM_POOL[key] = entry
+    return entry[0]
+
+
+def clear_filesystem_pool() -> None:
+    """
+    Remove all the filesystems from the pool, e.g., after rotating credentials.
+    """
+    with _FILESYSTEM_POOL_LOCK:
+        _FILESYSTEM_POOL.clear()
 
-    :param aws_profile: the name of an AWS profile or a s3fs filesystem
+
+def _create_s3fs(aws_profile: str, endpoint_url: Optional[str]) -> S3FileSystem:
+    """
+    Create a `s3fs` object from a given AWS profile.
     """
+    kwargs: Dict[str, Any] = {}
+    if endpoint_url is not None:
+        kwargs["client_kwargs"] = {"endpoint_url": endpoint_url}
     if hserver.is_ig_prod():
         # On IG prod machines we let the Docker container infer the right AWS
         # account.
         _LOG.warning("Not using AWS profile='%s'", aws_profile)
-        s3fs_ = S3FileSystem()
+        s3fs_ = S3FileSystem(**kwargs)
+    elif (
+        # When deploying jobs via ECS the container obtains credentials
+        # based on passed task role specified in the ECS task-definition,
+        # refer to:
+        # https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-iam-roles.html
+        # TODO(heanh): Centralize the list of supported profiles.
+        aws_profile in ["ck", "csfy"]
+        and hserver.is_inside_ecs_container()
+    ):
+        _LOG.info("Fetching credentials from task IAM role")
+        s3fs_ = S3FileSystem(**kwargs)
     else:
-        if isinstance(aws_profile, str):
-            # When deploying jobs via ECS the container obtains credentials
-            # based on passed task role specified in the ECS task-definition,
-            # refer to:
-            # https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-iam-roles.html
+        # TODO(heanh): Make this manual extraction of credentials
+        # code obsoleted.
+        # From https://stackoverflow.com/questions/62562945
+        # aws_credentials = get_aws_credentials(aws_profile)
+        # _LOG.debug("%s", pprint.pformat(aws_credentials))
+        # s3fs_ = S3FileSystem(
+        #     anon=False,
+        #     key=aws_credentials["aws_access_key_id"],
+        #     secret=aws_credentials["aws_secret_access_key"],
+        #     token=aws_credentials["aws_session_token"],
+        #     client_kwargs={"region_name": aws_credentials["aws_region"]},
+        # )
+        #
+        # We do not need to extract the credential from the file because
+        # the config (`~/.aws/config`) and credential
+        # (`~/.aws/credentials`) are already set.
+        s3fs_ = S3FileSystem(anon=False, profile=aws_profile, **kwargs)
+    return s3fs_
+
+
+def get_s3fs(
+    aws_profile: AwsProfile, *, endpoint_url: Optional[str] = None
+) -> S3FileSystem:
+    """
+    Return a `s3fs` object from a given AWS profile.
+
+    The object is shared with all the callers in the process using the same
+    AWS profile and endpoint (see `get_filesystem_from_pool()`).
+
+    :param aws_profile: the name of an AWS profile or a s3fs filesystem
+    :param endpoint_url: S3 endpoint to use, if not the default one
+    """
+    if hserver.is_ig_prod():
+        # On IG prod machines the AWS profile is ignored, so all the callers
+        # share the same filesystem.
+        aws_profile = str(aws_profile)
+    elif isinstance(aws_profile, S3FileSystem):
+        return aws_profile
+    elif not isinstance(aws_profile, str):
+        raise ValueError(f"Invalid aws_profile='{aws_profile}'")
+    s3fs_ = get_filesystem_from_pool(
+        "s3fs",
+        aws_profile,
+        lambda: _create_s3fs(aws_profile, endpoint_url),
+        endpoint_url=endpoint_url,
+    )
+    return s3fs_
+
+
+# #############################################################################
+# Listing cache.
+# #############################################################################
+
+# Cache of the S3 listings performed by `listdir()`, `du()` and
+# `get_latest_pq_in_s3_dir()`, disabled by default.
+# - It is meant for jobs listing the same prefixes many times, while the
+#   content of the prefixes doesn't change or changes only through the
+#   functions in this module, which invalidate the cache
+# - Changes made in other ways need `invalidate_s3_listing_cache()`
+# - The key is `(function name, filesystem, path, *args)`
+# - The value is `(result, creation time)`
+_S3_LISTING_CACHE_TTL_IN_SECS: Optional[float] = None
+_S3_LISTING_CACHE: Dict[Tuple[Any, ...], Tuple[Any, float]] = {}
+_S3_LISTING_CACHE_LOCK = threading.Lock()
+
+
+def enable_s3_listing_cache(ttl_in_secs: float) -> None:
+    """
+    Enable caching the S3 listings.
+
+    :param ttl_in_secs: time after which a cached listing is performed again
+    """
+    global _S3_LISTING_CACHE_TTL_IN_SECS
+    hdbg.dassert_lt(0, ttl_in_secs)
+    _S3_LISTING_CACHE_TTL_IN_SECS = ttl_in_secs
+
+
+def disable_s3_listing_cache() -> None:
+    """
+    Disable caching the S3 listings, removing the cached ones.
+    """
+    global _S3_LISTING_CACHE_TTL_IN_SECS
+    _S3_LISTING_CACHE_TTL_IN_SECS = None
+    invalidate_s3_listing_cache()
+
+
+def _normalize_s3_listing_path(path: str) -> str:
+    if path.startswith("s3://"):
+        path = path[len("s3://") :]
+    return path.rstrip("/")
+
+
+def invalidate_s3_listing_cache(path: Optional[str] = None) -> None:
+    """
+    Remove cached S3 listings.
+
+    :param path: S3 path that changed, e.g., a file that was written
+        - The listings of the path, of its parent dirs and of its subdirs are
+          removed
+        - `None` to remove all the listings
+    """
+    with _S3_LISTING_CACHE_LOCK:
+        if path is None:
+            _S3_LISTING_CACHE.clear()
+            return
+        path = _normalize_s3_listing_path(path)
+        for key in list(_S3_LISTING_CACHE):
+            cached_path = key[2]
             if (
-                # TODO(heanh): Centralize the list of supported profiles.
-                aws_profile in ["ck", "csfy"]
-                and hserver.is_inside_ecs_container()
+                cached_path == path
+                or cached_path.startswith(path + "/")
+                or path.startswith(cached_path + "/")
             ):
-                _LOG.info("Fetching credentials from task IAM role")
-                s3fs_ = S3FileSystem()
-            else:
-                # TODO(heanh): Make this manual extraction of credentials
-                # code obsoleted.
-                # From https://stackoverflow.com/questions/62562945
-                # aws_credentials = get_aws_credentials(aws_profile)
-                # _LOG.debug("%s", pprint.pformat(aws_credentials))
-                # s3fs_ = S3FileSystem(
-                #     anon=False,
-                #     key=aws_credentials["aws_access_key_id"],
-                #     secret=aws_credentials["aws_secret_access_key"],
-                #     token=aws_credentials["aws_session_token"],
-                #     client_kwargs={"region_name": aws_credentials["aws_region"]},
-                # )
-                #
-                # We do not need to extract the credential from the file because
-                # the config (`~/.aws/config`) and credential
-                # (`~/.aws/credentials`) are already set.
-                s3fs_ = S3FileSystem(anon=False, profile=aws_profile)
-        elif isinstance(aws_profile, S3FileSystem):
-            s3fs_ = aws_profile
-        else:
-            raise ValueError(f"Invalid aws_profile='{aws_profile}'")
-    return s3fs_
+                del _S3_LISTING_CACHE[key]
+
+
+def _get_s3_listing(
+    func_name: str,
+    s3fs_: S3FileSystem,
+    path: str,
+    args: Tuple[Any, ...],
+    func: Callable[[], Any],
+) -> Any:
+    """
+    Return the result of an S3 listing, using the cache if enabled.
+
+    The cached result is shared by the callers, so it must not be modified.
+
+    :param func_name: name of the listing, e.g., "glob"
+    :param s3fs_: filesystem performing the listing
+    :param path: S3 path being listed
+    :param args: additional params affecting the result of the listing
+    :param func: function performing the listing
+    :return: the result of `func`
+    """
+    ttl_in_secs = _S3_LISTING_CACHE_TTL_IN_SECS
+    if ttl_in_secs is None:
+        return func()
+    key = (func_name, s3fs_, _normalize_s3_listing_path(path)) + args
+    now = time.monotonic()
+    with _S3_LISTING_CACHE_LOCK:
+        entry = _S3_LISTING_CACHE.get(key)
+    if entry is not None and now - entry[1] <= ttl_in_secs:
+        _LOG.debug("Using cached listing for key=%s", str(key))
+        return entry[0]
+    # Perform the listing without holding the lock, since it can be slow.
+    result = func()
+    with _S3_LISTING_CACHE_LOCK:
+        _S3_LISTING_CACHE[key] = (result, now)
+    return result
+
+
+# ///////////////////////////////////////////////////////////////////////////////
 
 
 def dassert_path_exists(
@@ -296,7 +496,6 @@ def listdir(
     _LOG.debug("pattern=%s", pattern)
     if is_s3_path(dir_name):
         s3fs_ = get_s3fs(aws_profile)
-        dassert_path_exists(dir_name, s3fs_)
         # Ensure that there are no multiple stars in pattern.
         hdbg.dassert_not_in("**", pattern)
         # `hio.listdir` is using `find` which looks for files and directories
@@ -304,19 +503,27 @@ def listdir(
         # One star in glob will use `maxdepth=1`.
         pattern = _replace_star_with_double_star(pattern)
         _LOG.debug("pattern=%s", pattern)
+
+        def _glob() -> Dict[str, Dict[str, Any]]:
+            dassert_path_exists(dir_name, s3fs_)
+            return s3fs_.glob(
+                f"{dir_name}/{pattern}", detail=True, maxdepth=maxdepth
+            )
+
         # Detailed S3 objects in dict form with metadata.
-        path_objects = s3fs_.glob(
-            f"{dir_name}/{pattern}", detail=True, maxdepth=maxdepth
+        path_objects = _get_s3_listing(
+            "glob", s3fs_, dir_name, (pattern, maxdepth), _glob
         )
         if only_files:
-            # Original `path_objects` must not be changed during loop.
-            temp_path_objects = copy.deepcopy(list(path_objects.values()))
             # Use metadata to distinguish files from directories without
             # calling `s3fs_.isdir/isfile`.
-            for path_object in temp_path_objects:
-                if path_object["type"] != "file":
-                    path_objects.pop(path_object["Key"])
-        paths = list(path_objects.keys())
+            paths = [
+                path
+                for path, path_object in path_objects.items()
+                if path_object["type"] == "file"
+            ]
+        else:
+            paths = list(path_objects.keys())
         if exclude_git_dirs:
             paths = [
                 path for path in paths if ".git" not in pathlib.Path(path).parts
@@ -359,8 +566,12 @@ def du(
     dassert_is_valid_aws_profile(path, aws_profile)
     if is_s3_path(path):
         s3fs_ = get_s3fs(aws_profile)
-        dassert_path_exists(path, s3fs_)
-        size: Union[int, str] = s3fs_.du(path)
+
+        def _du() -> int:
+            dassert_path_exists(path, s3fs_)
+            return s3fs_.du(path)
+
+        size: Union[int, str] = _get_s3_listing("du", s3fs_, path, (), _du)
         if human_format:
             size = hintros.format_size(size)
     else:
@@ -381,6 +592,8 @@ def to_file(
 
     If and only if `aws_profile` is specified, S3 is used instead of
     local filesystem.
+
+    Use `open_file()` to write a large file incrementally.
     """
     dassert_is_valid_aws_profile(file_name, aws_profile)
     if is_s3_path(file_name):
@@ -394,17 +607,10 @@ def to_file(
         lines_lst = [f"{line}{os_sep}".encode() for line in lines.split(os_sep)]
         # Inspect file name and path.
         hio.dassert_is_valid_file_name(file_name)
-        s3fs_ = get_s3fs(aws_profile)
         mode = "wb" if mode is None else mode
-        # Open S3 file. `rb` is the default mode for S3.
-        with s3fs_.open(file_name, mode) as s3_file:
-            if file_name.endswith((".gz", ".gzip")):
-                # Open and decompress gzipped file.
-                with gzip.GzipFile(fileobj=s3_file) as gzip_file:
-                    gzip_file.writelines(lines_lst)
-            else:
-                # Any other file.
-                s3_file.writelines(lines_lst)
+        # Stream the lines to S3, compressing them if the file is gzipped.
+        with open_file(file_name, mode, aws_profile=aws_profile) as s3_file:
+            s3_file.writelines(lines_lst)
             if force_flush:
                 # TODO(Nikola): Investigate S3 alternative for `os.fsync(f.fileno())`.
                 s3_file.flush()
@@ -429,6 +635,8 @@ def from_file(
 
     If and only if `aws_profile` is specified, S3 is used instead of
     local filesystem.
+
+    Use `open_file()` to read a large file line by line or in chunks.
     """
     dassert_is_valid_aws_profile(file_name, aws_profile)
     if is_s3_path(file_name):
@@ -436,22 +644,302 @@ def from_file(
             raise ValueError("Encoding is not supported when reading from S3!")
         # Inspect file name and path.
         hio.dassert_is_valid_file_name(file_name)
-        s3fs_ = get_s3fs(aws_profile)
-        dassert_path_exists(file_name, s3fs_)
-        # Open s3 file.
-        with s3fs_.open(file_name) as s3_file:
-            if file_name.endswith((".gz", ".gzip")):
-                # Open and decompress gzipped file.
-                with gzip.GzipFile(fileobj=s3_file) as gzip_file:
-                    data = gzip_file.read().decode()
-            else:
-                # Any other file.
-                data = s3_file.read().decode()
+        # Read the S3 file, decompressing it if it is gzipped.
+        with open_file(file_name, "rb", aws_profile=aws_profile) as s3_file:
+            data = s3_file.read().decode()
     else:
         data = hio.from_file(file_name, encoding=encoding)
     return data
 
 
+# #############################################################################
+# Streaming.
+# #############################################################################
+
+
+# Default size of the parts of the multipart transfers.
+_TRANSFER_PART_SIZE_IN_BYTES = 64 * 1024 * 1024
+# Default number of concurrent requests of the transfers.
+_TRANSFER_NUM_THREADS = 10
+
+
+def get_s3_client(aws_profile: str) -> Any:
+    """
+    Return a `boto3` S3 client from a given AWS profile.
+
+    The client is shared by the callers in the process (see
+    `get_filesystem_from_pool()`). It is used for the multipart transfers,
+    which are not supported by `s3fs`.
+
+    :param aws_profile: the name of an AWS profile
+    """
+    # Import `boto3` here since it's needed only for the transfers.
+    import boto3
+
+    import helpers.haws as haws
+
+    def _create_s3_client() -> Any:
+        if hserver.is_ig_prod():
+            # On IG prod machines we let the Docker container infer the right
+            # AWS account.
+            _LOG.warning("Not using AWS profile='%s'", aws_profile)
+            s3_client = boto3.client("s3")
+        else:
+            s3_client = haws.get_service_client(aws_profile, "s3")
+        return s3_client
+
+    s3_client = get_filesystem_from_pool("boto3", aws_profile, _create_s3_client)
+    return s3_client
+
+
+def _get_transfer_manager(
+    s3_client: Any, num_threads: int, part_size_in_bytes: int
+) -> Any:
+    """
+    Return a manager running concurrent multipart transfers.
+
+    All the transfers submitted to the manager share the same `num_threads`
+    threads, both across files and across the parts of a file.
+    """
+    import boto3.s3.transfer
+
+    hdbg.dassert_lte(1, num_threads)
+    hdbg.dassert_lte(1, part_size_in_bytes)
+    config = boto3.s3.transfer.TransferConfig(
+        multipart_threshold=part_size_in_bytes,
+        multipart_chunksize=part_size_in_bytes,
+        max_concurrency=num_threads,
+    )
+    return boto3.s3.transfer.create_transfer_manager(s3_client, config)
+
+
+def _invalidate_s3_caches(s3_path: str, aws_profile: AwsProfile) -> None:
+    """
+    Invalidate the cached listings after writing an S3 path.
+
+    The uploads through `boto3` bypass `s3fs`, so the listings cached by
+    `s3fs` need to be invalidated, besides the ones cached by this module.
+    """
+    get_s3fs(aws_profile).invalidate_cache(s3_path)
+    invalidate_s3_listing_cache(s3_path)
+
+
+@contextlib.contextmanager
+def _open_s3_upload_stream(
+    s3_file_path: str,
+    s3_client: Any,
+    num_threads: int,
+    part_size_in_bytes: int,
+) -> Iterator[BinaryIO]:
+    """
+    Yield a binary file whose content is uploaded to S3 while it is written.
+
+    The data is written into a pipe, while a thread uploads its parts as soon
+    as they are available, using a concurrent multipart upload. So the
+    memory used is bounded by the parts being uploaded.
+
+    If an exception is raised while writing, the object uploaded with the
+    partial content is removed. If the upload fails, its exception is raised
+    (chained to the error that writing into the closed pipe raised, if any).
+    """
+    bucket, abs_path = split_path(s3_file_path)
+    key = abs_path.lstrip("/")
+    read_fd, write_fd = os.pipe()
+    exceptions = []
+
+    def _upload() -> None:
+        try:
+            with os.fdopen(read_fd, "rb") as src_file:
+                with _get_transfer_manager(
+                    s3_client, num_threads, part_size_in_bytes
+                ) as manager:
+                    manager.upload(src_file, bucket, key).result()
+        except BaseException as e:  # pylint: disable=broad-except
+            exceptions.append(e)
+
+    thread = threading.Thread(target=_upload, daemon=True)
+    thread.start()
+    dst_file = os.fdopen(write_fd, "wb")
+    try:
+        yield dst_file
+    except BaseException as e:
+        # Let the upload complete and then remove the partial content. If the
+        # upload failed, the pipe is closed and flushing the file fails.
+        with contextlib.suppress(BrokenPipeError):
+            dst_file.close()
+        thread.join()
+        if exceptions:
+            # Report the error of the upload, which caused the write error.
+            raise exceptions[0] from e
+        s3_client.delete_object(Bucket=bucket, Key=key)
+        raise
+    with contextlib.suppress(BrokenPipeError):
+        dst_file.close()
+    thread.join()
+    if exceptions:
+        raise exceptions[0]
+
+
+# #############################################################################
+# _ByteRangeReader
+# #############################################################################
+
+
+class _ByteRangeReader(io.RawIOBase):
+    """
+    Read at most a given number of bytes from a binary file.
+    """
+
+    def __init__(self, file: BinaryIO, num_bytes: Optional[int]) -> None:
+        """
+        Constructor.
+
+        :param file: file to read from its current position
+        :param num_bytes: number of bytes to read, `None` to read until the
+            end of the file
+        """
+        self._file = file
+        self._num_bytes_left = num_bytes
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        size = len(buffer)
+        if self._num_bytes_left is not None:
+            size = min(size, self._num_bytes_left)
+        data = self._file.read(size)
+        num_bytes = len(data)
+        buffer[:num_bytes] = data
+        if self._num_bytes_left is not None:
+            self._num_bytes_left -= num_bytes
+        return num_bytes
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def _open_binary_reader(
+    file_name: str,
+    byte_range: Optional[Tuple[int, Optional[int]]],
+    aws_profile: Optional[AwsProfile],
+    part_size_in_bytes: int,
+) -> BinaryIO:
+    """
+    Open a local or S3 file for reading bytes, optionally a range of them.
+    """
+    if is_s3_path(file_name):
+        s3fs_ = get_s3fs(aws_profile)
+        dassert_path_exists(file_name, s3fs_)
+        # The data is read from S3 in blocks, so avoid reading more than the
+        # requested range.
+        block_size = part_size_in_bytes
+        if byte_range is not None and byte_range[1] is not None:
+            block_size = max(1, min(block_size, byte_range[1] - byte_range[0]))
+        file = s3fs_.open(file_name, "rb", block_size=block_size)
+    else:
+        hdbg.dassert_file_exists(file_name)
+        file = open(file_name, "rb")  # pylint: disable=consider-using-with
+    if byte_range is not None:
+        start, end = byte_range
+        hdbg.dassert_lte(0, start)
+        num_bytes = None
+        if end is not None:
+            hdbg.dassert_lte(start, end)
+            num_bytes = end - start
+        file.seek(start)
+        file = io.BufferedReader(_ByteRangeReader(file, num_bytes))
+    return file
+
+
+@contextlib.contextmanager
+def open_file(
+    file_name: str,
+    mode: str = "r",
+    *,
+    encoding: Optional[str] = None,
+    byte_range: Optional[Tuple[int, Optional[int]]] = None,
+    aws_profile: Optional[AwsProfile] = None,
+    num_threads: int = _TRANSFER_NUM_THREADS,
+    part_size_in_bytes: int = _TRANSFER_PART_SIZE_IN_BYTES,
+) -> Iterator[IO]:
+    """
+    Open a local or S3 file as a stream.
+
+    Unlike `from_file()` and `to_file()`, the content is never entirely in
+    memory, so that large files can be processed line by line or in chunks,
+    e.g.,
+    ```
+    with hs3.open_file(file_name, aws_profile=aws_profile) as f:
+        for line in f:
+            ...
+    ```
+    Files ending with `.gz` or `.gzip` are decompressed when read and
+    compressed when written.
+
+    :param file_name: S3 or local path
+    :param mode: "r" or "w" for text, "rb" or "wb" for bytes
+    :param encoding: encoding of the text
+    :param byte_range: range `[start, end)` of bytes to read, where `end` is
+        `None` to read until the end of the file
+        - Not supported for gzipped files
+    :param aws_profile: AWS profile to use if and only if using an S3 path,
+        otherwise `None` for local path
+    :param num_threads: number of parts uploaded concurrently when writing on
+        S3 with an AWS profile name
+        - When `aws_profile` is a s3fs filesystem the parts are uploaded by
+          `s3fs` one at a time
+    :param part_size_in_bytes: size of the parts read from or written to S3
+    """
+    dassert_is_valid_aws_profile(file_name, aws_profile)
+    hdbg.dassert_in(mode, ("r", "rb", "w", "wb"))
+    is_read = mode.startswith("r")
+    use_gzip = file_name.endswith((".gz", ".gzip"))
+    if byte_range is not None:
+        hdbg.dassert(is_read, "Byte ranges are supported only for reading")
+        hdbg.dassert(
+            not use_gzip, "Byte ranges of gzipped files are not supported"
+        )
+    try:
+        with contextlib.ExitStack() as stack:
+            file: IO
+            if is_read:
+                file = _open_binary_reader(
+                    file_name, byte_range, aws_profile, part_size_in_bytes
+                )
+                stack.enter_context(file)
+            elif not is_s3_path(file_name):
+                hio.create_enclosing_dir(file_name, incremental=True)
+                # pylint: disable=consider-using-with
+                file = stack.enter_context(open(file_name, "wb"))
+            elif isinstance(aws_profile, str):
+                s3_client = get_s3_client(aws_profile)
+                file = stack.enter_context(
+                    _open_s3_upload_stream(
+                        file_name, s3_client, num_threads, part_size_in_bytes
+                    )
+                )
+            else:
+                s3fs_ = get_s3fs(aws_profile)
+                file = stack.enter_context(
+                    s3fs_.open(file_name, "wb", block_size=part_size_in_bytes)
+                )
+            if use_gzip:
+                gzip_mode = "rb" if is_read else "wb"
+                file = stack.enter_context(
+                    gzip.GzipFile(fileobj=file, mode=gzip_mode)
+                )
+            if "b" not in mode:
+                file = stack.enter_context(
+                    io.TextIOWrapper(file, encoding=encoding)
+                )
+            yield file
+    finally:
+        if not is_read and is_s3_path(file_name):
+            _invalidate_s3_caches(file_name, aws_profile)
+
+
 # TODO(Nina): consider adding support for handling dirs.
 # TODO(Grisha): consider extending for the regular file system.
 def copy_file_to_s3(
@@ -477,6 +965,7 @@ def copy_file_to_s3(
         aws_s3_cp_cmd += f" --profile {aws_profile}"
     _LOG.info("Copying from %s to %s", file_path, s3_dst_file_path)
     hsystem.system(aws_s3_cp_cmd, suppress_output=False)
+    invalidate_s3_listing_cache(s3_dst_file_path)
 
 
 def get_local_or_s3_stream(
@@ -742,7 +1231,13 @@ def get_latest_pq_in_s3_dir(s3_path: str, aws_profile: str) -> str:
     hdbg.dassert_type_is(aws_profile, str)
     s3fs_ = get_s3fs(aws_profile)
     dir_name = f"{s3_path}/**/*.parquet"
-    pq_files = s3fs_.glob(dir_name, detail=True)
+    pq_files = _get_s3_listing(
+        "glob",
+        s3fs_,
+        s3_path,
+        ("**/*.parquet", None),
+        lambda: s3fs_.glob(dir_name, detail=True),
+    )
     hdbg.dassert_lte(1, len(pq_files), "dir_name=%s", dir_name)
     _LOG.debug("pq_files=%s", pq_files)
     # Sort the files by the date they were modified for the last time.
@@ -921,7 +1416,13 @@ def generate_aws_files(
 
 
 def archive_data_on_s3(
-    src_dir: str, s3_path: str, aws_profile: Optional[str], tag: str = ""
+    src_dir: str,
+    s3_path: str,
+    aws_profile: Optional[str],
+    tag: str = "",
+    *,
+    num_threads: int = _TRANSFER_NUM_THREADS,
+    part_size_in_bytes: int = _TRANSFER_PART_SIZE_IN_BYTES,
 ) -> str:
     """
     Compress dir `src_dir` and save it on AWS S3 under `s3_path`.
@@ -930,12 +1431,18 @@ def archive_data_on_s3(
     The tgz is created so that when expanded a dir with the name `src_dir` is
     created.
 
+    The tgz is streamed to S3 while it is created, without storing it on the
+    local disk, using a concurrent multipart upload.
+
     :param src_dir: directory that will be compressed
     :param s3_path: full S3 path starting with `s3://`
     :param aws_profile: the profile to use. We use a string and not an
         `AwsProfile` since this is typically the outermost caller in the stack,
         and it doesn't reuse an S3 fs object
     :param tag: a tag to add to the name of the file
+    :param num_threads: number of parts uploaded concurrently
+    :param part_size_in_bytes: size of the parts of the upload
+    :return: path of the tgz file on S3
     """
     _LOG.info(
         "# Archiving '%s' to '%s' with aws_profile='%s'",
@@ -952,64 +1459,96 @@ def archive_data_on_s3(
     )
     # Add a timestamp if needed.
     dst_path = hsystem.append_timestamp_tag(src_dir, tag) + ".tgz"
-    # Compress the dir.
-    # > (cd .../TestRunExperimentArchiveOnS3.test_serial1; \
-    #    tar cvzf /app/.../TestRunExperimentArchiveOnS3.test_serial1.tgz experiment.RH1E)
+    s3_file_path = os.path.join(s3_path, os.path.basename(dst_path))
+    # Compress the dir, so that the package expands to the original dir.
+    # > tar tzf .../TestRunExperimentArchiveOnS3.test_serial1.tgz
     # experiment.RH1E/
     # experiment.RH1E/log.20210802-123758.txt
     # experiment.RH1E/output_metadata.json
     # ...
-    _LOG.debug("Destination path is '%s'", dst_path)
-    with htimer.TimedScope(logging.INFO, "Compressing"):
-        dir_name = os.path.dirname(src_dir)
-        base_name = os.path.basename(src_dir)
-        hdbg.dassert_ne(base_name, "", "src_dir=%s", src_dir)
-        cmd = ""
-        if dir_name != "":
-            cmd += f"cd {dir_name} && "
-        cmd += f"tar czf {dst_path} {base_name}"
-        hsystem.system(cmd)
-    _LOG.info(
-        "The size of '%s' is %s",
-        dst_path,
-        hsystem.du(dst_path, human_format=True),
-    )
-    # Test expanding the tgz. The package should expand to the original dir.
-    # > tar tf /app/.../TestRunExperimentArchiveOnS3.test_serial1.tgz
-    # experiment.RH1E/
-    # experiment.RH1E/log.20210802-123758.txt
-    # experiment.RH1E/output_metadata.json
-    _LOG.info("Testing archive")
-    cmd = f"tar tvf {dst_path}"
-    hsystem.system(cmd, log_level=logging.INFO, suppress_output=False)
-    # Copy to S3.
-    s3_file_path = os.path.join(s3_path, os.path.basename(dst_path))
-    _LOG.info("Copying '%s' to '%s'", dst_path, s3_file_path)
-    hdbg.dassert_file_exists(dst_path)
-    s3fs_ = get_s3fs(aws_profile)
+    _LOG.info("Compressing and copying '%s' to '%s'", src_dir, s3_file_path)
+    s3_client = get_s3_client(aws_profile)
     # TODO(gp): Make sure the S3 dir exists.
-    s3fs_.put(dst_path, s3_file_path)
+    base_name = os.path.basename(src_dir)
+    hdbg.dassert_ne(base_name, "", "src_dir=%s", src_dir)
+    with htimer.TimedScope(logging.INFO, "Compressing and copying"):
+        with _open_s3_upload_stream(
+            s3_file_path, s3_client, num_threads, part_size_in_bytes
+        ) as dst_file:
+            with tarfile.open(fileobj=dst_file, mode="w|gz") as tar:
+                tar.add(src_dir, arcname=base_name)
+    _invalidate_s3_caches(s3_file_path, aws_profile)
+    bucket, abs_path = split_path(s3_file_path)
+    size = s3_client.head_object(Bucket=bucket, Key=abs_path.lstrip("/"))[
+        "ContentLength"
+    ]
+    _LOG.info("The size of '%s' is %s", s3_file_path, hintros.format_size(size))
     _LOG.info("Data archived on S3 to '%s'", s3_file_path)
     return s3_file_path
 
 
 def copy_data_from_s3_to_local_dir(
-    src_s3_dir: str, dst_local_dir: str, aws_profile: str
+    src_s3_dir: str,
+    dst_local_dir: str,
+    aws_profile: str,
+    *,
+    num_threads: int = _TRANSFER_NUM_THREADS,
+    part_size_in_bytes: int = _TRANSFER_PART_SIZE_IN_BYTES,
 ) -> None:
     """
     Copy data from S3 to a local dir.
 
+    Like `aws s3 sync`, the files with a local copy of the same size more
+    recent than the S3 one are not copied again. The files are downloaded
+    concurrently, splitting the large files in parts downloaded concurrently.
+
     :param src_s3_dir: path on S3 storing the data to copy
-    :param scratch_space_path: local path on scratch space
+    :param dst_local_dir: local dir to copy the data to
     :param aws_profile: AWS profile to use
+    :param num_threads: number of files or parts downloaded concurrently
+    :param part_size_in_bytes: size of the parts of the downloads
     """
+    import helpers.haws as haws
+
     _LOG.debug(
         "Copying input data from %s to %s",
         src_s3_dir,
         dst_local_dir,
     )
-    cmd = f"aws s3 sync {src_s3_dir} {dst_local_dir} --profile {aws_profile}"
-    hsystem.system(cmd, suppress_output=False, log_level="PRINT")
+    dassert_is_s3_path(src_s3_dir)
+    bucket, abs_path = split_path(src_s3_dir)
+    prefix = abs_path.strip("/")
+    if prefix:
+        # Don't match the dirs with the same prefix, e.g., `dir2` for `dir`.
+        prefix += "/"
+    s3_client = get_s3_client(aws_profile)
+    objects = haws.list_all_objects(s3_client, bucket, prefix)
+    # Find the files to download.
+    files = []
+    for obj in objects:
+        if obj["Key"].endswith("/"):
+            # Skip the markers of the dirs.
+            continue
+        dst_file = os.path.join(dst_local_dir, obj["Key"][len(prefix) :])
+        if (
+            os.path.exists(dst_file)
+            and os.path.getsize(dst_file) == obj["Size"]
+            and os.path.getmtime(dst_file) >= obj["LastModified"].timestamp()
+        ):
+            _LOG.debug("Skipping up to date file '%s'", dst_file)
+            continue
+        files.append((obj["Key"], dst_file))
+    _LOG.info("Copying %s files out of %s", len(files), len(objects))
+    # Download the files.
+    with _get_transfer_manager(
+        s3_client, num_threads, part_size_in_bytes
+    ) as manager:
+        futures = []
+        for key, dst_file in files:
+            hio.create_enclosing_dir(dst_file, incremental=True)
+            futures.append(manager.download(bucket, key, dst_file))
+        for future in futures:
+            future.result()
 
 
 def retrieve_archived_data_from_s3(
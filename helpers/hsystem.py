@@ -7,13 +7,17 @@ Import as:
 import helpers.hsystem as hsystem
 """
 
+import asyncio
 import contextlib
+import dataclasses
 import datetime
 import getpass
 import glob
+import io
 import logging
 import os
 import re
+import shlex
 import signal
 import subprocess
 import sys
@@ -22,6 +26,8 @@ from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
+    Dict,
+    IO,
     Generator,
     List,
     Match,
@@ -137,9 +143,40 @@ def get_env_var(env_var_name: str) -> str:
 # #############################################################################
 
 
+def _read_output(
+    stream: IO[bytes], suppress_output: bool, tee_file: Optional[IO[str]]
+) -> str:
+    """
+    Read the output of a process as it is produced, until the process closes
+    it.
+
+    The lines are accumulated in a list and joined at the end, so that the
+    time to capture the output is linear in its size.
+
+    :param stream: stream with the output of the process
+    :param suppress_output: whether to print the lines as they are read
+    :param tee_file: file to append the lines to as they are read
+    :return: output of the process
+    """
+    lines = []
+    # Decode incrementally and split the lines only on `\n`, without
+    # translating the line endings.
+    with io.TextIOWrapper(
+        stream, encoding="utf-8", errors="replace", newline="\n"
+    ) as text_stream:
+        for line in text_stream:
+            if not suppress_output:
+                print("  ... " + line.rstrip("\n"))
+            if tee_file is not None:
+                tee_file.write(line)
+            lines.append(line)
+    output = "".join(lines)
+    return output
+
+
 # pylint: disable=too-many-branches,too-many-statements,too-many-arguments,too-many-locals
 def _system(
-    cmd: str,
+    cmd: Union[str, List[str]],
     print_command: Union[bool, str],
     abort_on_error: bool,
     suppress_error: Optional[Any],
@@ -174,8 +211,9 @@ def _system(
         suppress_output = not show_output
     _LOG.trace(hprint.to_str("suppress_output"))
     # Prepare the command line.
-    cmd = f"({cmd})"
     hdbg.dassert_imply(tee, output_file is not None)
+    # The output is teed while reading it, which requires blocking.
+    hdbg.dassert_imply(tee, blocking)
     if output_file is not None:
         # Redirect to a file.
         dir_name = os.path.dirname(output_file)
@@ -185,62 +223,90 @@ def _system(
             _LOG.trace("Dir '%s' doesn't exist: creating", dir_name)
             hdbg.dassert(bool(dir_name), "dir_name='%s'", dir_name)
             os.makedirs(dir_name)
-        if tee:
-            cmd += f" 2>&1 | tee -a {output_file};"
-            cmd += " exit ${PIPESTATUS[0]}"
-        else:
+    if isinstance(cmd, list) and wrapper:
+        # The wrapper needs a shell to run.
+        cmd = shlex.join(cmd)
+    use_shell = isinstance(cmd, str)
+    if use_shell:
+        cmd = f"({cmd})"
+        if output_file is not None and not tee:
             cmd += f" 2>&1 >{output_file}"
+        else:
+            # Merge stderr into stdout. The output is teed to `output_file`
+            # while it is read.
+            cmd += " 2>&1"
+        # Handle `wrapper`.
+        if wrapper:
+            cmd = wrapper + " && " + cmd
+        cmd_as_str = cmd
     else:
-        # Do not redirect to a file.
-        cmd += " 2>&1"
-    # Handle `wrapper`.
-    if wrapper:
-        cmd = wrapper + " && " + cmd
+        # Run the command directly without a shell.
+        hdbg.dassert_lte(1, len(cmd))
+        cmd_as_str = shlex.join(cmd)
     # Handle `log_level`.
     if isinstance(log_level, str):
         hdbg.dassert_in(log_level, ("PRINT", "PRINT_FRAME"))
         if log_level == "PRINT_FRAME":
-            print(hprint.frame(hprint.color_highlight(f"> {cmd}", "green")))
+            print(
+                hprint.frame(hprint.color_highlight(f"> {cmd_as_str}", "green"))
+            )
         elif log_level == "PRINT":
-            print(hprint.color_highlight(f"> {cmd}", "green"))
+            print(hprint.color_highlight(f"> {cmd_as_str}", "green"))
         else:
             raise ValueError(f"Invalid log_level='{log_level}'")
-        _LOG.trace("> %s", cmd)
+        _LOG.trace("> %s", cmd_as_str)
     else:
-        _LOG.log(log_level, "%s", hprint.color_highlight(f"> {cmd}", "green"))
+        _LOG.log(
+            log_level, "%s", hprint.color_highlight(f"> {cmd_as_str}", "green")
+        )
     output = ""
     # Handle `dry_run`.
     if dry_run:
-        _LOG.warning("As per user request, not executing command:\n%s", cmd)
+        _LOG.warning(
+            "As per user request, not executing command:\n%s", cmd_as_str
+        )
         rc = 0
         return rc, output
     # Execute the command.
     try:
-        stdout = subprocess.PIPE
-        stderr = subprocess.STDOUT
         hdbg.dassert_in(print_command, ("ON_DEBUG_LEVEL", True, False))
         if isinstance(print_command, bool):
             if print_command is True:
-                _LOG.info("%s", hprint.color_highlight(f"> {cmd}", "green"))
-        with subprocess.Popen(
-            cmd,
-            shell=True,
-            executable="/bin/bash",
-            stdout=stdout,
-            stderr=stderr,
-        ) as p:
-            output = ""
+                _LOG.info(
+                    "%s", hprint.color_highlight(f"> {cmd_as_str}", "green")
+                )
+        with contextlib.ExitStack() as stack:
+            stdout: Union[int, IO[str]] = subprocess.PIPE
+            stderr = subprocess.STDOUT
+            tee_file = None
+            if tee:
+                # Append the output to the file while reading it, like
+                # `tee -a`.
+                tee_file = stack.enter_context(
+                    open(output_file, "a", buffering=1)
+                )
+            elif output_file is not None and not use_shell:
+                # Like `2>&1 >{output_file}`, i.e., send stdout to the file
+                # and capture stderr.
+                stdout = stack.enter_context(open(output_file, "w"))
+                stderr = subprocess.PIPE
+            p = stack.enter_context(
+                subprocess.Popen(
+                    cmd,
+                    shell=use_shell,
+                    executable="/bin/bash" if use_shell else None,
+                    stdout=stdout,
+                    stderr=stderr,
+                )
+            )
+            output_stream = p.stdout if p.stdout is not None else p.stderr
             if blocking:
                 # Blocking call: get the output.
-                while True:
-                    line = p.stdout.readline().decode("utf-8", errors="replace")  # type: ignore
-                    if not line:
-                        break
-                    if not suppress_output:
-                        # print("  ==> " + line.rstrip("\n"))
-                        print("  ... " + line.rstrip("\n"))
-                    output += line
-                p.stdout.close()  # type: ignore
+                output = _read_output(
+                    output_stream,  # type: ignore[arg-type]
+                    bool(suppress_output),
+                    tee_file,
+                )
                 rc = p.wait()
             else:
                 # Not blocking.
@@ -274,7 +340,9 @@ def _system(
         msg = []
         msg.append("\n" + hprint.frame("_system() failed", thickness=2))
         msg.append(hprint.func_signature_to_str())
-        msg.append(hprint.frame(f"cmd='{cmd}'", char1="%", thickness=1))
+        msg.append(
+            hprint.frame(f"cmd='{cmd_as_str}'", char1="%", thickness=1)
+        )
         msg.append(f"- rc='{rc}'")
         msg.append(f"- output='\n{output_error}'")
         # Save the output in a file.
@@ -286,7 +354,7 @@ def _system(
         file_name = "tmp.system_cmd.sh"
         msg.append(f"- Command saved in '{file_name}'")
         with open(file_name, "w") as f:
-            f.write(cmd)
+            f.write(cmd_as_str)
         os.chmod(file_name, 0o755)
         #
         msg = "\n".join(msg)
@@ -297,7 +365,7 @@ def _system(
 
 # pylint: disable=too-many-arguments
 def system(
-    cmd: str,
+    cmd: Union[str, List[str]],
     *,
     print_command: Union[str, bool] = "ON_DEBUG_LEVEL",
     abort_on_error: bool = True,
@@ -314,7 +382,10 @@ def system(
     """
     Execute a shell command, without capturing its output.
 
-    :param cmd: string with command to execute
+    :param cmd: command to execute
+        - a string is executed through `bash`
+        - a list of arguments (e.g., `["git", "log"]`) is executed directly
+          without paying for a shell process
     :param print_command: whether to print the command using `_LOG.info()`
         - If "ON_DEBUG_LEVEL" then print the command if the log level is DEBUG
     :param abort_on_error: whether we should assert in case of error or not
@@ -327,7 +398,7 @@ def system(
     :param num_error_lines: number of lines of the output to display when
         raising `RuntimeError`
     :param tee: if True, tee append (i.e., `tee -a`) stdout and stderr to
-        `output_file`
+        `output_file` while the command runs
     :param dry_run: print the final command but not execute it
     :param log_level: print the command to execute at level "log_level".
         - If `echo` then print the command line to screen as `print()` and not
@@ -338,7 +409,8 @@ def system(
     """
     # print("cmd=", cmd)
     # print("suppress_output=", suppress_output)
-    cmd = hprint.dedent(cmd)
+    if isinstance(cmd, str):
+        cmd = hprint.dedent(cmd)
     rc, _ = _system(
         cmd,
         print_command=print_command,
@@ -370,7 +442,7 @@ def system(
 
 
 def system_to_string(
-    cmd: str,
+    cmd: Union[str, List[str]],
     *,
     print_command: Union[bool, str] = "ON_DEBUG_LEVEL",
     abort_on_error: bool = True,
@@ -403,6 +475,272 @@ def system_to_string(
     return rc, output
 
 
+# #############################################################################
+# async_system(), system_concurrently()
+# #############################################################################
+
+
+@dataclasses.dataclass(frozen=True)
+class CommandResult:
+    """
+    Result of a command executed by `async_system()`.
+    """
+
+    cmd: Union[str, List[str]]
+    rc: int
+    stdout: str
+    stderr: str
+    # Wall-clock time to execute the command.
+    duration_in_secs: float
+    # Whether the command was killed for exceeding its timeout.
+    timed_out: bool = False
+
+
+def _raise_command_errors(
+    func_name: str, results: List[CommandResult], num_error_lines: int
+) -> None:
+    """
+    Raise `RuntimeError` reporting the commands that failed, if any.
+
+    :param func_name: name of the function reporting the errors
+    :param results: results of the executed commands
+    :param num_error_lines: number of lines of stdout and stderr to report for
+        each failed command
+    """
+    failed_results = [result for result in results if result.rc != 0]
+    if not failed_results:
+        return
+    msg = []
+    msg.append(
+        "\n"
+        + hprint.frame(
+            f"{func_name}() failed: {len(failed_results)} / {len(results)} "
+            "commands",
+            thickness=2,
+        )
+    )
+    for result in failed_results:
+        cmd = result.cmd
+        cmd_as_str = cmd if isinstance(cmd, str) else shlex.join(cmd)
+        msg.append(hprint.frame(f"cmd='{cmd_as_str}'", char1="%", thickness=1))
+        msg.append(f"- rc='{result.rc}'")
+        if result.timed_out:
+            msg.append(f"- timed out after {result.duration_in_secs:.1f} secs")
+        for name, txt in (("stdout", result.stdout), ("stderr", result.stderr)):
+            txt = "\n".join(txt.rstrip("\n").split("\n")[-num_error_lines:])
+            msg.append(f"- {name}='\n{txt}'")
+    raise RuntimeError("\n".join(msg))
+
+
+async def _wait_for_process(
+    cmd: Union[str, List[str]],
+    process: asyncio.subprocess.Process,
+    start_time: float,
+    timeout_in_secs: Optional[float],
+) -> CommandResult:
+    """
+    Wait for a process started by `async_system()` and collect its result.
+
+    See `async_system()` for the params.
+    """
+    # Read the output in tasks that survive the timeout, instead of using
+    # `communicate()`, so that the output produced before the timeout is
+    # reported.
+    readers = [
+        asyncio.ensure_future(stream.read())
+        for stream in (process.stdout, process.stderr)
+    ]
+    completion = asyncio.gather(*readers, process.wait())
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            asyncio.shield(completion), timeout=timeout_in_secs
+        )
+    except asyncio.TimeoutError:
+        cmd_as_str = cmd if isinstance(cmd, str) else shlex.join(cmd)
+        _LOG.warning(
+            "Killing command after %s secs: %s", timeout_in_secs, cmd_as_str
+        )
+        timed_out = True
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        # The readers reach the end of the output when the processes of the
+        # group exit.
+        await completion
+    except asyncio.CancelledError:
+        # Don't leave the process running when the caller gives up.
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        completion.cancel()
+        # Wait for the process to exit only for a bounded time, since its
+        # exit might never be reported if the event loop is shutting down
+        # (e.g., when `asyncio.run()` cancels the pending tasks).
+        with contextlib.suppress(asyncio.TimeoutError, asyncio.CancelledError):
+            await asyncio.wait_for(process.wait(), timeout=1)
+        raise
+    stdout, stderr = (reader.result() for reader in readers)
+    duration_in_secs = time.monotonic() - start_time
+    rc = process.returncode
+    hdbg.dassert_is_not(rc, None)
+    result = CommandResult(
+        cmd=cmd,
+        rc=cast(int, rc),
+        stdout=stdout.decode("utf-8", errors="replace"),
+        stderr=stderr.decode("utf-8", errors="replace"),
+        duration_in_secs=duration_in_secs,
+        timed_out=timed_out,
+    )
+    return result
+
+
+async def async_system(
+    cmd: Union[str, List[str]],
+    *,
+    timeout_in_secs: Optional[float] = None,
+    abort_on_error: bool = True,
+    num_error_lines: int = 30,
+    log_level: int = logging.DEBUG,
+) -> CommandResult:
+    """
+    Execute a command without blocking the event loop, capturing its output.
+
+    Unlike `system()`, stdout and stderr are captured separately and the
+    output is not printed. A command that can't be started (e.g., because the
+    executable doesn't exist) fails with `rc=-1` and the error in `stderr`.
+
+    :param cmd: command to execute
+        - a string is executed through `bash`
+        - a list of arguments is executed directly without a shell
+    :param timeout_in_secs: kill the command if it doesn't complete within
+        this time, reporting it as failed with the output produced until then
+        - `None` to wait indefinitely
+    :param abort_on_error: raise `RuntimeError` if the command fails
+    :param num_error_lines: number of lines of the output to report when
+        raising `RuntimeError`
+    :param log_level: level to log the command to execute at
+    :return: result of the command
+    """
+    if isinstance(cmd, str):
+        cmd_as_str = cmd
+    else:
+        hdbg.dassert_lte(1, len(cmd))
+        cmd_as_str = shlex.join(cmd)
+    _LOG.log(log_level, "%s", hprint.color_highlight(f"> {cmd_as_str}", "green"))
+    # Start the command in a new session, so that on timeout we can kill the
+    # entire process group, including the children spawned by the shell.
+    kwargs: Dict[str, Any] = {
+        "stdout": asyncio.subprocess.PIPE,
+        "stderr": asyncio.subprocess.PIPE,
+        "start_new_session": True,
+    }
+    start_time = time.monotonic()
+    try:
+        if isinstance(cmd, str):
+            process = await asyncio.create_subprocess_shell(
+                cmd, executable="/bin/bash", **kwargs
+            )
+        else:
+            process = await asyncio.create_subprocess_exec(*cmd, **kwargs)
+    except OSError as e:
+        # The command can't be started (e.g., the executable doesn't exist):
+        # report it as failed, like `system()` does.
+        _LOG.debug("Can't start command '%s': %s", cmd_as_str, e)
+        result = CommandResult(
+            cmd=cmd,
+            rc=-1,
+            stdout="",
+            stderr=str(e),
+            duration_in_secs=time.monotonic() - start_time,
+        )
+    else:
+        result = await _wait_for_process(
+            cmd, process, start_time, timeout_in_secs
+        )
+    _LOG.trace("  ==> %s", result)
+    if abort_on_error:
+        _raise_command_errors("async_system", [result], num_error_lines)
+    return result
+
+
+async def async_system_concurrently(
+    cmds: List[Union[str, List[str]]],
+    *,
+    max_concurrency: int = 8,
+    timeout_in_secs: Optional[float] = None,
+    abort_on_error: bool = True,
+    num_error_lines: int = 30,
+    log_level: int = logging.DEBUG,
+) -> List[CommandResult]:
+    """
+    Execute commands concurrently, running at most `max_concurrency` of them
+    at the same time.
+
+    All the commands are executed, even if some of them fail.
+
+    :param cmds: commands to execute, like in `async_system()`
+    :param max_concurrency: maximum number of commands running at once
+    :param timeout_in_secs: timeout for each command, like in `async_system()`
+    :param abort_on_error: raise `RuntimeError` after all the commands
+        completed, if any of them failed
+    :return: results of the commands in the same order as `cmds`
+    """
+    hdbg.dassert_isinstance(cmds, list)
+    hdbg.dassert_lte(1, max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(cmd: Union[str, List[str]]) -> CommandResult:
+        async with semaphore:
+            result = await async_system(
+                cmd,
+                timeout_in_secs=timeout_in_secs,
+                abort_on_error=False,
+                log_level=log_level,
+            )
+        return result
+
+    results = list(await asyncio.gather(*[_run(cmd) for cmd in cmds]))
+    if abort_on_error:
+        _raise_command_errors("system_concurrently", results, num_error_lines)
+    return results
+
+
+def system_concurrently(
+    cmds: List[Union[str, List[str]]],
+    *,
+    max_concurrency: int = 8,
+    timeout_in_secs: Optional[float] = None,
+    abort_on_error: bool = True,
+    num_error_lines: int = 30,
+    log_level: int = logging.DEBUG,
+) -> List[CommandResult]:
+    """
+    Execute commands concurrently from synchronous code.
+
+    E.g., overlap the execution of independent tools:
+    ```
+    results = system_concurrently(
+        [["jupytext", "--sync", file_name] for file_name in file_names],
+        max_concurrency=4,
+    )
+    ```
+
+    This can't be called from a running event loop (e.g., in a notebook or in
+    async code), where `async_system_concurrently()` should be used instead.
+
+    See `async_system_concurrently()` for the params.
+    """
+    coroutine = async_system_concurrently(
+        cmds,
+        max_concurrency=max_concurrency,
+        timeout_in_secs=timeout_in_secs,
+        abort_on_error=abort_on_error,
+        num_error_lines=num_error_lines,
+        log_level=log_level,
+    )
+    results = asyncio.run(coroutine)
+    return results
+
+
 # #############################################################################
 # system_to_one_line()
 # #############################################################################
@@ -749,14 +1087,30 @@ def find_file_in_repo(file_name: str, *, root_dir: Optional[str] = None) -> str:
     """
     Find file in the repo.
     """
+    # Import here to avoid a circular dependency, since `hfile_index` depends
+    # on this module.
+    import helpers.hfile_index as hfilinde
+
     if root_dir is None:
         import helpers.hgit as hgit
 
         root_dir = hgit.find_git_root()
-    _, file_name_out = system_to_one_line(
-        rf"find {root_dir} -name {file_name} -not -path '*/\.git/*'"
+    file_index = hfilinde.get_file_index(root_dir)
+    file_names = [
+        os.path.join(root_dir, path)
+        for path in file_index.find_by_basename(
+            file_name, use_relative_paths=True
+        )
+    ]
+    # Remove the annoying spurious matches, like in `get_first_line()`.
+    file_names = [
+        file_name_ for file_name_ in file_names if "/tmp.base/" not in file_name_
+    ]
+    hdbg.dassert_ne(
+        len(file_names), 0, "File not found in repo: '%s'", file_name
     )
-    hdbg.dassert_ne(file_name_out, "", "File not found in repo: '%s'", file_name)
+    hdbg.dassert_eq(len(file_names), 1, "Found multiple files: %s", file_names)
+    file_name_out: str = file_names[0]
     return file_name_out
 
 
@@ -715,13 +715,8 @@ def get_dir_signature(
     # Find all the files under `dir_name`.
     _LOG.debug("dir_name=%s", dir_name)
     hdbg.dassert_path_exists(dir_name)
-    cmd = f'find {dir_name} -name "*"'
-    remove_files_non_present = False
-    dir_name_tmp = None
-    file_names = hsystem.system_to_files(
-        cmd, dir_name_tmp, remove_files_non_present
-    )
-    file_names = sorted(file_names)
+    file_names = hio.find_paths(dir_name)
+    file_names = sorted(map(os.path.normpath, file_names))
     # Save the directory / file structure.
     txt.append("# Dir structure")
     txt.append("\n".join(map(_remove_dir_name, file_names)))
@@ -709,6 +709,14 @@ def capture_sys_calls(
         _handle_side_effect()
         return (0, "")
 
+    def mock_hsystem_system_concurrently(
+        *args: Any, **kwargs: Any
+    ) -> List[hsystem.CommandResult]:
+        _mock_sys_call("hsystem.system_concurrently", *args, **kwargs)
+        _handle_side_effect()
+        cmds = args[0] if args else kwargs["cmds"]
+        return [hsystem.CommandResult(cmd, 0, "", "", 0.0) for cmd in cmds]
+
     with (
         mock.patch("subprocess.run", side_effect=mock_subprocess_run),
         mock.patch("helpers.hsystem.system", side_effect=mock_hsystem_system),
@@ -716,6 +724,10 @@ def capture_sys_calls(
             "helpers.hsystem.system_to_string",
             side_effect=mock_hsystem_system_to_string,
         ),
+        mock.patch(
+            "helpers.hsystem.system_concurrently",
+            side_effect=mock_hsystem_system_concurrently,
+        ),
     ):
         yield sys_calls
 
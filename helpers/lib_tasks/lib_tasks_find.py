@@ -16,6 +16,7 @@ from invoke import task
 # We want to minimize the dependencies from non-standard Python packages since
 # this code needs to run with minimal dependencies and without Docker.
 import helpers.hdbg as hdbg
+import helpers.hfile_index as hfilinde
 import helpers.hio as hio
 import helpers.hlist as hlist
 import helpers.hprint as hprint
@@ -158,10 +159,13 @@ def find_test_class(
 
 @functools.lru_cache()
 def _get_python_files(subdir: str) -> List[str]:
-    pattern = "*.py"
-    only_files = False
-    use_relative_paths = False
-    python_files = hio.listdir(subdir, pattern, only_files, use_relative_paths)
+    file_index = hfilinde.get_file_index(subdir)
+    python_files = [
+        os.path.join(subdir, path)
+        for path in file_index.get_paths(
+            patterns=["*.py"], use_relative_paths=True
+        )
+    ]
     # Remove tmp files.
     python_files = [f for f in python_files if not f.startswith("tmp")]
     return python_files
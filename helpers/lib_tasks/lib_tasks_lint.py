@@ -89,12 +89,17 @@ def lint_check_python_files_in_docker(  # type: ignore
                 msg = f"'{file_name}' doesn't compile correctly"
                 _LOG.error(msg)
                 failed_filenames.append(file_name)
-        # TODO(gp): Add also `python -c "import ..."`, if not equivalent to `compileall`.
-        if python_execute:
-            cmd = f"python {file_name}"
-            rc = hsystem.system(cmd, abort_on_error=False, suppress_output=False)
-            _LOG.debug("file_name='%s' -> python_compile=%s", file_name, rc)
-            if rc != 0:
+    # TODO(gp): Add also `python -c "import ..."`, if not equivalent to `compileall`.
+    if python_execute:
+        # The files are executed independently, so run them concurrently.
+        cmds = [f"python {file_name}" for file_name in file_list]
+        results = hsystem.system_concurrently(cmds, abort_on_error=False)
+        for file_name, result in zip(file_list, results):
+            _LOG.debug(
+                "file_name='%s' -> python_execute=%s", file_name, result.rc
+            )
+            if result.rc != 0:
+                print(result.stdout + result.stderr)
                 msg = f"'{file_name}' doesn't execute correctly"
                 _LOG.error(msg)
                 failed_filenames.append(file_name)
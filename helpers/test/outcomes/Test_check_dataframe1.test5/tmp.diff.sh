@@ -0,0 +1,8 @@
+#!/bin/bash
+if [[ $1 == "wrap" ]]; then
+    cmd='vimdiff -c "windo set wrap"'
+else
+    cmd='vimdiff'
+fi;
+cmd="$cmd helpers/test/outcomes/Test_check_dataframe1.test5/tmp.final.actual.txt helpers/test/outcomes/Test_check_dataframe1.test5/tmp.final.expected.txt"
+eval $cmd
\ No newline at end of file
@@ -1,6 +1,11 @@
+import asyncio
+import concurrent.futures
 import copy
 import logging
+import multiprocessing
 import os
+import threading
+import time
 import unittest.mock as umock
 from typing import Any, Dict
 
@@ -37,6 +42,18 @@ def _cached_pickle_square(x: int) -> int:
     return res
 
 
+@hcacsimp.simple_cache(cache_type="sqlite")
+def _cached_sqlite_cube(x: int) -> int:
+    """
+    Return the cube of the input and cache it using SQLite.
+
+    :param x: input integer to be cubed
+    :return: cubed value (x**3)
+    """
+    res = x**3
+    return res
+
+
 @hcacsimp.simple_cache(cache_type="json")
 def _cached_multi_arg_sum(a: int, b: int) -> int:
     """
@@ -145,6 +162,9 @@ class _BaseCacheTest(hunitest.TestCase):
         )
         self.monkeypatch.setattr(hcacsimp, "_CACHE_PERF", {})
         self.monkeypatch.setattr(hcacsimp, "_S3_AUTO_PULL_ATTEMPTED", set())
+        self.monkeypatch.setattr(hcacsimp, "_SQLITE_CONNECTIONS", {})
+        self.monkeypatch.setattr(hcacsimp, "_CACHE_BOUNDS", {})
+        self.monkeypatch.setattr(hcacsimp, "_WRITE_BACK_STATE", {})
 
     def tear_down_test(self) -> None:
         """
@@ -154,6 +174,12 @@ class _BaseCacheTest(hunitest.TestCase):
         automatically restored after each test.
         """
         _LOG.debug("tear_down_test")
+        # Release the SQLite databases opened by the test.
+        hcacsimp._close_sqlite_connection()
+        # Stop the write-back timers started by the test.
+        for state in hcacsimp._WRITE_BACK_STATE.values():
+            if state["timer"] is not None:
+                state["timer"].cancel()
 
 
 # #############################################################################
@@ -588,6 +614,82 @@ class Test__cached_pickle_square(_BaseCacheTest):
         self.assertEqual(func_cache_data['{"args": [4], "kwargs": {}}'], 16)
 
 
+# #############################################################################
+# Test__cached_sqlite_cube
+# #############################################################################
+
+
+class Test__cached_sqlite_cube(_BaseCacheTest):
+    """
+    Test caching with the SQLite keyed store.
+    """
+
+    def test1(self) -> None:
+        """
+        Verify that a miss is written through to the SQLite database.
+        """
+        # Run test.
+        res: int = _cached_sqlite_cube(3)
+        # Check outputs.
+        self.assertEqual(res, 27)
+        cache_file = hcacsimp._get_cache_file_name("_cached_sqlite_cube")
+        self.assertTrue(cache_file.endswith(".db"))
+        func_cache_data = hcacsimp._load_func_cache_data_from_file(
+            cache_file, "sqlite"
+        )
+        self.assertEqual(func_cache_data, {'{"args": [3], "kwargs": {}}': 27})
+
+    def test2(self) -> None:
+        """
+        Verify that a hit is served from the database after the memory cache
+        is reset, without loading the other entries.
+        """
+        # Prepare inputs.
+        _cached_sqlite_cube(2)
+        _cached_sqlite_cube(4)
+        hcacsimp.reset_mem_cache("_cached_sqlite_cube")
+        hcacsimp.enable_cache_perf("_cached_sqlite_cube")
+        # Run test.
+        res: int = _cached_sqlite_cube(2)
+        # Check outputs.
+        self.assertEqual(res, 8)
+        perf = hcacsimp.get_cache_perf("_cached_sqlite_cube")
+        self.assertEqual(perf["hits"], 1)
+        mem_cache = hcacsimp.get_mem_cache("_cached_sqlite_cube")
+        self.assertEqual(mem_cache, {'{"args": [2], "kwargs": {}}': 8})
+
+    def test3(self) -> None:
+        """
+        Verify that flushing merges the memory cache into the database.
+        """
+        # Prepare inputs.
+        cache_file = hcacsimp._get_cache_file_name("_cached_sqlite_cube")
+        hcacsimp._save_func_cache_data_to_file(
+            cache_file, "sqlite", {'{"args": [5], "kwargs": {}}': 125}
+        )
+        hcacsimp.mock_cache("_cached_sqlite_cube", "key", (1, "a"))
+        # Run test.
+        hcacsimp.flush_cache_to_disk("_cached_sqlite_cube")
+        # Check outputs.
+        disk_cache = hcacsimp.get_disk_cache("_cached_sqlite_cube")
+        expected = {'{"args": [5], "kwargs": {}}': 125, "key": (1, "a")}
+        self.assertEqual(disk_cache, expected)
+
+    def test4(self) -> None:
+        """
+        Verify that resetting the disk cache removes the database.
+        """
+        # Prepare inputs.
+        _cached_sqlite_cube(6)
+        cache_file = hcacsimp._get_cache_file_name("_cached_sqlite_cube")
+        # Run test.
+        hcacsimp.reset_disk_cache("_cached_sqlite_cube", interactive=False)
+        # Check outputs.
+        self.assertFalse(os.path.exists(cache_file))
+        self.assertFalse(os.path.exists(cache_file + "-wal"))
+        self.assertEqual(hcacsimp.get_disk_cache("_cached_sqlite_cube"), {})
+
+
 # #############################################################################
 # Test__cached_refreshable_func
 # #############################################################################
@@ -1305,6 +1407,418 @@ class Test_write_through(_BaseCacheTest):
         self.assertEqual(disk_cache['{"args": [11], "kwargs": {}}'], 99)
 
 
+@hcacsimp.simple_cache(cache_type="json", write_through=True)
+def _concurrent_write_function(x: int) -> int:
+    """
+    Test function to verify concurrent writes to the disk cache.
+
+    :param x: input integer
+    :return: x * 3
+    """
+    res = x * 3
+    return res
+
+
+def _write_concurrently(start: int, num_calls: int) -> None:
+    """
+    Call `_concurrent_write_function()` on a range of inputs.
+
+    :param start: first input
+    :param num_calls: number of inputs
+    """
+    for x in range(start, start + num_calls):
+        _concurrent_write_function(x)
+
+
+# #############################################################################
+# Test_concurrent_access
+# #############################################################################
+
+
+class Test_concurrent_access(_BaseCacheTest):
+    """
+    Test that concurrent writers don't lose entries of the disk cache.
+    """
+
+    def set_up_test(self) -> None:
+        """
+        Setup operations to run before each test.
+        """
+        super().set_up_test()
+        hcacsimp.set_cache_property("_concurrent_write_function", "type", "json")
+
+    def test1(self) -> None:
+        """
+        Verify that processes writing through the same cache file don't lose
+        entries.
+        """
+        # Prepare inputs.
+        num_processes = 4
+        num_calls = 20
+        # Run test.
+        # Use `fork` so that the children inherit the test cache directory.
+        ctx = multiprocessing.get_context("fork")
+        processes = [
+            ctx.Process(
+                target=_write_concurrently, args=(i * num_calls, num_calls)
+            )
+            for i in range(num_processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        # Check outputs.
+        for process in processes:
+            self.assertEqual(process.exitcode, 0)
+        disk_cache = hcacsimp.get_disk_cache("_concurrent_write_function")
+        self.assertEqual(len(disk_cache), num_processes * num_calls)
+
+    def test2(self) -> None:
+        """
+        Verify that threads writing through the same cache don't lose entries.
+        """
+        # Prepare inputs.
+        num_threads = 4
+        num_calls = 20
+        # Run test.
+        with concurrent.futures.ThreadPoolExecutor(num_threads) as executor:
+            futures = [
+                executor.submit(_write_concurrently, i * num_calls, num_calls)
+                for i in range(num_threads)
+            ]
+            for future in futures:
+                future.result()
+        # Check outputs.
+        mem_cache = hcacsimp.get_mem_cache("_concurrent_write_function")
+        self.assertEqual(len(mem_cache), num_threads * num_calls)
+        disk_cache = hcacsimp.get_disk_cache("_concurrent_write_function")
+        self.assertEqual(len(disk_cache), num_threads * num_calls)
+
+    def test3(self) -> None:
+        """
+        Verify that setting a property doesn't drop the properties saved on
+        disk by another process.
+        """
+        # Prepare inputs: simulate another process saving a property.
+        file_name = hcacsimp.get_cache_property_file()
+        other_property = {"_other_process_func": {"type": "pickle"}}
+        hcacsimp._save_func_cache_data_to_file(
+            file_name, "pickle", other_property
+        )
+        # Run test.
+        hcacsimp.set_cache_property(
+            "_concurrent_write_function", "force_refresh", True
+        )
+        # Check outputs.
+        disk_property = hcacsimp._load_func_cache_data_from_file(
+            file_name, "pickle"
+        )
+        self.assertEqual(disk_property["_other_process_func"], {"type": "pickle"})
+        self.assertTrue(
+            disk_property["_concurrent_write_function"]["force_refresh"]
+        )
+
+    def test4(self) -> None:
+        """
+        Verify that resetting the disk cache keeps the lock file, which other
+        processes might be holding.
+        """
+        # Prepare inputs.
+        _write_concurrently(0, 2)
+        file_name = hcacsimp._get_cache_file_name("_concurrent_write_function")
+        self.assertTrue(os.path.exists(file_name + ".lock"))
+        # Run test.
+        hcacsimp.reset_disk_cache(
+            "_concurrent_write_function", interactive=False
+        )
+        # Check outputs.
+        self.assertFalse(os.path.exists(file_name))
+        self.assertTrue(os.path.exists(file_name + ".lock"))
+
+
+# Count the calls of `_async_cached_square()`.
+_ASYNC_CALL_COUNT = {"count": 0}
+
+
+@hcacsimp.simple_cache(cache_type="json", write_through=True)
+async def _async_cached_square(x: int) -> int:
+    """
+    Test coroutine function to verify caching of awaited results.
+
+    :param x: input integer
+    :return: x squared
+    """
+    _ASYNC_CALL_COUNT["count"] += 1
+    # Yield to the event loop so that concurrent calls overlap.
+    await asyncio.sleep(0.01)
+    if x < 0:
+        raise ValueError(f"Invalid x={x}")
+    res = x**2
+    return res
+
+
+# #############################################################################
+# Test_async_simple_cache
+# #############################################################################
+
+
+class Test_async_simple_cache(_BaseCacheTest):
+    """
+    Test caching of coroutine functions and coalescing of concurrent calls.
+    """
+
+    def set_up_test(self) -> None:
+        """
+        Setup operations to run before each test.
+        """
+        super().set_up_test()
+        self.monkeypatch.setitem(_ASYNC_CALL_COUNT, "count", 0)
+        hcacsimp.set_cache_property("_async_cached_square", "type", "json")
+
+    def test1(self) -> None:
+        """
+        Verify that the awaited result is cached in memory and on disk.
+        """
+        # Run test.
+        res1 = asyncio.run(_async_cached_square(3))
+        res2 = asyncio.run(_async_cached_square(3))
+        # Check outputs.
+        self.assertEqual(res1, 9)
+        self.assertEqual(res2, 9)
+        self.assertEqual(_ASYNC_CALL_COUNT["count"], 1)
+        mem_cache = hcacsimp.get_mem_cache("_async_cached_square")
+        self.assertEqual(list(mem_cache.values()), [9])
+        disk_cache = hcacsimp.get_disk_cache("_async_cached_square")
+        self.assertEqual(list(disk_cache.values()), [9])
+
+    def test2(self) -> None:
+        """
+        Verify that concurrent calls with the same key compute the value once.
+        """
+
+        async def _run() -> Any:
+            res = await asyncio.gather(
+                *[_async_cached_square(4) for _ in range(5)],
+                _async_cached_square(5),
+            )
+            return res
+
+        # Run test.
+        res = asyncio.run(_run())
+        # Check outputs.
+        self.assertEqual(res, [16] * 5 + [25])
+        self.assertEqual(_ASYNC_CALL_COUNT["count"], 2)
+        self.assertEqual(hcacsimp._IN_FLIGHT, {})
+
+    def test3(self) -> None:
+        """
+        Verify that an exception is propagated to all the coalesced callers
+        and the result is not cached.
+        """
+
+        async def _run() -> Any:
+            res = await asyncio.gather(
+                *[_async_cached_square(-1) for _ in range(3)],
+                return_exceptions=True,
+            )
+            return res
+
+        # Run test.
+        res = asyncio.run(_run())
+        # Check outputs.
+        self.assertEqual(len(res), 3)
+        for exc in res:
+            self.assertIsInstance(exc, ValueError)
+        self.assertEqual(_ASYNC_CALL_COUNT["count"], 1)
+        mem_cache = hcacsimp.get_mem_cache("_async_cached_square")
+        self.assertEqual(mem_cache, {})
+        self.assertEqual(hcacsimp._IN_FLIGHT, {})
+
+    def test5(self) -> None:
+        """
+        Verify that cancelling the caller that started the computation doesn't
+        cancel it for the other callers.
+        """
+
+        async def _run() -> Any:
+            owner = asyncio.create_task(_async_cached_square(7))
+            # Let the owner start the computation.
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(_async_cached_square(7))
+            await asyncio.sleep(0)
+            owner.cancel()
+            res = await waiter
+            return owner, res
+
+        # Run test.
+        owner, res = asyncio.run(_run())
+        # Check outputs.
+        self.assertTrue(owner.cancelled())
+        self.assertEqual(res, 49)
+        self.assertEqual(_ASYNC_CALL_COUNT["count"], 1)
+        mem_cache = hcacsimp.get_mem_cache("_async_cached_square")
+        self.assertEqual(list(mem_cache.values()), [49])
+        self.assertEqual(hcacsimp._IN_FLIGHT, {})
+
+    def test4(self) -> None:
+        """
+        Verify that the result is written to disk outside the event loop
+        thread.
+        """
+        # Prepare inputs.
+        thread_ids = []
+        flush_cache_to_disk = hcacsimp.flush_cache_to_disk
+
+        def _flush_and_record(func_name: str) -> None:
+            thread_ids.append(threading.get_ident())
+            flush_cache_to_disk(func_name)
+
+        self.monkeypatch.setattr(
+            hcacsimp, "flush_cache_to_disk", _flush_and_record
+        )
+        # Run test.
+        res = asyncio.run(_async_cached_square(6))
+        # Check outputs.
+        self.assertEqual(res, 36)
+        self.assertEqual(len(thread_ids), 1)
+        self.assertNotEqual(thread_ids[0], threading.get_ident())
+        disk_cache = hcacsimp.get_disk_cache("_async_cached_square")
+        self.assertEqual(list(disk_cache.values()), [36])
+
+
+@hcacsimp.simple_cache(
+    cache_type="json",
+    write_back=True,
+    write_back_max_misses=3,
+    write_back_max_secs=60.0,
+)
+def _write_back_function(x: int) -> int:
+    """
+    Test function to verify the write-back mode.
+
+    :param x: input integer
+    :return: x * 5
+    """
+    res = x * 5
+    return res
+
+
+# #############################################################################
+# Test_write_back
+# #############################################################################
+
+
+class Test_write_back(_BaseCacheTest):
+    """
+    Test saving the new entries to disk in batches.
+    """
+
+    def set_up_test(self) -> None:
+        """
+        Setup operations to run before each test.
+        """
+        super().set_up_test()
+        func_name = "_write_back_function"
+        hcacsimp.set_cache_property(func_name, "type", "json")
+        hcacsimp.set_cache_property(func_name, "write_back", True)
+        hcacsimp.set_cache_property(func_name, "write_back_max_misses", 3)
+        hcacsimp.set_cache_property(func_name, "write_back_max_secs", 60.0)
+
+    def test1(self) -> None:
+        """
+        Verify that the entries are flushed every `write_back_max_misses`
+        misses.
+        """
+        # Run test.
+        _write_back_function(1)
+        _write_back_function(2)
+        disk_cache1 = hcacsimp.get_disk_cache("_write_back_function")
+        _write_back_function(3)
+        disk_cache2 = hcacsimp.get_disk_cache("_write_back_function")
+        # Check outputs.
+        self.assertEqual(disk_cache1, {})
+        self.assertEqual(sorted(disk_cache2.values()), [5, 10, 15])
+        self.assertEqual(hcacsimp._WRITE_BACK_STATE, {})
+
+    def test2(self) -> None:
+        """
+        Verify that `flush_cache_to_disk()` flushes the dirty entries.
+        """
+        # Run test.
+        _write_back_function(1)
+        hcacsimp.flush_cache_to_disk("_write_back_function")
+        # Check outputs.
+        disk_cache = hcacsimp.get_disk_cache("_write_back_function")
+        self.assertEqual(list(disk_cache.values()), [5])
+        self.assertEqual(hcacsimp._WRITE_BACK_STATE, {})
+
+    def test3(self) -> None:
+        """
+        Verify that the entries are flushed after `write_back_max_secs`.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property(
+            "_write_back_function", "write_back_max_secs", 0.1
+        )
+        # Run test.
+        _write_back_function(1)
+        disk_cache1 = hcacsimp.get_disk_cache("_write_back_function")
+        # Wait for the timer to flush the entry.
+        for _ in range(100):
+            disk_cache2 = hcacsimp.get_disk_cache("_write_back_function")
+            if disk_cache2:
+                break
+            time.sleep(0.05)
+        # Check outputs.
+        self.assertEqual(disk_cache1, {})
+        self.assertEqual(list(disk_cache2.values()), [5])
+
+    def test4(self) -> None:
+        """
+        Verify that the dirty entries are flushed at exit.
+        """
+        # Run test.
+        _write_back_function(1)
+        _write_back_function(2)
+        hcacsimp.flush_write_back_caches()
+        # Check outputs.
+        disk_cache = hcacsimp.get_disk_cache("_write_back_function")
+        self.assertEqual(sorted(disk_cache.values()), [5, 10])
+
+    def test5(self) -> None:
+        """
+        Verify that the S3 uploads are coalesced per batch.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_write_back_function", "auto_sync_s3", True)
+        # Run test.
+        with umock.patch.object(hcacsimp, "_upload_cache_to_s3") as mock_upload:
+            for x in range(7):
+                _write_back_function(x)
+        # Check outputs.
+        self.assertEqual(mock_upload.call_count, 2)
+        disk_cache = hcacsimp.get_disk_cache("_write_back_function")
+        self.assertEqual(len(disk_cache), 6)
+
+    def test6(self) -> None:
+        """
+        Verify that the dirty entries are flushed when a worker process of a
+        pool exits, without running the `atexit` handlers.
+        """
+        # Run test.
+        # Use `fork` so that the workers inherit the test cache directory.
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(1) as pool:
+            res = pool.map(_write_back_function, [1, 2])
+            pool.close()
+            pool.join()
+        # Check outputs.
+        self.assertEqual(res, [5, 10])
+        disk_cache = hcacsimp.get_disk_cache("_write_back_function")
+        self.assertEqual(sorted(disk_cache.values()), [5, 10])
+
+
 @hcacsimp.simple_cache(cache_type="json")
 def _test_cache_mode_kwarg(x: int, **kwargs) -> int:
     """
@@ -1420,6 +1934,226 @@ def _test_no_write_through(x: int) -> int:
     return res
 
 
+@hcacsimp.simple_cache(cache_type="json", write_through=False)
+def _bounded_mem_func(x: int) -> int:
+    """
+    Test function to verify the memory cache bounds.
+
+    :param x: input integer
+    :return: x + 1
+    """
+    _bounded_mem_func.call_count += 1
+    res = x + 1
+    return res
+
+
+_bounded_mem_func.call_count = 0
+
+
+# #############################################################################
+# Test_memory_cache_bounds
+# #############################################################################
+
+
+class Test_memory_cache_bounds(_BaseCacheTest):
+    """
+    Test bounding the memory cache with `max_entries`, `max_bytes`,
+    `eviction_policy`, and `ttl`.
+    """
+
+    def set_up_test(self) -> None:
+        """
+        Setup operations to run before each test.
+        """
+        super().set_up_test()
+        _bounded_mem_func.call_count = 0
+
+    def _get_mem_args(self) -> list:
+        """
+        Return the first positional argument of the entries in memory.
+        """
+        mem_cache = hcacsimp.get_mem_cache("_bounded_mem_func")
+        args = sorted(
+            int(key.split("[")[1].split("]")[0]) for key in mem_cache
+        )
+        return args
+
+    def test1(self) -> None:
+        """
+        Verify that LRU eviction keeps the most recently used entries.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 2)
+        # Run test.
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        _bounded_mem_func(1)
+        _bounded_mem_func(3)
+        # Check outputs.
+        self.assertEqual(self._get_mem_args(), [1, 3])
+
+    def test2(self) -> None:
+        """
+        Verify that LFU eviction keeps the most frequently used entries.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 2)
+        hcacsimp.set_cache_property("_bounded_mem_func", "eviction_policy", "lfu")
+        # Run test.
+        _bounded_mem_func(1)
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        _bounded_mem_func(2)
+        _bounded_mem_func(3)
+        # Check outputs.
+        # LRU would have evicted 1 instead of 3.
+        self.assertEqual(self._get_mem_args(), [1, 2])
+
+    def test3(self) -> None:
+        """
+        Verify that evicted entries are saved to disk and read back without
+        calling the function again.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 1)
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        # Run test.
+        res = _bounded_mem_func(1)
+        # Check outputs.
+        self.assertEqual(res, 2)
+        self.assertEqual(_bounded_mem_func.call_count, 2)
+        self.assertEqual(self._get_mem_args(), [1])
+        disk_cache = hcacsimp.get_disk_cache("_bounded_mem_func")
+        self.assertEqual(len(disk_cache), 2)
+
+    def test4(self) -> None:
+        """
+        Verify that `max_bytes` bounds the size of the memory cache.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_bytes", 60)
+        # Run test.
+        for x in range(5):
+            _bounded_mem_func(x)
+        # Check outputs.
+        state = hcacsimp._CACHE_BOUNDS["_bounded_mem_func"]
+        self.assertLessEqual(state["bytes"], 60)
+        self.assertEqual(
+            len(state["entries"]),
+            len(hcacsimp.get_mem_cache("_bounded_mem_func")),
+        )
+        self.assertEqual(state["evictions"], 5 - len(state["entries"]))
+
+    def test5(self) -> None:
+        """
+        Verify that entries not accessed within the TTL are evicted.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "ttl", 60)
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        # Age the first entry beyond the TTL.
+        state = hcacsimp._CACHE_BOUNDS["_bounded_mem_func"]
+        first_key = next(iter(state["entries"]))
+        state["entries"][first_key]["access_time"] -= 120
+        # Run test.
+        _bounded_mem_func(3)
+        # Check outputs.
+        self.assertEqual(self._get_mem_args(), [2, 3])
+
+    def test6(self) -> None:
+        """
+        Verify that the bounds and evictions are reported in the stats.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 1)
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        # Run test.
+        stats_df = hcacsimp.cache_stats_to_str("_bounded_mem_func")
+        # Check outputs.
+        row = stats_df.loc["_bounded_mem_func"]
+        self.assertEqual(row["memory"], 1)
+        self.assertEqual(row["max_entries"], 1)
+        self.assertEqual(row["evictions"], 1)
+
+    def test7(self) -> None:
+        """
+        Verify that memory misses don't parse the disk cache file again,
+        unless the file is changed by someone else.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 1)
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        load_func = hcacsimp._load_func_cache_data_from_file
+        # Run test.
+        with umock.patch.object(
+            hcacsimp, "_load_func_cache_data_from_file", side_effect=load_func
+        ) as mock_load:
+            # Each call evicts the other entry and reads it back from disk.
+            for _ in range(3):
+                _bounded_mem_func(1)
+                _bounded_mem_func(2)
+            num_loads = mock_load.call_count
+            # Update the cache file as another process would.
+            file_name = hcacsimp._get_cache_file_name("_bounded_mem_func")
+            disk_cache = hcacsimp.get_disk_cache("_bounded_mem_func")
+            hcacsimp._save_cache_dict_to_disk("_bounded_mem_func", disk_cache)
+            os.utime(file_name, ns=(0, 0))
+            mock_load.reset_mock()
+            _bounded_mem_func(1)
+        # Check outputs.
+        self.assertEqual(_bounded_mem_func.call_count, 2)
+        self.assertEqual(num_loads, 0)
+        self.assertEqual(mock_load.call_count, 1)
+
+    def test8(self) -> None:
+        """
+        Verify that a rewrite of the disk cache file with the same size and
+        mtime is detected.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 1)
+        _bounded_mem_func(1)
+        _bounded_mem_func(2)
+        file_name = hcacsimp._get_cache_file_name("_bounded_mem_func")
+        # Parse the disk cache file.
+        hcacsimp._get_disk_cache_snapshot("_bounded_mem_func")
+        stat = os.stat(file_name)
+        # Rewrite the cache file with a different value of the same size.
+        disk_cache = hcacsimp.get_disk_cache("_bounded_mem_func")
+        cache_key = next(iter(disk_cache))
+        disk_cache[cache_key] = 9
+        hcacsimp._save_func_cache_data_to_file(file_name, "json", disk_cache)
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(os.stat(file_name).st_size, stat.st_size)
+        # Run test.
+        actual = hcacsimp._get_disk_cache_snapshot("_bounded_mem_func")
+        # Check outputs.
+        self.assertEqual(actual[cache_key], 9)
+
+    def test9(self) -> None:
+        """
+        Verify that LFU eviction breaks the ties with the recency of use.
+        """
+        # Prepare inputs.
+        hcacsimp.set_cache_property("_bounded_mem_func", "max_entries", 3)
+        hcacsimp.set_cache_property("_bounded_mem_func", "eviction_policy", "lfu")
+        # Run test.
+        for x in [1, 2, 3, 3, 2, 4]:
+            _bounded_mem_func(x)
+        _bounded_mem_func(5)
+        # Check outputs.
+        # 1 is the least frequently used, then 4 is the least recently used
+        # among the entries without hits.
+        self.assertEqual(self._get_mem_args(), [2, 3, 5])
+        state = hcacsimp._CACHE_BOUNDS["_bounded_mem_func"]
+        actual = {hits: len(bucket) for hits, bucket in state["buckets"].items()}
+        self.assertEqual(actual, {0: 1, 1: 2})
+
+
 # #############################################################################
 # Test_sanity_check_function_cache
 # #############################################################################
@@ -2881,3 +3615,130 @@ class Test_func_hash_tracking(_BaseCacheTest):
         )
         self.assertEqual(hash_after_miss, "aaaa" * 8)
         _ = decoration_hash
+
+    def test5(self) -> None:
+        """
+        Test that the function source is not hashed again on a cache hit.
+        """
+        # First call populates the cache.
+        _cached_json_double(42)
+        # Run test.
+        with umock.patch.object(
+            hcacsimp, "_compute_func_hash", wraps=hcacsimp._compute_func_hash
+        ) as mock_hash:
+            _cached_json_double(42)
+        # Check outputs.
+        mock_hash.assert_not_called()
+
+
+@hcacsimp.simple_cache(
+    cache_type="pickle", write_through=False, key_encoder=hcacsimp.hash_cache_key
+)
+def _hashed_key_function(obj: Any) -> int:
+    """
+    Test function to verify a custom key encoder.
+
+    :param obj: input object
+    :return: length of the object
+    """
+    res = len(obj)
+    return res
+
+
+# #############################################################################
+# Test_hash_cache_key
+# #############################################################################
+
+
+class Test_hash_cache_key(_BaseCacheTest):
+    """
+    Test the hashed cache key encoder.
+    """
+
+    def test1(self) -> None:
+        """
+        Verify that the key is stable and independent of the kwargs order.
+        """
+        # Run test.
+        key1 = hcacsimp.hash_cache_key((1, "a"), {"x": [1, 2], "y": None})
+        key2 = hcacsimp.hash_cache_key((1, "a"), {"y": None, "x": [1, 2]})
+        # Check outputs.
+        self.assertEqual(key1, key2)
+        self.assertRegex(key1, r"^[0-9a-f]{64}$")
+
+    def test2(self) -> None:
+        """
+        Verify that values with the same string representation have different
+        keys.
+        """
+        # Run test.
+        keys = {
+            hcacsimp.hash_cache_key((1,), {}),
+            hcacsimp.hash_cache_key(("1",), {}),
+            hcacsimp.hash_cache_key(("ab", "c"), {}),
+            hcacsimp.hash_cache_key(("a", "bc"), {}),
+        }
+        # Check outputs.
+        self.assertEqual(len(keys), 4)
+
+    def test3(self) -> None:
+        """
+        Verify that large dataframes differing only in the middle rows, which
+        have the same string representation, have different keys.
+        """
+        # Prepare inputs.
+        df1 = pd.DataFrame({"a": range(1000), "b": [0.5] * 1000})
+        df2 = df1.copy()
+        df2.loc[500, "b"] = 1.5
+        self.assertEqual(str(df1), str(df2))
+        # Run test.
+        key1 = hcacsimp.hash_cache_key((df1,), {})
+        key2 = hcacsimp.hash_cache_key((df2,), {})
+        key3 = hcacsimp.hash_cache_key((df1.copy(),), {})
+        # Check outputs.
+        self.assertNotEqual(key1, key2)
+        self.assertEqual(key1, key3)
+
+    def test5(self) -> None:
+        """
+        Verify that equal dataframes with object data built separately have
+        the same key.
+        """
+        # Prepare inputs.
+        # Share the same string object across the rows of `df1`, while `df2`
+        # has a different object for each row.
+        value = "ab"
+        df1 = pd.DataFrame(
+            {"a": [value, value], "b": [[1], None]},
+            index=pd.Index([value, "c"]),
+        )
+        df2 = pd.DataFrame(
+            {"a": ["".join(["a", "b"]) for _ in range(2)], "b": [[1], None]},
+            index=pd.Index(["".join(["a", "b"]), "c"]),
+        )
+        self.assertTrue(df1.equals(df2))
+        df3 = df2.copy()
+        df3.loc["c", "a"] = "abc"
+        # Run test.
+        key1 = hcacsimp.hash_cache_key((df1,), {})
+        key2 = hcacsimp.hash_cache_key((df2,), {})
+        key3 = hcacsimp.hash_cache_key((df3,), {})
+        # Check outputs.
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+
+    def test4(self) -> None:
+        """
+        Verify that a decorated function uses the custom key encoder.
+        """
+        # Prepare inputs.
+        df = pd.DataFrame({"a": range(10)})
+        # Run test.
+        res1 = _hashed_key_function(df)
+        res2 = _hashed_key_function(df)
+        # Check outputs.
+        self.assertEqual(res1, 10)
+        self.assertEqual(res2, 10)
+        mem_cache = hcacsimp.get_mem_cache("_hashed_key_function")
+        expected_key = hcacsimp.hash_cache_key((df,), {})
+        self.assertEqual(list(mem_cache.keys()), [expected_key])
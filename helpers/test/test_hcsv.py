@@ -1,7 +1,10 @@
 import logging
 import os
+from typing import Iterator
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 import helpers.hcsv as hcsv
 import helpers.hunit_test as hunitest
@@ -79,3 +82,480 @@ class Test_to_typed_csv(hunitest.TestCase):
         hcsv.to_typed_csv(df, test_csv_path)
         self.assertTrue(os.path.exists(test_csv_types_path))
         os.remove(test_csv_types_path)
+
+
+# #############################################################################
+# Test_build_csv_row_index1
+# #############################################################################
+
+
+class Test_build_csv_row_index1(hunitest.TestCase):
+    def _write_csv(self, *, trailing_line_break: bool = True) -> str:
+        """
+        Write a CSV file with 1000 rows and a key column increasing every 10
+        rows.
+        """
+        df = pd.DataFrame(
+            {"key": [idx // 10 for idx in range(1000)], "value": range(1000)}
+        )
+        csv_path = os.path.join(self.get_scratch_space(), "test.csv")
+        txt = df.to_csv(index=False)
+        if not trailing_line_break:
+            txt = txt.rstrip("\n")
+        with open(csv_path, "w") as f:
+            f.write(txt)
+        return csv_path
+
+    def test_build1(self) -> None:
+        """
+        Test the offsets and the key statistics of the index.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        # Run test.
+        row_index = hcsv.build_csv_row_index(
+            csv_path, block_size=300, key_col="key"
+        )
+        # Check outputs.
+        self.assertEqual(row_index["num_rows"], 1000)
+        self.assertEqual(row_index["key_mins"], [0, 30, 60, 90])
+        self.assertEqual(row_index["key_maxs"], [29, 59, 89, 99])
+        with open(csv_path, "rb") as f:
+            lines = f.readlines()
+        for block_idx, offset in enumerate(row_index["offsets"]):
+            with open(csv_path, "rb") as f:
+                f.seek(offset)
+                line = f.readline()
+            self.assertEqual(line, lines[1 + block_idx * 300])
+        self.assertEqual(hcsv.load_csv_row_index(csv_path), row_index)
+
+    def test_stale1(self) -> None:
+        """
+        Test that the index is ignored after the CSV file changes.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        hcsv.build_csv_row_index(csv_path, block_size=300)
+        # Run test.
+        with open(csv_path, "a") as f:
+            f.write("100,1000\n")
+        # Check outputs.
+        self.assertIsNone(hcsv.load_csv_row_index(csv_path))
+
+    def test_read_csv_range1(self) -> None:
+        """
+        Test that reading with the index returns the same rows.
+        """
+        for trailing_line_break in [True, False]:
+            # Prepare inputs.
+            csv_path = self._write_csv(trailing_line_break=trailing_line_break)
+            row_index = hcsv.build_csv_row_index(csv_path, block_size=300)
+            for from_, to in [(1, 5), (299, 302), (300, 901), (998, 1005)]:
+                # Run test.
+                actual = hcsv._read_csv_range(
+                    csv_path, from_, to, row_index=row_index
+                )
+                # Check outputs.
+                expected = hcsv._read_csv_range(csv_path, from_, to)
+                pd.testing.assert_frame_equal(actual, expected)
+
+    def test_find_first_matching_row1(self) -> None:
+        """
+        Test finding rows using the key statistics of the index.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        hcsv.build_csv_row_index(csv_path, block_size=300, key_col="key")
+        # Run test.
+        actual = [
+            hcsv.find_first_matching_row(csv_path, "key", 75),
+            hcsv.find_first_matching_row(csv_path, "key", 75, start=755),
+            hcsv.find_first_matching_row(csv_path, "key", 100),
+        ]
+        # Check outputs.
+        self.assertEqual(actual, [751, 755, None])
+
+    def test_build_chunk1(self) -> None:
+        """
+        Test building a chunk using the index.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        hcsv.build_csv_row_index(csv_path, block_size=300)
+        # Run test.
+        actual = hcsv.build_chunk(csv_path, "key", 295, nrows_at_a_time=4)
+        # Check outputs.
+        self.assertEqual(actual["value"].tolist(), list(range(294, 300)))
+
+
+# #############################################################################
+# Test_csv_mapreduce1
+# #############################################################################
+
+
+class Test_csv_mapreduce1(hunitest.TestCase):
+    def _write_csv(self) -> str:
+        """
+        Write a CSV file with 100 rows spread across 5 keys.
+        """
+        df = pd.DataFrame(
+            {"key": [f"k{idx % 5}" for idx in range(100)], "value": range(100)}
+        )
+        csv_path = os.path.join(self.get_scratch_space(), "test.csv")
+        df.to_csv(csv_path, index=False)
+        return csv_path
+
+    @staticmethod
+    def _key_func(df: pd.DataFrame) -> Iterator:
+        return df.groupby("key")
+
+    def test_csv1(self) -> None:
+        """
+        Test fanning out to CSV files with few open files and small buffers.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        out_dir = os.path.join(self.get_scratch_space(), "out")
+        os.makedirs(out_dir)
+        # Run test.
+        hcsv._csv_mapreduce(
+            csv_path,
+            out_dir,
+            self._key_func,
+            None,
+            chunk_size=7,
+            max_open_files=2,
+            max_buffered_rows=10,
+        )
+        # Check outputs.
+        self.assertEqual(
+            sorted(os.listdir(out_dir)), [f"k{idx}.csv" for idx in range(5)]
+        )
+        for idx in range(5):
+            df = pd.read_csv(
+                os.path.join(out_dir, f"k{idx}.csv"),
+                header=None,
+                names=["key", "value"],
+            )
+            self.assertEqual(df["value"].tolist(), list(range(idx, 100, 5)))
+
+    def test_parquet1(self) -> None:
+        """
+        Test fanning out to Parquet files, reopening the files of a group.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        out_dir = os.path.join(self.get_scratch_space(), "out")
+        os.makedirs(out_dir)
+        # Run test.
+        hcsv._csv_mapreduce(
+            csv_path,
+            out_dir,
+            self._key_func,
+            None,
+            chunk_size=7,
+            output_format="parquet",
+            max_open_files=2,
+            max_buffered_rows=10,
+        )
+        # Check outputs.
+        self.assertEqual(
+            sorted(os.listdir(out_dir)), [f"k{idx}" for idx in range(5)]
+        )
+        for idx in range(5):
+            dir_name = os.path.join(out_dir, f"k{idx}")
+            self.assertGreater(len(os.listdir(dir_name)), 1)
+            df = pd.read_parquet(dir_name)
+            self.assertEqual(
+                sorted(df["value"].tolist()), list(range(idx, 100, 5))
+            )
+
+    def _write_csv_with_empty_column(self) -> str:
+        """
+        Write a CSV file where the column `a` is empty in the first 3 rows.
+        """
+        df = pd.DataFrame(
+            {"key": ["k0"] * 6, "a": [None, None, None, "foo", "bar", "baz"]}
+        )
+        csv_path = os.path.join(self.get_scratch_space(), "test.csv")
+        df.to_csv(csv_path, index=False)
+        return csv_path
+
+    def test_parquet2(self) -> None:
+        """
+        Test that a new part is started when the inferred types change.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv_with_empty_column()
+        out_dir = os.path.join(self.get_scratch_space(), "out")
+        os.makedirs(out_dir)
+        # Run test.
+        hcsv._csv_mapreduce(
+            csv_path,
+            out_dir,
+            self._key_func,
+            None,
+            chunk_size=3,
+            output_format="parquet",
+            max_buffered_rows=1,
+        )
+        # Check outputs.
+        dir_name = os.path.join(out_dir, "k0")
+        file_names = sorted(os.listdir(dir_name))
+        expected = ["part-00000.parquet", "part-00001.parquet"]
+        self.assertEqual(file_names, expected)
+        # The parts have the same schema and can be read as one dataset.
+        schemas = [
+            pq.read_schema(os.path.join(dir_name, file_name))
+            for file_name in file_names
+        ]
+        self.assertEqual(schemas[0], schemas[1])
+        self.assertEqual(schemas[0].field("a").type, pa.string())
+        table = pq.read_table(dir_name)
+        expected = [None, None, None, "foo", "bar", "baz"]
+        self.assertEqual(table.column("a").to_pylist(), expected)
+
+    def test_parquet3(self) -> None:
+        """
+        Test casting the rows to an explicit schema.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv_with_empty_column()
+        out_dir = os.path.join(self.get_scratch_space(), "out")
+        os.makedirs(out_dir)
+        schema = pa.schema([("key", pa.string()), ("a", pa.string())])
+        # Run test.
+        hcsv._csv_mapreduce(
+            csv_path,
+            out_dir,
+            self._key_func,
+            None,
+            chunk_size=3,
+            output_format="parquet",
+            max_buffered_rows=1,
+            schema=schema,
+        )
+        # Check outputs.
+        dir_name = os.path.join(out_dir, "k0")
+        self.assertEqual(os.listdir(dir_name), ["part-00000.parquet"])
+        table = pq.read_table(os.path.join(dir_name, "part-00000.parquet"))
+        self.assertEqual(table.schema, schema)
+        expected = [None, None, None, "foo", "bar", "baz"]
+        self.assertEqual(table.column("a").to_pylist(), expected)
+
+    def test_parquet4(self) -> None:
+        """
+        Test that running again appends new parts, like for CSV files.
+        """
+        # Prepare inputs.
+        csv_path = self._write_csv()
+        out_dir = os.path.join(self.get_scratch_space(), "out")
+        os.makedirs(out_dir)
+        # Run test.
+        for _ in range(2):
+            hcsv._csv_mapreduce(
+                csv_path,
+                out_dir,
+                self._key_func,
+                None,
+                output_format="parquet",
+            )
+        # Check outputs.
+        dir_name = os.path.join(out_dir, "k0")
+        file_names = sorted(os.listdir(dir_name))
+        expected = ["part-00000.parquet", "part-00001.parquet"]
+        self.assertEqual(file_names, expected)
+        df = pd.read_parquet(dir_name)
+        self.assertEqual(
+            sorted(df["value"].tolist()), sorted(list(range(0, 100, 5)) * 2)
+        )
+
+
+# #############################################################################
+# Test_convert_csv_dir_to_pq_dir1
+# #############################################################################
+
+
+def _set_key_as_index(df: pd.DataFrame) -> pd.DataFrame:
+    return df.set_index("key")
+
+
+class Test_convert_csv_dir_to_pq_dir1(hunitest.TestCase):
+    def _write_csv_dir(self) -> str:
+        """
+        Write 3 CSV files where only the first one has non-integer values.
+        """
+        csv_dir = os.path.join(self.get_scratch_space(), "csv")
+        os.makedirs(csv_dir)
+        for idx in range(3):
+            values = [1.5, 2.5] if idx == 0 else [1, 2]
+            df = pd.DataFrame({"key": ["a", "b"], "value": values})
+            df.to_csv(os.path.join(csv_dir, f"file{idx}.csv"), index=False)
+        return csv_dir
+
+    def test_schema1(self) -> None:
+        """
+        Test that all the files are written with the schema of the first one.
+        """
+        # Prepare inputs.
+        csv_dir = self._write_csv_dir()
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        schema = pa.schema([("key", pa.string()), ("value", pa.float32())])
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(csv_dir, pq_dir, header=0)
+        hcsv.convert_csv_dir_to_pq_dir(
+            csv_dir, pq_dir + "2", header=0, schema=schema
+        )
+        # Check outputs.
+        self.assertEqual(
+            sorted(os.listdir(pq_dir)), ["file0.pq", "file1.pq", "file2.pq"]
+        )
+        for file_name in os.listdir(pq_dir):
+            actual = pq.read_schema(os.path.join(pq_dir, file_name))
+            self.assertEqual(actual.field("value").type, pa.float64())
+            actual = pq.read_schema(os.path.join(pq_dir + "2", file_name))
+            self.assertTrue(actual.equals(schema))
+
+    def test_schema2(self) -> None:
+        """
+        Test that the schemas inferred from all the files are unified.
+        """
+        # Prepare inputs.
+        csv_dir = os.path.join(self.get_scratch_space(), "csv")
+        os.makedirs(csv_dir)
+        values = [[None, None], [1, 2], ["x", "y"]]
+        values2 = [[1, 2], [1.5, None], [None, None]]
+        for idx in range(3):
+            df = pd.DataFrame(
+                {"key": ["a", "b"], "value": values[idx], "value2": values2[idx]}
+            )
+            df.to_csv(os.path.join(csv_dir, f"file{idx}.csv"), index=False)
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(csv_dir, pq_dir, header=0)
+        # Check outputs.
+        expected = pa.schema(
+            [
+                ("key", pa.string()),
+                ("value", pa.string()),
+                ("value2", pa.float64()),
+            ]
+        )
+        for file_name in os.listdir(pq_dir):
+            actual = pq.read_schema(os.path.join(pq_dir, file_name))
+            self.assertTrue(actual.remove_metadata().equals(expected))
+        actual = pd.read_parquet(pq_dir)
+        self.assertEqual(
+            actual["value"].tolist(), [None, None, "1", "2", "x", "y"]
+        )
+
+    def test_index1(self) -> None:
+        """
+        Test that the index set by the normalizer is preserved.
+        """
+        # Prepare inputs.
+        csv_dir = self._write_csv_dir()
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(
+            csv_dir, pq_dir, header=0, normalizer=_set_key_as_index
+        )
+        # Check outputs.
+        actual = pd.read_parquet(os.path.join(pq_dir, "file1.pq"))
+        self.assertEqual(actual.index.name, "key")
+        self.assertEqual(actual.index.tolist(), ["a", "b"])
+        self.assertEqual(actual["value"].tolist(), [1.0, 2.0])
+
+    def test_typed_csv1(self) -> None:
+        """
+        Test that the types saved by `to_typed_csv()` are used.
+        """
+        # Prepare inputs.
+        csv_dir = self._write_csv_dir()
+        df = pd.DataFrame({"key": ["a", "b"], "value": [1, 2]})
+        hcsv.to_typed_csv(
+            df.astype({"value": "float32"}), os.path.join(csv_dir, "file0.csv")
+        )
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(csv_dir, pq_dir, header=0)
+        # Check outputs.
+        actual = pd.read_parquet(pq_dir)
+        self.assertEqual(actual["value"].tolist(), [1, 2, 1, 2, 1, 2])
+        self.assertEqual(actual["value"].dtype, "float32")
+
+    def test_incremental1(self) -> None:
+        """
+        Test that only the files more recent than the outputs are converted.
+        """
+        # Prepare inputs.
+        csv_dir = self._write_csv_dir()
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        hcsv.convert_csv_dir_to_pq_dir(csv_dir, pq_dir, header=0)
+        # Make the output of `file1.csv` older than its input.
+        os.utime(os.path.join(pq_dir, "file1.pq"), (0, 0))
+        mtimes = {
+            file_name: os.path.getmtime(os.path.join(pq_dir, file_name))
+            for file_name in os.listdir(pq_dir)
+        }
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(
+            csv_dir, pq_dir, header=0, incremental=True
+        )
+        # Check outputs.
+        for file_name, mtime in mtimes.items():
+            actual = os.path.getmtime(os.path.join(pq_dir, file_name))
+            if file_name == "file1.pq":
+                self.assertGreater(actual, mtime)
+            else:
+                self.assertEqual(actual, mtime)
+
+    def test_incremental2(self) -> None:
+        """
+        Test that the schema of the files already converted is reused and
+        promoted when needed.
+        """
+        # Prepare inputs.
+        csv_dir = self._write_csv_dir()
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        hcsv.convert_csv_dir_to_pq_dir(csv_dir, pq_dir, header=0)
+        # Remove the only file with non-integer values and make the output of
+        # `file1.csv` older than its input.
+        os.remove(os.path.join(csv_dir, "file0.csv"))
+        os.remove(os.path.join(pq_dir, "file0.pq"))
+        os.utime(os.path.join(pq_dir, "file1.pq"), (0, 0))
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(
+            csv_dir, pq_dir, header=0, incremental=True
+        )
+        # Check outputs.
+        for file_name in ["file1.pq", "file2.pq"]:
+            actual = pq.read_schema(os.path.join(pq_dir, file_name))
+            self.assertEqual(actual.field("value").type, pa.float64())
+        # Prepare inputs.
+        df = pd.DataFrame({"key": ["a", "b"], "value": ["x", "y"]})
+        df.to_csv(os.path.join(csv_dir, "file3.csv"), index=False)
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(
+            csv_dir, pq_dir, header=0, incremental=True
+        )
+        # Check outputs.
+        for file_name in ["file1.pq", "file2.pq", "file3.pq"]:
+            actual = pq.read_schema(os.path.join(pq_dir, file_name))
+            self.assertEqual(actual.field("value").type, pa.string())
+        actual = pd.read_parquet(pq_dir)
+        expected = ["1", "2", "1", "2", "x", "y"]
+        self.assertEqual(actual["value"].tolist(), expected)
+
+    def test_parallel1(self) -> None:
+        """
+        Test converting the files with multiple processes.
+        """
+        # Prepare inputs.
+        csv_dir = self._write_csv_dir()
+        pq_dir = os.path.join(self.get_scratch_space(), "pq")
+        # Run test.
+        hcsv.convert_csv_dir_to_pq_dir(csv_dir, pq_dir, header=0, num_threads=2)
+        # Check outputs.
+        actual = pd.read_parquet(pq_dir)
+        self.assertEqual(actual["value"].tolist(), [1.5, 2.5, 1, 2, 1, 2])
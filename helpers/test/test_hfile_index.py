@@ -0,0 +1,311 @@
+import logging
+import os
+import unittest.mock as umock
+
+import helpers.hfile_index as hfilinde
+import helpers.hio as hio
+import helpers.hsystem as hsystem
+import helpers.hunit_test as hunitest
+
+_LOG = logging.getLogger(__name__)
+
+
+def _create_tree(dir_name: str) -> None:
+    """
+    Create a dir tree with nested dirs and pruned dirs.
+    """
+    for file_name in [
+        "a.py",
+        "b.txt",
+        "dir1/a.py",
+        "dir1/dir2/c.py",
+        ".git/config",
+        "node_modules/pkg/d.py",
+    ]:
+        hio.to_file(os.path.join(dir_name, file_name), file_name)
+
+
+# #############################################################################
+# TestFileIndex1
+# #############################################################################
+
+
+class TestFileIndex1(hunitest.TestCase):
+    def test_find_by_basename1(self) -> None:
+        """
+        Check looking up files and dirs by basename and glob pattern.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        # Run test.
+        file_index = hfilinde.FileIndex(dir_name)
+        # Check outputs.
+        actual = file_index.find_by_basename("a.py", use_relative_paths=True)
+        self.assertEqual(actual, ["a.py", "dir1/a.py"])
+        actual = file_index.find_by_basename("dir2")
+        self.assertEqual(actual, [os.path.join(dir_name, "dir1/dir2")])
+        # The content of the pruned dirs is not indexed.
+        actual = file_index.find_by_basename("*.py", use_relative_paths=True)
+        self.assertEqual(actual, ["a.py", "dir1/a.py", "dir1/dir2/c.py"])
+
+    def test_get_paths1(self) -> None:
+        """
+        Check listing the paths like `find`.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        # Run test.
+        file_index = hfilinde.FileIndex(dir_name)
+        # Check outputs.
+        actual = file_index.get_paths(use_relative_paths=True)
+        expected = [
+            ".git",
+            "a.py",
+            "b.txt",
+            "dir1",
+            "dir1/a.py",
+            "dir1/dir2",
+            "dir1/dir2/c.py",
+            "node_modules",
+        ]
+        self.assertEqual(actual, expected)
+        actual = file_index.get_paths(
+            patterns=["*.txt", "dir*"], only_files=True, use_relative_paths=True
+        )
+        self.assertEqual(actual, ["b.txt"])
+
+    def test_refresh1(self) -> None:
+        """
+        Check that refreshing picks up added, removed and renamed paths.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        file_index = hfilinde.FileIndex(dir_name)
+        hio.to_file(os.path.join(dir_name, "dir1/dir2/dir3/e.py"), "")
+        os.remove(os.path.join(dir_name, "dir1/a.py"))
+        os.rename(
+            os.path.join(dir_name, "b.txt"), os.path.join(dir_name, "f.txt")
+        )
+        # Run test.
+        file_index.refresh(check_files=False)
+        # Check outputs.
+        actual = file_index.get_paths(only_files=True, use_relative_paths=True)
+        expected = ["a.py", "dir1/dir2/c.py", "dir1/dir2/dir3/e.py", "f.txt"]
+        self.assertEqual(actual, expected)
+        self.assertEqual(file_index.find_by_basename("b.txt"), [])
+
+    def test_refresh2(self) -> None:
+        """
+        Check that refreshing updates the metadata of modified files.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        file_index = hfilinde.FileIndex(dir_name, compute_hashes=True)
+        file_info1 = file_index.get_file_info("dir1/dir2/c.py")
+        hio.to_file(os.path.join(dir_name, "dir1/dir2/c.py"), "new content")
+        # Run test.
+        file_index.refresh()
+        # Check outputs.
+        file_info2 = file_index.get_file_info(
+            os.path.join(dir_name, "dir1/dir2/c.py")
+        )
+        self.assertIsNotNone(file_info1)
+        self.assertIsNotNone(file_info2)
+        self.assertEqual(file_info2.size, len("new content"))
+        self.assertNotEqual(file_info1.hash, file_info2.hash)
+
+    def test_save1(self) -> None:
+        """
+        Check that an index loaded from disk is refreshed.
+        """
+        # Prepare inputs.
+        dir_name = os.path.join(self.get_scratch_space(), "tree")
+        _create_tree(dir_name)
+        cache_file = os.path.join(self.get_scratch_space(), "index.json")
+        file_index = hfilinde.FileIndex(dir_name, cache_file=cache_file)
+        file_index.save()
+        hio.to_file(os.path.join(dir_name, "dir1/g.py"), "")
+        # Run test.
+        file_index = hfilinde.FileIndex(dir_name, cache_file=cache_file)
+        # Check outputs.
+        actual = file_index.find_by_basename("*.py", use_relative_paths=True)
+        expected = ["a.py", "dir1/a.py", "dir1/dir2/c.py", "dir1/g.py"]
+        self.assertEqual(actual, expected)
+
+    def test_refresh_from_git_status1(self) -> None:
+        """
+        Check refreshing the paths reported by `git status`.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        hsystem.system(
+            f"cd {dir_name} && rm -rf .git && git init -q && git add . && "
+            "git -c user.name=test -c user.email=test@test.com "
+            "commit -q -m init"
+        )
+        file_index = hfilinde.FileIndex(dir_name)
+        file_index.refresh_from_git_status()
+        hio.to_file(os.path.join(dir_name, "dir1/dir2/h.py"), "")
+        os.remove(os.path.join(dir_name, "dir1/a.py"))
+        # Run test.
+        file_index.refresh_from_git_status()
+        # Check outputs.
+        actual = file_index.find_by_basename("*.py", use_relative_paths=True)
+        expected = ["a.py", "dir1/dir2/c.py", "dir1/dir2/h.py"]
+        self.assertEqual(actual, expected)
+
+
+# #############################################################################
+# Test_get_file_index1
+# #############################################################################
+
+
+class Test_get_file_index1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Check that the index is shared and refreshed at each call.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        file_index1 = hfilinde.get_file_index(dir_name)
+        hio.to_file(os.path.join(dir_name, "i.py"), "")
+        # Run test.
+        file_index2 = hfilinde.get_file_index(dir_name)
+        # Check outputs.
+        self.assertIs(file_index1, file_index2)
+        actual = file_index2.find_by_basename("i.py", use_relative_paths=True)
+        self.assertEqual(actual, ["i.py"])
+
+    def test_disk_cache1(self) -> None:
+        """
+        Check that a new process loads the index saved on disk.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        file_index1 = hfilinde.get_file_index(dir_name)
+        hio.to_file(os.path.join(dir_name, "j.py"), "")
+        # Run test.
+        # Simulate a new process with an empty registry.
+        with umock.patch.dict(hfilinde._FILE_INDEXES, clear=True):
+            with umock.patch.object(
+                hfilinde.FileIndex,
+                "_scan_dir",
+                autospec=True,
+                side_effect=hfilinde.FileIndex._scan_dir,
+            ) as scan_dir_mock:
+                file_index2 = hfilinde.get_file_index(dir_name)
+        # Check outputs.
+        self.assertEqual(
+            file_index1.cache_file,
+            os.path.join(
+                dir_name,
+                ".git",
+                "tmp.file_index",
+                os.path.basename(file_index1.cache_file),
+            ),
+        )
+        self.assertIsNot(file_index1, file_index2)
+        # Only the dir that changed is listed again.
+        scanned_dir_names = [
+            call.args[1] for call in scan_dir_mock.call_args_list
+        ]
+        self.assertEqual(scanned_dir_names, [""])
+        actual = file_index2.find_by_basename("j.py", use_relative_paths=True)
+        self.assertEqual(actual, ["j.py"])
+
+    def test_pruned_dirs1(self) -> None:
+        """
+        Check that only the content of `.git` is not indexed, like the `find`
+        commands replaced by the index.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        # Run test.
+        file_index = hfilinde.get_file_index(dir_name)
+        # Check outputs.
+        actual = file_index.find_by_basename("*.py", use_relative_paths=True)
+        expected = [
+            "a.py",
+            "dir1/a.py",
+            "dir1/dir2/c.py",
+            "node_modules/pkg/d.py",
+        ]
+        self.assertEqual(actual, expected)
+        actual = file_index.find_by_basename("config")
+        self.assertEqual(actual, [])
+
+    def test_disk_cache2(self) -> None:
+        """
+        Check that the index works when the disk cache can't be written.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        hio.to_file(os.path.join(dir_name, "a.py"), "")
+        # E.g., a worktree mounted in a container without its Git dir. The Git
+        # dir is under a file, so that it can't be created.
+        git_dir = os.path.join(dir_name, "a.py", ".git")
+        hio.to_file(os.path.join(dir_name, ".git"), f"gitdir: {git_dir}")
+        # Run test.
+        file_index = hfilinde.get_file_index(dir_name)
+        # Check outputs.
+        actual = file_index.find_by_basename("a.py", use_relative_paths=True)
+        self.assertEqual(actual, ["a.py"])
+        self.assertIsNone(file_index.cache_file)
+
+    def test_disk_cache3(self) -> None:
+        """
+        Check that an index file that can't be loaded is ignored.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        _create_tree(dir_name)
+        file_index1 = hfilinde.get_file_index(dir_name)
+        hio.to_file(file_index1.cache_file, "{")
+        # Run test.
+        # Simulate a new process with an empty registry.
+        with umock.patch.dict(hfilinde._FILE_INDEXES, clear=True):
+            file_index2 = hfilinde.get_file_index(dir_name)
+        # Check outputs.
+        actual = file_index2.find_by_basename("a.py", use_relative_paths=True)
+        self.assertEqual(actual, ["a.py", "dir1/a.py"])
+        # The index is saved again.
+        actual = hio.from_file(file_index1.cache_file)
+        self.assertIn('"version": 1', actual)
+
+    def test_eviction1(self) -> None:
+        """
+        Check that only the most recently used indexes are kept.
+        """
+        # Prepare inputs.
+        dir_name = self.get_scratch_space()
+        hio.create_dir(os.path.join(dir_name, ".git"), incremental=True)
+        dir_names = [os.path.join(dir_name, f"dir{idx}") for idx in range(3)]
+        for dir_name_ in dir_names:
+            hio.to_file(os.path.join(dir_name_, "a.py"), "")
+        # Run test.
+        with umock.patch.dict(hfilinde._FILE_INDEXES, clear=True):
+            with umock.patch.multiple(
+                hfilinde, _MAX_NUM_FILE_INDEXES=2, _MAX_NUM_CACHE_FILES=2
+            ):
+                file_indexes = [
+                    hfilinde.get_file_index(dir_name_)
+                    for dir_name_ in dir_names
+                ]
+                actual = list(hfilinde._FILE_INDEXES)
+        # Check outputs.
+        self.assertEqual(actual, dir_names[1:])
+        cache_dir = os.path.join(dir_name, ".git", "tmp.file_index")
+        actual = sorted(os.listdir(cache_dir))
+        expected = sorted(
+            os.path.basename(file_index.cache_file)
+            for file_index in file_indexes[1:]
+        )
+        self.assertEqual(actual, expected)
@@ -1,5 +1,6 @@
 import logging
 import os
+from typing import List
 
 import numpy as np
 import pandas as pd
@@ -8,6 +9,7 @@ import pytest
 import helpers.hgit as hgit
 import helpers.hio as hio
 import helpers.hpandas as hpandas
+import helpers.hsystem as hsystem
 import helpers.hunit_test as hunitest
 
 _LOG = logging.getLogger(__name__)
@@ -107,6 +109,119 @@ class Test_find_all_files1(hunitest.TestCase):
         self.assertGreater(len(py_files), len(not_paired_py_files))
 
 
+# #############################################################################
+# Test_find_paths1
+# #############################################################################
+
+
+class Test_find_paths1(hunitest.TestCase):
+    def _create_tree(self) -> str:
+        """
+        Create a dir tree with files, nested dirs, pruned dirs and a symlink.
+        """
+        dir_name = self.get_scratch_space()
+        for file_name in [
+            "a.py",
+            "b.txt",
+            "dir1/c.py",
+            "dir1/dir2/d.py",
+            "dir1/dir2/e.txt",
+            ".git/config.py",
+            "node_modules/pkg/f.py",
+            "tmp.dir/g.py",
+        ]:
+            hio.to_file(os.path.join(dir_name, file_name), "")
+        os.symlink(
+            os.path.join(dir_name, "dir1"), os.path.join(dir_name, "link1")
+        )
+        return dir_name
+
+    def _find(self, cmd_opts: str, dir_name: str) -> List[str]:
+        """
+        Run `find` to compute the reference output.
+        """
+        cmd = f"find {dir_name} {cmd_opts}"
+        _, output = hsystem.system_to_string(cmd)
+        paths = [path for path in output.split("\n") if path != ""]
+        return paths
+
+    def test1(self) -> None:
+        """
+        Check that all the paths are reported in the same order as `find`.
+        """
+        # Prepare inputs.
+        dir_name = self._create_tree()
+        # Run test.
+        actual = hio.find_paths(dir_name)
+        # Check outputs.
+        expected = self._find("", dir_name)
+        self.assertEqual(actual, expected)
+
+    def test2(self) -> None:
+        """
+        Check a pattern with pruned dirs and only files.
+        """
+        # Prepare inputs.
+        dir_name = self._create_tree()
+        # Run test.
+        actual = hio.find_paths(
+            dir_name,
+            patterns=["*.py"],
+            pruned_dir_names=[".git", "node_modules"],
+            only_files=True,
+        )
+        # Check outputs.
+        expected = self._find(
+            '-name "*.py" -type f -not -path "*/.git/*" '
+            '-not -path "*/node_modules/*"',
+            dir_name,
+        )
+        self.assertEqual(actual, expected)
+
+    def test3(self) -> None:
+        """
+        Check `maxdepth`.
+        """
+        # Prepare inputs.
+        dir_name = self._create_tree()
+        # Run test.
+        actual = hio.find_paths(dir_name, maxdepth=1)
+        # Check outputs.
+        expected = self._find("-maxdepth 1", dir_name)
+        self.assertEqual(actual, expected)
+
+    def test4(self) -> None:
+        """
+        Check that excluded dirs are neither reported nor traversed.
+        """
+        # Prepare inputs.
+        dir_name = self._create_tree()
+        # Run test.
+        actual = hio.find_paths(
+            dir_name,
+            patterns=["*.py", "tmp.dir"],
+            exclude_patterns=["tmp.dir", ".git", "node_modules"],
+            only_files=False,
+        )
+        # Check outputs.
+        actual = sorted(os.path.relpath(path, dir_name) for path in actual)
+        expected = ["a.py", "dir1/c.py", "dir1/dir2/d.py"]
+        self.assertEqual(actual, expected)
+
+    def test5(self) -> None:
+        """
+        Check that the parallel walk reports the same paths as the serial one.
+        """
+        # Prepare inputs.
+        dir_name = self._create_tree()
+        # Run test.
+        actual = hio.find_paths(dir_name, patterns=["*.py"], num_threads=4)
+        # Check outputs.
+        expected = hio.find_paths(dir_name, patterns=["*.py"])
+        self.assertEqual(sorted(actual), sorted(expected))
+        self.assertEqual(len(expected), 6)
+
+
 # #############################################################################
 # Test_change_filename_extension1
 # #############################################################################
@@ -2,7 +2,8 @@ import datetime
 import logging
 import os
 import random
-from typing import Any, List, Optional, Tuple
+import unittest.mock as umock
+from typing import Any, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import pyarrow
@@ -10,6 +11,7 @@ import pyarrow.parquet as parquet
 import pytest
 
 import helpers.hdbg as hdbg
+import helpers.hio as hio
 import helpers.hmoto as hmoto
 import helpers.hpandas as hpandas
 import helpers.hparquet as hparque
@@ -1470,3 +1472,822 @@ class TestPartitionedParquet2(hunitest.TestCase):
         timestamp formats.
         """
         self._run_write_and_read_mixed_timestamp_partitioned_dataset()
+
+
+# #############################################################################
+# TestParquetDatasetIndex1
+# #############################################################################
+
+
+class TestParquetDatasetIndex1(hunitest.TestCase):
+    @staticmethod
+    def _get_test_df() -> pd.DataFrame:
+        index = pd.date_range(
+            "2022-01-01", periods=120, freq="12h", tz="UTC", name="timestamp"
+        )
+        df = pd.DataFrame(
+            {"value": range(120), "asset": ["A", "B", "C"] * 40}, index=index
+        )
+        df, _ = hparque.add_date_partition_columns(df, "by_year_month")
+        return df
+
+    def _write_dataset(self, *, create_index: bool) -> str:
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        df = self._get_test_df()
+        partition_columns = ["asset", "year", "month"]
+        hparque.to_partitioned_parquet(
+            df,
+            partition_columns,
+            dst_dir,
+            basename_template="data{i}.parquet",
+            create_index=create_index,
+        )
+        return dst_dir
+
+    def test_build1(self) -> None:
+        """
+        Test that the index is created on write and matches a full rebuild.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset(create_index=True)
+        # Run test.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        # Check outputs.
+        actual = "\n".join(
+            f"{rel_path} {entry['partition']} num_rows={entry['num_rows']}"
+            for rel_path, entry in sorted(index["files"].items())
+        )
+        expected = r"""
+        asset=A/year=2022/month=1/data0.parquet {'asset': 'A', 'month': 1, 'year': 2022} num_rows=21
+        asset=A/year=2022/month=2/data0.parquet {'asset': 'A', 'month': 2, 'year': 2022} num_rows=19
+        asset=B/year=2022/month=1/data0.parquet {'asset': 'B', 'month': 1, 'year': 2022} num_rows=21
+        asset=B/year=2022/month=2/data0.parquet {'asset': 'B', 'month': 2, 'year': 2022} num_rows=18
+        asset=B/year=2022/month=3/data0.parquet {'asset': 'B', 'month': 3, 'year': 2022} num_rows=1
+        asset=C/year=2022/month=1/data0.parquet {'asset': 'C', 'month': 1, 'year': 2022} num_rows=20
+        asset=C/year=2022/month=2/data0.parquet {'asset': 'C', 'month': 2, 'year': 2022} num_rows=19
+        asset=C/year=2022/month=3/data0.parquet {'asset': 'C', 'month': 3, 'year': 2022} num_rows=1
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+        # The incremental index must match the one built from scratch.
+        self.assertEqual(index, hparque.build_parquet_dataset_index(dst_dir))
+
+    def test_update1(self) -> None:
+        """
+        Test that an existing index is refreshed when writing and merging.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset(create_index=True)
+        df = self._get_test_df()
+        # Run test.
+        hparque.to_partitioned_parquet(
+            df,
+            ["asset", "year", "month"],
+            dst_dir,
+            basename_template="data_new{i}.parquet",
+        )
+        # Check outputs.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(len(index["files"]), 16)
+        self.assertEqual(index, hparque.build_parquet_dataset_index(dst_dir))
+        # Run test.
+        hparque.list_and_merge_pq_files(dst_dir)
+        # Check outputs.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(len(index["files"]), 8)
+        self.assertEqual(index, hparque.build_parquet_dataset_index(dst_dir))
+
+    def test_no_index1(self) -> None:
+        """
+        Test that the index is not created by default.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset(create_index=False)
+        # Run test.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        # Check outputs.
+        self.assertIsNone(index)
+
+    def test_create_index1(self) -> None:
+        """
+        Test that creating the index on a dataset without one indexes also the
+        files already in the dataset.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset(create_index=False)
+        df = self._get_test_df()
+        # Run test.
+        hparque.to_partitioned_parquet(
+            df,
+            ["asset", "year", "month"],
+            dst_dir,
+            basename_template="data_new{i}.parquet",
+            create_index=True,
+        )
+        # Check outputs.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(len(index["files"]), 16)
+        self.assertEqual(index, hparque.build_parquet_dataset_index(dst_dir))
+        actual = hparque.from_parquet(dst_dir)
+        self.assertEqual(len(actual), 2 * len(df))
+
+    def test_manifest1(self) -> None:
+        """
+        Test that the readers using the index read only the indexed files,
+        without listing the dataset.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset(create_index=True)
+        df = self._get_test_df()
+        # Add a file without updating the index.
+        table = pyarrow.Table.from_pandas(df[df["asset"] == "A"].head(5))
+        parquet.write_table(
+            table.drop(["asset", "year", "month"]),
+            os.path.join(dst_dir, "asset=A/year=2022/month=1/other.parquet"),
+        )
+        # Run test.
+        with umock.patch.object(
+            hparque,
+            "_list_parquet_dataset_files",
+            side_effect=AssertionError("The dataset must not be listed"),
+        ):
+            actual = hparque.from_parquet(dst_dir)
+            batches = list(hparque.yield_parquet_batches(dst_dir))
+        # Check outputs.
+        self.assertEqual(len(actual), len(df))
+        self.assertEqual(sum(len(batch) for batch in batches), len(df))
+        # Reading without the index sees also the unindexed file.
+        actual = hparque.from_parquet(dst_dir, use_index=False)
+        self.assertEqual(len(actual), len(df) + 5)
+
+    def test_from_parquet1(self) -> None:
+        """
+        Test that reading through the index returns the same data.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset(create_index=True)
+        filters_list = [
+            None,
+            [("asset", "==", "B")],
+            [("asset", "in", ["A", "C"]), ("month", "==", 2)],
+            [
+                [("timestamp", "<", pd.Timestamp("2022-01-03", tz="UTC"))],
+                [("asset", "==", "C"), ("value", ">=", 110)],
+            ],
+            # No data matches this filter.
+            [("value", ">", 1000)],
+        ]
+        for filters in filters_list:
+            for columns in [None, ["value"]]:
+                # Run test.
+                actual = hparque.from_parquet(
+                    dst_dir, columns=columns, filters=filters
+                )
+                expected = hparque.from_parquet(
+                    dst_dir, columns=columns, filters=filters, use_index=False
+                )
+                # Check outputs.
+                actual = actual.sort_index(kind="stable")
+                expected = expected.sort_index(kind="stable")
+                _compare_dfs(self, actual, expected)
+
+    def test_prune1(self) -> None:
+        """
+        Test pruning files and row groups using partitions and statistics.
+        """
+        # Prepare inputs.
+        index = {
+            "version": 1,
+            "files": {
+                "asset=A/data.parquet": {
+                    "partition": {"asset": "A"},
+                    "num_rows": 20,
+                    "size_in_bytes": 100,
+                    "row_groups": [
+                        {
+                            "num_rows": 10,
+                            "size_in_bytes": 50,
+                            "stats": {
+                                "timestamp": {
+                                    "min": "2022-01-01T00:00:00+00:00",
+                                    "max": "2022-01-01T09:00:00+00:00",
+                                    "type": "timestamp",
+                                }
+                            },
+                        },
+                        {
+                            "num_rows": 10,
+                            "size_in_bytes": 50,
+                            "stats": {
+                                "timestamp": {
+                                    "min": "2022-01-01T10:00:00+00:00",
+                                    "max": "2022-01-01T19:00:00+00:00",
+                                    "type": "timestamp",
+                                }
+                            },
+                        },
+                    ],
+                },
+                "asset=B/data.parquet": {
+                    "partition": {"asset": "B"},
+                    "num_rows": 10,
+                    "size_in_bytes": 50,
+                    "row_groups": [
+                        {"num_rows": 10, "size_in_bytes": 50, "stats": {}}
+                    ],
+                },
+            },
+        }
+        timestamp = pd.Timestamp("2022-01-01 12:00:00", tz="UTC")
+        # Run test.
+        actual = [
+            hparque.prune_parquet_dataset_index(index, None),
+            hparque.prune_parquet_dataset_index(index, [("asset", "==", "A")]),
+            hparque.prune_parquet_dataset_index(
+                index, [("timestamp", ">=", timestamp)]
+            ),
+            hparque.prune_parquet_dataset_index(
+                index, [[("asset", "==", "A")], [("asset", "==", "C")]]
+            ),
+            hparque.prune_parquet_dataset_index(
+                index, [("asset", "==", "A"), ("timestamp", "<", timestamp)]
+            ),
+            # Values that can't be compared are never pruned.
+            hparque.prune_parquet_dataset_index(index, [("asset", "==", 1)]),
+        ]
+        # Check outputs.
+        expected = [
+            [("asset=A/data.parquet", [0, 1]), ("asset=B/data.parquet", [0])],
+            [("asset=A/data.parquet", [0, 1])],
+            [("asset=A/data.parquet", [1]), ("asset=B/data.parquet", [0])],
+            [("asset=A/data.parquet", [0, 1])],
+            [("asset=A/data.parquet", [0, 1])],
+            [("asset=A/data.parquet", [0, 1]), ("asset=B/data.parquet", [0])],
+        ]
+        self.assertEqual(actual, expected)
+
+
+# #############################################################################
+# TestYieldParquetBatches1
+# #############################################################################
+
+
+class TestYieldParquetBatches1(hunitest.TestCase):
+    def _write_dataset(self) -> str:
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        index = pd.date_range(
+            "2022-01-01", periods=1000, freq="1h", tz="UTC", name="timestamp"
+        )
+        df = pd.DataFrame(
+            {"value": range(1000), "asset": ["A", "B"] * 500}, index=index
+        )
+        df, _ = hparque.add_date_partition_columns(df, "by_year_month")
+        hparque.to_partitioned_parquet(df, ["asset", "year", "month"], dst_dir)
+        return dst_dir
+
+    def test_pandas1(self) -> None:
+        """
+        Test that the batches have bounded size and contain the same data as
+        `from_parquet()`.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset()
+        columns = ["value"]
+        filters = [("asset", "==", "A"), ("value", ">=", 100)]
+        batch_size = 100
+        # Run test.
+        batches = list(
+            hparque.yield_parquet_batches(
+                dst_dir, columns=columns, filters=filters, batch_size=batch_size
+            )
+        )
+        # Check outputs.
+        self.assertGreater(len(batches), 1)
+        for batch in batches:
+            self.assertIsInstance(batch, pd.DataFrame)
+            self.assertLessEqual(len(batch), batch_size)
+        actual = pd.concat(batches)
+        expected = hparque.from_parquet(dst_dir, columns=columns, filters=filters)
+        _compare_dfs(self, actual, expected)
+
+    def test_arrow1(self) -> None:
+        """
+        Test yielding Arrow record batches without prefetching.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset()
+        # Run test.
+        batches = list(
+            hparque.yield_parquet_batches(
+                dst_dir,
+                batch_size=300,
+                output_type="arrow",
+                num_prefetched_batches=0,
+            )
+        )
+        # Check outputs.
+        for batch in batches:
+            self.assertIsInstance(batch, pyarrow.RecordBatch)
+            self.assertLessEqual(batch.num_rows, 300)
+        self.assertEqual(sum(batch.num_rows for batch in batches), 1000)
+
+    def test_early_stop1(self) -> None:
+        """
+        Test that the consumer can stop before the end of the data.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset()
+        batches = hparque.yield_parquet_batches(
+            dst_dir, batch_size=10, num_prefetched_batches=2
+        )
+        # Run test.
+        batch = next(batches)
+        batches.close()
+        # Check outputs.
+        self.assertEqual(len(batch), 10)
+
+
+# #############################################################################
+# TestPrefetch1
+# #############################################################################
+
+
+class TestPrefetch1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Test that all the items are returned in order.
+        """
+        # Run test.
+        actual = list(hparque._prefetch(iter(range(10)), 3))
+        # Check outputs.
+        self.assertEqual(actual, list(range(10)))
+
+    def test2(self) -> None:
+        """
+        Test that the exceptions are propagated to the consumer.
+        """
+
+        # Prepare inputs.
+        def _iterator() -> Iterator[int]:
+            yield 1
+            raise ValueError("Simulated error")
+
+        # Run test.
+        items = []
+        with self.assertRaises(ValueError) as cm:
+            for item in hparque._prefetch(_iterator(), 2):
+                items.append(item)
+        # Check outputs.
+        self.assertEqual(items, [1])
+        self.assertEqual(str(cm.exception), "Simulated error")
+
+
+# #############################################################################
+# TestListAndMergePqFilesLocal1
+# #############################################################################
+
+
+class TestListAndMergePqFilesLocal1(hunitest.TestCase):
+    def _write_files(self) -> str:
+        """
+        Write two overlapping files in each of two partition folders.
+        """
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        for asset in ["A", "B"]:
+            for file_idx, volumes in enumerate([[1, 5, 3], [4, 2, 6]]):
+                index = pd.date_range(
+                    f"2022-01-01 0{file_idx}:00",
+                    periods=3,
+                    freq="1h",
+                    tz="UTC",
+                    name="end_timestamp",
+                )
+                df = pd.DataFrame(
+                    {
+                        "timestamp": index.asi8 // 10**6,
+                        "exchange_id": "binance",
+                        "volume": volumes,
+                    },
+                    index=index,
+                )
+                file_name = os.path.join(
+                    dst_dir, f"asset={asset}", f"data{file_idx}.parquet"
+                )
+                hparque.to_parquet(df, file_name)
+        return dst_dir
+
+    def test_ohlcv1(self) -> None:
+        """
+        Test that duplicates keep the row with the largest volume and the
+        data is sorted by index.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_files()
+        # Run test.
+        hparque.list_and_merge_pq_files(
+            dst_dir, drop_duplicates_mode="ohlcv", num_threads=2
+        )
+        # Check outputs.
+        for asset in ["A", "B"]:
+            folder = os.path.join(dst_dir, f"asset={asset}")
+            self.assertEqual(os.listdir(folder), ["data.parquet"])
+        df = hparque.from_parquet(os.path.join(dst_dir, "asset=A/data.parquet"))
+        actual = hpandas.df_to_str(df, num_rows=None)
+        expected = r"""
+                                       timestamp exchange_id  volume
+        end_timestamp
+        2022-01-01 00:00:00+00:00  1640995200000     binance       1
+        2022-01-01 01:00:00+00:00  1640998800000     binance       5
+        2022-01-01 02:00:00+00:00  1641002400000     binance       3
+        2022-01-01 03:00:00+00:00  1641006000000     binance       6
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+
+    def test_row_group_size1(self) -> None:
+        """
+        Test that the merged files have the requested row group size.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_files()
+        # Run test.
+        hparque.list_and_merge_pq_files(dst_dir, row_group_size=2)
+        # Check outputs.
+        file_name = os.path.join(dst_dir, "asset=B/data.parquet")
+        metadata = parquet.read_metadata(file_name)
+        # Rows are duplicated only if all the columns are equal.
+        self.assertEqual(metadata.num_rows, 6)
+        self.assertEqual(metadata.num_row_groups, 3)
+
+    def test_invalid_mode1(self) -> None:
+        """
+        Test that an invalid mode is detected before merging any folder.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_files()
+        # Run test.
+        with self.assertRaises(ValueError):
+            hparque.list_and_merge_pq_files(
+                dst_dir, drop_duplicates_mode="invalid"
+            )
+        # Check outputs.
+        folder = os.path.join(dst_dir, "asset=A")
+        self.assertEqual(len(os.listdir(folder)), 2)
+
+    def test_hidden_files1(self) -> None:
+        """
+        Test that hidden files (e.g., files being written) are not merged.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_files()
+        folder = os.path.join(dst_dir, "asset=A")
+        hidden_file_names = [".tmp.data2.parquet", "_metadata"]
+        for file_name in hidden_file_names:
+            hio.to_file(os.path.join(folder, file_name), "")
+        # Run test.
+        hparque.list_and_merge_pq_files(dst_dir)
+        # Check outputs.
+        actual = sorted(os.listdir(folder))
+        self.assertEqual(actual, sorted(hidden_file_names + ["data.parquet"]))
+        metadata = parquet.read_metadata(os.path.join(folder, "data.parquet"))
+        self.assertEqual(metadata.num_rows, 6)
+
+
+# #############################################################################
+# TestParquetDatasetWriter1
+# #############################################################################
+
+
+class TestParquetDatasetWriter1(hunitest.TestCase):
+    @staticmethod
+    def _get_test_df() -> pd.DataFrame:
+        index = pd.date_range(
+            "2022-01-01", periods=100, freq="1D", tz="UTC", name="timestamp"
+        )
+        df = pd.DataFrame(
+            {"value": range(100), "asset": ["A", "B"] * 50}, index=index
+        )
+        return df
+
+    def _write(self, partition_mode: str) -> str:
+        dst_dir = os.path.join(self.get_scratch_space(), partition_mode)
+        df = self._get_test_df()
+        with hparque.ParquetDatasetWriter(
+            dst_dir,
+            partition_mode,
+            additional_partition_columns=["asset"],
+            target_rows_per_file=20,
+        ) as writer:
+            for idx in range(0, len(df), 10):
+                writer.append(df.iloc[idx : idx + 10])
+        return dst_dir
+
+    def _check_written_data(self, dst_dir: str) -> None:
+        actual = hparque.from_parquet(dst_dir, use_index=False)
+        actual = actual.sort_index()
+        expected = self._get_test_df()
+        self.assertEqual(actual["value"].tolist(), expected["value"].tolist())
+        self.assertEqual(actual["asset"].tolist(), expected["asset"].tolist())
+
+    def test_by_year_month1(self) -> None:
+        """
+        Test that the rows are buffered into one file per partition.
+        """
+        # Run test.
+        dst_dir = self._write("by_year_month")
+        # Check outputs.
+        self._check_written_data(dst_dir)
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        actual = "\n".join(
+            f"{os.path.dirname(rel_path)} num_rows={entry['num_rows']}"
+            for rel_path, entry in sorted(index["files"].items())
+        )
+        expected = r"""
+        asset=A/year=2022/month=1 num_rows=16
+        asset=A/year=2022/month=2 num_rows=14
+        asset=A/year=2022/month=3 num_rows=15
+        asset=A/year=2022/month=4 num_rows=5
+        asset=B/year=2022/month=1 num_rows=15
+        asset=B/year=2022/month=2 num_rows=14
+        asset=B/year=2022/month=3 num_rows=16
+        asset=B/year=2022/month=4 num_rows=5
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+
+    def test_by_date1(self) -> None:
+        """
+        Test writing a dataset partitioned by date.
+        """
+        # Run test.
+        dst_dir = self._write("by_date")
+        # Check outputs.
+        self._check_written_data(dst_dir)
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(len(index["files"]), 100)
+
+    def test_by_year_week1(self) -> None:
+        """
+        Test writing a dataset partitioned by year and week.
+        """
+        # Run test.
+        dst_dir = self._write("by_year_week")
+        # Check outputs.
+        self._check_written_data(dst_dir)
+
+    def test_flush1(self) -> None:
+        """
+        Test that a partition is committed as soon as it reaches the target
+        size, while the others stay buffered.
+        """
+        # Prepare inputs.
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        df = self._get_test_df()
+        writer = hparque.ParquetDatasetWriter(
+            dst_dir, "by_year_month", target_rows_per_file=31
+        )
+        # Run test.
+        writer.append(df.iloc[:30])
+        # Check outputs.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertIsNone(index)
+        # Run test.
+        writer.append(df.iloc[30:70])
+        # Check outputs.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(
+            [os.path.dirname(rel_path) for rel_path in index["files"]],
+            ["year=2022/month=1"],
+        )
+        # Run test.
+        writer.close()
+        # Check outputs.
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(len(index["files"]), 3)
+
+    def test_error1(self) -> None:
+        """
+        Test that the buffered rows are not committed on error.
+        """
+        # Prepare inputs.
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        df = self._get_test_df()
+        # Run test.
+        with self.assertRaises(ValueError):
+            with hparque.ParquetDatasetWriter(dst_dir, "by_year_month") as writer:
+                writer.append(df)
+                raise ValueError("Simulated error")
+        # Check outputs.
+        self.assertFalse(os.path.exists(dst_dir))
+
+    def test_error2(self) -> None:
+        """
+        Test that the files of a flush failing while writing are removed.
+        """
+        # Prepare inputs.
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        df = self._get_test_df()
+        write_table = parquet.write_table
+        num_calls = [0]
+
+        def _write_table(*args: Any, **kwargs: Any) -> None:
+            num_calls[0] += 1
+            if num_calls[0] > 1:
+                raise OSError("Simulated error")
+            write_table(*args, **kwargs)
+
+        # Run test.
+        with self.assertRaises(OSError):
+            with umock.patch.object(parquet, "write_table", _write_table):
+                with hparque.ParquetDatasetWriter(
+                    dst_dir, "by_year_month"
+                ) as writer:
+                    writer.append(df)
+        # Check outputs.
+        self.assertEqual(num_calls[0], 2)
+        file_names = [
+            file_name
+            for _, _, file_names in os.walk(dst_dir)
+            for file_name in file_names
+        ]
+        self.assertEqual(file_names, [])
+
+    def test_error3(self) -> None:
+        """
+        Test that a flush failing to commit in the index is not visible.
+        """
+        # Prepare inputs.
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        df = self._get_test_df()
+        with hparque.ParquetDatasetWriter(dst_dir, "by_year_month") as writer:
+            writer.append(df.iloc[:50])
+        # Run test.
+        with self.assertRaises(OSError):
+            with umock.patch.object(
+                hparque,
+                "_update_parquet_dataset_index",
+                side_effect=OSError("Simulated error"),
+            ):
+                with hparque.ParquetDatasetWriter(
+                    dst_dir, "by_year_month"
+                ) as writer:
+                    writer.append(df.iloc[50:])
+        # Check outputs.
+        for use_index in [True, False]:
+            actual = hparque.from_parquet(dst_dir, use_index=use_index)
+            self.assertEqual(len(actual), 50)
+
+    def test_append_to_dataset1(self) -> None:
+        """
+        Test that appending to a dataset without an index doesn't hide the
+        existing files from the readers.
+        """
+        # Prepare inputs.
+        dst_dir = os.path.join(self.get_scratch_space(), "dataset")
+        df = self._get_test_df()
+        df_tmp, partition_columns = hparque.add_date_partition_columns(
+            df.copy(), "by_year_month"
+        )
+        hparque.to_partitioned_parquet(df_tmp, partition_columns, dst_dir)
+        df_new = df.iloc[:10].copy()
+        df_new.index = df_new.index + pd.DateOffset(years=1)
+        # Run test.
+        with hparque.ParquetDatasetWriter(dst_dir, "by_year_month") as writer:
+            writer.append(df_new)
+        # Check outputs.
+        actual = hparque.from_parquet(dst_dir)
+        self.assertEqual(len(actual), 110)
+        expected = hparque.from_parquet(dst_dir, use_index=False)
+        self.assertEqual(len(expected), 110)
+        index = hparque.load_parquet_dataset_index(dst_dir)
+        self.assertEqual(index, hparque.build_parquet_dataset_index(dst_dir))
+
+
+# #############################################################################
+# TestPlanParquetQuery1
+# #############################################################################
+
+
+class TestPlanParquetQuery1(hunitest.TestCase):
+    @staticmethod
+    def _get_test_df() -> pd.DataFrame:
+        index = pd.date_range(
+            "2021-12-20", periods=24 * 40, freq="1h", tz="UTC", name="timestamp"
+        )
+        df = pd.DataFrame(
+            {"value": range(len(index)), "asset_id": [1, 2, 3] * 320},
+            index=index,
+        )
+        return df
+
+    def _write_dataset(self, partition_mode: str, create_index: bool) -> str:
+        dst_dir = os.path.join(self.get_scratch_space(), partition_mode)
+        df, partition_columns = hparque.add_date_partition_columns(
+            self._get_test_df(), partition_mode
+        )
+        hparque.to_partitioned_parquet(
+            df,
+            ["asset_id"] + partition_columns,
+            dst_dir,
+            create_index=create_index,
+        )
+        return dst_dir
+
+    def _test_read(self, partition_mode: str, create_index: bool) -> None:
+        # Prepare inputs.
+        dst_dir = self._write_dataset(partition_mode, create_index)
+        start_timestamp = pd.Timestamp("2021-12-30 05:00", tz="UTC")
+        end_timestamp = pd.Timestamp("2022-01-02 03:00", tz="UTC")
+        asset_ids = [1, 3]
+        # Run test.
+        plan = hparque.plan_parquet_query(
+            dst_dir,
+            partition_mode,
+            start_timestamp,
+            end_timestamp,
+            asset_ids=asset_ids,
+            timestamp_col="timestamp",
+            columns=["value"],
+        )
+        actual = hparque.read_parquet_query_plan(plan)
+        # Check outputs.
+        df = self._get_test_df()
+        expected = df[
+            (df.index >= start_timestamp)
+            & (df.index <= end_timestamp)
+            & df["asset_id"].isin(asset_ids)
+        ]
+        self.assertEqual(
+            sorted(actual["value"].tolist()), expected["value"].tolist()
+        )
+
+    def test_get_partition_paths1(self) -> None:
+        """
+        Test the partitions of an interval across the end of the year.
+        """
+        # Prepare inputs.
+        start_timestamp = pd.Timestamp("2021-12-30 05:00", tz="UTC")
+        end_timestamp = pd.Timestamp("2022-01-03 03:00", tz="UTC")
+        # Run test.
+        actual = []
+        for partition_mode in ["by_date", "by_year_month", "by_year_week"]:
+            actual.extend(
+                hparque.get_partition_paths_from_timestamp_interval(
+                    partition_mode,
+                    start_timestamp,
+                    end_timestamp,
+                    asset_ids=["BTC_USDT"],
+                    asset_id_col="currency_pair",
+                )
+            )
+        # Check outputs.
+        actual = "\n".join(actual)
+        expected = r"""
+        currency_pair=BTC_USDT/date=20211230
+        currency_pair=BTC_USDT/date=20211231
+        currency_pair=BTC_USDT/date=20220101
+        currency_pair=BTC_USDT/date=20220102
+        currency_pair=BTC_USDT/date=20220103
+        currency_pair=BTC_USDT/year=2021/month=12
+        currency_pair=BTC_USDT/year=2022/month=1
+        currency_pair=BTC_USDT/year=2021/weekofyear=52
+        currency_pair=BTC_USDT/year=2022/weekofyear=52
+        currency_pair=BTC_USDT/year=2022/weekofyear=1
+        """
+        self.assert_equal(actual, expected, fuzzy_match=True)
+
+    def test_read_by_date1(self) -> None:
+        self._test_read("by_date", create_index=False)
+
+    def test_read_by_year_month_day1(self) -> None:
+        self._test_read("by_year_month_day", create_index=True)
+
+    def test_read_by_year_month1(self) -> None:
+        self._test_read("by_year_month", create_index=False)
+
+    def test_read_by_year_week1(self) -> None:
+        self._test_read("by_year_week", create_index=True)
+
+    def test_read_by_year1(self) -> None:
+        self._test_read("by_year", create_index=False)
+
+    def test_read_by_month1(self) -> None:
+        self._test_read("by_month", create_index=True)
+
+    def test_empty1(self) -> None:
+        """
+        Test a query on an interval without data.
+        """
+        # Prepare inputs.
+        dst_dir = self._write_dataset("by_date", create_index=False)
+        # Run test.
+        plan = hparque.plan_parquet_query(
+            dst_dir,
+            "by_date",
+            pd.Timestamp("2023-01-01", tz="UTC"),
+            pd.Timestamp("2023-01-02", tz="UTC"),
+            asset_ids=[1],
+            columns=["value"],
+        )
+        actual = hparque.read_parquet_query_plan(plan)
+        # Check outputs.
+        self.assertEqual(plan.files, [])
+        self.assertEqual(actual.columns.tolist(), ["value"])
+        self.assertEqual(len(actual), 0)
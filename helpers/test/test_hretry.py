@@ -171,3 +171,40 @@ class Test_retry2(hunitest.TestCase):
         actual = str(fail.exception)
         expected = "Simulated non expected error"
         self.assert_equal(actual, expected)
+
+
+# #############################################################################
+# Test_get_backoff_delay_in_sec1
+# #############################################################################
+
+
+class Test_get_backoff_delay_in_sec1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Test that the delay grows exponentially up to the maximum delay.
+        """
+        # Run test.
+        actual = [
+            hretry.get_backoff_delay_in_sec(
+                attempt,
+                retry_delay_in_sec=1,
+                backoff_factor=2.0,
+                max_retry_delay_in_sec=5,
+            )
+            for attempt in range(1, 6)
+        ]
+        # Check outputs.
+        self.assertEqual(actual, [1, 2, 4, 5, 5])
+
+    def test2(self) -> None:
+        """
+        Test that the jitter keeps the delay within the expected bounds.
+        """
+        for _ in range(100):
+            # Run test.
+            actual = hretry.get_backoff_delay_in_sec(
+                3, retry_delay_in_sec=1, backoff_factor=2.0, jitter=0.25
+            )
+            # Check outputs.
+            self.assertGreaterEqual(actual, 3.0)
+            self.assertLessEqual(actual, 5.0)
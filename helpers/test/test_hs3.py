@@ -1,6 +1,8 @@
+import gzip
 import logging
 import os
-from typing import Generator, Tuple
+import unittest.mock as umock
+from typing import Dict, Generator, List, Tuple
 
 import pytest
 
@@ -339,6 +341,384 @@ class TestDu1(hmoto.S3Mock_TestCase):
         self.assert_equal(size, expected_size)
 
 
+# #############################################################################
+# TestS3ListingCache1
+# #############################################################################
+
+
+@pytest.mark.requires_ck_infra
+@pytest.mark.requires_aws
+@pytest.mark.skipif(
+    not hserver.is_CK_S3_available(),
+    reason="Run only if CK S3 is available",
+)
+class TestS3ListingCache1(hmoto.S3Mock_TestCase):
+    def set_up_test(self) -> None:
+        super().set_up_test()
+        hs3.enable_s3_listing_cache(3600)
+
+    def tear_down_test(self) -> None:
+        hs3.disable_s3_listing_cache()
+        super().tear_down_test()
+
+    def test_listdir1(self) -> None:
+        """
+        Verify that listings are cached until they are invalidated.
+        """
+        # Prepare inputs.
+        dir_s3_path = f"s3://{self.bucket_name}/dir"
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        with moto_s3fs.open(f"{dir_s3_path}/mock1.txt", "wb") as s3_file:
+            s3_file.write(b"line_mock1")
+
+        def _listdir() -> List[str]:
+            paths = hs3.listdir(
+                dir_s3_path, "*", True, True, aws_profile=moto_s3fs
+            )
+            return sorted(paths)
+
+        self.assertEqual(_listdir(), ["mock1.txt"])
+        # Run test.
+        # Write a file without going through `hs3`.
+        with moto_s3fs.open(f"{dir_s3_path}/mock2.txt", "wb") as s3_file:
+            s3_file.write(b"line_mock2")
+        actual1 = _listdir()
+        hs3.invalidate_s3_listing_cache(f"{dir_s3_path}/mock2.txt")
+        actual2 = _listdir()
+        # Write a file through `hs3`, which invalidates the cache.
+        hs3.to_file(
+            "line_mock3", f"{dir_s3_path}/mock3.txt", aws_profile=moto_s3fs
+        )
+        actual3 = _listdir()
+        # Check outputs.
+        self.assertEqual(actual1, ["mock1.txt"])
+        self.assertEqual(actual2, ["mock1.txt", "mock2.txt"])
+        self.assertEqual(actual3, ["mock1.txt", "mock2.txt", "mock3.txt"])
+
+    def test_du1(self) -> None:
+        """
+        Verify that the sizes are cached until they are invalidated.
+        """
+        # Prepare inputs.
+        dir_s3_path = f"s3://{self.bucket_name}/dir"
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        with moto_s3fs.open(f"{dir_s3_path}/mock1.txt", "wb") as s3_file:
+            s3_file.write(b"0123456789")
+        self.assertEqual(hs3.du(dir_s3_path, aws_profile=moto_s3fs), 10)
+        # Run test.
+        with moto_s3fs.open(f"{dir_s3_path}/sub/mock2.txt", "wb") as s3_file:
+            s3_file.write(b"0123456789")
+        actual1 = hs3.du(dir_s3_path, aws_profile=moto_s3fs)
+        hs3.invalidate_s3_listing_cache(f"{dir_s3_path}/sub")
+        actual2 = hs3.du(dir_s3_path, aws_profile=moto_s3fs)
+        # Check outputs.
+        self.assertEqual(actual1, 10)
+        self.assertEqual(actual2, 20)
+
+
+# #############################################################################
+# TestS3Transfers1
+# #############################################################################
+
+
+@pytest.mark.requires_ck_infra
+@pytest.mark.requires_aws
+@pytest.mark.skipif(
+    not hserver.is_CK_S3_available(),
+    reason="Run only if CK S3 is available",
+)
+class TestS3Transfers1(hmoto.S3Mock_TestCase):
+    # Smallest part size allowed by S3 for multipart uploads.
+    part_size_in_bytes = 5 * 1024 * 1024
+
+    def _write_local_dir(self, dir_name: str) -> Dict[str, bytes]:
+        """
+        Write a dir with a small file and a file spanning multiple parts.
+        """
+        contents = {
+            "small.txt": b"line_mock1",
+            "sub/large.bin": os.urandom(2 * self.part_size_in_bytes + 10),
+        }
+        for file_name, content in contents.items():
+            path = os.path.join(dir_name, file_name)
+            hio.create_enclosing_dir(path, incremental=True)
+            with open(path, "wb") as f:
+                f.write(content)
+        return contents
+
+    def _check_local_dir(
+        self, dir_name: str, expected: Dict[str, bytes]
+    ) -> None:
+        for file_name, content in expected.items():
+            with open(os.path.join(dir_name, file_name), "rb") as f:
+                self.assertEqual(f.read(), content)
+
+    def test_archive_data_on_s3(self) -> None:
+        """
+        Verify that an archived dir is retrieved and expanded unchanged.
+        """
+        # Prepare inputs.
+        scratch_dir = self.get_scratch_space()
+        src_dir = os.path.join(scratch_dir, "experiment")
+        contents = self._write_local_dir(src_dir)
+        s3_path = f"s3://{self.bucket_name}/archive"
+        # Run test.
+        s3_file_path = hs3.archive_data_on_s3(
+            src_dir,
+            s3_path,
+            self.mock_aws_profile,
+            "test",
+            num_threads=3,
+            part_size_in_bytes=self.part_size_in_bytes,
+        )
+        # Check outputs.
+        self.assertTrue(s3_file_path.startswith(f"{s3_path}/experiment."))
+        self.assertTrue(s3_file_path.endswith(".test.tgz"))
+        dst_dir = os.path.join(scratch_dir, "dst")
+        tgz_file = hs3.retrieve_archived_data_from_s3(
+            s3_file_path, dst_dir, self.mock_aws_profile
+        )
+        actual_dir = hs3.expand_archived_data(tgz_file, dst_dir)
+        self.assertEqual(
+            os.path.normpath(actual_dir), os.path.join(dst_dir, "experiment")
+        )
+        self._check_local_dir(actual_dir, contents)
+
+    def test_copy_data_from_s3_to_local_dir(self) -> None:
+        """
+        Verify that a dir is copied and that up to date files are skipped.
+        """
+        # Prepare inputs.
+        scratch_dir = self.get_scratch_space()
+        contents = self._write_local_dir(os.path.join(scratch_dir, "src"))
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        s3_dir = f"s3://{self.bucket_name}/dir"
+        for file_name, content in contents.items():
+            with moto_s3fs.open(f"{s3_dir}/{file_name}", "wb") as s3_file:
+                s3_file.write(content)
+        # Add a file in a dir with the same prefix, which is not copied.
+        with moto_s3fs.open(f"{s3_dir}2/other.txt", "wb") as s3_file:
+            s3_file.write(b"line_mock2")
+        dst_dir = os.path.join(scratch_dir, "dst")
+        # Run test.
+        hs3.copy_data_from_s3_to_local_dir(
+            s3_dir,
+            dst_dir,
+            self.mock_aws_profile,
+            num_threads=3,
+            part_size_in_bytes=self.part_size_in_bytes,
+        )
+        # Check outputs.
+        self._check_local_dir(dst_dir, contents)
+        self.assertEqual(sorted(os.listdir(dst_dir)), ["small.txt", "sub"])
+        # Run test again after changing a local file with the same size.
+        small_file = os.path.join(dst_dir, "small.txt")
+        with open(small_file, "wb") as f:
+            f.write(b"line_mock3")
+        hs3.copy_data_from_s3_to_local_dir(
+            s3_dir, dst_dir, self.mock_aws_profile
+        )
+        # Check outputs.
+        with open(small_file, "rb") as f:
+            self.assertEqual(f.read(), b"line_mock3")
+
+
+# #############################################################################
+# TestOpenFile1
+# #############################################################################
+
+
+@pytest.mark.requires_ck_infra
+@pytest.mark.requires_aws
+@pytest.mark.skipif(
+    not hserver.is_CK_S3_available(),
+    reason="Run only if CK S3 is available",
+)
+class TestOpenFile1(hmoto.S3Mock_TestCase):
+    # Smallest part size allowed by S3 for multipart uploads.
+    part_size_in_bytes = 5 * 1024 * 1024
+
+    def test_write_read1(self) -> None:
+        """
+        Verify writing and reading a file in multiple parts in chunks.
+        """
+        # Prepare inputs.
+        s3_path = f"s3://{self.bucket_name}/dir/data.bin"
+        content = os.urandom(2 * self.part_size_in_bytes + 10)
+        chunk_size = 1024 * 1024
+        # Run test.
+        with hs3.open_file(
+            s3_path,
+            "wb",
+            aws_profile=self.mock_aws_profile,
+            part_size_in_bytes=self.part_size_in_bytes,
+        ) as f:
+            for idx in range(0, len(content), chunk_size):
+                f.write(content[idx : idx + chunk_size])
+        with hs3.open_file(
+            s3_path, "rb", aws_profile=self.mock_aws_profile
+        ) as f:
+            chunks = list(iter(lambda: f.read(chunk_size), b""))
+        # Check outputs.
+        self.assertEqual(len(chunks), 11)
+        self.assertEqual(b"".join(chunks), content)
+
+    def test_gzip1(self) -> None:
+        """
+        Verify that gzipped files are compressed and decompressed.
+        """
+        # Prepare inputs.
+        s3_path = f"s3://{self.bucket_name}/dir/log.txt.gz"
+        lines = [f"line_mock{idx}\n" for idx in range(1000)]
+        # Run test.
+        with hs3.open_file(
+            s3_path, "w", aws_profile=self.mock_aws_profile
+        ) as f:
+            f.writelines(lines)
+        with hs3.open_file(
+            s3_path, "r", aws_profile=self.mock_aws_profile
+        ) as f:
+            actual = list(f)
+        # Check outputs.
+        self.assertEqual(actual, lines)
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        with moto_s3fs.open(s3_path, "rb") as f:
+            data = gzip.decompress(f.read()).decode()
+        self.assertEqual(data, "".join(lines))
+
+    def test_byte_range1(self) -> None:
+        """
+        Verify reading ranges of bytes from S3 and local files.
+        """
+        # Prepare inputs.
+        s3_path = f"s3://{self.bucket_name}/dir/data.txt"
+        local_path = os.path.join(self.get_scratch_space(), "data.txt")
+        paths_and_profiles = [
+            (s3_path, self.mock_aws_profile),
+            (local_path, None),
+        ]
+        for path, aws_profile in paths_and_profiles:
+            with hs3.open_file(path, "wb", aws_profile=aws_profile) as f:
+                f.write(b"0123456789")
+            # Run test.
+            actual = []
+            for byte_range in [(2, 5), (7, None), (3, 3)]:
+                with hs3.open_file(
+                    path, "rb", byte_range=byte_range, aws_profile=aws_profile
+                ) as f:
+                    actual.append(f.read())
+            # Check outputs.
+            self.assertEqual(actual, [b"234", b"789", b""])
+
+    def test_abort1(self) -> None:
+        """
+        Verify that no file is left when writing fails.
+        """
+        # Prepare inputs.
+        s3_path = f"s3://{self.bucket_name}/dir/data.txt"
+        # Run test.
+        with self.assertRaises(ValueError):
+            with hs3.open_file(
+                s3_path, "w", aws_profile=self.mock_aws_profile
+            ) as f:
+                f.write("line_mock1\n")
+                raise ValueError("Simulated error")
+        # Check outputs.
+        moto_s3fs = hs3.get_s3fs(self.mock_aws_profile)
+        self.assertFalse(moto_s3fs.exists(s3_path))
+
+
+# #############################################################################
+# Test_open_s3_upload_stream1
+# #############################################################################
+
+
+class Test_open_s3_upload_stream1(hunitest.TestCase):
+    def test_upload_error1(self) -> None:
+        """
+        Verify that the error of a failed upload is raised.
+        """
+        # Prepare inputs.
+        manager = umock.MagicMock()
+        manager.__enter__.return_value.upload.side_effect = ValueError(
+            "Simulated upload error"
+        )
+        s3_client = umock.MagicMock()
+        # Write more than the pipe can buffer, so that writing fails.
+        chunk = b"0" * 1024 * 1024
+        # Run test.
+        with umock.patch.object(
+            hs3, "_get_transfer_manager", return_value=manager
+        ):
+            with self.assertRaises(ValueError) as cm:
+                with hs3._open_s3_upload_stream(
+                    "s3://bucket/dir/data.bin", s3_client, 1, 1024
+                ) as f:
+                    for _ in range(10):
+                        f.write(chunk)
+        # Check outputs.
+        self.assertEqual(str(cm.exception), "Simulated upload error")
+        self.assertIsInstance(cm.exception.__cause__, BrokenPipeError)
+        s3_client.delete_object.assert_not_called()
+
+
+# #############################################################################
+# Test_get_filesystem_from_pool1
+# #############################################################################
+
+
+class Test_get_filesystem_from_pool1(hunitest.TestCase):
+    def tear_down_test(self) -> None:
+        hs3.clear_filesystem_pool()
+
+    def test1(self) -> None:
+        """
+        Verify that a filesystem is created once per profile and endpoint.
+        """
+        # Prepare inputs.
+        created = []
+
+        def _factory() -> object:
+            created.append(object())
+            return created[-1]
+
+        # Run test.
+        fs1 = hs3.get_filesystem_from_pool("test", "profile1", _factory)
+        fs2 = hs3.get_filesystem_from_pool("test", "profile1", _factory)
+        fs3 = hs3.get_filesystem_from_pool(
+            "test", "profile1", _factory, endpoint_url="http://localhost"
+        )
+        fs4 = hs3.get_filesystem_from_pool("test", "profile2", _factory)
+        # Check outputs.
+        self.assertIs(fs1, fs2)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(len({id(fs1), id(fs3), id(fs4)}), 3)
+
+    def test2(self) -> None:
+        """
+        Verify that a filesystem is created again after its maximum age.
+        """
+        # Prepare inputs.
+        created = []
+
+        def _factory() -> object:
+            created.append(object())
+            return created[-1]
+
+        # Run test.
+        fs1 = hs3.get_filesystem_from_pool(
+            "test", "profile1", _factory, max_age_in_secs=0
+        )
+        fs2 = hs3.get_filesystem_from_pool(
+            "test", "profile1", _factory, max_age_in_secs=0
+        )
+        hs3.clear_filesystem_pool()
+        fs3 = hs3.get_filesystem_from_pool("test", "profile1", _factory)
+        # Check outputs.
+        self.assertEqual(created, [fs1, fs2, fs3])
+        self.assertEqual(len({id(fs1), id(fs2), id(fs3)}), 3)
+
+
 # #############################################################################
 # TestGenerateAwsFiles
 # #############################################################################
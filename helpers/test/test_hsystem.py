@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import os
 import platform
 import re
 import tempfile
+import time
 
 import helpers.hdbg as hdbg
 import helpers.hio as hio
@@ -207,6 +209,225 @@ class Test_system2(hunitest.TestCase):
         self.assertEqual(actual, expected)
 
 
+# #############################################################################
+# Test_system3
+# #############################################################################
+
+
+class Test_system3(hunitest.TestCase):
+    """
+    Test running commands passed as a list of arguments.
+    """
+
+    def test1(self) -> None:
+        """
+        Check that the arguments are not interpreted by a shell.
+        """
+        # Run test.
+        rc, actual = hsystem.system_to_string(["echo", "$HOME", "a  b", ";"])
+        # Check outputs.
+        self.assertEqual(rc, 0)
+        self.assertEqual(actual, "$HOME a  b ;")
+
+    def test2(self) -> None:
+        """
+        Check that stdout and stderr are captured and teed to a file.
+        """
+        # Prepare inputs.
+        log_file_path = os.path.join(self.get_scratch_space(), "tee_log")
+        cmd = ["bash", "-c", "echo out; echo err >&2; exit 3"]
+        # Run test.
+        rc = hsystem.system(
+            cmd, abort_on_error=False, output_file=log_file_path, tee=True
+        )
+        # Check outputs.
+        self.assertEqual(rc, 3)
+        actual = hio.from_file(log_file_path)
+        self.assertEqual(actual, "out\nerr\n")
+
+    def test3(self) -> None:
+        """
+        Check that stdout is redirected to a file without `tee`.
+        """
+        # Prepare inputs.
+        output_file = os.path.join(self.get_scratch_space(), "output.txt")
+        # Run test.
+        rc = hsystem.system(["echo", "hello"], output_file=output_file)
+        # Check outputs.
+        self.assertEqual(rc, 0)
+        actual = hio.from_file(output_file)
+        self.assertEqual(actual, "hello\n")
+
+    def test4(self) -> None:
+        """
+        Check the error raised by a failing command.
+        """
+        # Run test.
+        with self.assertRaises(RuntimeError) as cm:
+            hsystem.system(["ls", "this_file_doesnt_exist"])
+        # Check outputs.
+        actual = str(cm.exception)
+        self.assertIn("cmd='ls this_file_doesnt_exist'", actual)
+        self.assertIn("this_file_doesnt_exist", actual)
+
+    def test5(self) -> None:
+        """
+        Check capturing a large output with long lines and missing newlines.
+        """
+        # Prepare inputs.
+        num_lines = 100000
+        cmd = [
+            "python",
+            "-c",
+            f"import sys; sys.stdout.write('x' * 100 + '\\r\\n' * {num_lines}"
+            " + 'y' * 10000)",
+        ]
+        # Run test.
+        _, actual = hsystem.system_to_string(cmd)
+        # Check outputs.
+        expected = "x" * 100 + "\r\n" * num_lines + "y" * 10000
+        self.assertEqual(actual, expected)
+
+
+# #############################################################################
+# Test_system_concurrently1
+# #############################################################################
+
+
+class Test_system_concurrently1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Check that stdout, stderr and rc are returned in the order of the
+        commands.
+        """
+        # Prepare inputs.
+        cmds = [
+            "echo a; echo b",
+            ["bash", "-c", "echo out; echo err >&2; exit 2"],
+        ]
+        # Run test.
+        results = hsystem.system_concurrently(cmds, abort_on_error=False)
+        # Check outputs.
+        actual = [
+            (result.cmd, result.rc, result.stdout, result.stderr)
+            for result in results
+        ]
+        expected = [
+            (cmds[0], 0, "a\nb\n", ""),
+            (cmds[1], 2, "out\n", "err\n"),
+        ]
+        self.assertEqual(actual, expected)
+
+    def test2(self) -> None:
+        """
+        Check that the commands run concurrently.
+        """
+        # Prepare inputs.
+        cmds = [["sleep", "0.5"]] * 4
+        # Run test.
+        start_time = time.monotonic()
+        results = hsystem.system_concurrently(cmds, max_concurrency=4)
+        elapsed_time = time.monotonic() - start_time
+        # Check outputs.
+        self.assertEqual([result.rc for result in results], [0] * 4)
+        self.assertLess(elapsed_time, 1.5)
+
+    def test3(self) -> None:
+        """
+        Check that a command exceeding its timeout is killed with its children.
+        """
+        # Prepare inputs.
+        cmds = ["sleep 10; echo done", "echo fast"]
+        # Run test.
+        results = hsystem.system_concurrently(
+            cmds, timeout_in_secs=0.5, abort_on_error=False
+        )
+        # Check outputs.
+        self.assertTrue(results[0].timed_out)
+        self.assertNotEqual(results[0].rc, 0)
+        self.assertLess(results[0].duration_in_secs, 5)
+        self.assertEqual(results[0].stdout, "")
+        self.assertFalse(results[1].timed_out)
+        self.assertEqual(results[1].stdout, "fast\n")
+
+    def test4(self) -> None:
+        """
+        Check the error raised when some commands fail.
+        """
+        # Prepare inputs.
+        cmds = [["ls", "this_file_doesnt_exist"], "true"]
+        # Run test.
+        with self.assertRaises(RuntimeError) as cm:
+            hsystem.system_concurrently(cmds)
+        # Check outputs.
+        actual = str(cm.exception)
+        self.assertIn("system_concurrently() failed: 1 / 2 commands", actual)
+        self.assertIn("cmd='ls this_file_doesnt_exist'", actual)
+
+    def test5(self) -> None:
+        """
+        Check running a single command from async code.
+        """
+        # Run test.
+        result = asyncio.run(hsystem.async_system(["echo", "hello"]))
+        # Check outputs.
+        self.assertEqual(result.rc, 0)
+        self.assertEqual(result.stdout, "hello\n")
+        self.assertGreater(result.duration_in_secs, 0)
+
+    def test6(self) -> None:
+        """
+        Check that a missing executable is reported as a failed command.
+        """
+        # Prepare inputs.
+        cmds = [["no_such_bin"], "echo ok"]
+        # Run test.
+        results = hsystem.system_concurrently(cmds, abort_on_error=False)
+        result = asyncio.run(
+            hsystem.async_system(["no_such_bin"], abort_on_error=False)
+        )
+        # Check outputs.
+        self.assertEqual(results[0].rc, -1)
+        self.assertIn("no_such_bin", results[0].stderr)
+        self.assertEqual(results[1].rc, 0)
+        self.assertEqual(results[1].stdout, "ok\n")
+        self.assertEqual(result.rc, -1)
+        self.assertIn("no_such_bin", result.stderr)
+
+    def test7(self) -> None:
+        """
+        Check that cancelling a command kills it without hanging.
+        """
+
+        async def _run() -> None:
+            await asyncio.wait_for(
+                hsystem.async_system(["sleep", "10"]), timeout=0.5
+            )
+
+        # Run test.
+        start_time = time.monotonic()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(_run())
+        elapsed_time = time.monotonic() - start_time
+        # Check outputs.
+        self.assertLess(elapsed_time, 5)
+
+    def test8(self) -> None:
+        """
+        Check that the output produced before a timeout is reported.
+        """
+        # Prepare inputs.
+        cmds = ["echo start; echo error >&2; sleep 10; echo done"]
+        # Run test.
+        results = hsystem.system_concurrently(
+            cmds, timeout_in_secs=0.5, abort_on_error=False
+        )
+        # Check outputs.
+        self.assertTrue(results[0].timed_out)
+        self.assertEqual(results[0].stdout, "start\n")
+        self.assertEqual(results[0].stderr, "error\n")
+
+
 # #############################################################################
 # Test_Linux_commands1
 # #############################################################################
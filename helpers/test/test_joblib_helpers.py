@@ -1,10 +1,14 @@
+import concurrent.futures
 import logging
 import os
 import time
-from typing import Any, List, Optional, Union
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+import pandas as pd
 import pytest
 
+import helpers.hio as hio
 import helpers.hjoblib as hjoblib
 import helpers.hprint as hprint
 import helpers.hunit_test as hunitest
@@ -532,6 +536,665 @@ val1=4, val2=8, incremental=True, num_attempts=1, kwargs={'hello4': 'world8', 'g
         self._run_test(abort_on_error, num_threads, backend, should_succeed)
 
 
+# #############################################################################
+# Test_parallel_execute_iter1
+# #############################################################################
+
+
+# Indices of the tasks executed by `sleep_workload_function()` in this process.
+_EXECUTED_TASKS: List[int] = []
+
+
+def sleep_workload_function(
+    val: int,
+    sleep_in_secs: float,
+    #
+    **kwargs: Any,
+) -> int:
+    """
+    Execute a task sleeping for the given time.
+
+    :param val: value to return, or -1 to raise
+    :param sleep_in_secs: time to sleep before returning
+    :return: `val`
+    """
+    _ = kwargs
+    _EXECUTED_TASKS.append(val)
+    time.sleep(sleep_in_secs)
+    if val == -1:
+        raise ValueError("Error")
+    return val
+
+
+def get_sleep_workload(
+    vals: List[int], *, sleep_in_secs: Optional[float] = None
+) -> hjoblib.Workload:
+    """
+    Return a workload where the earlier tasks take longer to complete.
+
+    :param sleep_in_secs: if not None, use the same sleep time for all the
+        tasks
+    """
+    tasks = []
+    for i, val in enumerate(vals):
+        if sleep_in_secs is None:
+            task = ((val, 0.05 * (len(vals) - i)), {})
+        else:
+            task = ((val, sleep_in_secs), {})
+        tasks.append(task)
+    workload: hjoblib.Workload = (
+        sleep_workload_function,
+        "sleep_workload_function",
+        tasks,
+    )
+    return workload
+
+
+class Test_parallel_execute_iter1(hunitest.TestCase):
+    """
+    Execute a workload yielding the results as the tasks complete.
+    """
+
+    def _run_test(self, keep_order: bool) -> List[Tuple[int, Any]]:
+        workload = get_sleep_workload([10, 11, 12, 13])
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        res_iter = hjoblib.parallel_execute_iter(
+            workload,
+            4,
+            True,
+            True,
+            1,
+            log_file,
+            backend="asyncio_threading",
+            keep_order=keep_order,
+        )
+        res = list(res_iter)
+        return res
+
+    def test1(self) -> None:
+        """
+        Check that the results are yielded in the order of the tasks.
+        """
+        # Run test.
+        res = self._run_test(keep_order=True)
+        # Check outputs.
+        self.assertEqual(res, [(0, 10), (1, 11), (2, 12), (3, 13)])
+
+    def test2(self) -> None:
+        """
+        Check that the results are yielded in order of completion.
+        """
+        # Run test.
+        res = self._run_test(keep_order=False)
+        # Check outputs.
+        self.assertEqual(res, [(3, 13), (2, 12), (1, 11), (0, 10)])
+
+
+# #############################################################################
+# Test_parallel_execute_checkpoint1
+# #############################################################################
+
+
+class Test_parallel_execute_checkpoint1(hunitest.TestCase):
+    """
+    Resume the execution of a workload from a checkpoint journal.
+    """
+
+    def set_up_test(self) -> None:
+        _EXECUTED_TASKS.clear()
+
+    @pytest.fixture(autouse=True)
+    def setup_teardown_test(self):
+        # Run before each test.
+        self.set_up_test()
+        yield
+
+    def _run_workload(self, vals: List[int], checkpoint_file: str) -> List[Any]:
+        workload = get_sleep_workload(vals, sleep_in_secs=0.01)
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            "serial",
+            True,
+            False,
+            1,
+            log_file,
+            checkpoint_file=checkpoint_file,
+        )
+        return res
+
+    def test1(self) -> None:
+        """
+        Check that only the tasks not completed are executed again.
+        """
+        # Prepare inputs.
+        checkpoint_file = os.path.join(
+            self.get_scratch_space(), "checkpoint.pkl"
+        )
+        # Run a workload with a failing task.
+        res1 = self._run_workload([1, -1, 3], checkpoint_file)
+        self.assertEqual(res1, [1, "Error", 3])
+        self.assertEqual(_EXECUTED_TASKS, [1, -1, 3])
+        # Run the workload again after "fixing" the failing task.
+        _EXECUTED_TASKS.clear()
+        res2 = self._run_workload([1, 2, 3], checkpoint_file)
+        # Check outputs.
+        self.assertEqual(res2, [1, 2, 3])
+        self.assertEqual(_EXECUTED_TASKS, [2])
+
+    def test2(self) -> None:
+        """
+        Check that a record truncated by a crash is discarded.
+        """
+        # Prepare inputs.
+        checkpoint_file = os.path.join(
+            self.get_scratch_space(), "checkpoint.pkl"
+        )
+        self._run_workload([1, 2], checkpoint_file)
+        with open(checkpoint_file, "ab") as f:
+            f.write(b"\x80\x04\x95")
+        # Run test.
+        _EXECUTED_TASKS.clear()
+        res = self._run_workload([1, 2, 3], checkpoint_file)
+        # Check outputs.
+        self.assertEqual(res, [1, 2, 3])
+        self.assertEqual(_EXECUTED_TASKS, [3])
+        completed = hjoblib._load_checkpoint(checkpoint_file)
+        self.assertEqual(sorted(completed.values()), [1, 2, 3])
+
+
+# #############################################################################
+# Test_get_task_key1
+# #############################################################################
+
+
+class Test_get_task_key1(hunitest.TestCase):
+    def test1(self) -> None:
+        """
+        Check that tasks with the same truncated representation have different
+        keys.
+        """
+        # Prepare inputs.
+        df1 = pd.DataFrame({"a": range(1000)})
+        df2 = df1.copy()
+        df2.iloc[500, 0] = -1
+        task1 = ((df1,), {"x": 1})
+        task2 = ((df2,), {"x": 1})
+        self.assertEqual(str(task1), str(task2))
+        # Run test.
+        key1 = hjoblib._get_task_key(task1)
+        key2 = hjoblib._get_task_key(task2)
+        # Check outputs.
+        self.assertNotEqual(key1, key2)
+
+    def test2(self) -> None:
+        """
+        Check that the key depends only on the content of the task.
+        """
+        # Prepare inputs.
+        task1 = ((pd.DataFrame({"a": [1, 2]}),), {"x": 1, "y": object})
+        task2 = ((pd.DataFrame({"a": [1, 2]}),), {"x": 1, "y": object})
+        # Run test.
+        key1 = hjoblib._get_task_key(task1)
+        # The params added by the executor are ignored.
+        key2 = hjoblib._get_task_key(
+            (task2[0], {**task2[1], "incremental": True, "num_attempts": 1})
+        )
+        # Check outputs.
+        self.assertEqual(key1, key2)
+
+
+# #############################################################################
+# Test_parallel_execute_retry1
+# #############################################################################
+
+
+# Number of failing attempts of the tasks executed by
+# `flaky_workload_function()`: val -> number of failures left.
+_NUM_FAILURES: Dict[int, int] = {}
+
+
+def flaky_workload_function(
+    val: int,
+    exception_type: type,
+    #
+    **kwargs: Any,
+) -> int:
+    """
+    Execute a task failing until its number of failures is exhausted.
+
+    :param val: value to return
+    :param exception_type: type of the exception raised on failure
+    :return: `val`
+    """
+    _ = kwargs
+    _EXECUTED_TASKS.append(val)
+    if _NUM_FAILURES.get(val, 0) > 0:
+        _NUM_FAILURES[val] -= 1
+        raise exception_type(f"Error {val}")
+    return val
+
+
+class Test_parallel_execute_retry1(hunitest.TestCase):
+    """
+    Retry the tasks failing with a retriable exception.
+    """
+
+    def set_up_test(self) -> None:
+        _EXECUTED_TASKS.clear()
+        _NUM_FAILURES.clear()
+
+    @pytest.fixture(autouse=True)
+    def setup_teardown_test(self):
+        # Run before each test.
+        self.set_up_test()
+        yield
+
+    def _run_workload(
+        self,
+        exception_type: type,
+        num_threads: Union[str, int],
+        backend: str,
+    ) -> List[Any]:
+        tasks = [((val, exception_type), {}) for val in [1, 2, 3]]
+        workload: hjoblib.Workload = (
+            flaky_workload_function,
+            "flaky_workload_function",
+            tasks,
+        )
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        retry_policy = hjoblib.TaskRetryPolicy(
+            num_attempts=3,
+            retry_exceptions=(ValueError,),
+            retry_delay_in_sec=0.05,
+        )
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            num_threads,
+            True,
+            False,
+            1,
+            log_file,
+            backend=backend,
+            retry_policy=retry_policy,
+        )
+        return res
+
+    def test_serial1(self) -> None:
+        """
+        Check that a task failing less times than the attempts succeeds.
+        """
+        # Prepare inputs.
+        _NUM_FAILURES.update({2: 2})
+        # Run test.
+        res = self._run_workload(ValueError, "serial", "")
+        # Check outputs.
+        self.assertEqual(res, [1, 2, 3])
+        self.assertEqual(_EXECUTED_TASKS, [1, 2, 2, 2, 3])
+
+    def test_serial2(self) -> None:
+        """
+        Check that a task failing more times than the attempts fails.
+        """
+        # Prepare inputs.
+        _NUM_FAILURES.update({2: 3})
+        # Run test.
+        res = self._run_workload(ValueError, "serial", "")
+        # Check outputs.
+        self.assertEqual(res, [1, "Error 2", 3])
+        self.assertEqual(_EXECUTED_TASKS, [1, 2, 2, 2, 3])
+
+    def test_serial3(self) -> None:
+        """
+        Check that a task failing with a non-retriable exception is not
+        retried.
+        """
+        # Prepare inputs.
+        _NUM_FAILURES.update({2: 1})
+        # Run test.
+        res = self._run_workload(IndexError, "serial", "")
+        # Check outputs.
+        self.assertEqual(res, [1, "Error 2", 3])
+        self.assertEqual(_EXECUTED_TASKS, [1, 2, 3])
+
+    def test_parallel_asyncio_threading1(self) -> None:
+        """
+        Check that the failing task is retried without blocking the others.
+        """
+        # Prepare inputs.
+        _NUM_FAILURES.update({1: 2})
+        # Run test.
+        res = self._run_workload(ValueError, 2, "asyncio_threading")
+        # Check outputs.
+        self.assertEqual(res, [1, 2, 3])
+        self.assertEqual(sorted(_EXECUTED_TASKS), [1, 1, 1, 2, 3])
+        # The other tasks are executed while the first task waits to be retried.
+        self.assertEqual(_EXECUTED_TASKS[-1], 1)
+
+
+# #############################################################################
+# Test_parallel_execute_timeout1
+# #############################################################################
+
+
+class Test_parallel_execute_timeout1(hunitest.TestCase):
+    """
+    Time out the tasks running too long.
+    """
+
+    def _run_test(self, num_threads: Union[str, int], backend: str) -> None:
+        # Prepare inputs.
+        workload = get_sleep_workload([1, 2, 3], sleep_in_secs=0.01)
+        _, _, tasks = workload
+        tasks[1] = ((2, 2.0), {})
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        retry_policy = hjoblib.TaskRetryPolicy(task_timeout_in_sec=0.5)
+        # Run test.
+        start_time = time.time()
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            num_threads,
+            True,
+            False,
+            1,
+            log_file,
+            backend=backend,
+            retry_policy=retry_policy,
+        )
+        elapsed_time = time.time() - start_time
+        # Check outputs.
+        self.assertEqual(res, [1, "Task 2 timed out after 0.5 secs", 3])
+        self.assertLess(elapsed_time, 2.0)
+
+    def test_serial1(self) -> None:
+        """
+        Check that a task timing out is interrupted.
+        """
+        self._run_test("serial", "")
+
+    def test_parallel_asyncio_threading1(self) -> None:
+        """
+        Check that a task timing out fails without waiting for it.
+        """
+        self._run_test(2, "asyncio_threading")
+
+    def test_serial2(self) -> None:
+        """
+        Check that serial tasks run outside the main thread without timeout.
+        """
+        # Prepare inputs.
+        workload = get_sleep_workload([1, 2, 3], sleep_in_secs=0.01)
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        retry_policy = hjoblib.TaskRetryPolicy(task_timeout_in_sec=0.5)
+        res = []
+
+        def _run() -> None:
+            res.extend(
+                hjoblib.parallel_execute(
+                    workload,
+                    False,
+                    "serial",
+                    True,
+                    False,
+                    1,
+                    log_file,
+                    retry_policy=retry_policy,
+                )
+            )
+
+        # Run test.
+        thread = threading.Thread(target=_run)
+        thread.start()
+        thread.join()
+        # Check outputs.
+        self.assertEqual(res, [1, 2, 3])
+
+
+# #############################################################################
+# Test_worker_pool1
+# #############################################################################
+
+
+def get_pid(val: int, **kwargs: Any) -> Tuple[int, int]:
+    """
+    Return the value and the pid of the process executing the function.
+
+    :param val: value to return, or -1 to raise
+    """
+    _ = kwargs
+    if val == -1:
+        raise ValueError("Error")
+    return val, os.getpid()
+
+
+class Test_worker_pool1(hunitest.TestCase):
+    """
+    Execute functions in a pool of warm worker processes.
+    """
+
+    def test1(self) -> None:
+        """
+        Check that the function is executed in a worker process.
+        """
+        # Prepare inputs.
+        worker_pool = hjoblib.get_worker_pool(1, max_tasks_per_worker=None)
+        func = hjoblib.processify(get_pid, worker_pool=worker_pool)
+        # Run test.
+        res = [func(val) for val in range(3)]
+        # Check outputs.
+        self.assertEqual([val for val, _ in res], [0, 1, 2])
+        pids = {pid for _, pid in res}
+        self.assertEqual(len(pids), 1)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test2(self) -> None:
+        """
+        Check that a worker is replaced after executing its tasks.
+        """
+        # Prepare inputs.
+        worker_pool = hjoblib.get_worker_pool(1, max_tasks_per_worker=2)
+        func = hjoblib.processify(get_pid, worker_pool=worker_pool)
+        # Run test.
+        res = [func(val) for val in range(4)]
+        # Check outputs.
+        pids = [pid for _, pid in res]
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[2], pids[3])
+        self.assertNotEqual(pids[0], pids[2])
+
+    def test3(self) -> None:
+        """
+        Check that the exception of the function is propagated.
+        """
+        # Prepare inputs.
+        worker_pool = hjoblib.get_worker_pool(1, max_tasks_per_worker=None)
+        func = hjoblib.processify(get_pid, worker_pool=worker_pool)
+        # Run test.
+        with self.assertRaises(ValueError) as cm:
+            func(-1)
+        # Check outputs.
+        self.assert_equal(str(cm.exception), "Error")
+
+    def test4(self) -> None:
+        """
+        Check that the same pool is returned for the same params.
+        """
+        # Run test.
+        worker_pool1 = hjoblib.get_worker_pool(2, max_tasks_per_worker=10)
+        worker_pool2 = hjoblib.get_worker_pool(2, max_tasks_per_worker=10)
+        worker_pool3 = hjoblib.get_worker_pool(2, max_tasks_per_worker=20)
+        # Check outputs.
+        self.assertIs(worker_pool1, worker_pool2)
+        self.assertIsNot(worker_pool1, worker_pool3)
+
+    def test5(self) -> None:
+        """
+        Check that a broken pool is replaced with a new one.
+        """
+        # Prepare inputs.
+        worker_pool1 = hjoblib.get_worker_pool(1, max_tasks_per_worker=None)
+        func = hjoblib.processify(os._exit, worker_pool=worker_pool1)
+        # Run test.
+        with self.assertRaises(concurrent.futures.process.BrokenProcessPool):
+            func(1)
+        worker_pool2 = hjoblib.get_worker_pool(1, max_tasks_per_worker=None)
+        res = worker_pool2.submit(get_pid, 1).result()
+        # Check outputs.
+        self.assertIsNot(worker_pool1, worker_pool2)
+        self.assertEqual(res[0], 1)
+
+
+# #############################################################################
+# Test_parallel_execute_threading1
+# #############################################################################
+
+
+class Test_parallel_execute_threading1(hunitest.TestCase):
+    """
+    Execute a workload with the threading backend in separate processes.
+    """
+
+    def _run_workload(
+        self, workload_func: Callable, **kwargs: Any
+    ) -> List[Tuple[int, int]]:
+        tasks = [((val,), {}) for val in range(6)]
+        workload: hjoblib.Workload = (workload_func, "get_pid", tasks)
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            2,
+            True,
+            True,
+            1,
+            log_file,
+            backend="threading",
+            **kwargs,
+        )
+        return res
+
+    def test1(self) -> None:
+        """
+        Check that the tasks are executed by the warm workers.
+        """
+        # Run test.
+        res = self._run_workload(
+            get_pid, use_worker_pool=True, max_tasks_per_worker=3
+        )
+        # Check outputs.
+        self.assertEqual([val for val, _ in res], list(range(6)))
+        pids = {pid for _, pid in res}
+        self.assertNotIn(os.getpid(), pids)
+        # Each of the 2 workers executes at most 3 tasks.
+        self.assertLessEqual(len(pids), 4)
+        self.assertGreaterEqual(len(pids), 2)
+
+    def test2(self) -> None:
+        """
+        Check that by default each task is executed by a new process.
+        """
+        # Run test.
+        res = self._run_workload(get_pid)
+        # Check outputs.
+        self.assertEqual([val for val, _ in res], list(range(6)))
+        pids = {pid for _, pid in res}
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(len(pids), 6)
+
+    def test3(self) -> None:
+        """
+        Check that a function that can't be sent to the workers is executed by
+        a new process for each task.
+        """
+        # Prepare inputs.
+        offset = 10
+
+        def _get_pid(val: int, **kwargs: Any) -> Tuple[int, int]:
+            return get_pid(val + offset, **kwargs)
+
+        # Run test.
+        res = self._run_workload(_get_pid, use_worker_pool=True)
+        # Check outputs.
+        self.assertEqual([val for val, _ in res], list(range(10, 16)))
+        pids = {pid for _, pid in res}
+        self.assertNotIn(os.getpid(), pids)
+
+
+# #############################################################################
+# Test_parallel_execute_run_report1
+# #############################################################################
+
+
+class Test_parallel_execute_run_report1(hunitest.TestCase):
+    """
+    Save a report with the statistics of the tasks of a run.
+    """
+
+    def _run_test(self, num_threads: Union[str, int], backend: str) -> None:
+        # Prepare inputs.
+        workload = get_sleep_workload([0, 1, 2, 3, 4], sleep_in_secs=0.01)
+        _, _, tasks = workload
+        # Make a task much slower than the others.
+        tasks[3] = ((3, 0.5), {})
+        log_file = os.path.join(self.get_scratch_space(), "log.txt")
+        # Run test.
+        res = hjoblib.parallel_execute(
+            workload,
+            False,
+            num_threads,
+            True,
+            True,
+            1,
+            log_file,
+            backend=backend,
+            profile_tasks=True,
+        )
+        # Check outputs.
+        self.assertEqual(res, [0, 1, 2, 3, 4])
+        file_name = hjoblib.get_run_report_file_name(log_file)
+        self.assertEqual(
+            file_name,
+            os.path.join(self.get_scratch_space(), "log.run_report.json"),
+        )
+        report = hio.from_json(file_name)
+        self.assertEqual(report["num_tasks"], 5)
+        self.assertEqual(
+            [task["task_idx"] for task in report["tasks"]], [0, 1, 2, 3, 4]
+        )
+        for task in report["tasks"]:
+            self.assertEqual(task["num_task_attempts"], 1)
+            self.assertGreater(task["peak_rss_in_GB"], 0)
+            self.assertGreaterEqual(task["queue_wait_in_secs"], 0)
+            self.assertIsNotNone(task["worker_id"])
+        self.assertEqual(
+            sorted(report["summary"].keys()),
+            [
+                "cpu_time_in_secs",
+                "elapsed_time_in_secs",
+                "num_task_attempts",
+                "peak_rss_in_GB",
+                "queue_wait_in_secs",
+                "run_time_in_secs",
+            ],
+        )
+        self.assertIn("90%", report["summary"]["run_time_in_secs"])
+        self.assertEqual(
+            [task["task_idx"] for task in report["stragglers"]], [3]
+        )
+
+    def test_serial1(self) -> None:
+        self._run_test("serial", "")
+
+    def test_parallel_asyncio_threading1(self) -> None:
+        self._run_test(2, "asyncio_threading")
+
+    def test_parallel_threading1(self) -> None:
+        self._run_test(2, "threading")
+
+
 # #############################################################################
 
 
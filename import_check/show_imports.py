@@ -119,24 +119,32 @@ class _PydepsRunner:
         cmd = f"export PYTHONPATH=/src:$PYTHONPATH; uvx pydeps {args_str} > {output_filename}"
         return cmd
 
-    def _run_submodule(self, submodule_path: str) -> str:
+    def _run_submodules(self) -> List[str]:
         """
-        Run the `pydeps` script on the specified submodule.
+        Run the `pydeps` script on all the submodules concurrently.
 
-        :param submodule_path: path to the input submodule
-        :return: the output filename
+        :return: the output filenames, in the same order as the submodules
         """
-        output_name = submodule_path.replace("/", "_")
-        # Set the `pydeps` output filename.
-        _tmp_output_filename = f"{self.tmp_dir.name}/{output_name}.json"
-        # Build and run the pydeps command.
-        cmd = self._build_pydeps_command(submodule_path, _tmp_output_filename)
-        hsystem.system(cmd)
-        # Assert that the command produced an output.
-        hdbg.dassert_path_exists(
-            _tmp_output_filename, msg="`pydeps` did not produce any output"
-        )
-        return _tmp_output_filename
+        tmp_output_filenames = []
+        cmds = []
+        for submodule_path in self.submodules:
+            output_name = submodule_path.replace("/", "_")
+            # Set the `pydeps` output filename.
+            _tmp_output_filename = f"{self.tmp_dir.name}/{output_name}.json"
+            tmp_output_filenames.append(_tmp_output_filename)
+            # Build the pydeps command.
+            cmd = self._build_pydeps_command(
+                submodule_path, _tmp_output_filename
+            )
+            cmds.append(cmd)
+        # Run the commands, overlapping their execution.
+        hsystem.system_concurrently(cmds)
+        for _tmp_output_filename in tmp_output_filenames:
+            # Assert that the command produced an output.
+            hdbg.dassert_path_exists(
+                _tmp_output_filename, msg="`pydeps` did not produce any output"
+            )
+        return tmp_output_filenames
 
     def run(self) -> str:
         """
@@ -145,13 +153,10 @@ class _PydepsRunner:
         :return: the output filename
         """
         # Call `pydeps` for each submodule.
-        tmp_output_filenames = []
-        submodule_names = []
-        for submodule in self.submodules:
-            tmp_output_filename = self._run_submodule(submodule)
-            tmp_output_filenames.append(tmp_output_filename)
-            submodule_name = submodule.split("/")[-1]
-            submodule_names.append(submodule_name)
+        tmp_output_filenames = self._run_submodules()
+        submodule_names = [
+            submodule.split("/")[-1] for submodule in self.submodules
+        ]
         # Concatenate outputs.
         _tmp_concatenated_output_filename = (
             f"{self.tmp_dir.name}/concatenated_output.json"
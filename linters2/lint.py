@@ -351,14 +351,19 @@ def _lint_jupyter_files(
         abort_on_error=abort_on_error,
     )
     if "sync_jupytext" in actions:
-        for file_path in file_paths:
-            _LOG.debug("Syncing jupytext: %s", file_path)
-            ret |= hsystem.system(
-                f"jupytext --sync {file_path}",
-                print_command=True,
-                abort_on_error=abort_on_error,
-                suppress_output=False,
-            )
+        # Each notebook is synced independently, so run the commands
+        # concurrently.
+        cmds = [f"jupytext --sync {file_path}" for file_path in file_paths]
+        results = hsystem.system_concurrently(
+            cmds,
+            abort_on_error=abort_on_error,
+            log_level=logging.INFO,
+        )
+        for result in results:
+            output = (result.stdout + result.stderr).rstrip("\n")
+            if output:
+                print(output)
+            ret |= result.rc
     return ret
 
 
@@ -629,7 +629,7 @@ class Test_lint_jupyter_files(hunitest.TestCase):
 
     def test3(self) -> None:
         """
-        actions=["sync_jupytext"]: 2 jupytext calls.
+        actions=["sync_jupytext"]: 2 concurrent jupytext calls.
         """
         # Prepare inputs.
         file_paths = ["foo.ipynb", "bar.ipynb"]
@@ -639,14 +639,9 @@ class Test_lint_jupyter_files(hunitest.TestCase):
         expected_return_code = 0
         expected = r"""[
         {
-        'function': hsystem.system,
-        'args': ('jupytext --sync foo.ipynb',),
-        'kwargs': {'print_command': True, 'abort_on_error': True, 'suppress_output': False},
-        },
-        {
-        'function': hsystem.system,
-        'args': ('jupytext --sync bar.ipynb',),
-        'kwargs': {'print_command': True, 'abort_on_error': True, 'suppress_output': False},
+        'function': hsystem.system_concurrently,
+        'args': (['jupytext --sync foo.ipynb', 'jupytext --sync bar.ipynb'],),
+        'kwargs': {'abort_on_error': True, 'log_level': 20},
         },
         ]"""
         # Run test.
@@ -0,0 +1,8 @@
+#!/bin/bash -xe
+# Repro script for failed tests (auto-generated during the pytest run).
+pytest_log helpers/test/test_hs3.py::Test_s3_get_credentials1::test1 $*
+pytest_log helpers/test/test_hs3.py::Test_s3_1::test_exists1 $*
+pytest_log helpers/test/test_hs3.py::Test_s3_1::test_exists2 $*
+pytest_log helpers/test/test_hs3.py::Test_s3_1::test_exists3 $*
+pytest_log helpers/test/test_hs3.py::Test_s3_1::test_glob1 $*
+pytest_log helpers/test/test_hs3.py::Test_s3_1::test_ls1 $*
@@ -0,0 +1 @@
+ls this_file_doesnt_exist
\ No newline at end of file